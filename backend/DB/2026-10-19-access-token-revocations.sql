@@ -0,0 +1,16 @@
+-- Persisted access-token revocations (backend/utils/auth_deps.py).
+-- Logout stores the SHA-256 of the access token until it would have expired;
+-- signing a customer out everywhere (password change, deactivation) sets
+-- customers.tokens_valid_after, and tokens issued before it are refused.
+-- Workers read both on every verified-token cache miss.  Expired rows are
+-- pruned a few at a time by the application.
+-- The application creates these itself on first start.
+
+CREATE TABLE IF NOT EXISTS revoked_access_tokens (
+  token_hash BINARY(32) NOT NULL,
+  expires_at DATETIME NOT NULL,
+  PRIMARY KEY (token_hash),
+  KEY idx_revoked_access_tokens_expires (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+ALTER TABLE customers ADD COLUMN tokens_valid_after TIMESTAMP NULL DEFAULT NULL;
@@ -0,0 +1,35 @@
+-- Keyset indexes for browsing admin_logs (GET /api/logs pages newest first by
+-- timestamp, log_id and filters by entity type or admin), plus the
+-- monthly-partitioned archive that backend/scripts/archive_admin_logs.py moves
+-- old rows into (backend/utils/admin_log_archive.py).
+-- The application creates these itself on first start; the archive script adds
+-- a partition per archived month.
+
+ALTER TABLE admin_logs
+  ADD INDEX idx_admin_logs_entity_time (entity_type, `timestamp`),
+  ADD INDEX idx_admin_logs_admin_time (admin_id, `timestamp`),
+  ADD INDEX idx_admin_logs_time (`timestamp`);
+
+CREATE TABLE IF NOT EXISTS admin_logs_archive (
+  log_id INT NOT NULL,
+  admin_id INT NOT NULL,
+  action_type VARCHAR(16) NOT NULL,
+  entity_type VARCHAR(32) NOT NULL,
+  entity_id INT NOT NULL,
+  description TEXT,
+  `timestamp` DATETIME NOT NULL,
+  archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (log_id, `timestamp`),
+  KEY idx_admin_logs_archive_entity_time (entity_type, `timestamp`),
+  KEY idx_admin_logs_archive_admin_time (admin_id, `timestamp`),
+  KEY idx_admin_logs_archive_time (`timestamp`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+PARTITION BY RANGE COLUMNS(`timestamp`) (
+  PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- Example: archiving January 2026 first splits p_future.
+-- ALTER TABLE admin_logs_archive REORGANIZE PARTITION p_future INTO (
+--   PARTITION p202601 VALUES LESS THAN ('2026-02-01 00:00:00'),
+--   PARTITION p_future VALUES LESS THAN (MAXVALUE)
+-- );
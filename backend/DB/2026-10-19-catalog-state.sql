@@ -0,0 +1,14 @@
+-- Version counter for the per-worker catalog snapshot (backend/utils/catalog.py).
+-- Every catalog write in routers/products.py increments it inside its own
+-- transaction. The application creates this table itself on first start.
+
+CREATE TABLE IF NOT EXISTS catalog_state (
+  id TINYINT NOT NULL,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- id 1: items/combos/categories, id 2: discount codes and item discounts,
+-- id 3: menu_items stock (bumped by the low-stock watcher after each change).
+INSERT IGNORE INTO catalog_state (id, version) VALUES (1, 0), (2, 0), (3, 0);
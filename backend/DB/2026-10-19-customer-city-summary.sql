@@ -0,0 +1,20 @@
+-- Precomputed (customer, city) rows behind the admin customer list and the
+-- dashboard customer count (backend/utils/customer_summary.py). Address and
+-- order writes keep it current; rebuild with
+-- `python -m backend.scripts.rebuild_customer_city_summary`.
+-- The application creates and backfills this table itself on first start.
+
+CREATE TABLE IF NOT EXISTS customer_city_summary (
+  customer_id INT NOT NULL,
+  city_code VARCHAR(3) NOT NULL,
+  address_id INT NULL,
+  route_id INT NULL,
+  completed_orders INT NOT NULL DEFAULT 0,
+  pending_orders INT NOT NULL DEFAULT 0,
+  last_order_at TIMESTAMP NULL,
+  customer_created_at DATETIME NULL,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (customer_id, city_code),
+  KEY idx_ccs_city_created (city_code, customer_created_at, customer_id),
+  KEY idx_ccs_address (address_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,25 @@
+-- One row per (customer, role) assignment, mirroring the customers.roles JSON
+-- array (backend/utils/rbac.py). Role usage counts, the team-member list and
+-- the audit log's admin lookup read this instead of parsing every customer's
+-- JSON. The RBAC team-member endpoints keep it in sync.
+-- The application creates and fills this itself on first start.
+
+CREATE TABLE IF NOT EXISTS customer_roles (
+  customer_id INT NOT NULL,
+  role_id INT NOT NULL,
+  PRIMARY KEY (customer_id, role_id),
+  KEY idx_customer_roles_role (role_id, customer_id),
+  CONSTRAINT fk_customer_roles_customer
+    FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+    ON DELETE CASCADE,
+  CONSTRAINT fk_customer_roles_role
+    FOREIGN KEY (role_id) REFERENCES roles(role_id)
+    ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT IGNORE INTO customer_roles (customer_id, role_id)
+SELECT c.customer_id, r.role_id
+  FROM customers c
+ CROSS JOIN JSON_TABLE(c.roles, '$[*]' COLUMNS (role_id INT PATH '$')) jt
+  JOIN roles r ON r.role_id = jt.role_id
+ WHERE c.roles IS NOT NULL;
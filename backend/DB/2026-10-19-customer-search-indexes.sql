@@ -0,0 +1,16 @@
+-- Indexes behind the shared customer search (backend/customer/customer_search.py).
+-- mobile_rev stores the reversed mobile number so "last N digits" lookups are
+-- index prefix scans; the ngram FULLTEXT indexes serve substring matches on
+-- name/email and address text. The application applies this itself on first start.
+
+ALTER TABLE customers
+  ADD COLUMN mobile_rev VARCHAR(20) GENERATED ALWAYS AS (REVERSE(primary_mobile)) STORED,
+  ADD INDEX idx_customers_mobile_rev (mobile_rev),
+  ADD INDEX idx_customers_name (name),
+  ADD INDEX idx_customers_email (email);
+
+ALTER TABLE customers
+  ADD FULLTEXT INDEX ft_customers_name_email (name, email) WITH PARSER ngram;
+
+ALTER TABLE addresses
+  ADD FULLTEXT INDEX ft_addresses_written_address (written_address) WITH PARSER ngram;
@@ -0,0 +1,25 @@
+-- Change tracking and keyset indexes for the order-history loader
+-- (backend/utils/order_history.py). updated_at moves on every UPDATE of an
+-- order row, so clients can sync with ?updated_since=. The application
+-- applies this itself on first start.
+
+ALTER TABLE orders
+  ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+UPDATE orders SET updated_at = created_at WHERE created_at IS NOT NULL;
+
+ALTER TABLE orders
+  ADD INDEX idx_orders_customer_created (customer_id, created_at, order_id),
+  ADD INDEX idx_orders_customer_updated (customer_id, updated_at),
+  ADD INDEX idx_orders_created (created_at, order_id);
+
+-- Deleted orders, so ?updated_since= syncs can report them
+-- (order_history.delete_orders writes a row before deleting).
+CREATE TABLE IF NOT EXISTS order_tombstones (
+  order_id INT NOT NULL,
+  customer_id INT NULL,
+  deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (order_id),
+  KEY idx_order_tombstones_customer_deleted (customer_id, deleted_at),
+  KEY idx_order_tombstones_deleted (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,22 @@
+-- Server-side refresh-token sessions (backend/utils/refresh_sessions.py).
+-- One row per issued refresh token (jti); tokens from one login share a
+-- family_id.  Refresh rotates a row (rotated_at) and inserts its child;
+-- logout, token reuse and password changes set revoked_at.  Rows more than a
+-- day past expires_at are pruned in batches by the application.
+-- The application creates this itself on first start.
+
+CREATE TABLE IF NOT EXISTS refresh_sessions (
+  jti CHAR(36) NOT NULL,
+  family_id CHAR(36) NOT NULL,
+  customer_id INT NOT NULL,
+  parent_jti CHAR(36) NULL,
+  issued_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  expires_at DATETIME NOT NULL,
+  rotated_at DATETIME NULL,
+  revoked_at DATETIME NULL,
+  revoke_reason VARCHAR(32) NULL,
+  PRIMARY KEY (jti),
+  KEY idx_refresh_sessions_family (family_id),
+  KEY idx_refresh_sessions_customer (customer_id, revoked_at),
+  KEY idx_refresh_sessions_expires (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
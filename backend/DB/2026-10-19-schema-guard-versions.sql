@@ -0,0 +1,10 @@
+-- Bookkeeping for the startup schema guard registry (backend/utils/schema.py).
+-- The application creates this table itself on first start; this file exists
+-- so fresh environments provisioned from SQL match.
+
+CREATE TABLE IF NOT EXISTS schema_guard_versions (
+  guard_name VARCHAR(100) NOT NULL,
+  version INT NOT NULL,
+  applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (guard_name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,15 @@
+-- Precomputed answers for GET /api/customers/{id}/subscription-today
+-- (backend/utils/subscription_snapshots.py). Rows for a (date, city) are
+-- rebuilt when subscriptions are resolved for a menu and dropped when a
+-- customer's subscription or pauses change, or the day's menu is edited.
+-- The application creates this itself on first start.
+
+CREATE TABLE IF NOT EXISTS subscription_today_snapshots (
+  service_date DATE NOT NULL,
+  city_code VARCHAR(3) NOT NULL,
+  customer_id INT NOT NULL,
+  payload JSON NOT NULL,
+  built_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (service_date, city_code, customer_id),
+  KEY idx_sub_snapshots_customer (customer_id, service_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -65,6 +65,25 @@ def _refresh_token_ttl() -> int:
 
 ACCESS_TOKEN_TTL_SEC = _access_token_ttl()
 REFRESH_TOKEN_TTL_SEC = _refresh_token_ttl()
+# A refresh token presented again within this many seconds of its rotation is
+# a concurrent refresh (several browser requests at once), not a replay.
+REFRESH_REUSE_GRACE_SEC = int(_clean(os.getenv("REFRESH_REUSE_GRACE_SEC")) or 10)
+
+# Verified access tokens kept in memory per worker; 0 disables the cache.
+AUTH_TOKEN_CACHE_SIZE = int(_clean(os.getenv("AUTH_TOKEN_CACHE_SIZE")) or 10000)
+# Seconds a cached token is trusted before revocations are re-read from the database.
+AUTH_TOKEN_CACHE_TTL_SEC = int(_clean(os.getenv("AUTH_TOKEN_CACHE_TTL_SEC")) or 30)
+
+# bcrypt cost for new admin password hashes.  With rehash-on-login, a hash of a
+# different cost is replaced after the next successful admin login.
+BCRYPT_ROUNDS = int(_clean(os.getenv("BCRYPT_ROUNDS")) or 12)
+BCRYPT_REHASH_ON_LOGIN = (
+    _clean(os.getenv("BCRYPT_REHASH_ON_LOGIN", "true")) or ""
+).lower() == "true"
+# Threads dedicated to bcrypt per worker, and how many checks may wait for one
+# before logins are turned away with 503.
+BCRYPT_POOL_WORKERS = int(_clean(os.getenv("BCRYPT_POOL_WORKERS")) or 2)
+BCRYPT_POOL_MAX_QUEUE = int(_clean(os.getenv("BCRYPT_POOL_MAX_QUEUE")) or 32)
 
 COOKIE_SECURE = (_clean(os.getenv("COOKIE_SECURE", "false")) or "").lower() == "true"
 COOKIE_SAMESITE = _clean(os.getenv("COOKIE_SAMESITE", "Lax")) or "Lax"
@@ -4,6 +4,8 @@ from datetime import date, datetime
 from typing import Optional
 from pydantic import BaseModel
 
+from ..utils.customer_summary import refresh_customer_city_summary
+from .customer_search import customer_match_sql
 from ..utils.rbac import get_role_id, parse_role_ids
 
 
@@ -82,6 +84,7 @@ def create_customer(db, customer_data):
         )
 
         cursor.execute(address_query, address_values)
+        refresh_customer_city_summary(cursor, customer_ids=[customer_id])
         db.commit()
 
         return {"customer_id": customer_id, "message": "Customer and address created successfully"}
@@ -139,8 +142,9 @@ def get_all_customers(
         db: Database connection.
         city_code: Optional city filter; when set, only customers with an address in that city
             are returned.
-        search: Optional substring filter applied to customer name, phone, or email.
-        limit: Maximum number of rows to return (capped at 500).
+        search: Optional search text, matched and ranked by ``search_customers`` (name, phone,
+            email, address).
+        limit: Maximum number of rows to return (capped at 500); the total counts every match.
         offset: Pagination offset.
 
     Returns:
@@ -149,76 +153,52 @@ def get_all_customers(
     limit = min(limit, 500)
     try:
         cursor = db.cursor(dictionary=True)
-        params: list = []
-        search_clause = ""
-        search_params: list = []
-        if search:
-            term = f"%{search}%"
-            search_clause = (
-                " AND (c.name LIKE %s OR c.primary_mobile LIKE %s"
-                " OR c.email LIKE %s OR a.written_address LIKE %s)"
-            )
-            search_params = [term, term, term, term]
+        # Every search match is joined in (not a capped id list), so the total
+        # and the later pages cover all of them.
+        match = customer_match_sql(search) if search else None
+        match_join = ""
+        base_params: list = []
+        if match is not None:
+            match_sql, match_params = match
+            match_join = f"INNER JOIN ({match_sql}) m ON m.customer_id = c.customer_id"
+            base_params.extend(match_params)
 
         if city_code:
-            base_from = """
-            FROM customers c
-            INNER JOIN (
-                SELECT *
-                FROM (
-                    SELECT addr.*,
-                           ROW_NUMBER() OVER (
-                               PARTITION BY addr.customer_id
-                               ORDER BY addr.is_default DESC, addr.address_id DESC
-                           ) AS rn
-                      FROM addresses addr
-                     WHERE addr.city_code = %s AND addr.is_active = 1
-                ) ranked_addr
-               WHERE ranked_addr.rn = 1
-            ) a ON c.customer_id = a.customer_id
+            base_from = f"""
+            FROM customer_city_summary s
+            INNER JOIN customers c ON c.customer_id = s.customer_id
+            {match_join}
+            INNER JOIN addresses a ON a.address_id = s.address_id
             LEFT JOIN delivery_routes dr ON dr.route_id = a.route_id
-            LEFT JOIN (
-                SELECT o.customer_id, COUNT(*) AS completed_orders
-                 FROM orders o
-                  JOIN addresses ao ON ao.address_id = o.address_id
-                 WHERE LOWER(COALESCE(o.status, '')) = 'delivered'
-                   AND ao.city_code = %s
-                 GROUP BY o.customer_id
-            ) o ON o.customer_id = c.customer_id
-            LEFT JOIN (
-                SELECT o.customer_id, COUNT(*) AS pending_orders
-                 FROM orders o
-                  JOIN addresses ao ON ao.address_id = o.address_id
-                 WHERE LOWER(COALESCE(o.status, '')) IN ('confirmed', 'dispatched')
-                   AND ao.city_code = %s
-                 GROUP BY o.customer_id
-            ) p ON p.customer_id = c.customer_id
-            WHERE 1=1
+            WHERE s.city_code = %s AND s.address_id IS NOT NULL
             """
-            base_params = [city_code, city_code, city_code]
+            base_params.append(city_code)
+            counts_select = "s.completed_orders, s.pending_orders"
+            order_by = "s.customer_created_at ASC, s.customer_id ASC"
         else:
-            base_from = """
+            base_from = f"""
             FROM customers c
+            {match_join}
             INNER JOIN addresses a ON c.customer_id = a.customer_id
             LEFT JOIN delivery_routes dr ON dr.route_id = a.route_id
-            LEFT JOIN (
-                SELECT customer_id, COUNT(*) AS completed_orders
-                FROM orders
-                WHERE status = 'Delivered'
-                GROUP BY customer_id
-            ) o ON o.customer_id = c.customer_id
-            LEFT JOIN (
-                SELECT customer_id, COUNT(*) AS pending_orders
-                FROM orders
-                WHERE status IN ('Confirmed', 'Dispatched')
-                GROUP BY customer_id
-            ) p ON p.customer_id = c.customer_id
             WHERE a.is_default = 1 AND a.is_active = 1
             """
-            base_params = []
-
-        count_query = f"SELECT COUNT(DISTINCT c.customer_id) AS total {base_from}{search_clause}"
-        cursor.execute(count_query, tuple(base_params + search_params))
+            counts_select = "0 AS completed_orders, 0 AS pending_orders"
+            order_by = "c.created_at ASC"
+
+        if match is not None:
+            # Best matches first, in search_customers order.
+            order_by = "m.score DESC, c.name ASC, c.customer_id ASC"
+
+        if city_code and match is None:
+            # Served straight from the (city_code, customer_created_at) index.
+            count_query = (
+                "SELECT COUNT(*) AS total FROM customer_city_summary s"
+                " WHERE s.city_code = %s AND s.address_id IS NOT NULL"
+            )
+        else:
+            count_query = f"SELECT COUNT(DISTINCT c.customer_id) AS total {base_from}"
+        cursor.execute(count_query, tuple(base_params))
         total = int((cursor.fetchone() or {}).get("total") or 0)
 
         data_query = f"""
@@ -229,15 +209,35 @@ def get_all_customers(
                 a.address_id, a.house_apartment_no, a.written_address, a.city,
                 a.pin_code, a.latitude, a.longitude, a.address_type, a.route_id,
                 dr.route_name, dr.route_code,
-                COALESCE(o.completed_orders, 0) AS completed_orders,
-                COALESCE(p.pending_orders, 0) AS pending_orders
-            {base_from}{search_clause}
-            ORDER BY c.created_at ASC
+                {counts_select}
+            {base_from}
+            ORDER BY {order_by}
             LIMIT %s OFFSET %s
         """
-        cursor.execute(data_query, tuple(base_params + search_params + [limit, offset]))
+        cursor.execute(data_query, tuple(base_params + [limit, offset]))
         rows = cursor.fetchall()
 
+        if rows and not city_code:
+            # Order counts across all cities, summed for this page's customers only.
+            page_ids = sorted({row["customer_id"] for row in rows})
+            placeholders = ", ".join(["%s"] * len(page_ids))
+            cursor.execute(
+                f"""
+                SELECT customer_id,
+                       SUM(completed_orders) AS completed_orders,
+                       SUM(pending_orders) AS pending_orders
+                  FROM customer_city_summary
+                 WHERE customer_id IN ({placeholders})
+                 GROUP BY customer_id
+                """,
+                tuple(page_ids),
+            )
+            counts = {row["customer_id"]: row for row in cursor.fetchall() or []}
+            for row in rows:
+                summary = counts.get(row["customer_id"]) or {}
+                row["completed_orders"] = int(summary.get("completed_orders") or 0)
+                row["pending_orders"] = int(summary.get("pending_orders") or 0)
+
         admin_role_id = get_role_id(cursor, "admin")
         for row in rows:
             roles = parse_role_ids(row.get("roles"))
@@ -327,6 +327,7 @@ def update_customer(db, customer_id, customer_data):
                 """,
                 (customer_id,) + new_vals,
             )
+            refresh_customer_city_summary(cursor, customer_ids=[customer_id])
 
         db.commit()
         return {"message": "Customer and address updated successfully"}
@@ -354,6 +355,7 @@ def delete_customer(db, customer_id):
         if cursor.rowcount == 0:
             raise HTTPException(status_code=404, detail="Customer not found")
 
+        cursor.execute("DELETE FROM customer_city_summary WHERE customer_id = %s", (customer_id,))
         db.commit()
         return {"message": "Customer and associated addresses deleted successfully"}
 
@@ -369,10 +371,9 @@ def get_customer_count(db, city_code: Optional[str] = None):
         cursor = db.cursor(dictionary=True)
         if city_code:
             query = """
-                SELECT COUNT(DISTINCT c.customer_id) AS total
-                  FROM customers c
-                  JOIN addresses a ON a.customer_id = c.customer_id
-                 WHERE a.city_code = %s
+                SELECT COUNT(*) AS total
+                  FROM customer_city_summary
+                 WHERE city_code = %s AND address_id IS NOT NULL
             """
             cursor.execute(query, (city_code,))
         else:
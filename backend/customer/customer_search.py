@@ -0,0 +1,257 @@
+"""Ranked customer search shared by the admin list, order history, MCP and NL lookups.
+
+Every caller used to run ``name LIKE '%term%' OR primary_mobile LIKE '%term%'
+...`` which scans the customers (and addresses) table on each keystroke.
+``search_customers`` instead unions a handful of index-backed candidate
+queries and ranks the union:
+
+* exact phone, then phone suffix (``mobile_rev`` — a stored ``REVERSE`` of
+  ``primary_mobile`` — turns "last N digits" into an index prefix scan), then
+  phone prefix;
+* exact name, name prefix and email prefix (B-tree indexes);
+* substring matches on name/email and on active address text through
+  ``FULLTEXT ... WITH PARSER ngram`` indexes, ranked by MySQL relevance.
+
+``customer_match_sql`` exposes the same ranked union as an uncapped
+``(customer_id, score)`` derived table, for callers that count or page over
+every match (the admin customer list, the order-history customer filter).
+
+The indexes live in MySQL, so customer and address writes keep them current
+in every worker without any application-side invalidation.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.schema import schema_guard
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_RESULTS = 500
+
+MIN_PHONE_DIGITS = 3
+PHONE_DIGITS = 10
+MIN_NGRAM_TERM = 2
+
+SCORE_EXACT_PHONE = 100
+SCORE_EXACT_NAME = 90
+SCORE_PHONE_SUFFIX = 80
+SCORE_PHONE_PREFIX = 70
+SCORE_NAME_PREFIX = 60
+SCORE_EMAIL_PREFIX = 50
+SCORE_NAME_EMAIL_TEXT = 40
+SCORE_ADDRESS_TEXT = 20
+# Fulltext relevance only orders matches within their tier.
+MAX_RELEVANCE_BONUS = 9
+
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+_LIKE_SPECIALS = re.compile(r"([\\%_])")
+_PHONE_QUERY = re.compile(r"^\+?[\d\s\-]+$")
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index,))
+    return bool(cursor.fetchall())
+
+
+@schema_guard("customer_search_indexes")
+def _ensure_customer_search_indexes(db) -> None:
+    """Add the phone-suffix column and the search indexes on customers and addresses.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("SHOW COLUMNS FROM customers LIKE 'mobile_rev'")
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "ALTER TABLE customers ADD COLUMN mobile_rev VARCHAR(20) "
+                "GENERATED ALWAYS AS (REVERSE(primary_mobile)) STORED"
+            )
+        statements = [
+            (
+                "customers",
+                "idx_customers_mobile_rev",
+                "ADD INDEX idx_customers_mobile_rev (mobile_rev)",
+            ),
+            ("customers", "idx_customers_name", "ADD INDEX idx_customers_name (name)"),
+            ("customers", "idx_customers_email", "ADD INDEX idx_customers_email (email)"),
+            (
+                "customers",
+                "ft_customers_name_email",
+                "ADD FULLTEXT INDEX ft_customers_name_email (name, email) WITH PARSER ngram",
+            ),
+            (
+                "addresses",
+                "ft_addresses_written_address",
+                "ADD FULLTEXT INDEX ft_addresses_written_address (written_address) WITH PARSER ngram",
+            ),
+        ]
+        for table, index, clause in statements:
+            if not _index_exists(cursor, table, index):
+                cursor.execute(f"ALTER TABLE {table} {clause}")
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def _like_prefix(value: str) -> str:
+    return _LIKE_SPECIALS.sub(r"\\\1", value) + "%"
+
+
+def _boolean_phrase(value: str) -> Optional[str]:
+    cleaned = " ".join(_BOOLEAN_OPERATORS.sub(" ", value).split())
+    if len(cleaned) < MIN_NGRAM_TERM:
+        return None
+    return f'"{cleaned}"'
+
+
+def _candidate_branches(term: str) -> Tuple[List[str], List[Any]]:
+    """Build the UNION ALL branches (``customer_id, score``) for one search term."""
+    branches: List[str] = []
+    params: List[Any] = []
+
+    digits = re.sub(r"\D", "", term)
+    if _PHONE_QUERY.match(term) and len(digits) >= MIN_PHONE_DIGITS:
+        # "+91 98450 12345" is stored as the bare 10-digit number.
+        digits = digits[-PHONE_DIGITS:]
+        branches.append(
+            f"SELECT customer_id, {SCORE_EXACT_PHONE} AS score "
+            "FROM customers WHERE primary_mobile = %s"
+        )
+        params.append(digits)
+        branches.append(
+            f"SELECT customer_id, {SCORE_PHONE_SUFFIX} AS score "
+            "FROM customers WHERE mobile_rev LIKE %s"
+        )
+        params.append(_like_prefix(digits[::-1]))
+        branches.append(
+            f"SELECT customer_id, {SCORE_PHONE_PREFIX} AS score "
+            "FROM customers WHERE primary_mobile LIKE %s"
+        )
+        params.append(_like_prefix(digits))
+        return branches, params
+
+    branches.append(
+        f"SELECT customer_id, {SCORE_EXACT_NAME} AS score FROM customers WHERE name = %s"
+    )
+    params.append(term)
+    branches.append(
+        f"SELECT customer_id, {SCORE_NAME_PREFIX} AS score FROM customers WHERE name LIKE %s"
+    )
+    params.append(_like_prefix(term))
+    branches.append(
+        f"SELECT customer_id, {SCORE_EMAIL_PREFIX} AS score FROM customers WHERE email LIKE %s"
+    )
+    params.append(_like_prefix(term))
+
+    phrase = _boolean_phrase(term)
+    if phrase is not None:
+        branches.append(
+            f"SELECT customer_id, {SCORE_NAME_EMAIL_TEXT} + LEAST("
+            "MATCH(name, email) AGAINST (%s IN BOOLEAN MODE), "
+            f"{MAX_RELEVANCE_BONUS}) AS score "
+            "FROM customers WHERE MATCH(name, email) AGAINST (%s IN BOOLEAN MODE)"
+        )
+        params.extend([phrase, phrase])
+        branches.append(
+            f"SELECT customer_id, {SCORE_ADDRESS_TEXT} + LEAST("
+            "MATCH(written_address) AGAINST (%s IN BOOLEAN MODE), "
+            f"{MAX_RELEVANCE_BONUS}) AS score "
+            "FROM addresses WHERE is_active = 1 "
+            "AND MATCH(written_address) AGAINST (%s IN BOOLEAN MODE)"
+        )
+        params.extend([phrase, phrase])
+    return branches, params
+
+
+def _fetch_dicts(cursor) -> List[Dict[str, Any]]:
+    rows = cursor.fetchall() or []
+    if rows and not isinstance(rows[0], dict):
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in rows]
+    return list(rows)
+
+
+def customer_match_sql(query: Optional[str]) -> Optional[Tuple[str, List[Any]]]:
+    """Return a derived table of every customer matching ``query``, with its score.
+
+    The SQL selects one ``customer_id, score`` row per matching customer and
+    is not limited, so callers can join it, count it and page over it.
+
+    Args:
+        query: Search text as typed by the user.
+
+    Returns:
+        ``(sql, params)`` for use as ``FROM (sql) m``, or None for an empty query.
+    """
+    term = " ".join((query or "").split())
+    if not term:
+        return None
+    branches, params = _candidate_branches(term)
+    sql = (
+        f"SELECT customer_id, MAX(score) AS score "
+        f"FROM ({' UNION ALL '.join(branches)}) u GROUP BY customer_id"
+    )
+    return sql, params
+
+
+def search_customers(
+    cursor,
+    query: Optional[str],
+    *,
+    city_code: Optional[str] = None,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+) -> List[Dict[str, Any]]:
+    """Return customers matching a free-text query, best match first.
+
+    Digit-only queries (spaces, dashes and a leading ``+`` allowed) are
+    treated as phone numbers: exact, last-digits and leading-digits matches.
+    Anything else matches names, emails and active address text.
+
+    Args:
+        cursor: mysql.connector cursor (dictionary or tuple rows) or any DB-API
+            cursor using ``%s`` placeholders.
+        query: Search text as typed by the user.
+        city_code: Only return customers with an active address in this city.
+        limit: Maximum number of matches (capped at ``MAX_SEARCH_RESULTS``).
+
+    Returns:
+        List of dicts with customer_id, name, primary_mobile, email,
+        created_at and score, ordered by score then name.
+    """
+    match = customer_match_sql(query)
+    if match is None:
+        return []
+    match_sql, params = match
+
+    city_clause = ""
+    if city_code:
+        city_clause = """
+         WHERE EXISTS (
+            SELECT 1 FROM customer_city_summary s
+             WHERE s.customer_id = c.customer_id
+               AND s.city_code = %s
+               AND s.address_id IS NOT NULL
+         )
+        """
+        params.append(city_code)
+    params.append(max(1, min(int(limit), MAX_SEARCH_RESULTS)))
+
+    cursor.execute(
+        f"""
+        SELECT c.customer_id, c.name, c.primary_mobile, c.email, c.created_at, m.score
+          FROM ({match_sql}) m
+          JOIN customers c ON c.customer_id = m.customer_id
+        {city_clause}
+         ORDER BY m.score DESC, c.name ASC, c.customer_id ASC
+         LIMIT %s
+        """,
+        tuple(params),
+    )
+    matches = _fetch_dicts(cursor)
+    for match in matches:
+        match["score"] = float(match.get("score") or 0)
+    return matches
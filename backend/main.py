@@ -7,6 +7,7 @@ backend/routers/ and backend/customer/.
 
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
@@ -31,28 +32,55 @@ from .routers.rbac import router as rbac_router
 # Import db to ensure the shared connection pool is initialised at startup.
 from . import db as _db  # noqa: F401
 from .db import get_raw_db
-from .utils.helpers import _ensure_menu_type_column, get_items_columns
+from .nl import get_service as get_nl_service
+from .nl.snapshot import WATCH_INTERVAL_SEC as NL_REGISTRY_WATCH_SEC
+from .nl.snapshot import watch_registry
+from .utils.helpers import get_items_columns
+from .utils.logger import shutdown_audit_log_writer, start_audit_log_writer
+from .utils.password_pool import shutdown_password_pool
+from .utils.refresh_sessions import run_session_pruner
+from .utils.schema import run_schema_guards
+from .utils.stop_sequencing import shutdown_sequencing_pool
 
 
 @asynccontextmanager
 async def _lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Run schema initialisation once at startup before serving any requests.
 
-    Caches the items table column set and applies any outstanding schema
-    migrations (menu_type column guard) so that request handlers never need
-    to do schema inspection at runtime.
+    Applies every registered schema/seed guard (see ``utils/schema.py``) that
+    has not yet been recorded in ``schema_guard_versions`` and caches the
+    items table column set, so that request handlers never need to do schema
+    inspection at runtime. Per-guard timings are logged and available via
+    ``utils.schema.last_schema_report()``.
+
+    Also loads the NL intent registry snapshot, and runs the refresh-session
+    pruner, the admin audit-log writer and (if enabled) the NL registry
+    watcher while serving; on shutdown it stops the background tasks and
+    worker pools and flushes the audit log.
     """
     db = get_raw_db()
     try:
+        run_schema_guards(db)
         cursor = db.cursor(dictionary=True)
         try:
-            _ensure_menu_type_column(db)
             get_items_columns(cursor)
         finally:
             cursor.close()
     finally:
         db.close()
+    pruner = asyncio.create_task(run_session_pruner(get_raw_db))
+    start_audit_log_writer(get_raw_db)
+    nl_service = get_nl_service()
+    registry_watcher = (
+        asyncio.create_task(watch_registry(nl_service)) if NL_REGISTRY_WATCH_SEC > 0 else None
+    )
     yield
+    pruner.cancel()
+    if registry_watcher is not None:
+        registry_watcher.cancel()
+    shutdown_sequencing_pool()
+    shutdown_password_pool()
+    await asyncio.to_thread(shutdown_audit_log_writer)
 
 
 app = FastAPI(
@@ -24,12 +24,14 @@ from typing import Any, Dict, List, Optional
 import fastmcp
 
 from backend.city_config import DEFAULT_CITY, normalize_city_code
+from backend.customer.customer_search import search_customers as _search_customers
 from backend.db import get_raw_db
 from backend.utils.helpers import (
     MENU_TYPE_ONE_DAY,
     normalize_status_for_response,
     resolve_bld_id,
 )
+from backend.utils.order_history import load_order_history
 
 mcp = fastmcp.FastMCP(
     name="kuteera-kitchen",
@@ -140,37 +142,29 @@ def get_orders_for_date(
         status_filter: Optional status string to filter by (e.g. "Confirmed").
 
     Returns:
-        Dict with date, city_code, total_orders, and list of order summaries.
+        Dict with date, city_code, total_orders, and list of order summaries
+        including their line items.
     """
     city = normalize_city_code(city_code)
+    try:
+        service_date = date.fromisoformat(date_str)
+    except ValueError:
+        return {"error": f"Invalid date '{date_str}', expected YYYY-MM-DD"}
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        params: list = [date_str, city]
-        status_clause = ""
-        if status_filter:
-            status_clause = "AND LOWER(o.status) LIKE LOWER(%s)"
-            params.append(f"%{status_filter}%")
-
-        cursor.execute(
-            f"""
-            SELECT o.order_id, o.status, o.total_price, o.payment_method, o.paid,
-                   o.created_at, c.name AS customer_name, c.primary_mobile
-              FROM orders o
-              JOIN customers c ON o.customer_id = c.customer_id
-              JOIN addresses a ON o.address_id = a.address_id
-             WHERE DATE(o.created_at) = %s
-               AND a.city_code = %s
-               {status_clause}
-             ORDER BY o.created_at DESC
-            """,
-            params,
+        page = load_order_history(
+            cursor,
+            city_code=city,
+            created_on=service_date,
+            status_like=status_filter,
+            limit=None,
+            include_customer=True,
         )
-        rows = cursor.fetchall() or []
         return {
             "date": date_str,
             "city_code": city,
-            "total_orders": len(rows),
+            "total_orders": len(page.orders),
             "orders": [
                 {
                     "order_id": row["order_id"],
@@ -183,8 +177,9 @@ def get_orders_for_date(
                     "created_at": (
                         row["created_at"].isoformat() if row.get("created_at") else None
                     ),
+                    "items": row["items"],
                 }
-                for row in rows
+                for row in page.orders
             ],
         }
     finally:
@@ -316,10 +311,10 @@ def search_customers(
     city_code: str = DEFAULT_CITY,
     limit: int = 20,
 ) -> Dict[str, Any]:
-    """Search customers by name or phone number within a city.
+    """Search customers by name, phone, email or address within a city, best match first.
 
     Args:
-        query: Search string matched against name or primary_mobile.
+        query: Search text; digit-only input matches full numbers or their last digits.
         city_code: City code to scope the search (e.g. MYS or BLR).
         limit: Maximum number of results to return (default 20, max 100).
 
@@ -331,19 +326,7 @@ def search_customers(
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        cursor.execute(
-            """
-            SELECT DISTINCT c.customer_id, c.name, c.primary_mobile, c.email, c.created_at
-              FROM customers c
-              JOIN addresses a ON c.customer_id = a.customer_id
-             WHERE a.city_code = %s
-               AND (c.name LIKE %s OR c.primary_mobile LIKE %s)
-             ORDER BY c.name ASC
-             LIMIT %s
-            """,
-            (city, f"%{query}%", f"%{query}%", safe_limit),
-        )
-        rows = cursor.fetchall() or []
+        rows = _search_customers(cursor, query, city_code=city, limit=safe_limit)
         return {
             "city_code": city,
             "query": query,
@@ -357,6 +340,7 @@ def search_customers(
                     "created_at": (
                         row["created_at"].isoformat() if row.get("created_at") else None
                     ),
+                    "score": row["score"],
                 }
                 for row in rows
             ],
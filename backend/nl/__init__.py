@@ -4,12 +4,13 @@ from functools import lru_cache
 from pathlib import Path
 
 from .engine import NLService
+from .snapshot import load_snapshot
 
 
 @lru_cache()
 def get_service() -> NLService:
     base_dir = Path(__file__).resolve().parent
-    return NLService(base_dir)
+    return NLService(base_dir, load_snapshot(base_dir))
 
 
 __all__ = ["get_service", "NLService"]
@@ -2,15 +2,20 @@ from __future__ import annotations
 
 import json
 import re
+import time
+from collections import defaultdict
 from dataclasses import dataclass, field
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Mapping, Optional, Tuple
+from typing import Any, Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple
 
 import yaml
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from ..customer.customer_search import search_customers
+from .result_cache import NLResultCache
+
 
 class SlotExtractionError(Exception):
     pass
@@ -75,6 +80,8 @@ class IntentDefinition:
     projection: Optional[List[Any]]
     responses: Dict[str, Any]
     examples: List[str]
+    cache_topics: Tuple[str, ...] = ()
+    invalidates: Tuple[str, ...] = ()
 
     def extract_slots(
         self,
@@ -111,6 +118,7 @@ class SharedResources:
         self.meal_lookup = self._build_meal_lookup(self.meal_map)
         self.range_lookup, self.default_range = self._build_range_lookup(self.date_rules)
         self.synonym_lookup = self._build_synonym_lookup(self.synonyms)
+        self.range_phrases = dict(sorted(self.range_lookup.items(), key=lambda item: -len(item[0])))
 
     @staticmethod
     def _load_yaml(path: Path, default: Any | None = None) -> Any:
@@ -162,6 +170,128 @@ class SharedResources:
         return self.range_lookup.get(key)
 
 
+@dataclass(frozen=True)
+class _CompiledPattern:
+    intent_index: int
+    pattern: IntentPattern
+    all_terms: FrozenSet[str]
+    any_terms: FrozenSet[str]
+    none_terms: FrozenSet[str]
+
+
+class CompiledMatcher:
+    """Pattern matching for a registry's intents, compiled once at load time.
+
+    Terms are lowercased into frozensets up front.  Every keyword pattern is
+    posted under each of its ``all`` terms in an inverted index, so a query
+    only looks at patterns whose required terms it contains; patterns with
+    no ``all`` terms are always checked.  Multi-word terms (matched as
+    substrings, like ``_term_present``) are found with one alternation regex
+    before any are tested individually.  Results are the same as testing
+    every pattern of every intent in priority order.
+    """
+
+    def __init__(self, intents: List[IntentDefinition]):
+        self.intents = intents
+        self._patterns: List[_CompiledPattern] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._always: List[int] = []
+        phrases: set[str] = set()
+        regexes: List[re.Pattern[str]] = []
+        for intent_index, intent in enumerate(intents):
+            for pattern in intent.patterns:
+                compiled = _CompiledPattern(
+                    intent_index=intent_index,
+                    pattern=pattern,
+                    all_terms=frozenset(term.lower() for term in pattern.all_terms),
+                    any_terms=frozenset(term.lower() for term in pattern.any_terms),
+                    none_terms=frozenset(term.lower() for term in pattern.none_terms),
+                )
+                pattern_id = len(self._patterns)
+                self._patterns.append(compiled)
+                if pattern.kind == "regex":
+                    self._always.append(pattern_id)
+                    if pattern.regex is not None:
+                        regexes.append(pattern.regex)
+                    continue
+                for term in compiled.all_terms | compiled.any_terms | compiled.none_terms:
+                    if _is_phrase(term):
+                        phrases.add(term)
+                for term in compiled.all_terms:
+                    self._postings[term].append(pattern_id)
+                if not compiled.all_terms:
+                    self._always.append(pattern_id)
+        self._phrases: Tuple[str, ...] = tuple(sorted(phrases, key=lambda p: (-len(p), p)))
+        self._phrase_gate = _alternation([re.escape(phrase) for phrase in self._phrases], 0)
+        self._regex_gate = _regex_alternation(regexes)
+
+    def _features(self, utterance: NormalizedUtterance) -> set[str]:
+        if self._phrase_gate is None or not self._phrase_gate.search(utterance.text):
+            return utterance.token_set
+        present = {phrase for phrase in self._phrases if phrase in utterance.text}
+        return utterance.token_set | present
+
+    def _matches(
+        self,
+        compiled: _CompiledPattern,
+        utterance: NormalizedUtterance,
+        features: set[str],
+        regex_possible: bool,
+    ) -> bool:
+        if compiled.pattern.kind == "regex":
+            return regex_possible and compiled.pattern.matches(utterance)
+        if compiled.any_terms and compiled.any_terms.isdisjoint(features):
+            return False
+        if compiled.none_terms and not compiled.none_terms.isdisjoint(features):
+            return False
+        return True
+
+    def candidates(self, utterance: NormalizedUtterance) -> Iterator[IntentDefinition]:
+        """Yield, in priority order, each intent with a pattern matching the utterance."""
+        features = self._features(utterance)
+        hits: Dict[int, int] = {}
+        for term in features:
+            for pattern_id in self._postings.get(term, ()):
+                hits[pattern_id] = hits.get(pattern_id, 0) + 1
+        pattern_ids = [
+            pattern_id
+            for pattern_id, count in hits.items()
+            if count == len(self._patterns[pattern_id].all_terms)
+        ]
+        pattern_ids.extend(self._always)
+        pattern_ids.sort()
+        regex_possible = self._regex_gate is None or bool(self._regex_gate.search(utterance.text))
+        last_intent = -1
+        for pattern_id in pattern_ids:
+            compiled = self._patterns[pattern_id]
+            if compiled.intent_index == last_intent:
+                continue
+            if self._matches(compiled, utterance, features, regex_possible):
+                last_intent = compiled.intent_index
+                yield self.intents[compiled.intent_index]
+
+
+def _is_phrase(term: str) -> bool:
+    return " " in term or "/" in term
+
+
+def _alternation(sources: List[str], flags: int) -> Optional[re.Pattern[str]]:
+    if not sources:
+        return None
+    try:
+        return re.compile("|".join(f"(?:{source})" for source in sources), flags)
+    except re.error:
+        return None
+
+
+def _regex_alternation(regexes: List[re.Pattern[str]]) -> Optional[re.Pattern[str]]:
+    # A gate only: if no alternative matches, no regex pattern can.  Patterns
+    # with differing flags (or that do not combine) are simply not gated.
+    if not regexes or len({regex.flags for regex in regexes}) != 1:
+        return None
+    return _alternation([regex.pattern for regex in regexes], regexes[0].flags)
+
+
 class IntentRegistry:
     def __init__(self, base_dir: Path, shared: SharedResources):
         self.base_dir = base_dir
@@ -169,6 +299,7 @@ class IntentRegistry:
         self.index_path = base_dir / "intents" / "index.json"
         self.intents: List[IntentDefinition] = []
         self.examples: List[str] = []
+        self.matcher = CompiledMatcher([])
         self._load()
 
     def _load(self) -> None:
@@ -186,6 +317,7 @@ class IntentRegistry:
             examples.extend(entry.get("examples", [])[:3])
         self.intents = loaded
         self.examples = examples
+        self.matcher = CompiledMatcher(loaded)
 
     def _load_intent_file(self, relative_path: str) -> Mapping[str, Any]:
         intent_path = self.base_dir / "intents" / relative_path
@@ -203,6 +335,7 @@ class IntentRegistry:
         projection = config.get("projection")
         responses = config.get("responses", {})
         examples = config.get("examples", [])
+        cache_cfg = config.get("cache") or {}
 
         return IntentDefinition(
             id=config["id"],
@@ -212,6 +345,8 @@ class IntentRegistry:
             projection=projection,
             responses=responses,
             examples=examples,
+            cache_topics=tuple(cache_cfg.get("topics", [])),
+            invalidates=tuple(cache_cfg.get("invalidates", [])),
         )
 
     @staticmethod
@@ -243,11 +378,7 @@ class IntentRegistry:
 
     def match(self, query: str) -> Optional[IntentMatch]:
         utterance = normalize(query, self.shared)
-        for intent in self.intents:
-            if not intent.patterns:
-                continue
-            if not any(pattern.matches(utterance) for pattern in intent.patterns):
-                continue
+        for intent in self.matcher.candidates(utterance):
             try:
                 slots = intent.extract_slots(utterance, self.shared)
             except (SlotExtractionError, SlotValidationError):
@@ -256,24 +387,103 @@ class IntentRegistry:
         return None
 
 
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """Compiled shared resources and intents, swapped into ``NLService`` as one unit.
+
+    ``version`` identifies the sources it was compiled from (see
+    ``nl/snapshot.py``); ``source`` is "yaml" when compiled in-process and
+    "snapshot" when unpickled.
+    """
+
+    shared: SharedResources
+    registry: IntentRegistry
+    version: str = ""
+    built_at: float = field(default_factory=time.time)
+    source: str = "yaml"
+
+    @classmethod
+    def compile(cls, base_dir: Path, version: str = "") -> "RegistrySnapshot":
+        shared = SharedResources(base_dir)
+        return cls(shared=shared, registry=IntentRegistry(base_dir, shared), version=version)
+
+
 class NLService:
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, snapshot: Optional[RegistrySnapshot] = None):
         self.base_dir = base_dir
-        self.shared = SharedResources(base_dir)
-        self.registry = IntentRegistry(base_dir, self.shared)
+        self.snapshot = snapshot or RegistrySnapshot.compile(base_dir)
+        self.results = NLResultCache()
+
+    @property
+    def shared(self) -> SharedResources:
+        return self.snapshot.shared
+
+    @property
+    def registry(self) -> IntentRegistry:
+        return self.snapshot.registry
+
+    def swap(self, snapshot: RegistrySnapshot) -> RegistrySnapshot:
+        """Serve ``snapshot`` from now on and drop results of the previous one.
 
-    def interpret(self, query: str, db: Session) -> Dict[str, Any]:
-        match = self.registry.match(query)
+        Requests already running keep the snapshot they started with; the
+        cache keys carry the version, so they cannot store stale entries.
+        """
+        previous, self.snapshot = self.snapshot, snapshot
+        self.results.clear()
+        return previous
+
+    def match(self, query: str) -> Optional[IntentMatch]:
+        return self._match(self.snapshot, query)
+
+    def _match(self, snapshot: RegistrySnapshot, query: str) -> Optional[IntentMatch]:
+        memo_key = (snapshot.version, query.strip().lower(), date.today())
+        found, match = self.results.get_match(memo_key)
+        if not found:
+            match = snapshot.registry.match(query)
+            self.results.put_match(memo_key, match)
+        return match
+
+    def interpret(self, query: str, db: Session, city_code: Optional[str] = None) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        match = self._match(snapshot, query)
         if match is None:
             return self._unknown_response()
-        executor = EXECUTORS.get(match.intent.id)
+        intent = match.intent
+        executor = EXECUTORS.get(intent.id)
         if executor is None:
-            return self._unsupported(match.intent.id)
+            return self._unsupported(intent.id)
+        slots = sanitize_slots(match.slots)
+        cache_key = None
+        if intent.cache_topics and not intent.invalidates:
+            cache_key = self.results.key(
+                intent.id, slots, city_code, intent.cache_topics, registry=snapshot.version
+            )
+            cached = self.results.get(cache_key)
+            if cached is not None:
+                return cached
+        else:
+            self.results.bypass()
         result = executor(match, db)
-        result.setdefault("intent", match.intent.id)
-        result.setdefault("slots", sanitize_slots(match.slots))
+        result.setdefault("intent", intent.id)
+        result.setdefault("slots", slots)
+        if intent.invalidates:
+            self.results.invalidate(intent.invalidates)
+        elif cache_key is not None:
+            self.results.put(cache_key, result, intent.cache_topics)
         return result
 
+    def registry_info(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {
+            "version": snapshot.version,
+            "source": snapshot.source,
+            "built_at": datetime.fromtimestamp(snapshot.built_at).isoformat(timespec="seconds"),
+            "intents": len(snapshot.registry.intents),
+        }
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.results.stats()
+
     def help_examples(self) -> List[str]:
         return self.registry.examples[:5]
 
@@ -298,16 +508,22 @@ class NLService:
         }
 
 
+_STRIP_RE = re.compile(r"[^a-z0-9\s/:-]")
+_SPACE_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"[a-z0-9/:-]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+
 def normalize(query: str, shared: SharedResources) -> NormalizedUtterance:
     lowered = query.lower()
-    normalized = re.sub(r"[^a-z0-9\s/:-]", " ", lowered)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    tokens = re.findall(r"[a-z0-9/:-]+", normalized)
+    normalized = _STRIP_RE.sub(" ", lowered)
+    normalized = _SPACE_RE.sub(" ", normalized).strip()
+    tokens = _TOKEN_RE.findall(normalized)
     token_set: set[str] = set()
     for token in tokens:
         token_set.add(token)
         token_set.add(shared.normalize_token(token))
-    numbers = [int(match) for match in re.findall(r"\d+", normalized)]
+    numbers = [int(match) for match in _NUMBER_RE.findall(normalized)]
     return NormalizedUtterance(
         original=query,
         text=normalized,
@@ -497,11 +713,7 @@ def extract_range(
 
 
 def _range_phrases(shared: SharedResources) -> Dict[str, str]:
-    phrases: Dict[str, str] = {}
-    for alias, range_key in shared.range_lookup.items():
-        phrases[alias] = range_key
-    sorted_items = dict(sorted(phrases.items(), key=lambda item: -len(item[0])))
-    return sorted_items
+    return shared.range_phrases
 
 
 def build_range_value(range_key: str) -> Dict[str, Any]:
@@ -860,40 +1072,22 @@ def execute_customer_addresses(match: IntentMatch, db: Session) -> Dict[str, Any
 
 
 def resolve_customer(db: Session, query_text: Optional[str]) -> Optional[Dict[str, Any]]:
-    if not query_text:
+    if not query_text or not query_text.strip():
         return None
-    if query_text.isdigit():
-        result = db.execute(
-            text(
-                """
-                SELECT customer_id, name, primary_mobile
-                FROM customers
-                WHERE primary_mobile = :phone
-                LIMIT 1
-                """
-            ),
-            {"phone": query_text},
-        )
-        row = result.mappings().first()
-        if row:
-            return dict(row)
-    like_value = f"%{query_text.strip()}%"
-    result = db.execute(
-        text(
-            """
-            SELECT customer_id, name, primary_mobile
-            FROM customers
-            WHERE name LIKE :name_like
-            ORDER BY
-                CASE WHEN LOWER(name) = LOWER(:exact) THEN 0 ELSE 1 END,
-                name
-            LIMIT 1
-            """
-        ),
-        {"name_like": like_value, "exact": query_text.strip()},
-    )
-    row = result.mappings().first()
-    return dict(row) if row else None
+    # Run the shared ranked search on the session's own DB-API connection.
+    cursor = db.connection().connection.cursor()
+    try:
+        matches = search_customers(cursor, query_text, limit=1)
+    finally:
+        cursor.close()
+    if not matches:
+        return None
+    best = matches[0]
+    return {
+        "customer_id": best["customer_id"],
+        "name": best["name"],
+        "primary_mobile": best["primary_mobile"],
+    }
 
 
 def execute_set_buffer_by_id(match: IntentMatch, db: Session) -> Dict[str, Any]:
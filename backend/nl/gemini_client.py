@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+import hashlib
 import os
+import threading
+import time
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Protocol, Tuple
 
 from zoneinfo import ZoneInfo
 
 import google.generativeai as genai
 
+from .sql_cache import normalize_question
 from .sql_prompt import build_system_prompt
 
 
@@ -22,6 +27,27 @@ class GeminiConfig:
     model: str = "gemini-2.0-flash-lite"
 
 
+def today_label() -> str:
+    ist_today = datetime.now(ZoneInfo("Asia/Kolkata")).date()
+    return ist_today.isoformat()
+
+
+@lru_cache(maxsize=8)
+def system_prompt(today: str, allow_update: bool) -> str:
+    """Build (once per day and mode) the system prompt sent with every question."""
+    return build_system_prompt(today=today, allow_update=allow_update)
+
+
+@lru_cache(maxsize=8)
+def prompt_version(today: str, allow_update: bool) -> str:
+    """Return a short hash of the system prompt; generated SQL is cached under it."""
+    return hashlib.sha256(system_prompt(today, allow_update).encode()).hexdigest()[:16]
+
+
+class SQLClient(Protocol):
+    def generate_sql(self, *, query: str, allow_update: bool) -> str: ...
+
+
 class GeminiSQLClient:
     def __init__(self, *, config: Optional[GeminiConfig] = None):
         api_key = (config.api_key if config else None) or os.getenv("GEMINI_API_KEY")
@@ -31,16 +57,27 @@ class GeminiSQLClient:
             )
         self.config = config or GeminiConfig(api_key=api_key)
         genai.configure(api_key=self.config.api_key)
+        self._models: Dict[Tuple[str, bool], "genai.GenerativeModel"] = {}
+        self._lock = threading.Lock()
+
+    def _model(self, allow_update: bool) -> "genai.GenerativeModel":
+        """Return the model bound to today's prompt, creating it once per day and mode."""
+        today = today_label()
+        key = (today, allow_update)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                # Models for previous days carry a stale "today" in their prompt.
+                self._models = {k: m for k, m in self._models.items() if k[0] == today}
+                model = genai.GenerativeModel(
+                    model_name=self.config.model,
+                    system_instruction=system_prompt(today, allow_update),
+                )
+                self._models[key] = model
+            return model
 
     def generate_sql(self, *, query: str, allow_update: bool) -> str:
-        system_prompt = build_system_prompt(
-            today=self._today_label(),
-            allow_update=allow_update,
-        )
-        model = genai.GenerativeModel(
-            model_name=self.config.model,
-            system_instruction=system_prompt,
-        )
+        model = self._model(allow_update)
         try:
             response = model.generate_content(
                 [{"role": "user", "parts": [query]}],
@@ -57,7 +94,45 @@ class GeminiSQLClient:
 
         return response.text
 
-    @staticmethod
-    def _today_label() -> str:
-        ist_today = datetime.now(ZoneInfo("Asia/Kolkata")).date()
-        return ist_today.isoformat()
+
+class StubSQLClient:
+    """Offline stand-in for ``GeminiSQLClient`` used in tests and benchmarks.
+
+    Answers from ``responses`` (keyed by normalized question) or with
+    ``default_sql``, fenced like the model's output, after sleeping
+    ``latency_sec`` to mimic the API round trip.  Enable it for the service
+    with ``NL_SQL_CLIENT=stub``.
+    """
+
+    DEFAULT_SQL = (
+        "SELECT m.date, b.bld_type, i.name AS item_name FROM menu m "
+        "JOIN bld b ON b.bld_id = m.bld_id "
+        "JOIN menu_items mi ON mi.menu_id = m.menu_id "
+        "JOIN items i ON i.item_id = mi.item_id WHERE m.date = CURDATE()"
+    )
+
+    def __init__(
+        self,
+        responses: Optional[Mapping[str, str]] = None,
+        default_sql: str = DEFAULT_SQL,
+        latency_sec: float = float(os.getenv("NL_SQL_STUB_LATENCY_SEC", "0")),
+    ):
+        self.responses = {normalize_question(q): sql for q, sql in (responses or {}).items()}
+        self.default_sql = default_sql
+        self.latency_sec = latency_sec
+        self.calls = 0
+
+    def generate_sql(self, *, query: str, allow_update: bool) -> str:
+        system_prompt(today_label(), allow_update)
+        self.calls += 1
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        sql = self.responses.get(normalize_question(query), self.default_sql)
+        return f"```sql\n{sql}\n```"
+
+
+def make_sql_client() -> SQLClient:
+    """Return the configured NL→SQL client (``NL_SQL_CLIENT=stub`` for offline use)."""
+    if os.getenv("NL_SQL_CLIENT", "gemini").strip().lower() == "stub":
+        return StubSQLClient()
+    return GeminiSQLClient()
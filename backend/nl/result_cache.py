@@ -0,0 +1,164 @@
+"""Short-lived cache of NL intent results.
+
+Ops staff ask the same few questions ("today's lunch menu", "orders today")
+many times a day.  Results of read-only intents are kept for
+``NL_RESULT_CACHE_TTL_SEC`` keyed by (intent id, sanitized slots, city, data
+version), so a repeat skips the executor's SQL.  Slots carry resolved dates
+and ranges, so the key changes when the day does.
+
+Which intents are cached is declared in each intent's YAML:
+
+    cache:
+      topics: ["menu"]          # read-only; cached, tagged with these topics
+    cache:
+      invalidates: ["menu"]     # writes; never cached, bumps these topics
+
+The data version is a per-topic generation counter.  A write intent bumps
+its topics' generations and drops every entry tagged with them, so the next
+read runs fresh.  Writes made outside the NL endpoints (or by another
+worker) are picked up when the TTL expires.  Intents without a ``cache``
+block are never cached.
+
+Recognised utterances are also memoised per day as (intent, slots), since
+matching and slot extraction only depend on the text and today's date.
+
+Env overrides:
+    NL_RESULT_CACHE_TTL_SEC — seconds a result is reused (30; 0 disables)
+    NL_RESULT_CACHE_SIZE    — results kept per worker (512)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from cachetools import LRUCache, TTLCache
+
+RESULT_TTL_SEC = float(os.getenv("NL_RESULT_CACHE_TTL_SEC", "30"))
+RESULT_CACHE_SIZE = int(os.getenv("NL_RESULT_CACHE_SIZE", "512"))
+MATCH_MEMO_SIZE = 2048
+
+
+class NLResultCache:
+    """TTL cache of executor results plus the per-day utterance → match memo."""
+
+    def __init__(self, ttl_sec: float = RESULT_TTL_SEC, maxsize: int = RESULT_CACHE_SIZE):
+        self.enabled = ttl_sec > 0 and maxsize > 0
+        self._results: "TTLCache[Hashable, Tuple[Dict[str, Any], Tuple[str, ...]]]" = TTLCache(
+            maxsize=max(1, maxsize), ttl=max(ttl_sec, 0.001)
+        )
+        self._matches: "LRUCache[Hashable, Any]" = LRUCache(maxsize=MATCH_MEMO_SIZE)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._invalidations = 0
+        self._match_hits = 0
+        self._match_misses = 0
+
+    # -- utterance memo -----------------------------------------------------
+
+    def get_match(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, match) for a memoised utterance."""
+        with self._lock:
+            if key in self._matches:
+                self._match_hits += 1
+                return True, self._matches[key]
+            self._match_misses += 1
+            return False, None
+
+    def put_match(self, key: Hashable, match: Any) -> None:
+        with self._lock:
+            self._matches[key] = match
+
+    # -- results ------------------------------------------------------------
+
+    def key(
+        self,
+        intent_id: str,
+        slots: Dict[str, Any],
+        city_code: Optional[str],
+        topics: Iterable[str],
+        registry: str = "",
+    ) -> Hashable:
+        """Build the cache key; includes the current generation of every topic.
+
+        ``registry`` is the version of the intent registry that matched, so
+        results computed just before a registry swap are never served after it.
+        """
+        with self._lock:
+            version = tuple((topic, self._generations.get(topic, 0)) for topic in sorted(topics))
+        return (
+            registry,
+            intent_id,
+            json.dumps(slots, sort_keys=True, default=str),
+            city_code or "",
+            version,
+        )
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._results.get(key) if self.enabled else None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, result: Dict[str, Any], topics: Iterable[str]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._results[key] = (result, tuple(topics))
+
+    def bypass(self) -> None:
+        """Count a request served without the cache (write or uncached intent)."""
+        with self._lock:
+            self._bypassed += 1
+
+    def invalidate(self, topics: Iterable[str]) -> int:
+        """Bump the topics' generations and drop every result tagged with them.
+
+        Returns:
+            Number of results dropped.
+        """
+        topics = set(topics)
+        if not topics:
+            return 0
+        with self._lock:
+            for topic in topics:
+                self._generations[topic] = self._generations.get(topic, 0) + 1
+            stale = [key for key, (_, tags) in self._results.items() if topics.intersection(tags)]
+            for key in stale:
+                self._results.pop(key, None)
+            self._invalidations += 1
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._matches.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            match_lookups = self._match_hits + self._match_misses
+            return {
+                "enabled": self.enabled,
+                "ttl_sec": RESULT_TTL_SEC,
+                "size": len(self._results),
+                "maxsize": self._results.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self._bypassed,
+                "invalidations": self._invalidations,
+                "generations": dict(self._generations),
+                "match_memo_size": len(self._matches),
+                "match_hit_rate": (
+                    round(self._match_hits / match_lookups, 4) if match_lookups else 0.0
+                ),
+            }
@@ -0,0 +1,234 @@
+"""Precompiled, hot-swappable snapshots of the NL intent registry.
+
+Compiling the registry means parsing ``intents/index.json``, every intent
+YAML and the shared YAML files, then building the matcher.  That is done once
+by ``python -m backend.scripts.build_nl_snapshot`` (run on deploy, before the
+service starts) and pickled to ``NL_REGISTRY_SNAPSHOT``; workers unpickle it
+at startup instead of parsing YAML.
+
+A snapshot carries two fingerprints:
+
+* ``version``  — SHA-256 of the source files (paths and contents);
+* ``compiler`` — SHA-256 of ``engine.py`` plus the Python version, since a
+  pickle of the registry's dataclasses is only valid for the code that made it.
+
+If either differs from the running tree, the snapshot is ignored, the
+registry is compiled from YAML and the snapshot is rewritten.
+
+``reload_service`` compiles a new registry off to the side and swaps it into
+the running ``NLService`` in one assignment.  Requests already in flight
+finish on the snapshot they started with.  It is triggered by
+``POST /api/nl/registry/reload`` (this worker only) or, with
+``NL_REGISTRY_WATCH_SEC`` set, by ``watch_registry`` polling the sources
+from every worker.
+
+The snapshot file is unpickled, so it must only be writable by the service
+user (it lives under ``backend/var`` by default).
+
+Env overrides:
+    NL_REGISTRY_SNAPSHOT  — snapshot path (backend/var/nl_registry.pickle)
+    NL_REGISTRY_WATCH_SEC — seconds between source checks (0 = no watcher)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .engine import NLService, RegistrySnapshot
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_PATH = Path(
+    os.getenv("NL_REGISTRY_SNAPSHOT")
+    or Path(__file__).resolve().parent.parent / "var" / "nl_registry.pickle"
+)
+WATCH_INTERVAL_SEC = float(os.getenv("NL_REGISTRY_WATCH_SEC", "0"))
+
+_reload_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------------------------
+
+
+def source_files(base_dir: Path) -> List[Path]:
+    """Every file the registry is compiled from, in a stable order."""
+    files = [base_dir / "intents" / "index.json"]
+    files += sorted((base_dir / "intents").rglob("*.yaml"))
+    files += sorted((base_dir / "shared").glob("*.yaml"))
+    return [path for path in files if path.is_file()]
+
+
+def source_version(base_dir: Path) -> str:
+    """Return the fingerprint of the registry sources under ``base_dir``."""
+    digest = hashlib.sha256()
+    for path in source_files(base_dir):
+        digest.update(path.relative_to(base_dir).as_posix().encode())
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def compiler_version() -> str:
+    """Return the fingerprint of the code that defines the pickled classes."""
+    digest = hashlib.sha256(Path(__file__).with_name("engine.py").read_bytes())
+    digest.update(f"{sys.version_info.major}.{sys.version_info.minor}".encode())
+    return digest.hexdigest()[:16]
+
+
+# ---------------------------------------------------------------------------
+# Snapshot file
+# ---------------------------------------------------------------------------
+
+
+def compile_snapshot(base_dir: Path) -> RegistrySnapshot:
+    """Compile the registry from its YAML sources."""
+    return RegistrySnapshot.compile(base_dir, version=source_version(base_dir))
+
+
+def write_snapshot(snapshot: RegistrySnapshot, path: Path = SNAPSHOT_PATH) -> None:
+    """Pickle ``snapshot`` to ``path``, replacing any previous file atomically."""
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "compiler": compiler_version(),
+        "version": snapshot.version,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as handle:
+        pickle.dump(header, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(snapshot, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: Path, version: str) -> Optional[RegistrySnapshot]:
+    """Load the snapshot at ``path`` if it was compiled from ``version`` by this code.
+
+    Returns:
+        The snapshot, or None if the file is missing, stale or unreadable.
+    """
+    try:
+        with path.open("rb") as handle:
+            header = pickle.load(handle)
+            if header != {
+                "format": SNAPSHOT_FORMAT,
+                "compiler": compiler_version(),
+                "version": version,
+            }:
+                logger.info("NL registry snapshot %s is stale; recompiling", path)
+                return None
+            snapshot = pickle.load(handle)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.warning("Could not read NL registry snapshot %s", path, exc_info=True)
+        return None
+    if not isinstance(snapshot, RegistrySnapshot):
+        return None
+    return replace(snapshot, source="snapshot")
+
+
+def load_snapshot(base_dir: Path, path: Path = SNAPSHOT_PATH) -> RegistrySnapshot:
+    """Return the current registry, from the snapshot when it is up to date.
+
+    A stale or missing snapshot is recompiled from YAML and rewritten; a
+    failure to write it is logged and otherwise ignored.
+    """
+    version = source_version(base_dir)
+    snapshot = read_snapshot(path, version)
+    if snapshot is not None:
+        return snapshot
+    snapshot = RegistrySnapshot.compile(base_dir, version=version)
+    try:
+        write_snapshot(snapshot, path)
+    except OSError:
+        logger.warning("Could not write NL registry snapshot %s", path, exc_info=True)
+    return snapshot
+
+
+# ---------------------------------------------------------------------------
+# Hot reload
+# ---------------------------------------------------------------------------
+
+
+def reload_service(
+    service: NLService, force: bool = False, path: Path = SNAPSHOT_PATH
+) -> Dict[str, Any]:
+    """Recompile the registry and swap it into ``service`` if the sources changed.
+
+    Compilation errors (bad YAML, missing files) propagate and leave the
+    running registry in place.
+
+    Args:
+        service: Service to update.
+        force: Recompile even when the sources are unchanged.
+        path: Snapshot file to rewrite.
+
+    Returns:
+        Dict with ``reloaded``, the previous and current ``version`` and
+        ``compile_ms``.
+    """
+    with _reload_lock:
+        previous = service.snapshot.version
+        version = source_version(service.base_dir)
+        if version == previous and not force:
+            return {"reloaded": False, "previous": previous, "version": version, "compile_ms": 0.0}
+        started = time.perf_counter()
+        snapshot = RegistrySnapshot.compile(service.base_dir, version=version)
+        compile_ms = (time.perf_counter() - started) * 1000
+        service.swap(snapshot)
+        try:
+            write_snapshot(snapshot, path)
+        except OSError:
+            logger.warning("Could not write NL registry snapshot %s", path, exc_info=True)
+    logger.info(
+        "NL registry reloaded %s -> %s (%d intents, %.1f ms)",
+        previous or "-",
+        version,
+        len(snapshot.registry.intents),
+        compile_ms,
+    )
+    return {
+        "reloaded": True,
+        "previous": previous,
+        "version": version,
+        "compile_ms": round(compile_ms, 1),
+    }
+
+
+async def watch_registry(service: NLService, interval_sec: float = WATCH_INTERVAL_SEC) -> None:
+    """Reload ``service`` whenever its sources change, checking every ``interval_sec``.
+
+    Args:
+        service: Service to keep up to date.
+        interval_sec: Seconds between source fingerprint checks.
+    """
+    failed: Optional[str] = None
+    while True:
+        await asyncio.sleep(interval_sec)
+        version: Optional[str] = None
+        try:
+            version = await asyncio.to_thread(source_version, service.base_dir)
+            if version in (service.snapshot.version, failed):
+                continue
+            await asyncio.to_thread(reload_service, service)
+            failed = None
+        except Exception:
+            # Retried once the sources change again (e.g. the YAML is fixed).
+            failed = version
+            logger.exception(
+                "NL registry reload failed; keeping version %s", service.snapshot.version
+            )
@@ -0,0 +1,214 @@
+"""Cache of validated NL→SQL translations.
+
+The model's answer depends only on the question and the system prompt, and
+the prompt depends only on (today, allow_update).  Validated SQL is therefore
+cached under (prompt version, normalized question), where the prompt version
+is a hash of the rendered prompt.  A new day or any change to
+``sql_prompt.py`` gives a new version, so entries never outlive the prompt
+they were generated with.
+
+Entries live in an in-process LRU and are written through to a SQLite file
+shared by every worker and kept across restarts.  The LRU is checked first,
+then SQLite (a hit there is promoted into the LRU).  The file is trimmed to
+the ``NL_SQL_CACHE_DISK_ROWS`` most recently used rows.  SQLite errors are
+logged and treated as misses.
+
+Only SQL that passed ``validate_sql`` is stored; callers validate again on a
+hit, so a tampered file cannot inject SQL.
+
+Env overrides:
+    NL_SQL_CACHE_SIZE      — translations kept in memory per worker (1024; 0 disables)
+    NL_SQL_CACHE_PATH      — SQLite file (backend/var/nl_sql_cache.sqlite3; empty = memory only)
+    NL_SQL_CACHE_DISK_ROWS — rows kept in the SQLite file (20000)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SIZE = int(os.getenv("NL_SQL_CACHE_SIZE", "1024"))
+_DISK_ENV = os.getenv(
+    "NL_SQL_CACHE_PATH",
+    str(Path(__file__).resolve().parent.parent / "var" / "nl_sql_cache.sqlite3"),
+)
+DISK_PATH: Optional[Path] = Path(_DISK_ENV) if _DISK_ENV else None
+DISK_ROWS = int(os.getenv("NL_SQL_CACHE_DISK_ROWS", "20000"))
+PRUNE_EVERY = 256
+
+_SPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?.!]+$")
+
+CacheKey = Tuple[str, str]
+
+
+def normalize_question(query: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing ``?``/``.``/``!``."""
+    collapsed = _SPACE_RE.sub(" ", query.strip().lower())
+    return _TRAILING_PUNCT_RE.sub("", collapsed)
+
+
+class SQLCache:
+    """In-memory LRU of validated SQL with a write-through SQLite file."""
+
+    def __init__(
+        self,
+        maxsize: int = MEMORY_SIZE,
+        path: Optional[Path] = DISK_PATH,
+        disk_rows: int = DISK_ROWS,
+    ):
+        self.enabled = maxsize > 0
+        self._memory: "LRUCache[CacheKey, str]" = LRUCache(maxsize=max(1, maxsize))
+        self._path = path if self.enabled else None
+        self._disk_rows = disk_rows
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_failed = False
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(query: str, prompt_version: str) -> CacheKey:
+        return prompt_version, normalize_question(query)
+
+    # -- SQLite -------------------------------------------------------------
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite file on first use; None when disabled or broken."""
+        if self._path is None or self._disk_failed:
+            return None
+        if self._conn is None:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self._path), timeout=5, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS nl_sql_cache (
+                        prompt_version TEXT NOT NULL,
+                        question TEXT NOT NULL,
+                        sql TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        used_at REAL NOT NULL,
+                        PRIMARY KEY (prompt_version, question)
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_nl_sql_cache_used ON nl_sql_cache (used_at)"
+                )
+                conn.commit()
+            except sqlite3.Error:
+                logger.warning("NL SQL cache file %s unavailable", self._path, exc_info=True)
+                self._disk_failed = True
+                return None
+            self._conn = conn
+        return self._conn
+
+    def _disk_get(self, key: CacheKey) -> Optional[str]:
+        conn = self._disk()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT sql FROM nl_sql_cache WHERE prompt_version = ? AND question = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE nl_sql_cache SET used_at = ? WHERE prompt_version = ? AND question = ?",
+                (time.time(), *key),
+            )
+            conn.commit()
+            return row[0]
+        except sqlite3.Error:
+            logger.warning("NL SQL cache read failed", exc_info=True)
+            return None
+
+    def _disk_put(self, key: CacheKey, sql: str) -> None:
+        conn = self._disk()
+        if conn is None:
+            return
+        now = time.time()
+        try:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO nl_sql_cache
+                    (prompt_version, question, sql, created_at, used_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (*key, sql, now, now),
+            )
+            if self._puts % PRUNE_EVERY == 0:
+                conn.execute(
+                    """
+                    DELETE FROM nl_sql_cache WHERE rowid IN (
+                        SELECT rowid FROM nl_sql_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self._disk_rows,),
+                )
+            conn.commit()
+        except sqlite3.Error:
+            logger.warning("NL SQL cache write failed", exc_info=True)
+
+    # -- public -------------------------------------------------------------
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        """Return cached SQL for ``key`` from memory, then disk; None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            sql = self._memory.get(key)
+            if sql is not None:
+                self._memory_hits += 1
+                return sql
+            sql = self._disk_get(key)
+            if sql is None:
+                self._misses += 1
+                return None
+            self._memory[key] = sql
+            self._disk_hits += 1
+            return sql
+
+    def put(self, key: CacheKey, sql: str) -> None:
+        """Store validated ``sql`` for ``key`` in memory and on disk."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._memory[key] = sql
+            self._puts += 1
+            self._disk_put(key, sql)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            hits = self._memory_hits + self._disk_hits
+            return {
+                "enabled": self.enabled,
+                "size": len(self._memory),
+                "maxsize": self._memory.maxsize,
+                "disk": str(self._path) if self._path and not self._disk_failed else None,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,145 @@
+"""Bounded execution of model-generated SELECTs.
+
+A validated SELECT is still only as cheap as the question was specific, so
+before it runs:
+
+* trailing comments and semicolons are dropped, then its top-level ``LIMIT``
+  is clamped to ``NL_SQL_MAX_ROWS + 1``, or one is appended (the extra row
+  tells us the answer was truncated);
+* a ``MAX_EXECUTION_TIME`` optimizer hint stops it server-side after
+  ``NL_SQL_TIMEOUT_MS``.
+
+Rows are streamed from an unbuffered cursor (``yield_per``), so the worker
+never holds more than one batch beyond the capped response.  Statements run
+on the read-only ``nl_read_engine`` pool (see ``database.py``), not on the
+request's session.
+
+Env overrides:
+    NL_SQL_MAX_ROWS   — rows returned per answer (500)
+    NL_SQL_TIMEOUT_MS — server-side statement time limit (3000)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..database import NLReadSessionLocal
+
+MAX_ROWS = int(os.getenv("NL_SQL_MAX_ROWS", "500"))
+TIMEOUT_MS = int(os.getenv("NL_SQL_TIMEOUT_MS", "3000"))
+FETCH_BATCH = 100
+
+# ER_QUERY_TIMEOUT: "maximum statement execution time exceeded"
+_ER_QUERY_TIMEOUT = 3024
+
+_LEADING_SELECT_RE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+# MySQL only allows the outer query's LIMIT at the very end of the statement;
+# a subquery's LIMIT is always followed by its closing parenthesis.
+_TRAILING_LIMIT_RE = re.compile(
+    r"\bLIMIT\s+(?:\d+\s*,\s*)?(?P<count>\d+)(?:\s+OFFSET\s+\d+)?\s*$",
+    re.IGNORECASE,
+)
+# Quoted strings and identifiers, comments, and everything else; used to find
+# where the statement's last real token ends.
+_TOKEN_RE = re.compile(
+    r"""
+      (?P<quoted>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`)
+    | (?P<comment>/\*.*?\*/|(?:--(?=\s|$)|\#)[^\n]*)
+    | (?P<blank>[\s;]+)
+    | (?P<other>[^'"`/#\-\s;]+|.)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+
+class SQLTimeoutError(Exception):
+    """Raised when a generated SELECT exceeds its execution time limit."""
+
+
+def strip_trailing(sql: str) -> str:
+    """Drop trailing comments, whitespace and semicolons from ``sql``.
+
+    Comments and semicolons inside the statement, or inside string literals,
+    are left alone.
+    """
+    end = 0
+    for match in _TOKEN_RE.finditer(sql):
+        if match.lastgroup in ("quoted", "other"):
+            end = match.end()
+    return sql[:end]
+
+
+def bound_select(sql: str, row_limit: int, timeout_ms: int) -> str:
+    """Return ``sql`` with a time-limit hint and a LIMIT of at most ``row_limit``.
+
+    Args:
+        sql: Validated single SELECT statement.
+        row_limit: Largest number of rows the statement may return.
+        timeout_ms: Server-side execution time limit.
+    """
+    sql = strip_trailing(sql)
+    match = _TRAILING_LIMIT_RE.search(sql)
+    if match:
+        count = min(int(match.group("count")), row_limit)
+        sql = f"{sql[: match.start('count')]}{count}{sql[match.end('count'):]}"
+    else:
+        sql = f"{sql}\nLIMIT {row_limit}"
+    hint = f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */"
+    return _LEADING_SELECT_RE.sub(hint, sql, count=1)
+
+
+class SelectSandbox:
+    """Runs generated SELECTs with a row cap, a time limit and streamed fetches."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = NLReadSessionLocal,
+        max_rows: int = MAX_ROWS,
+        timeout_ms: int = TIMEOUT_MS,
+        fetch_batch: int = FETCH_BATCH,
+    ):
+        self._session_factory = session_factory
+        self.max_rows = max_rows
+        self.timeout_ms = timeout_ms
+        self.fetch_batch = fetch_batch
+
+    def run(self, sql: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """Execute ``sql`` and return up to ``max_rows`` rows.
+
+        Returns:
+            The rows and whether more rows matched than were returned.
+
+        Raises:
+            SQLTimeoutError: The statement hit ``timeout_ms``.
+            sqlalchemy.exc.TimeoutError: No NL read connection became free in time.
+        """
+        bounded = bound_select(sql, self.max_rows + 1, self.timeout_ms)
+        session = self._session_factory()
+        try:
+            result = session.execute(
+                text(bounded), execution_options={"yield_per": self.fetch_batch}
+            )
+            rows: List[Dict[str, Any]] = []
+            truncated = False
+            try:
+                for row in result.mappings():
+                    if len(rows) == self.max_rows:
+                        truncated = True
+                        break
+                    rows.append(dict(row))
+            finally:
+                result.close()
+            return rows, truncated
+        except DBAPIError as exc:
+            code = exc.orig.args[0] if exc.orig is not None and exc.orig.args else None
+            if code == _ER_QUERY_TIMEOUT:
+                raise SQLTimeoutError(str(exc.orig)) from exc
+            raise
+        finally:
+            session.close()
@@ -7,42 +7,68 @@ from decimal import Decimal
 from typing import Any, Dict, List, Optional, Tuple
 
 from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
 
-from .gemini_client import GeminiClientError, GeminiSQLClient
+from .gemini_client import (
+    GeminiClientError,
+    SQLClient,
+    make_sql_client,
+    prompt_version,
+    today_label,
+)
+from .sql_cache import SQLCache
+from .sql_sandbox import SelectSandbox, SQLTimeoutError
 from .sql_validator import SQLValidationError, extract_sql, validate_sql
 
 logger = logging.getLogger(__name__)
 
 
 class SQLGenerationService:
-    def __init__(self) -> None:
-        self._client: Optional[GeminiSQLClient] = None
-
-    def _client_instance(self) -> GeminiSQLClient:
+    def __init__(
+        self,
+        client: Optional[SQLClient] = None,
+        cache: Optional[SQLCache] = None,
+        sandbox: Optional[SelectSandbox] = None,
+    ):
+        self._client = client
+        self.cache = cache if cache is not None else SQLCache()
+        self.sandbox = sandbox if sandbox is not None else SelectSandbox()
+
+    def _client_instance(self) -> SQLClient:
         if self._client is None:
-            self._client = GeminiSQLClient()
+            self._client = make_sql_client()
         return self._client
 
     def handle_query(self, *, query: str, db: Session, confirm: bool) -> Dict[str, Any]:
         query_lower = query.lower()
         allow_update = _should_allow_update(query_lower)
-        try:
-            raw_text = self._client_instance().generate_sql(
-                query=query,
-                allow_update=allow_update,
-            )
-        except GeminiClientError as exc:
-            raise RuntimeError(str(exc)) from exc
-        try:
-            sql = extract_sql(raw_text)
-            validation = validate_sql(sql, allow_update=allow_update)
-        except SQLValidationError as exc:
-            return {
-                "error": str(exc),
-                "sql": strip_sql_fence(raw_text),
-                "examples": _fallback_examples(),
-            }
+        cache_key = self.cache.key(query, prompt_version(today_label(), allow_update))
+        cached_sql = self.cache.get(cache_key)
+        validation = None
+        if cached_sql is not None:
+            try:
+                validation = validate_sql(cached_sql, allow_update=allow_update)
+            except SQLValidationError:
+                logger.warning("Discarding cached SQL that no longer validates: %s", cached_sql)
+        if validation is None:
+            try:
+                raw_text = self._client_instance().generate_sql(
+                    query=query,
+                    allow_update=allow_update,
+                )
+            except GeminiClientError as exc:
+                raise RuntimeError(str(exc)) from exc
+            try:
+                sql = extract_sql(raw_text)
+                validation = validate_sql(sql, allow_update=allow_update)
+            except SQLValidationError as exc:
+                return {
+                    "error": str(exc),
+                    "sql": strip_sql_fence(raw_text),
+                    "examples": _fallback_examples(),
+                }
+            self.cache.put(cache_key, validation.sql)
 
         if validation.is_update:
             prepared = self._prepare_update(sql=validation.sql, db=db)
@@ -51,18 +77,23 @@ class SQLGenerationService:
             if not confirm:
                 return self._preview_update(prepared)
             return self._apply_update(prepared, db=db)
-        return self._execute_select(sql=validation.sql, db=db, original_query=query)
+        return self._execute_select(sql=validation.sql, original_query=query)
 
-    def _execute_select(self, *, sql: str, db: Session, original_query: str) -> Dict[str, Any]:
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    def _execute_select(self, *, sql: str, original_query: str) -> Dict[str, Any]:
         try:
-            result = db.execute(text(sql))
-            rows = [dict(row) for row in result.mappings().all()]
-            intent = infer_intent(sql, original_query)
-            display_rows = [_filter_row(row) for row in rows]
+            rows, truncated = self.sandbox.run(sql)
+        except SQLTimeoutError:
+            return {
+                "error": "The query took too long. Try narrowing it to a date, meal or customer.",
+                "sql": sql,
+            }
+        except PoolTimeoutError:
             return {
-                "intent": intent,
+                "error": "Too many questions are running right now. Please try again shortly.",
                 "sql": sql,
-                "rows": display_rows,
             }
         except Exception as exc:  # pragma: no cover - DB errors
             logger.exception("Failed to execute generated SELECT : %s", exc)
@@ -70,6 +101,13 @@ class SQLGenerationService:
                 "error": "Failed to execute generated SQL.",
                 "sql": sql,
             }
+        return {
+            "intent": infer_intent(sql, original_query),
+            "sql": sql,
+            "rows": [_filter_row(row) for row in rows],
+            "truncated": truncated,
+            "max_rows": self.sandbox.max_rows,
+        }
 
     def _prepare_update(self, *, sql: str, db: Session) -> "PreparedUpdate | Dict[str, Any]":
         buffer_qty = _extract_buffer_qty(sql)
@@ -2,12 +2,15 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, Optional, Union
 
 import sqlparse
 
 from .sql_prompt import ALLOWED_TABLE_COLUMNS, all_allowed_columns
 
+VALIDATION_CACHE_SIZE = 2048
+
 
 class SQLValidationError(Exception):
     """Raised when the generated SQL violates safety rules."""
@@ -32,8 +35,21 @@ UNSAFE_PATTERNS = [
     r"\bREVOKE\b",
 ]
 
+# Built once: every check below runs on each generated statement.
+_UNSAFE_RE = re.compile("|".join(UNSAFE_PATTERNS))
+_ALLOWED_TABLES = frozenset(ALLOWED_TABLE_COLUMNS)
+_ALLOWED_COLUMNS = frozenset(column.lower() for column in all_allowed_columns())
+_BUFFER_UPDATE_RE = re.compile(
+    r"^\s*UPDATE\s+menu_items\s+SET\s+buffer_qty\s*=\s*([0-9]+(\.[0-9]+)?)",
+    re.IGNORECASE | re.DOTALL,
+)
+_SET_CLAUSE_RE = re.compile(r"SET\s+([^=]+)=", re.IGNORECASE)
+_FROM_TABLE_RE = re.compile(r"\bFROM\s+([a-zA-Z_][\w]*)", re.IGNORECASE)
+_JOIN_TABLE_RE = re.compile(r"\bJOIN\s+([a-zA-Z_][\w]*)", re.IGNORECASE)
+_QUALIFIED_COLUMN_RE = re.compile(r"\b([A-Za-z_][\w]*)\.([A-Za-z_][\w]*)\b")
 
-@dataclass
+
+@dataclass(frozen=True)
 class SQLValidationResult:
     sql: str
     is_update: bool
@@ -51,15 +67,37 @@ def extract_sql(text: str) -> str:
 
 
 def validate_sql(sql: str, *, allow_update: bool) -> SQLValidationResult:
+    """Check a generated statement against the safety rules.
+
+    Outcomes, including rejections, are cached per (statement, allow_update),
+    so a repeated statement is not parsed again.
+
+    Raises:
+        SQLValidationError: The statement breaks a rule.
+    """
+    outcome = _validate_cached(sql, allow_update)
+    if isinstance(outcome, str):
+        raise SQLValidationError(outcome)
+    return outcome
+
+
+@lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def _validate_cached(sql: str, allow_update: bool) -> Union[SQLValidationResult, str]:
+    try:
+        return _validate(sql, allow_update=allow_update)
+    except SQLValidationError as exc:
+        return str(exc)
+
+
+def _validate(sql: str, *, allow_update: bool) -> SQLValidationResult:
     sql = sql.strip()
     if sql.endswith(";"):
         sql = sql[:-1].strip()
     if ";" in sql:
         raise SQLValidationError("Multiple statements or semicolons are not allowed.")
     upper_sql = sql.upper()
-    for pattern in UNSAFE_PATTERNS:
-        if re.search(pattern, upper_sql):
-            raise SQLValidationError("SQL contains a forbidden operation.")
+    if _UNSAFE_RE.search(upper_sql):
+        raise SQLValidationError("SQL contains a forbidden operation.")
     is_update = upper_sql.startswith("UPDATE")
     if is_update:
         if not allow_update:
@@ -73,18 +111,9 @@ def validate_sql(sql: str, *, allow_update: bool) -> SQLValidationResult:
 
 
 def _validate_buffer_update(sql: str) -> None:
-    pattern = re.compile(
-        r"^\s*UPDATE\s+menu_items\s+SET\s+buffer_qty\s*=\s*([0-9]+(\.[0-9]+)?)",
-        re.IGNORECASE | re.DOTALL,
-    )
-    if not pattern.search(sql):
+    if not _BUFFER_UPDATE_RE.search(sql):
         raise SQLValidationError("Only menu_items.buffer_qty updates are permitted.")
-    forbidden_columns = re.findall(
-        r"SET\s+([^=]+)=",
-        sql,
-        flags=re.IGNORECASE,
-    )
-    for clause in forbidden_columns:
+    for clause in _SET_CLAUSE_RE.findall(sql):
         parts = [segment.strip().lower() for segment in clause.split(",")]
         for part in parts:
             if part and not part.startswith("buffer_qty"):
@@ -105,24 +134,19 @@ def _validate_tables_and_columns(sql: str) -> None:
             elif token.ttype is None:
                 _extract_aliases(token, table_aliases)
 
-    allowed_tables = set(ALLOWED_TABLE_COLUMNS.keys())
     if table_aliases:
         for table in table_aliases.values():
-            if table not in allowed_tables:
+            if table not in _ALLOWED_TABLES:
                 raise SQLValidationError(f"Table '{table}' is not allowed.")
     else:
         # fallback: ensure raw table names exist inside SQL
-        found_tables = set(re.findall(r"\bFROM\s+([a-zA-Z_][\w]*)", sql, flags=re.IGNORECASE))
-        found_tables.update(re.findall(r"\bJOIN\s+([a-zA-Z_][\w]*)", sql, flags=re.IGNORECASE))
-        if not found_tables.issubset(allowed_tables):
+        found_tables = set(_FROM_TABLE_RE.findall(sql))
+        found_tables.update(_JOIN_TABLE_RE.findall(sql))
+        if not found_tables.issubset(_ALLOWED_TABLES):
             raise SQLValidationError("SQL references non-whitelisted tables.")
 
-    allowed_columns = all_allowed_columns()
-    for alias, column in re.findall(
-        r"\b([A-Za-z_][\w]*)\.([A-Za-z_][\w]*)\b",
-        sql,
-    ):
-        if column.lower() not in {col.lower() for col in allowed_columns}:
+    for _alias, column in _QUALIFIED_COLUMN_RE.findall(sql):
+        if column.lower() not in _ALLOWED_COLUMNS:
             raise SQLValidationError(f"Column '{column}' is not allowed.")
 
 
@@ -1,38 +1,250 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+"""Admin audit log browsing: keyset-paged listing and NDJSON export.
 
-from ..database import get_db
+Logs are read newest first by ``(timestamp, log_id)``.  A page asks for one
+row more than ``limit``; when that row exists the response carries an
+``X-Next-Cursor`` header to pass back as ``before``.  With
+``include_archived`` the same page is also read from ``admin_logs_archive``
+(see ``utils/admin_log_archive.py``) and the two are merged.
+"""
+
+from __future__ import annotations
+
+import base64
+import heapq
+import json
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import mysql.connector
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+
+from ..db import get_raw_db
+from ..utils.admin_log_archive import ARCHIVE_TABLE
+from ..utils.auth_deps import admin_required
 
 router = APIRouter(prefix="/api/logs", tags=["Admin Logs"])
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+EXPORT_PAGE_SIZE = 1000
+
+_PAGE_SQL = """
+    SELECT al.log_id,
+           al.admin_id,
+           al.action_type,
+           al.entity_type,
+           al.entity_id,
+           al.description,
+           al.`timestamp`,
+           cu.name AS admin_name,
+           cu.customer_id
+      FROM {table} al
+      LEFT JOIN customers cu ON cu.customer_id = al.admin_id
+     {where_sql}
+     ORDER BY al.`timestamp` DESC, al.log_id DESC
+     LIMIT %s
+"""
 
-@router.get("/")
-def get_admin_logs(
-    admin_id: int | None = Query(None),
-    entity_type: str | None = Query(None),
-    action_type: str | None = Query(None),
-    db: Session = Depends(get_db),
-):
-    query = (
-        "SELECT al.*, cu.name AS admin_name, cu.customer_id "
-        "FROM admin_logs al "
-        "LEFT JOIN customers cu ON cu.customer_id = al.admin_id "
-        "WHERE 1=1"
-    )
-    params: dict[str, object] = {}
 
+def _encode_cursor(timestamp: datetime, log_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{int(log_id)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor_token: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor_token + "=" * (-len(cursor_token) % 4)
+        timestamp_raw, log_raw = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(timestamp_raw), int(log_raw)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor") from exc
+
+
+def _log_filters(
+    admin_id: Optional[int],
+    entity_type: Optional[str],
+    action_type: Optional[str],
+    start_date: Optional[date],
+    end_date: Optional[date],
+) -> Tuple[List[str], List[Any]]:
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date")
+    clauses: List[str] = []
+    params: List[Any] = []
     if admin_id is not None:
-        query += " AND al.admin_id = :admin_id"
-        params["admin_id"] = admin_id
+        clauses.append("al.admin_id = %s")
+        params.append(admin_id)
     if entity_type:
-        query += " AND al.entity_type = :entity_type"
-        params["entity_type"] = entity_type
+        clauses.append("al.entity_type = %s")
+        params.append(entity_type)
     if action_type:
-        query += " AND al.action_type = :action_type"
-        params["action_type"] = action_type
+        clauses.append("al.action_type = %s")
+        params.append(action_type)
+    if start_date:
+        clauses.append("al.`timestamp` >= %s")
+        params.append(datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        clauses.append("al.`timestamp` < %s")
+        params.append(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    return clauses, params
+
+
+def _load_page(
+    cursor,
+    clauses: List[str],
+    params: List[Any],
+    before: Optional[Tuple[datetime, int]],
+    limit: int,
+    include_archived: bool,
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[datetime, int]]]:
+    """Read one newest-first page.
+
+    Returns:
+        The page's rows and the (timestamp, log_id) of its last row when more
+        rows follow, else None.
+    """
+    page_clauses = list(clauses)
+    page_params = list(params)
+    if before is not None:
+        # Expanded rather than a row constructor so MySQL can range-scan the
+        # (timestamp, log_id) index.
+        page_clauses.append("(al.`timestamp` < %s OR (al.`timestamp` = %s AND al.log_id < %s))")
+        page_params.extend((before[0], before[0], before[1]))
+    where_sql = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+
+    sources = []
+    for table in ("admin_logs", ARCHIVE_TABLE) if include_archived else ("admin_logs",):
+        cursor.execute(
+            _PAGE_SQL.format(table=table, where_sql=where_sql),
+            (*page_params, limit + 1),
+        )
+        sources.append(cursor.fetchall() or [])
+    if len(sources) == 1:
+        rows = sources[0]
+    else:
+        rows = list(
+            heapq.merge(
+                *sources,
+                key=lambda row: (row["timestamp"] or datetime.min, row["log_id"]),
+                reverse=True,
+            )
+        )[: limit + 1]
 
-    query += " ORDER BY al.timestamp DESC"
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    if last["timestamp"] is None:
+        return rows, None
+    return rows, (last["timestamp"], last["log_id"])
 
-    result = db.execute(text(query), params)
-    return [dict(row) for row in result.mappings().all()]
+
+@router.get("/")
+def get_admin_logs(
+    response: Response,
+    admin_id: Optional[int] = Query(None),
+    entity_type: Optional[str] = Query(None),
+    action_type: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None, description="First day to include (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="Last day to include (YYYY-MM-DD)"),
+    before: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_archived: bool = Query(False, description="Also read archived months"),
+    _: Dict[str, Any] = Depends(admin_required),
+) -> List[Dict[str, Any]]:
+    """Return a newest-first page of admin logs.
+
+    Args:
+        response: Outgoing response (the pagination header is set on it).
+        admin_id: Only this admin's actions.
+        entity_type: Only this entity type (ITEM, COMBO, ...).
+        action_type: Only this action (ADD, UPDATE, DELETE).
+        start_date: Only logs on or after this day.
+        end_date: Only logs on or before this day.
+        before: Keyset cursor from a previous page.
+        limit: Page size.
+        include_archived: Also read ``admin_logs_archive``.
+        _: Current admin user (injected, unused).
+
+    Returns:
+        List of log dicts with ``admin_name``.
+    """
+    clauses, params = _log_filters(admin_id, entity_type, action_type, start_date, end_date)
+    position = _decode_cursor(before) if before else None
+    db = get_raw_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        rows, next_position = _load_page(cursor, clauses, params, position, limit, include_archived)
+    except mysql.connector.Error as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    finally:
+        cursor.close()
+        db.close()
+    if next_position is not None:
+        response.headers["X-Next-Cursor"] = _encode_cursor(*next_position)
+    return rows
+
+
+def _ndjson_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+@router.get("/export")
+def export_admin_logs(
+    admin_id: Optional[int] = Query(None),
+    entity_type: Optional[str] = Query(None),
+    action_type: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None, description="First day to include (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="Last day to include (YYYY-MM-DD)"),
+    include_archived: bool = Query(False, description="Also read archived months"),
+    _: Dict[str, Any] = Depends(admin_required),
+) -> StreamingResponse:
+    """Stream every matching admin log as NDJSON, newest first.
+
+    Rows are read in keyset pages of ``EXPORT_PAGE_SIZE``, so memory use does
+    not grow with the export and every page uses the browsing indexes.
+
+    Args:
+        admin_id: Only this admin's actions.
+        entity_type: Only this entity type.
+        action_type: Only this action.
+        start_date: Only logs on or after this day.
+        end_date: Only logs on or before this day.
+        include_archived: Also read ``admin_logs_archive``.
+        _: Current admin user (injected, unused).
+
+    Returns:
+        Streaming ``application/x-ndjson`` attachment, one log per line.
+    """
+    clauses, params = _log_filters(admin_id, entity_type, action_type, start_date, end_date)
+    db = get_raw_db()
+
+    def _generate() -> Iterator[str]:
+        """Yield one JSON line per log, then close the connection."""
+        cursor = db.cursor(dictionary=True)
+        try:
+            position: Optional[Tuple[datetime, int]] = None
+            while True:
+                rows, position = _load_page(
+                    cursor, clauses, params, position, EXPORT_PAGE_SIZE, include_archived
+                )
+                if rows:
+                    yield "".join(
+                        json.dumps({key: _ndjson_value(value) for key, value in row.items()}) + "\n"
+                        for row in rows
+                    )
+                if position is None:
+                    break
+        finally:
+            cursor.close()
+            db.close()
+
+    filename = f"admin-logs-{datetime.now():%Y%m%d-%H%M}.ndjson"
+    return StreamingResponse(
+        _generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -2,12 +2,13 @@
 
 from __future__ import annotations
 
-import uuid
+import asyncio
+import logging
 from datetime import date
 from typing import Any, Dict, List, Optional
 
 import mysql.connector
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
@@ -23,19 +24,28 @@ from ..utils.auth_deps import (
     create_refresh_token,
     decode_token,
     get_current_user,
+    revoke_access_token,
     set_cookie,
-    verify_password,
 )
+from ..utils.customer_summary import refresh_customer_city_summary
 from ..utils.helpers import (
     _customer_has_city,
     _normalize_city_label,
     _resolve_city_code,
 )
-from ..utils.rbac import (
-    ensure_default_roles,
-    parse_role_ids,
+from ..utils.password_pool import PasswordPoolBusy, check_password, hash_password_pooled
+from ..utils.rbac import parse_role_ids
+from ..utils.refresh_sessions import (
+    STATE_REVOKED,
+    RefreshSessionError,
+    cached_session,
+    revoke_family,
+    rotate_session,
+    start_session,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -90,11 +100,10 @@ def _build_role_context_for_login(db, roles: List[int]):
     Returns:
         Tuple of (role_map, role_codes, role_details).
     """
-    from ..utils.rbac import ensure_default_roles, fetch_role_map, make_role_summary
+    from ..utils.rbac import fetch_role_map, make_role_summary
 
     cursor = db.cursor()
     try:
-        ensure_default_roles(cursor)
         role_map = fetch_role_map(cursor, roles)
     finally:
         cursor.close()
@@ -190,6 +199,7 @@ def register_customer(data: CustomerCreate):
                 True,
             ),
         )
+        refresh_customer_city_summary(cursor, customer_ids=[customer_id])
 
         db.commit()
         return {"success": True, "customer_id": customer_id}
@@ -210,25 +220,22 @@ def register_customer(data: CustomerCreate):
         db.close()
 
 
-@router.post("/api/login")
-def login(data: LoginRequest, response: Response):
-    """Authenticate a customer or admin user and issue JWT tokens.
+def _load_login_context(data: LoginRequest) -> Dict[str, Any]:
+    """Run every database check of a login and release the connection.
 
-    Sets access and refresh tokens as HTTP-only cookies (used by Next.js
-    middleware and SSR requests) and also returns them in the JSON body
-    so the frontend can persist them in localStorage for client-side API calls.
+    Raises the same HTTP errors as before for everything except a wrong admin
+    password, which the caller checks afterwards on the bcrypt pool so that no
+    pooled connection is held while hashing.
 
     Args:
-        data: Login credentials (phone, optional admin_password, optional city_code).
-        response: FastAPI response object used to set cookies.
+        data: Login credentials.
 
     Returns:
-        JSON with message, user profile, role info, and token pair.
+        Dict with the customer row fields and role/city context for the tokens.
     """
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        ensure_default_roles(cursor)
         cursor.execute(
             """
             SELECT
@@ -251,30 +258,22 @@ def login(data: LoginRequest, response: Response):
         roles = parse_role_ids(result.get("roles"))
         role_map, role_codes, role_details = _build_role_context_for_login(db, roles)
         has_admin_role = ADMIN_ROLE_CODE in role_codes
-        is_admin_account = has_admin_role and bool(result.get("admin_password_hash"))
-        admin_password_provided = bool(data.admin_password)
-
-        admin_login = False
         admin_is_active = bool(result.get("admin_is_active", True))
-        if admin_password_provided:
+        if data.admin_password:
             if not has_admin_role:
                 raise HTTPException(
                     status_code=403, detail="Admin access not enabled for this user."
                 )
             if not admin_is_active:
                 raise HTTPException(status_code=403, detail="Admin account disabled")
-            password_hash = result.get("admin_password_hash")
-            if not password_hash:
+            if not result.get("admin_password_hash"):
                 raise HTTPException(status_code=400, detail="Admin password not set")
-            if not verify_password(data.admin_password, password_hash):
-                raise HTTPException(status_code=401, detail="Invalid admin password")
-            admin_login = True
 
-        if not admin_password_provided and not data.city_code:
+        if not data.admin_password and not data.city_code:
             raise HTTPException(status_code=400, detail="Please select a city to continue.")
 
         requested_city_code = _resolve_city_code(None, data.city_code)
-        if not admin_password_provided and not _customer_has_city(
+        if not data.admin_password and not _customer_has_city(
             cursor, result["customer_id"], requested_city_code
         ):
             raise HTTPException(
@@ -296,47 +295,186 @@ def login(data: LoginRequest, response: Response):
         if requested_city_code not in eligible_codes:
             eligible_codes.append(requested_city_code)
 
-        base_payload = {
+        return {
             "customer_id": result["customer_id"],
             "phone": result["phone_number"],
             "name": result.get("customer_name"),
+            "admin_password_hash": result.get("admin_password_hash"),
             "roles": roles,
             "role_codes": role_codes,
-            "is_admin": has_admin_role,
+            "role_details": role_details,
+            "has_admin_role": has_admin_role,
             "admin_is_active": admin_is_active,
             "city_code": requested_city_code,
             "eligible_city_codes": eligible_codes or [requested_city_code],
         }
-        if admin_login:
-            base_payload["admin_id"] = result["customer_id"]
-            base_payload["role"] = ADMIN_ROLE_CODE
-        else:
-            base_payload["role"] = "customer"
+    finally:
+        cursor.close()
+        db.close()
 
-        access = create_access_token(base_payload)
-        refresh_tok = create_refresh_token(base_payload, str(uuid.uuid4()))
 
-        set_cookie(response, "access_token", access, ACCESS_TOKEN_TTL_SEC)
-        set_cookie(response, "refresh_token", refresh_tok, REFRESH_TOKEN_TTL_SEC)
+def _rehash_admin_password(customer_id: int, plain: str, old_hash: str) -> None:
+    """Replace an admin's password hash with one at the configured bcrypt cost.
 
-        user_payload = dict(base_payload)
-        user_payload["role_details"] = role_details
+    Runs as a background task after the login response and is skipped while
+    password checks are queued (the next login retries it).  The update only
+    applies if the stored hash is still ``old_hash``, so a password changed in
+    the meantime is never overwritten.
 
-        return {
-            "message": "Login successful",
-            "is_admin": admin_login,
-            "is_admin_account": is_admin_account,
-            "user": user_payload,
-            "access_token": access,
-            "refresh_token": refresh_tok,
-            "role_codes": role_codes,
-            "role_details": role_details,
-        }
+    Args:
+        customer_id: Admin whose hash to replace.
+        plain: The password that just verified against ``old_hash``.
+        old_hash: Hash the password was verified against.
+    """
+    try:
+        new_hash = hash_password_pooled(plain, only_if_idle=True)
+    except PasswordPoolBusy:
+        logger.info("Skipped admin password rehash for %s: bcrypt pool busy", customer_id)
+        return
+    db = get_raw_db()
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE customers
+               SET admin_password_hash = %s
+             WHERE customer_id = %s AND admin_password_hash = %s
+            """,
+            (new_hash, customer_id, old_hash),
+        )
+        db.commit()
+    except mysql.connector.Error:
+        db.rollback()
+        logger.warning("Admin password rehash failed for %s", customer_id, exc_info=True)
     finally:
         cursor.close()
         db.close()
 
 
+def _run_session_write(write, *args):
+    """Run a refresh-session write on a pooled connection and commit it.
+
+    The commit also happens when ``write`` raises ``RefreshSessionError``,
+    because detecting token reuse revokes the family in the same transaction.
+
+    Args:
+        write: Function taking a dictionary cursor followed by ``args``.
+        *args: Arguments for ``write``.
+
+    Returns:
+        Whatever ``write`` returns.
+    """
+    db = get_raw_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        result = write(cursor, *args)
+        db.commit()
+        return result
+    except RefreshSessionError:
+        db.commit()
+        raise
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(err))
+    finally:
+        cursor.close()
+        db.close()
+
+
+def _sign_out(cursor, access_tokens: List[str], family_ids: List[str]) -> None:
+    for token in access_tokens:
+        revoke_access_token(cursor, token)
+    for family_id in family_ids:
+        revoke_family(cursor, family_id, "logout")
+
+
+@router.post("/api/login")
+async def login(data: LoginRequest, response: Response, background_tasks: BackgroundTasks):
+    """Authenticate a customer or admin user and issue JWT tokens.
+
+    Sets access and refresh tokens as HTTP-only cookies (used by Next.js
+    middleware and SSR requests) and also returns them in the JSON body
+    so the frontend can persist them in localStorage for client-side API calls.
+
+    Database checks run first on a worker thread and return their connection
+    to the pool; the admin password is then verified on the bounded bcrypt
+    pool (503 when its queue is full).  A matching hash of a different cost
+    than ``BCRYPT_ROUNDS`` is replaced in the background.
+
+    Each login starts a new refresh-session family (see
+    ``utils/refresh_sessions.py``).
+
+    Args:
+        data: Login credentials (phone, optional admin_password, optional city_code).
+        response: FastAPI response object used to set cookies.
+        background_tasks: Runs the optional password rehash after the response.
+
+    Returns:
+        JSON with message, user profile, role info, and token pair.
+    """
+    context = await asyncio.to_thread(_load_login_context, data)
+    password_hash = context.pop("admin_password_hash")
+    role_details = context.pop("role_details")
+    has_admin_role = context.pop("has_admin_role")
+    is_admin_account = has_admin_role and bool(password_hash)
+
+    admin_login = False
+    if data.admin_password:
+        try:
+            check = await check_password(data.admin_password, password_hash)
+        except PasswordPoolBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-ins in progress. Please try again.",
+                headers={"Retry-After": "1"},
+            )
+        if not check.ok:
+            raise HTTPException(status_code=401, detail="Invalid admin password")
+        admin_login = True
+        if check.needs_rehash:
+            background_tasks.add_task(
+                _rehash_admin_password, context["customer_id"], data.admin_password, password_hash
+            )
+
+    base_payload = {
+        "customer_id": context["customer_id"],
+        "phone": context["phone"],
+        "name": context["name"],
+        "roles": context["roles"],
+        "role_codes": context["role_codes"],
+        "is_admin": has_admin_role,
+        "admin_is_active": context["admin_is_active"],
+        "city_code": context["city_code"],
+        "eligible_city_codes": context["eligible_city_codes"],
+    }
+    if admin_login:
+        base_payload["admin_id"] = context["customer_id"]
+        base_payload["role"] = ADMIN_ROLE_CODE
+    else:
+        base_payload["role"] = "customer"
+
+    session = await asyncio.to_thread(_run_session_write, start_session, context["customer_id"])
+    access = create_access_token(base_payload)
+    refresh_tok = create_refresh_token(base_payload, session.jti, session.family_id)
+
+    set_cookie(response, "access_token", access, ACCESS_TOKEN_TTL_SEC)
+    set_cookie(response, "refresh_token", refresh_tok, REFRESH_TOKEN_TTL_SEC)
+
+    user_payload = dict(base_payload)
+    user_payload["role_details"] = role_details
+
+    return {
+        "message": "Login successful",
+        "is_admin": admin_login,
+        "is_admin_account": is_admin_account,
+        "user": user_payload,
+        "access_token": access,
+        "refresh_token": refresh_tok,
+        "role_codes": context["role_codes"],
+        "role_details": role_details,
+    }
+
+
 @router.post("/auth/refresh")
 async def refresh(
     request: Request,
@@ -350,6 +488,11 @@ async def refresh(
     2. ``Authorization: Bearer <token>`` header.
     3. JSON body ``{"refresh_token": "..."}``.
 
+    The token's session is rotated atomically, so each refresh token can be
+    exchanged once.  Replaying a rotated token (outside the short grace window
+    for concurrent refreshes) revokes its whole session family.  Tokens this
+    worker already knows to be revoked are refused without a database call.
+
     Args:
         request: FastAPI request object.
         response: FastAPI response object used to set cookies.
@@ -381,11 +524,24 @@ async def refresh(
         sub = payload.get("sub") or payload.get("usr")
         if not sub:
             raise ValueError("missing sub claim")
+        jti = str(payload["jti"])
+        customer_id = int(sub["customer_id"])
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
 
+    cached = cached_session(jti)
+    if cached is not None and cached.state == STATE_REVOKED:
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+    try:
+        session = await asyncio.to_thread(
+            _run_session_write, rotate_session, jti, payload.get("fam"), customer_id
+        )
+    except RefreshSessionError as exc:
+        detail = "Refresh token revoked" if exc.reason in ("revoked", "reused") else None
+        raise HTTPException(status_code=401, detail=detail or "Invalid or expired refresh token")
+
     new_access = create_access_token(sub)
-    new_refresh = create_refresh_token(sub, str(uuid.uuid4()))
+    new_refresh = create_refresh_token(sub, session.jti, session.family_id)
 
     set_cookie(response, "access_token", new_access, ACCESS_TOKEN_TTL_SEC)
     set_cookie(response, "refresh_token", new_refresh, REFRESH_TOKEN_TTL_SEC)
@@ -394,15 +550,49 @@ async def refresh(
 
 
 @router.post("/auth/logout")
-def logout(response: Response):
-    """Clear authentication cookies.
+async def logout(
+    request: Request,
+    response: Response,
+    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
+):
+    """Revoke the presented tokens and clear authentication cookies.
+
+    Access tokens (cookie or Bearer header) are revoked for every worker; the refresh
+    token (cookie, Bearer header or JSON body ``{"refresh_token": "..."}``)
+    has its whole session family revoked.
 
     Args:
+        request: FastAPI request object.
         response: FastAPI response object.
+        creds: Optional Bearer credentials from the Authorization header.
 
     Returns:
         Dict with ok flag.
     """
+    tokens = {request.cookies.get("access_token"), request.cookies.get("refresh_token")}
+    if creds and creds.scheme.lower() == "bearer":
+        tokens.add(creds.credentials)
+    try:
+        body = await request.json()
+        if isinstance(body, dict):
+            tokens.add(body.get("refresh_token"))
+    except Exception:
+        pass
+
+    access_tokens: List[str] = []
+    families: List[str] = []
+    for token in tokens - {None, ""}:
+        try:
+            payload = decode_token(token)
+        except Exception:
+            continue
+        if payload.get("type") == "access":
+            access_tokens.append(token)
+        elif payload.get("type") == "refresh" and payload.get("fam"):
+            families.append(str(payload["fam"]))
+    if access_tokens or families:
+        await asyncio.to_thread(_run_session_write, _sign_out, access_tokens, families)
+
     clear_cookie(response, "access_token")
     clear_cookie(response, "refresh_token")
     return {"ok": True}
@@ -5,7 +5,7 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional, Tuple
 
 import mysql.connector
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 
 from datetime import date as date_type
@@ -21,6 +21,7 @@ from ..customer.customer_crud import (
 )
 from ..db import get_raw_db
 from ..utils.auth_deps import admin_required, get_current_user
+from ..utils.customer_summary import refresh_customer_city_summary
 from ..utils.helpers import (
     ORDER_STATUS_CANCELLED,
     _format_datetime,
@@ -30,6 +31,13 @@ from ..utils.helpers import (
     normalize_status_for_response,
     payment_status_label,
 )
+from ..utils.order_history import load_order_history, parse_updated_since
+from ..utils.stock_watcher import stock_watcher
+from ..utils.subscription_snapshots import (
+    compute_subscription_today,
+    invalidate_customer_snapshots,
+    read_subscription_snapshot,
+)
 
 router = APIRouter()
 
@@ -127,50 +135,6 @@ def _resolve_coordinates(
     return float(lat or 0.0), float(lng or 0.0)
 
 
-def _ensure_subscription_pause_table(cursor) -> None:
-    """Create the subscription pause table if a deployment has not run migrations yet.
-
-    Args:
-        cursor: Active MySQL cursor.
-    """
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS subscription_pause_windows (
-            pause_id INT NOT NULL AUTO_INCREMENT,
-            customer_id INT NOT NULL,
-            order_id INT NULL,
-            city_code VARCHAR(3) NOT NULL,
-            meal_type VARCHAR(20) NULL,
-            start_date DATE NOT NULL,
-            end_date DATE NOT NULL,
-            reason VARCHAR(255) NULL,
-            is_active TINYINT(1) NOT NULL DEFAULT 1,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            PRIMARY KEY (pause_id),
-            KEY idx_subscription_pause_city_dates (city_code, start_date, end_date),
-            KEY idx_subscription_pause_customer (customer_id),
-            KEY idx_subscription_pause_order (order_id),
-            CONSTRAINT fk_subscription_pause_customer_from_customers
-                FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
-                ON DELETE CASCADE
-        )
-        """
-    )
-    cursor.execute("SHOW COLUMNS FROM subscription_pause_windows LIKE 'order_id'")
-    if cursor.fetchone() is None:
-        cursor.execute(
-            "ALTER TABLE subscription_pause_windows ADD COLUMN order_id INT NULL AFTER customer_id"
-        )
-    cursor.execute(
-        "SHOW INDEX FROM subscription_pause_windows WHERE Key_name = 'idx_subscription_pause_order'"
-    )
-    if cursor.fetchone() is None:
-        cursor.execute(
-            "CREATE INDEX idx_subscription_pause_order ON subscription_pause_windows (order_id)"
-        )
-
-
 # ---------------------------------------------------------------------------
 # Customer CRUD proxy endpoints (SQLAlchemy-backed via customer_crud)
 # ---------------------------------------------------------------------------
@@ -411,6 +375,7 @@ def create_customer_address(customer_id: int, payload: AddressPayload):
             ),
         )
         address_id = cursor.lastrowid
+        refresh_customer_city_summary(cursor, customer_ids=[customer_id])
         db.commit()
 
         return {"address_id": address_id, "message": "Address added successfully"}
@@ -491,6 +456,7 @@ def update_customer_address(customer_id: int, address_id: int, payload: AddressP
             ),
         )
         new_address_id = cursor.lastrowid
+        refresh_customer_city_summary(cursor, customer_ids=[customer_id])
         db.commit()
         return {"address_id": new_address_id, "message": "Address updated successfully"}
     except mysql.connector.Error as err:
@@ -532,6 +498,7 @@ def assign_address_route(
             "UPDATE addresses SET route_id=%s WHERE address_id=%s AND customer_id=%s",
             (payload.route_id, address_id, customer_id),
         )
+        refresh_customer_city_summary(cursor, customer_ids=[customer_id])
         db.commit()
         return {"message": "Route assigned successfully"}
     except mysql.connector.Error as err:
@@ -571,6 +538,7 @@ def set_default_customer_address(customer_id: int, address_id: int):
             "UPDATE addresses SET is_default=1 WHERE address_id=%s AND customer_id=%s AND is_active=1",
             (address_id, customer_id),
         )
+        refresh_customer_city_summary(cursor, customer_ids=[customer_id])
         db.commit()
         return {"message": "Default address updated"}
     except mysql.connector.Error as err:
@@ -587,140 +555,87 @@ def set_default_customer_address(customer_id: int, address_id: int):
 
 
 @router.get("/api/customers/{customer_id}/orders", tags=["Customers"])
-def list_customer_orders(customer_id: int, limit: int = Query(50, ge=1, le=200)):
-    """Return a customer's order history with items.
+def list_customer_orders(
+    customer_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header"),
+    updated_since: Optional[str] = Query(
+        None, description="ISO timestamp; only orders created or changed since then"
+    ),
+):
+    """Return a customer's order history with items, newest first.
+
+    Pages are keyset-based: when more orders exist the response carries an
+    ``X-Next-Cursor`` header to pass back as ``before``.  ``X-Sync-Token``
+    is the ``updated_since`` to send on the next incremental sync; it is
+    safe to store after any page.  With ``updated_since`` orders come oldest
+    change first and ``X-Deleted-Order-Ids`` lists (comma-separated) the
+    orders deleted since then.
 
     Args:
         customer_id: Customer to look up.
+        response: Outgoing response (pagination headers are set on it).
         limit: Maximum number of orders to return.
+        before: Keyset cursor from a previous page.
+        updated_since: Only return orders created, updated or deleted at or after this time.
 
     Returns:
         List of order dicts with items.
     """
+    since = parse_updated_since(updated_since)
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        from mysql.connector import errorcode
-
-        try:
-            cursor.execute(
-                """
-                SELECT o.order_id,
-                       o.created_at,
-                       o.delivery_date,
-                       o.total_price,
-                       o.status,
-                       o.paid,
-                       o.payment_method,
-                       o.order_type,
-                       a.address_type,
-                       a.written_address,
-                       a.city,
-                       a.pin_code
-                  FROM orders o
-                  JOIN addresses a ON o.address_id = a.address_id
-                 WHERE o.customer_id = %s
-                 ORDER BY o.created_at DESC, o.order_id DESC
-                 LIMIT %s
-                """,
-                (customer_id, limit),
-            )
-        except mysql.connector.Error as err:
-            if err.errno == errorcode.ER_BAD_FIELD_ERROR:
-                cursor.execute(
-                    """
-                    SELECT o.order_id,
-                           o.created_at,
-                           NULL AS delivery_date,
-                           o.total_price,
-                           o.status,
-                           o.paid,
-                           o.payment_method,
-                           NULL AS order_type,
-                           a.address_type,
-                           a.written_address,
-                           a.city,
-                           a.pin_code
-                      FROM orders o
-                      JOIN addresses a ON o.address_id = a.address_id
-                     WHERE o.customer_id = %s
-                     ORDER BY o.created_at DESC, o.order_id DESC
-                     LIMIT %s
-                    """,
-                    (customer_id, limit),
-                )
-            else:
-                raise
-        orders = cursor.fetchall()
-        if not orders:
-            return []
-
-        order_ids = [row["order_id"] for row in orders]
-        placeholders = ",".join(["%s"] * len(order_ids))
-
-        cursor.execute(
-            f"""
-            SELECT oi.order_id,
-                   oi.quantity,
-                   oi.price,
-                   oi.meal_type,
-                   COALESCE(i.name, co.combo_name, ct_mi.name, ct_i.name) AS item_name
-              FROM order_items oi
-              LEFT JOIN items i ON oi.item_id = i.item_id
-              LEFT JOIN combos co ON oi.combo_id = co.combo_id
-              LEFT JOIN menu_items mi ON oi.menu_item_id = mi.menu_item_id
-              LEFT JOIN component_types ct_mi ON mi.component_type_id = ct_mi.component_type_id
-              LEFT JOIN component_types ct_i ON i.component_type_id = ct_i.component_type_id
-             WHERE oi.order_id IN ({placeholders})
-             ORDER BY oi.order_id ASC, oi.order_item_id ASC
-            """,
-            order_ids,
+        page = load_order_history(
+            cursor,
+            customer_id=customer_id,
+            updated_since=since,
+            before=before,
+            limit=limit,
         )
-        item_rows = cursor.fetchall()
-        items_by_order: Dict[int, List[Dict[str, object]]] = {}
-        for row in item_rows:
-            order_id = row["order_id"]
-            items_by_order.setdefault(order_id, []).append(
-                {
-                    "item_name": row.get("item_name") or "Item",
-                    "quantity": int(row.get("quantity") or 0),
-                    "price": float(row.get("price") or 0),
-                    "meal_type": row.get("meal_type"),
-                }
-            )
-
-        result = []
-        for order in orders:
-            order_id = order["order_id"]
-            created = order.get("created_at")
-            delivery_date = order.get("delivery_date")
-            paid_flag = bool(order.get("paid"))
-            result.append(
-                {
-                    "order_id": order_id,
-                    "created_at": created.isoformat() if created else None,
-                    "delivery_date": delivery_date.isoformat() if delivery_date else None,
-                    "total_price": float(order.get("total_price") or 0),
-                    "status": normalize_status_for_response(order.get("status")),
-                    "payment_status": payment_status_label(paid_flag),
-                    "payment_method": order.get("payment_method") or "Cash",
-                    "paid": paid_flag,
-                    "address": {
-                        "label": order.get("address_type") or "Address",
-                        "line": order.get("written_address") or "",
-                        "city": order.get("city") or "",
-                        "pin_code": order.get("pin_code") or "",
-                    },
-                    "items": items_by_order.get(order_id, []),
-                    "order_type": order.get("order_type") or "one_time",
-                }
-            )
-
-        return result
     finally:
         cursor.close()
         db.close()
 
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.sync_token is not None:
+        response.headers["X-Sync-Token"] = page.sync_token.isoformat()
+    if since is not None:
+        response.headers["X-Deleted-Order-Ids"] = ",".join(
+            str(order_id) for order_id in page.deleted_order_ids
+        )
+
+    result = []
+    for order in page.orders:
+        created = order.get("created_at")
+        updated = order.get("updated_at")
+        delivery_date = order.get("delivery_date")
+        paid_flag = bool(order.get("paid"))
+        result.append(
+            {
+                "order_id": order["order_id"],
+                "created_at": created.isoformat() if created else None,
+                "updated_at": updated.isoformat() if updated else None,
+                "delivery_date": delivery_date.isoformat() if delivery_date else None,
+                "total_price": float(order.get("total_price") or 0),
+                "status": normalize_status_for_response(order.get("status")),
+                "payment_status": payment_status_label(paid_flag),
+                "payment_method": order.get("payment_method") or "Cash",
+                "paid": paid_flag,
+                "address": {
+                    "label": order.get("address_type") or "Address",
+                    "line": order.get("written_address") or "",
+                    "city": order.get("city") or "",
+                    "pin_code": order.get("pin_code") or "",
+                },
+                "items": order["items"],
+                "order_type": order.get("order_type") or "one_time",
+            }
+        )
+    return result
+
 
 @router.get("/api/customers/{customer_id}/subscription-today", tags=["Customers"])
 def get_subscription_today(
@@ -729,6 +644,9 @@ def get_subscription_today(
 ) -> List[Dict[str, Any]]:
     """Return today's resolved menu items for a customer's active subscriptions.
 
+    Served from the snapshot written when today's menus were resolved; falls
+    back to computing the answer live when there is no snapshot row.
+
     Args:
         customer_id: Customer to look up.
         city_code: City code; defaults to DEFAULT_CITY.
@@ -742,88 +660,11 @@ def get_subscription_today(
     today = date_type.today().isoformat()
     city = normalize_city_code(city_code or DEFAULT_CITY)
     try:
-        _ensure_subscription_pause_table(cursor)
-        cursor.execute(
-            """
-            SELECT
-                oi.meal_type,
-                oi.quantity,
-                COALESCE(sub_mi.component_type_id, i_sub.component_type_id) AS component_type_id,
-                COALESCE(ct.name, ct2.name)                                 AS group_name
-            FROM orders o
-            JOIN order_items oi ON oi.order_id = o.order_id
-            LEFT JOIN menu_items sub_mi ON oi.menu_item_id = sub_mi.menu_item_id
-            LEFT JOIN items i_sub     ON oi.item_id = i_sub.item_id
-            LEFT JOIN component_types ct  ON sub_mi.component_type_id = ct.component_type_id
-            LEFT JOIN component_types ct2 ON i_sub.component_type_id  = ct2.component_type_id
-            LEFT JOIN subscription_pause_windows spw
-                   ON spw.customer_id = o.customer_id
-                  AND spw.city_code = %s
-                  AND spw.is_active = 1
-                  AND %s BETWEEN spw.start_date AND spw.end_date
-                  AND spw.order_id = o.order_id
-            WHERE o.customer_id = %s
-              AND o.order_type  = 'subscription'
-              AND o.status NOT IN ('cancelled', 'rejected')
-              AND COALESCE(sub_mi.component_type_id, i_sub.component_type_id) IS NOT NULL
-              AND spw.pause_id IS NULL
-            """,
-            (city, today, customer_id),
-        )
-        sub_rows = cursor.fetchall()
-        if not sub_rows:
-            return []
-
-        ct_ids = list({r["component_type_id"] for r in sub_rows if r["component_type_id"]})
-        if not ct_ids:
-            return []
-
-        placeholders = ",".join(["%s"] * len(ct_ids))
-        cursor.execute(
-            f"""
-            SELECT
-                COALESCE(i.component_type_id, today_mi.component_type_id) AS component_type_id,
-                i.name          AS resolved_item_name,
-                i.picture_url   AS resolved_picture_url,
-                today_mi.rate   AS resolved_price,
-                m.is_released
-            FROM menu m
-            JOIN menu_items today_mi ON today_mi.menu_id = m.menu_id
-            JOIN items i             ON today_mi.item_id = i.item_id
-            WHERE m.date       = %s
-              AND m.menu_type  = 'ONE_DAY'
-              AND m.city_code  = %s
-              AND COALESCE(i.component_type_id, today_mi.component_type_id) IN ({placeholders})
-            """,
-            [today, city] + ct_ids,
-        )
-        resolved: Dict[int, Dict[str, Any]] = {r["component_type_id"]: r for r in cursor.fetchall()}
-
-        seen: set = set()
-        result: List[Dict[str, Any]] = []
-        for row in sub_rows:
-            ct_id = row["component_type_id"]
-            key = (row["meal_type"], ct_id)
-            if key in seen:
-                continue
-            seen.add(key)
-            res = resolved.get(ct_id, {})
-            result.append(
-                {
-                    "meal_type": row["meal_type"],
-                    "group_name": row["group_name"],
-                    "quantity": row["quantity"],
-                    "resolved_item_name": res.get("resolved_item_name"),
-                    "resolved_picture_url": res.get("resolved_picture_url"),
-                    "resolved_price": (
-                        float(res["resolved_price"])
-                        if res.get("resolved_price") is not None
-                        else None
-                    ),
-                    "menu_released": bool(res.get("is_released", False)),
-                }
-            )
-        return result
+        snapshot = read_subscription_snapshot(cursor, today, city, customer_id)
+        if snapshot is not None:
+            return snapshot
+        # Not resolved yet today, or invalidated since: compute live.
+        return compute_subscription_today(cursor, today, city, [customer_id]).get(customer_id, [])
     finally:
         cursor.close()
         db.close()
@@ -898,6 +739,9 @@ def update_customer_subscription_order(
             f"UPDATE orders SET {', '.join(updates)} WHERE order_id = %s",
             tuple(params),
         )
+        if payload.address_id is not None:
+            refresh_customer_city_summary(cursor, customer_ids=[customer_id])
+        invalidate_customer_snapshots(cursor, [customer_id])
         db.commit()
         return {"status": "updated", "order_id": order_id}
     except mysql.connector.Error as err:
@@ -952,7 +796,10 @@ def cancel_customer_subscription_order(customer_id: int, order_id: int) -> Dict[
             "UPDATE orders SET status = %s WHERE order_id = %s",
             (ORDER_STATUS_CANCELLED, order_id),
         )
+        refresh_customer_city_summary(cursor, customer_ids=[customer_id])
+        invalidate_customer_snapshots(cursor, [customer_id])
         db.commit()
+        stock_watcher.notify_changed(db, order_id=order_id)
         return {"status": "cancelled", "order_id": order_id}
     except mysql.connector.Error as err:
         db.rollback()
@@ -22,7 +22,12 @@ from pydantic import BaseModel, Field
 
 from ..city_config import DEFAULT_CITY, normalize_city_code
 from ..db import get_raw_db, DATABASE_NAME
-from ..utils.auth_deps import developer_required
+from ..utils.auth_deps import developer_required, token_cache_stats
+from ..utils.customer_summary import rebuild_customer_city_summary, refresh_customer_city_summary
+from ..utils.order_history import delete_orders
+from ..utils.logger import audit_log_stats
+from ..utils.password_pool import password_pool_stats
+from ..utils.schema import last_schema_report
 from ..utils.helpers import (
     MENU_TYPE_CONDIMENTS,
     MENU_TYPE_ONE_DAY,
@@ -345,6 +350,42 @@ def get_table_data(
         db.close()
 
 
+@router.get("/api/dev/schema-guards")
+def get_schema_guard_report(user: Any = Depends(developer_required)) -> Dict[str, Any]:
+    """Return the startup schema guard timing report for this worker.
+
+    Args:
+        user: Current developer user (injected).
+
+    Returns:
+        Dict with per-guard entries and the total startup time in ms.
+    """
+    guards = last_schema_report()
+    return {
+        "guards": guards,
+        "total_ms": round(sum(entry["duration_ms"] for entry in guards), 2),
+    }
+
+
+@router.get("/api/dev/auth-metrics")
+def get_auth_metrics(user: Any = Depends(developer_required)) -> Dict[str, Any]:
+    """Return this worker's bcrypt pool, verified-token cache and audit-log counters.
+
+    Args:
+        user: Current developer user (injected).
+
+    Returns:
+        Dict with ``password_pool`` (queue depth, rejections, wait/hash times),
+        ``token_cache`` (size, hits, misses) and ``audit_log`` (queue depth,
+        rows written, spooled and dropped).
+    """
+    return {
+        "password_pool": password_pool_stats(),
+        "token_cache": token_cache_stats(),
+        "audit_log": audit_log_stats(),
+    }
+
+
 @router.post("/api/dev/daily-menu/auto")
 def auto_generate_daily_menu(
     payload: AutoMenuRequest, _: Dict[str, Any] = Depends(developer_required)
@@ -532,9 +573,9 @@ def purge_all_orders(user: Dict[str, Any] = Depends(developer_required)) -> Dict
     try:
         cursor.execute("SELECT COUNT(*) FROM orders")
         total_orders = int((cursor.fetchone() or [0])[0] or 0)
-        cursor.execute("DELETE FROM order_items")
-        cursor.execute("DELETE FROM orders")
+        delete_orders(cursor, None)
         db.commit()
+        rebuild_customer_city_summary(db)
         return {"deleted_orders": total_orders}
     except mysql.connector.Error as err:
         db.rollback()
@@ -571,7 +612,7 @@ def seed_orders_for_testing(
         if payload.clear_existing:
             cursor.execute(
                 """
-                SELECT o.order_id
+                SELECT o.order_id, o.customer_id
                   FROM orders o
                   JOIN addresses a ON o.address_id = a.address_id
                  WHERE DATE(o.created_at) = %s
@@ -582,16 +623,11 @@ def seed_orders_for_testing(
             rows = cursor.fetchall() or []
             order_ids = [row["order_id"] for row in rows]
             if order_ids:
-                placeholders = ", ".join(["%s"] * len(order_ids))
-                cursor.execute(
-                    f"DELETE FROM order_items WHERE order_id IN ({placeholders})",
-                    tuple(order_ids),
-                )
-                cursor.execute(
-                    f"DELETE FROM orders WHERE order_id IN ({placeholders})",
-                    tuple(order_ids),
-                )
+                delete_orders(cursor, order_ids)
                 deleted_orders = len(order_ids)
+                refresh_customer_city_summary(
+                    cursor, customer_ids=[row["customer_id"] for row in rows]
+                )
             db.commit()
 
         if payload.count == 0:
@@ -732,6 +768,7 @@ def seed_orders_for_testing(
             created_ids.append(order_id)
             seeded_status_counts[seeded_status] += 1
 
+        refresh_customer_city_summary(cursor, order_ids=created_ids)
         db.commit()
         return {
             "date": target_date.isoformat(),
@@ -1153,15 +1190,10 @@ async def vps_metrics_stream(websocket: WebSocket, token: str = Query(...)) -> N
         websocket: FastAPI WebSocket connection.
         token: JWT access token passed as a query parameter.
     """
-    from ..utils.auth_deps import decode_token, _user_has_role, DEVELOPER_ROLE_CODE
+    from ..utils.auth_deps import DEVELOPER_ROLE_CODE, _verify_access_token
 
-    try:
-        payload = decode_token(token)
-        if payload.get("type") != "access":
-            raise ValueError("wrong token type")
-        if not _user_has_role(payload["sub"], DEVELOPER_ROLE_CODE):
-            raise ValueError("developer role required")
-    except Exception:
+    user = _verify_access_token(token)
+    if user is None or not user.has_role(DEVELOPER_ROLE_CODE):
         await websocket.close(code=4003)
         return
 
@@ -1210,16 +1242,10 @@ async def vps_terminal_ws(websocket: WebSocket, token: str = Query(...)) -> None
         websocket: FastAPI WebSocket connection.
         token: JWT access token passed as a query parameter.
     """
-    from ..utils.auth_deps import decode_token, _user_has_role, DEVELOPER_ROLE_CODE
+    from ..utils.auth_deps import DEVELOPER_ROLE_CODE, _verify_access_token
 
-    try:
-        payload = decode_token(token)
-        if payload.get("type") != "access":
-            raise ValueError("wrong token type")
-        user_sub = payload["sub"]
-        if not _user_has_role(user_sub, DEVELOPER_ROLE_CODE):
-            raise ValueError("developer role required")
-    except Exception:
+    user = _verify_access_token(token)
+    if user is None or not user.has_role(DEVELOPER_ROLE_CODE):
         await websocket.close(code=4003)
         return
 
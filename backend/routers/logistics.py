@@ -3,27 +3,42 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
-from typing import Any, Dict, List, Optional, Set
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import mysql.connector
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from ..db import get_raw_db
 from ..utils.auth_deps import admin_required
+from ..utils.customer_summary import refresh_customer_city_summary
 from ..utils.helpers import (
     ORDER_STATUS_CANCELLED,
     ORDER_STATUS_CONFIRMED,
     ORDER_STATUS_DELIVERED,
     ORDER_STATUS_DISPATCHED,
+    _ORDER_STATUS_ALIASES,
     _parse_optional_date,
     _resolve_city_context,
     get_food_meals_for_city,
     normalize_status_for_response,
     payment_status_label,
 )
+from ..utils.route_planning import MAX_ROUTE_COUNT, apply_route_plan, plan_routes
+from ..utils.schema import schema_guard
+from ..utils.stop_sequencing import RouteSequence, sequence_routes
+from ..utils.trip_sheet_export import (
+    iter_trip_sheet_stops,
+    stream_trip_sheet_csv,
+    stream_trip_sheet_pdf,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -39,6 +54,7 @@ class TripSheetRequest(BaseModel):
     date: str
     city_code: Optional[str] = None
     meal_type: Optional[str] = None
+    optimize: bool = False
 
 
 class TripSheetBulkStatusRequest(BaseModel):
@@ -67,41 +83,22 @@ class DeliveryRouteBulkSaveRequest(BaseModel):
     routes: List[DeliveryRoutePayload] = Field(default_factory=list)
 
 
-# ---------------------------------------------------------------------------
-# Internal helpers
-# ---------------------------------------------------------------------------
+class RoutePlanRequest(BaseModel):
+    """Parameters for clustering a city's addresses into delivery routes."""
 
+    city_code: Optional[str] = None
+    route_count: int = Field(..., ge=1, le=MAX_ROUTE_COUNT)
+    max_stops_per_route: Optional[int] = Field(default=None, ge=1)
+    seed: int = 0
+    plan_token: Optional[str] = None
 
-def _ensure_delivery_routes_table(db) -> None:
-    """Create the delivery_routes table if it does not yet exist.
 
-    Args:
-        db: mysql.connector connection.
-    """
-    cursor = db.cursor()
-    try:
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS delivery_routes (
-                route_id INT NOT NULL AUTO_INCREMENT,
-                city_code VARCHAR(10) NOT NULL,
-                route_code VARCHAR(50) NOT NULL,
-                route_name VARCHAR(150) NOT NULL,
-                notes TEXT NULL,
-                is_active TINYINT(1) NOT NULL DEFAULT 1,
-                sort_order INT NOT NULL DEFAULT 0,
-                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                PRIMARY KEY (route_id),
-                UNIQUE KEY uq_delivery_routes_city_route_code (city_code, route_code)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """
-        )
-        db.commit()
-    finally:
-        cursor.close()
+# ---------------------------------------------------------------------------
+# Internal helpers
+# ---------------------------------------------------------------------------
 
 
+@schema_guard("trip_sheets_table")
 def _ensure_trip_sheets_table(db) -> None:
     """Create the trip_sheets table if it does not yet exist.
 
@@ -142,6 +139,264 @@ def _normalized_meal_type(meal_type: Optional[str]) -> str:
     return (meal_type or "").strip()
 
 
+def _valid_coordinates(row: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    if row.get("latitude") is None or row.get("longitude") is None:
+        return None
+    lat, lng = float(row["latitude"]), float(row["longitude"])
+    if (lat == 0.0 and lng == 0.0) or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def _sequence_route_groups(
+    route_groups: Dict[str, List[Dict[str, Any]]],
+    rows_by_order: Dict[int, Dict[str, Any]],
+) -> Dict[str, RouteSequence]:
+    """Reorder each route's orders into an optimised stop sequence, in place.
+
+    Orders to the same address share a stop.  Orders whose address has no
+    usable coordinates keep their original relative order after the
+    sequenced stops and get no ``stop_sequence``.
+
+    Args:
+        route_groups: Route label -> order payloads (reordered in place).
+        rows_by_order: order_id -> query row carrying address coordinates.
+
+    Returns:
+        Route label -> RouteSequence for routes with at least one located stop.
+    """
+    stops_by_route: Dict[str, List[Tuple[int, float, float]]] = {}
+    for route, orders in route_groups.items():
+        stops: Dict[int, Tuple[int, float, float]] = {}
+        for order in orders:
+            row = rows_by_order[order["order_id"]]
+            coordinates = _valid_coordinates(row)
+            if coordinates is not None and row.get("address_id") is not None:
+                stops[int(row["address_id"])] = (int(row["address_id"]), *coordinates)
+        if stops:
+            stops_by_route[route] = list(stops.values())
+
+    sequences = sequence_routes(stops_by_route)
+    for route, sequence in sequences.items():
+        position = {address_id: index for index, address_id in enumerate(sequence.address_ids)}
+        orders = route_groups[route]
+        for order in orders:
+            stop_index = position.get(order["address"].get("address_id"))
+            if stop_index is not None:
+                order["stop_sequence"] = stop_index + 1
+        fallback = len(position)
+        orders.sort(key=lambda order: order.get("stop_sequence", fallback + 1))
+    return sequences
+
+
+# Statuses (lower-cased, "(Payment Due)" stripped) that end a delivery run.
+_CLOSED_STATUS_KEYS = tuple(
+    sorted(
+        alias
+        for alias, canonical in _ORDER_STATUS_ALIASES.items()
+        if canonical in (ORDER_STATUS_DELIVERED, ORDER_STATUS_CANCELLED)
+    )
+)
+_STATUS_KEY_SQL = "TRIM(REPLACE(LOWER(COALESCE(o.status, '')), ' (payment due)', ''))"
+ORDER_ID_BATCH_SIZE = 1000
+
+
+class _StageTimer:
+    """Collects wall-clock milliseconds per pipeline stage."""
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self._mark = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.timings[stage] = round((now - self._mark) * 1000, 2)
+        self._mark = now
+
+
+def _service_date_filter(service_date) -> Tuple[str, Tuple[Any, ...]]:
+    """Return a sargable equivalent of ``COALESCE(o.delivery_date, DATE(o.created_at)) = %s``.
+
+    Args:
+        service_date: Service date.
+
+    Returns:
+        Tuple of (SQL condition, params) using idx_orders_delivery_date and idx_orders_created.
+    """
+    day_start = datetime.combine(service_date, datetime.min.time())
+    return (
+        "(o.delivery_date = %s OR (o.delivery_date IS NULL "
+        "AND o.created_at >= %s AND o.created_at < %s))",
+        (service_date, day_start, day_start + timedelta(days=1)),
+    )
+
+
+def _ensure_production_ready(cursor, service_date, city_code: str, meals: List[str]) -> None:
+    """Raise 400 if any released meal still needs kitchen production generated.
+
+    Args:
+        cursor: Dictionary cursor.
+        service_date: Service date.
+        city_code: City code.
+        meals: Meal types the trip sheet covers.
+
+    Raises:
+        HTTPException: 400 naming the meals whose production is missing.
+    """
+    if not meals:
+        return
+    meal_placeholders = ", ".join(["%s"] * len(meals))
+    cursor.execute(
+        f"""
+        SELECT b.bld_type
+          FROM bld b
+          LEFT JOIN menu m
+            ON m.bld_id = b.bld_id
+           AND m.date = %s
+           AND m.city_code = %s
+         WHERE b.bld_type IN ({meal_placeholders})
+         GROUP BY b.bld_type
+        HAVING MAX(COALESCE(m.is_released, 0)) = 1
+           AND MAX(COALESCE(m.is_production_generated, 0)) = 0
+        """,
+        (service_date, city_code, *meals),
+    )
+    missing = [row["bld_type"] for row in cursor.fetchall() or []]
+    if missing:
+        missing_label = ", ".join(missing)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Generate kitchen production for {missing_label} before creating the trip sheet.",
+        )
+
+
+def _fetch_trip_sheet_orders(
+    cursor, service_date, city_code: str, meal_type: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Load the sheet's orders with their line items in one query.
+
+    With a meal type the item join doubles as the meal filter: only orders
+    with at least one item of that meal come back, carrying just those items.
+
+    Args:
+        cursor: Dictionary cursor.
+        service_date: Service date.
+        city_code: City code.
+        meal_type: Optional meal type.
+
+    Returns:
+        Order rows in sheet order, each with an ``items`` list.
+    """
+    date_sql, params = _service_date_filter(service_date)
+    if meal_type:
+        items_join = (
+            "JOIN order_items oi ON oi.order_id = o.order_id AND LOWER(oi.meal_type) = LOWER(%s)"
+        )
+        params = (meal_type, *params)
+    else:
+        items_join = "LEFT JOIN order_items oi ON oi.order_id = o.order_id"
+    cursor.execute(
+        f"""
+        SELECT
+            o.order_id,
+            o.created_at,
+            o.total_price,
+            o.status,
+            o.payment_method,
+            o.paid,
+            c.customer_id,
+            c.name AS customer_name,
+            c.primary_mobile,
+            c.email,
+            a.address_id,
+            a.address_type,
+            a.house_apartment_no,
+            a.written_address,
+            a.city,
+            a.pin_code,
+            a.latitude,
+            a.longitude,
+            a.route_id,
+            dr.route_code,
+            dr.route_name,
+            dr.sort_order,
+            oi.order_id AS item_order_id,
+            oi.quantity AS item_quantity,
+            oi.price AS item_price,
+            oi.meal_type AS item_meal_type,
+            COALESCE(i.name, co.combo_name) AS item_name
+        FROM orders o
+        JOIN customers c ON o.customer_id = c.customer_id
+        JOIN addresses a ON o.address_id = a.address_id
+        LEFT JOIN delivery_routes dr ON dr.route_id = a.route_id
+        {items_join}
+        LEFT JOIN items i ON oi.item_id = i.item_id
+        LEFT JOIN combos co ON oi.combo_id = co.combo_id
+       WHERE {date_sql}
+         AND a.city_code = %s
+       ORDER BY COALESCE(dr.sort_order, 9999), COALESCE(dr.route_name, ''), c.name,
+                o.order_id, COALESCE(i.name, co.combo_name)
+        """,
+        (*params, city_code),
+    )
+    orders: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    for row in cursor.fetchall() or []:
+        if current is None or current["order_id"] != row["order_id"]:
+            current = dict(row)
+            current["items"] = []
+            orders.append(current)
+        if row.get("item_order_id") is None:
+            continue
+        qty = int(row.get("item_quantity") or 0)
+        price = float(row.get("item_price") or 0)
+        current["items"].append(
+            {
+                "item_name": row.get("item_name") or "Item",
+                "meal_type": row.get("item_meal_type"),
+                "quantity": qty,
+                "price": price,
+                "line_total": round(qty * price, 2),
+            }
+        )
+    return orders
+
+
+def _reset_order_id_table(cursor) -> None:
+    """Create (or empty) the connection's ``tmp_trip_sheet_orders`` temporary table.
+
+    Pooled connections keep temporary tables between requests, hence the DELETE.
+
+    Args:
+        cursor: Cursor on the writer's connection.
+    """
+    cursor.execute(
+        """
+        CREATE TEMPORARY TABLE IF NOT EXISTS tmp_trip_sheet_orders (
+            order_id INT NOT NULL PRIMARY KEY
+        ) ENGINE=MEMORY
+        """
+    )
+    cursor.execute("DELETE FROM tmp_trip_sheet_orders")
+
+
+def _load_order_id_table(cursor, order_ids: List[int]) -> None:
+    """Fill ``tmp_trip_sheet_orders`` with the given order ids.
+
+    Args:
+        cursor: Cursor on the writer's connection.
+        order_ids: Order ids to load.
+    """
+    _reset_order_id_table(cursor)
+    for start in range(0, len(order_ids), ORDER_ID_BATCH_SIZE):
+        batch = order_ids[start : start + ORDER_ID_BATCH_SIZE]
+        cursor.execute(
+            f"INSERT IGNORE INTO tmp_trip_sheet_orders (order_id) VALUES "
+            f"{', '.join(['(%s)'] * len(batch))}",
+            tuple(batch),
+        )
+
+
 # ---------------------------------------------------------------------------
 # Endpoints
 # ---------------------------------------------------------------------------
@@ -164,7 +419,6 @@ def list_delivery_routes(
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_delivery_routes_table(db)
         resolved_city = _resolve_city_context(city_code, user)
         cursor.execute(
             """
@@ -203,7 +457,6 @@ def bulk_save_delivery_routes(
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_delivery_routes_table(db)
         resolved_city = _resolve_city_context(payload.city_code, user)
         normalized_routes: List[Dict[str, Any]] = []
         seen_codes: Set[str] = set()
@@ -320,6 +573,84 @@ def bulk_save_delivery_routes(
         db.close()
 
 
+def _plan_routes_or_400(cursor, city_code: str, payload: RoutePlanRequest):
+    try:
+        return plan_routes(
+            cursor,
+            city_code,
+            payload.route_count,
+            max_stops_per_route=payload.max_stops_per_route,
+            seed=payload.seed,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+
+
+@router.post("/api/logistics/routes/auto-plan/preview")
+def preview_route_plan(
+    payload: RoutePlanRequest,
+    user: Dict[str, Any] = Depends(admin_required),
+) -> Dict[str, Any]:
+    """Cluster a city's active addresses into routes without saving anything.
+
+    Args:
+        payload: route_count, optional max_stops_per_route, seed and city_code.
+        user: Current admin user (injected).
+
+    Returns:
+        Dict with plan_token, the planned routes and the addresses that would move.
+    """
+    target_city = _resolve_city_context(payload.city_code, user)
+    db = get_raw_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        return _plan_routes_or_400(cursor, target_city, payload).to_dict()
+    finally:
+        cursor.close()
+        db.close()
+
+
+@router.post("/api/logistics/routes/auto-plan/apply")
+def apply_route_plan_endpoint(
+    payload: RoutePlanRequest,
+    user: Dict[str, Any] = Depends(admin_required),
+) -> Dict[str, Any]:
+    """Recompute a previewed plan and apply it in one transaction.
+
+    The plan is recomputed from the same parameters; if the city's addresses
+    or routes changed since the preview its ``plan_token`` differs and the
+    request is rejected so the admin can preview again.
+
+    Args:
+        payload: The preview's parameters plus its plan_token.
+        user: Current admin user (injected).
+
+    Returns:
+        Dict with city_code, created_routes and updated_addresses.
+    """
+    if not payload.plan_token:
+        raise HTTPException(status_code=400, detail="plan_token from the preview is required")
+    target_city = _resolve_city_context(payload.city_code, user)
+    db = get_raw_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        plan = _plan_routes_or_400(cursor, target_city, payload)
+        if plan.plan_token != payload.plan_token:
+            raise HTTPException(
+                status_code=409,
+                detail="Addresses or routes changed since the preview; preview the plan again",
+            )
+        result = apply_route_plan(cursor, plan)
+        db.commit()
+        return {"city_code": target_city, **result}
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(err))
+    finally:
+        cursor.close()
+        db.close()
+
+
 @router.get("/api/logistics/trip-sheet/unassigned-routes")
 def get_unassigned_route_customers(
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
@@ -440,7 +771,6 @@ def get_saved_trip_sheet(
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_trip_sheets_table(db)
         cursor.execute(
             """
             SELECT payload
@@ -464,6 +794,105 @@ def get_saved_trip_sheet(
         db.close()
 
 
+@router.get("/api/logistics/trip-sheet/export")
+def export_trip_sheet(
+    date: str = Query(..., description="Date in YYYY-MM-DD format"),
+    format: str = Query("csv", pattern="^(csv|pdf)$", description="csv or pdf"),
+    route_id: Optional[int] = Query(None, description="Export a single route"),
+    city_code: Optional[str] = Query(None),
+    meal_type: Optional[str] = Query(None, description="Export the saved sheet for this meal type"),
+    user: Dict[str, Any] = Depends(admin_required),
+) -> StreamingResponse:
+    """Stream a saved trip sheet as a printable CSV or PDF, one route at a time.
+
+    Stops are read from the stored payload with an unbuffered cursor and
+    written out as they arrive, so memory use does not grow with the sheet.
+
+    Args:
+        date: Service date in YYYY-MM-DD format.
+        format: ``csv`` or ``pdf``.
+        route_id: Optional route to export; all routes when omitted.
+        city_code: City to export; defaults to admin's active city.
+        meal_type: Optional meal type scope (e.g. "Breakfast").
+        user: Current admin user (injected).
+
+    Returns:
+        Streaming ``text/csv`` or ``application/pdf`` attachment.
+    """
+    parsed_date = _parse_optional_date(date)
+    if not parsed_date:
+        raise HTTPException(status_code=400, detail="Valid date required (YYYY-MM-DD)")
+    target_city = _resolve_city_context(city_code, user)
+    normalized_meal = _normalized_meal_type(meal_type)
+    db = get_raw_db()
+    cursor = db.cursor(dictionary=True)
+    _streaming = False
+    try:
+        cursor.execute(
+            """
+            SELECT trip_sheet_id
+              FROM trip_sheets
+             WHERE service_date = %s
+               AND city_code = %s
+               AND meal_type = %s
+            """,
+            (parsed_date, target_city, normalized_meal),
+        )
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Trip sheet not found")
+        route_name: Optional[str] = None
+        if route_id is not None:
+            cursor.execute(
+                "SELECT route_name FROM delivery_routes WHERE route_id = %s AND city_code = %s",
+                (route_id, target_city),
+            )
+            route_row = cursor.fetchone()
+            if not route_row:
+                raise HTTPException(status_code=404, detail="Route not found")
+            route_name = route_row["route_name"]
+        cursor.close()
+        stream_cursor = db.cursor(dictionary=True)
+
+        filename_parts = [parsed_date.isoformat(), target_city, normalized_meal or "all"]
+        if route_id is not None:
+            filename_parts.append(f"route-{route_id}")
+        filename = f"trip-sheet-{'-'.join(filename_parts)}.{format}"
+        title = (
+            f"Trip sheet {parsed_date.isoformat()} {target_city} {normalized_meal or 'All meals'}"
+        )
+
+        def _generate():
+            """Yield the rendered document, then close the cursor and connection."""
+            try:
+                stops = iter_trip_sheet_stops(
+                    stream_cursor,
+                    parsed_date,
+                    target_city,
+                    normalized_meal,
+                    route_id=route_id,
+                    route_name=route_name,
+                )
+                if format == "pdf":
+                    yield from stream_trip_sheet_pdf(stops, title)
+                else:
+                    yield from stream_trip_sheet_csv(stops)
+            finally:
+                stream_cursor.close()
+                db.close()
+
+        # Signal the outer finally not to close db — the generator handles cleanup.
+        _streaming = True
+        return StreamingResponse(
+            _generate(),
+            media_type="application/pdf" if format == "pdf" else "text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+    finally:
+        if not _streaming:
+            cursor.close()
+            db.close()
+
+
 @router.post("/api/logistics/trip-sheet/mark-delivered")
 def mark_trip_sheet_orders_delivered(
     payload: TripSheetBulkStatusRequest,
@@ -473,14 +902,17 @@ def mark_trip_sheet_orders_delivered(
 
     This bulk action is intended for admins completing daily delivery runs from
     the trip-sheet page. It updates both the orders table and the stored trip
-    sheet payload for the same date, city, and meal.
+    sheet payload for the same date, city, and meal. The deliverable order ids
+    are collected server-side into a temporary table and updated with a single
+    joined UPDATE.
 
     Args:
         payload: Service date, optional city_code, and optional meal_type.
         user: Current admin user (injected).
 
     Returns:
-        Dict with the service date, city_code, meal_type, and number of orders updated.
+        Dict with the service date, city_code, meal_type, number of orders
+        updated, and per-stage timings_ms.
     """
     parsed_date = _parse_optional_date(payload.date)
     if not parsed_date:
@@ -489,52 +921,54 @@ def mark_trip_sheet_orders_delivered(
     target_city = _resolve_city_context(payload.city_code, user)
     normalized_meal = _normalized_meal_type(payload.meal_type)
     meal_type = normalized_meal or None
+    timer = _StageTimer()
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_trip_sheets_table(db)
-        meal_filter_sql = ""
-        query_params: tuple = (parsed_date, target_city)
+        date_sql, date_params = _service_date_filter(parsed_date)
+        meal_join = ""
+        meal_params: tuple = ()
         if meal_type:
-            meal_filter_sql = """
-              AND EXISTS (
-                SELECT 1 FROM order_items oi_m
-                WHERE oi_m.order_id = o.order_id
-                  AND LOWER(oi_m.meal_type) = LOWER(%s)
-              )"""
-            query_params = (parsed_date, target_city, meal_type)
+            meal_join = (
+                "JOIN order_items oi_m ON oi_m.order_id = o.order_id "
+                "AND LOWER(oi_m.meal_type) = LOWER(%s)"
+            )
+            meal_params = (meal_type,)
+        closed_placeholders = ", ".join(["%s"] * len(_CLOSED_STATUS_KEYS))
+        _reset_order_id_table(cursor)
         cursor.execute(
             f"""
-            SELECT o.order_id, o.status
+            INSERT IGNORE INTO tmp_trip_sheet_orders (order_id)
+            SELECT o.order_id
               FROM orders o
               JOIN addresses a ON o.address_id = a.address_id
-             WHERE COALESCE(o.delivery_date, DATE(o.created_at)) = %s
+              {meal_join}
+             WHERE {date_sql}
                AND a.city_code = %s
-               {meal_filter_sql}
+               AND {_STATUS_KEY_SQL} NOT IN ({closed_placeholders})
             """,
-            query_params,
+            (*meal_params, *date_params, target_city, *_CLOSED_STATUS_KEYS),
         )
-        rows = cursor.fetchall() or []
-        deliverable_ids = [
-            int(row["order_id"])
-            for row in rows
-            if normalize_status_for_response(row.get("status")).lower()
-            not in {ORDER_STATUS_DELIVERED.lower(), "cancelled"}
-        ]
+        cursor.execute("SELECT order_id FROM tmp_trip_sheet_orders")
+        deliverable_ids = {int(row["order_id"]) for row in cursor.fetchall() or []}
+        timer.lap("select")
 
         updated_rows = 0
         if deliverable_ids:
-            placeholders = ", ".join(["%s"] * len(deliverable_ids))
             cursor.execute(
-                f"""
-                UPDATE orders
-                   SET status = %s
-                 WHERE order_id IN ({placeholders})
+                """
+                UPDATE orders o
+                  JOIN tmp_trip_sheet_orders t ON t.order_id = o.order_id
+                   SET o.status = %s
                 """,
-                (ORDER_STATUS_DELIVERED, *deliverable_ids),
+                (ORDER_STATUS_DELIVERED,),
             )
             updated_rows = cursor.rowcount
+            refresh_customer_city_summary(cursor, order_ids=deliverable_ids)
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_trip_sheet_orders")
+        timer.lap("status_update")
 
+        if deliverable_ids:
             cursor.execute(
                 """
                 SELECT trip_sheet_id, payload
@@ -545,47 +979,52 @@ def mark_trip_sheet_orders_delivered(
                 """,
                 (parsed_date, target_city, normalized_meal),
             )
-            for sheet_row in cursor.fetchall() or []:
+            sheet_row = cursor.fetchone()
+            payload_obj = None
+            if sheet_row:
                 raw_payload = sheet_row.get("payload")
                 payload_obj = (
                     json.loads(raw_payload) if isinstance(raw_payload, str) else raw_payload
                 )
-                if not isinstance(payload_obj, dict):
-                    continue
-                routes = payload_obj.get("routes")
-                if not isinstance(routes, list):
+            routes = payload_obj.get("routes") if isinstance(payload_obj, dict) else None
+            payload_changed = False
+            for route in routes if isinstance(routes, list) else []:
+                orders = route.get("orders")
+                if not isinstance(orders, list):
                     continue
-
-                payload_changed = False
-                for route in routes:
-                    orders = route.get("orders")
-                    if not isinstance(orders, list):
-                        continue
-                    for order in orders:
-                        order_id = order.get("order_id")
-                        if (
-                            order_id in deliverable_ids
-                            and order.get("status") != ORDER_STATUS_CANCELLED
-                        ):
-                            order["status"] = ORDER_STATUS_DELIVERED
-                            payload_changed = True
-
-                if payload_changed:
-                    cursor.execute(
-                        """
-                        UPDATE trip_sheets
-                           SET payload = CAST(%s AS JSON)
-                         WHERE trip_sheet_id = %s
-                        """,
-                        (json.dumps(payload_obj), sheet_row["trip_sheet_id"]),
-                    )
+                for order in orders:
+                    if (
+                        order.get("order_id") in deliverable_ids
+                        and order.get("status") != ORDER_STATUS_CANCELLED
+                    ):
+                        order["status"] = ORDER_STATUS_DELIVERED
+                        payload_changed = True
+            if payload_changed:
+                cursor.execute(
+                    """
+                    UPDATE trip_sheets
+                       SET payload = CAST(%s AS JSON)
+                     WHERE trip_sheet_id = %s
+                    """,
+                    (json.dumps(payload_obj), sheet_row["trip_sheet_id"]),
+                )
 
         db.commit()
+        timer.lap("persist")
+        logger.info(
+            "Marked %s trip-sheet orders delivered for %s %s %s: %s",
+            updated_rows,
+            parsed_date,
+            target_city,
+            normalized_meal or "all meals",
+            timer.timings,
+        )
         return {
             "date": parsed_date.isoformat(),
             "city_code": target_city,
             "meal_type": meal_type,
             "updated_orders": updated_rows,
+            "timings_ms": timer.timings,
         }
     except mysql.connector.Error as err:
         db.rollback()
@@ -603,14 +1042,21 @@ def generate_trip_sheet_report(
     """Generate a trip sheet grouped by delivery route for a given date and city.
 
     Validates that production has been finalized for all released meals before
-    generating. Updates qualifying order statuses to "Dispatched".
+    generating. Updates qualifying order statuses to "Dispatched". With
+    ``optimize`` each route's orders are put in an optimised stop sequence and
+    the route gets a ``distance_km`` estimate.
+
+    Runs as a fixed pipeline whatever the number of orders: one readiness
+    query, one orders-with-items query, one joined status UPDATE over a
+    temporary table of ids, and one ``trip_sheets`` upsert.
 
     Args:
-        payload: Date, optional city_code, and optional meal_type filter.
+        payload: Date, optional city_code, optional meal_type filter and optimize flag.
         user: Current admin user (injected).
 
     Returns:
-        Dict with date, city_code, meal_type, routes (with orders), status_updates, and generated_at.
+        Dict with date, city_code, meal_type, routes (with orders), status_updates, optimized,
+        generated_at, and per-stage timings_ms.
     """
     parsed_date = _parse_optional_date(payload.date)
     if not parsed_date:
@@ -618,141 +1064,35 @@ def generate_trip_sheet_report(
     target_city = _resolve_city_context(payload.city_code, user)
     normalized_meal = _normalized_meal_type(payload.meal_type)
     meal_type = normalized_meal or None
+    timer = _StageTimer()
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_delivery_routes_table(db)
-        _ensure_trip_sheets_table(db)
-        meals_requiring_production = (
-            [meal_type] if meal_type else get_food_meals_for_city(target_city)
-        )
-        if meals_requiring_production:
-            meal_placeholders = ", ".join(["%s"] * len(meals_requiring_production))
-            cursor.execute(
-                f"""
-                SELECT
-                    b.bld_type,
-                    MAX(COALESCE(m.is_released, 0)) AS is_released,
-                    MAX(COALESCE(m.is_production_generated, 0)) AS is_generated
-                  FROM bld b
-                  LEFT JOIN menu m
-                    ON m.bld_id = b.bld_id
-                   AND m.date = %s
-                   AND m.city_code = %s
-                 WHERE b.bld_type IN ({meal_placeholders})
-                 GROUP BY b.bld_type
-                """,
-                (parsed_date, target_city, *meals_requiring_production),
-            )
-            rows = cursor.fetchall() or []
-            missing = []
-            for row in rows:
-                meal = row["bld_type"]
-                released = bool(row.get("is_released"))
-                generated = bool(row.get("is_generated"))
-                if released and not generated:
-                    missing.append(meal)
-            if missing:
-                missing_label = ", ".join(missing)
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Generate kitchen production for {missing_label} before creating the trip sheet.",
-                )
-
-        meal_filter_sql = ""
-        orders_params: tuple = (parsed_date, target_city)
-        if meal_type:
-            meal_filter_sql = """
-              AND EXISTS (
-                SELECT 1 FROM order_items oi_m
-                WHERE oi_m.order_id = o.order_id
-                  AND LOWER(oi_m.meal_type) = LOWER(%s)
-              )"""
-            orders_params = (parsed_date, target_city, meal_type)
-        cursor.execute(
-            f"""
-            SELECT
-                o.order_id,
-                o.created_at,
-                o.total_price,
-                o.status,
-                o.payment_method,
-                o.paid,
-                c.customer_id,
-                c.name AS customer_name,
-                c.primary_mobile,
-                c.email,
-                a.address_id,
-                a.address_type,
-                a.house_apartment_no,
-                a.written_address,
-                a.city,
-                a.pin_code,
-                a.route_id,
-                dr.route_code,
-                dr.route_name,
-                dr.sort_order
-            FROM orders o
-            JOIN customers c ON o.customer_id = c.customer_id
-            JOIN addresses a ON o.address_id = a.address_id
-            LEFT JOIN delivery_routes dr ON dr.route_id = a.route_id
-           WHERE COALESCE(o.delivery_date, DATE(o.created_at)) = %s
-             AND a.city_code = %s
-             {meal_filter_sql}
-           ORDER BY COALESCE(dr.sort_order, 9999), COALESCE(dr.route_name, ''), c.name
-            """,
-            orders_params,
+        _ensure_production_ready(
+            cursor,
+            parsed_date,
+            target_city,
+            [meal_type] if meal_type else get_food_meals_for_city(target_city),
         )
-        rows = cursor.fetchall() or []
+        timer.lap("readiness")
 
-        order_items_map: Dict[int, List[Dict[str, Any]]] = {}
-        if rows:
-            order_ids = [row["order_id"] for row in rows]
-            id_placeholders = ", ".join(["%s"] * len(order_ids))
-            items_meal_filter = ""
-            items_params: tuple = tuple(order_ids)
-            if meal_type:
-                items_meal_filter = "AND LOWER(oi.meal_type) = LOWER(%s)"
-                items_params = (*order_ids, meal_type)
-            cursor.execute(
-                f"""
-                SELECT
-                    oi.order_id,
-                    oi.quantity,
-                    oi.price,
-                    oi.meal_type,
-                    COALESCE(i.name, co.combo_name) AS item_name
-                FROM order_items oi
-                LEFT JOIN items i ON oi.item_id = i.item_id
-                LEFT JOIN combos co ON oi.combo_id = co.combo_id
-                WHERE oi.order_id IN ({id_placeholders})
-                  {items_meal_filter}
-                ORDER BY oi.order_id, COALESCE(i.name, co.combo_name)
-                """,
-                items_params,
-            )
-            for item_row in cursor.fetchall() or []:
-                oid = item_row["order_id"]
-                qty = int(item_row.get("quantity") or 0)
-                price = float(item_row.get("price") or 0)
-                order_items_map.setdefault(oid, []).append(
-                    {
-                        "item_name": item_row.get("item_name") or "Item",
-                        "meal_type": item_row.get("meal_type"),
-                        "quantity": qty,
-                        "price": price,
-                        "line_total": round(qty * price, 2),
-                    }
-                )
+        rows = _fetch_trip_sheet_orders(cursor, parsed_date, target_city, meal_type)
+        timer.lap("orders")
 
         route_groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
         route_sort_order: Dict[str, int] = {}
+        route_refs: Dict[str, Dict[str, Any]] = {}
         updatable_statuses = {ORDER_STATUS_CONFIRMED.lower()}
         legacy_updatable_statuses = {"preparing", "processing"}
+        updatable_order_ids: List[int] = []
 
         for row in rows:
             route_label = row.get("route_name") or "Unassigned"
             route_sort_order.setdefault(route_label, int(row.get("sort_order") or 9999))
+            route_refs.setdefault(
+                route_label,
+                {"route_id": row.get("route_id"), "route_code": row.get("route_code")},
+            )
             normalized_display = normalize_status_for_response(row.get("status"))
             raw_status_key = (
                 str(row.get("status") or "").strip().lower().replace(" (payment due)", "")
@@ -762,6 +1102,7 @@ def generate_trip_sheet_report(
                 or raw_status_key in legacy_updatable_statuses
             ):
                 display_status = ORDER_STATUS_DISPATCHED
+                updatable_order_ids.append(int(row["order_id"]))
             else:
                 display_status = normalized_display
             route_groups[route_label].append(
@@ -784,51 +1125,52 @@ def generate_trip_sheet_report(
                         "city": row.get("city"),
                         "pin_code": row.get("pin_code"),
                     },
-                    "items": order_items_map.get(row["order_id"], []),
+                    "items": row["items"],
                 }
             )
+        timer.lap("build")
+
+        sequences: Dict[str, RouteSequence] = {}
+        if payload.optimize:
+            sequences = _sequence_route_groups(route_groups, {row["order_id"]: row for row in rows})
+            timer.lap("sequence")
 
-        updatable_order_ids = [
-            row["order_id"]
-            for row in rows
-            if normalize_status_for_response(row.get("status")).lower() in updatable_statuses
-            or str(row.get("status") or "").strip().lower().replace(" (payment due)", "")
-            in legacy_updatable_statuses
-        ]
         updated_rows = 0
         if updatable_order_ids:
-            id_ph = ", ".join(["%s"] * len(updatable_order_ids))
-            status_compare_expr = "LOWER(REPLACE(COALESCE(status, ''), ' (Payment Due)', ''))"
             previous_statuses = sorted(updatable_statuses | legacy_updatable_statuses)
             prev_ph = ", ".join(["%s"] * len(previous_statuses))
+            _load_order_id_table(cursor, updatable_order_ids)
             cursor.execute(
                 f"""
-                UPDATE orders
-                   SET status = %s
-                 WHERE order_id IN ({id_ph})
-                   AND {status_compare_expr} IN ({prev_ph})
+                UPDATE orders o
+                  JOIN tmp_trip_sheet_orders t ON t.order_id = o.order_id
+                   SET o.status = %s
+                 WHERE {_STATUS_KEY_SQL} IN ({prev_ph})
                 """,
-                (
-                    ORDER_STATUS_DISPATCHED,
-                    *updatable_order_ids,
-                    *previous_statuses,
-                ),
+                (ORDER_STATUS_DISPATCHED, *previous_statuses),
             )
             updated_rows = cursor.rowcount
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_trip_sheet_orders")
+            if updated_rows:
+                refresh_customer_city_summary(cursor, order_ids=updatable_order_ids)
+        timer.lap("status_update")
+
         routes_payload = []
         for route, orders in sorted(
             route_groups.items(),
             key=lambda entry: (route_sort_order.get(entry[0], 9999), entry[0].lower()),
         ):
             total_amount = sum(order["total_price"] for order in orders)
-            routes_payload.append(
-                {
-                    "route": route,
-                    "total_orders": len(orders),
-                    "total_amount": total_amount,
-                    "orders": orders,
-                }
-            )
+            route_payload = {
+                "route": route,
+                **route_refs.get(route, {"route_id": None, "route_code": None}),
+                "total_orders": len(orders),
+                "total_amount": total_amount,
+                "orders": orders,
+            }
+            if route in sequences:
+                route_payload["distance_km"] = sequences[route].distance_km
+            routes_payload.append(route_payload)
 
         response_payload = {
             "date": parsed_date.isoformat(),
@@ -836,6 +1178,7 @@ def generate_trip_sheet_report(
             "meal_type": meal_type,
             "routes": routes_payload,
             "status_updates": updated_rows,
+            "optimized": payload.optimize,
             "generated_at": datetime.utcnow().isoformat() + "Z",
         }
         cursor.execute(
@@ -854,7 +1197,20 @@ def generate_trip_sheet_report(
             ),
         )
         db.commit()
-        return response_payload
+        timer.lap("persist")
+        logger.info(
+            "Generated trip sheet for %s %s %s: %s orders, %s dispatched, %s",
+            parsed_date,
+            target_city,
+            normalized_meal or "all meals",
+            len(rows),
+            updated_rows,
+            timer.timings,
+        )
+        return {**response_payload, "timings_ms": timer.timings}
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
         db.close()
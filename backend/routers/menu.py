@@ -2,35 +2,43 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 from collections import defaultdict
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 import mysql.connector
 from mysql.connector import errorcode
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
 from ..db import get_raw_db
 from ..city_config import DEFAULT_CITY, normalize_city_code
 from ..utils.auth_deps import get_optional_user
+from ..utils.catalog import etag_response, get_catalog_snapshot
+from ..utils.customer_summary import refresh_customer_city_summary
+from ..utils.order_history import delete_orders, touch_orders
 from ..utils.helpers import (
     CONDIMENTS_BLD_TYPE,
     MENU_TYPE_ONE_DAY,
     MENU_TYPE_CONDIMENTS,
     MENU_TYPE_SUBSCRIPTION,
     _is_condiment_from_blds,
-    attach_bld_ids,
-    attach_plated_flags,
-    attach_combo_bld_ids,
     resolve_bld_id,
     normalize_meal_type,
     normalize_menu_type,
     ensure_menu_allowed,
     resolve_delivers_by_value,
-    filter_items_by_bld,
     _resolve_city_context,
 )
 from ..utils.logger import log_admin_action
+from ..utils.stock_watcher import LOW_STOCK_RATIO, stock_watcher
+from ..utils.subscription_snapshots import (
+    invalidate_customer_snapshots,
+    invalidate_menu_snapshots,
+    rebuild_subscription_snapshots,
+)
 
 router = APIRouter()
 
@@ -301,197 +309,49 @@ def _get_daily_menu_internal(
 
 @router.get("/api/menu/available-items")
 def get_available_items(
+    request: Request,
     bld_type: str = Query(..., description="BLD type: Breakfast, Lunch, Dinner, Condiments"),
     include_combos: bool = Query(
         False,
         description="When true, includes combo products mapped to the selected meal",
     ),
-) -> List[Dict[str, Any]]:
+) -> Response:
     """Return all available items for a given meal type.
 
+    Served from the per-worker catalog snapshot; the response carries an ETag
+    and a matching If-None-Match yields 304.
+
     Args:
+        request: Incoming request (for If-None-Match).
         bld_type: BLD type to filter items by (Breakfast, Lunch, Dinner, Condiments).
         include_combos: When true, also includes combo products for the meal.
 
     Returns:
-        List of item dicts with bld_ids, is_combo, is_plated flags.
+        JSON list of item dicts with bld_ids, is_combo, is_plated flags.
     """
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        bld_id = resolve_bld_id(cursor, bld_type)
-
-        canonical_meal = normalize_meal_type(bld_type)
-        query = """
-            SELECT
-                i.item_id,
-                i.name,
-                i.description,
-                i.alias,
-                i.category_id,
-                cat.category_name,
-                i.component_type_id,
-                ct.name AS component_type_name,
-                i.uom_customer,
-                i.uom_customer AS uom,
-                i.unit_packing,
-                i.uom_packing,
-                i.hsn_code,
-                i.uom_production,
-                i.packing_to_production_rate,
-                i.buffer_percentage,
-                i.max_qty_breakfast,
-                i.max_qty_lunch,
-                i.max_qty_dinner,
-                i.max_qty_condiments,
-                i.picture_url,
-                i.breakfast_price,
-                i.lunch_price,
-                i.dinner_price,
-                i.condiments_price,
-                i.festival_price,
-                i.cgst,
-                i.sgst,
-                i.igst,
-                i.net_price
-            FROM items i
-            LEFT JOIN categories cat ON i.category_id = cat.category_id
-            LEFT JOIN component_types ct ON i.component_type_id = ct.component_type_id
-            WHERE EXISTS (
-                SELECT 1
-                  FROM item_bld_map map
-                 WHERE map.item_id = i.item_id
-                   AND map.bld_id = %s
-            )
-        """
-        legacy_mode = False
-        try:
-            cursor.execute(query, (bld_id,))
-            items = cursor.fetchall()
-        except mysql.connector.Error as err:
-            if err.errno == errorcode.ER_BAD_FIELD_ERROR:
-                legacy_mode = True
-                legacy_query = """
-                    SELECT
-                        i.item_id,
-                        i.name,
-                        i.description,
-                        i.alias,
-                        i.category_id,
-                        cat.category_name,
-                        i.component_type_id,
-                        ct.name AS component_type_name,
-                        i.uom_customer,
-                        i.uom_customer AS uom,
-                        i.unit_packing,
-                        i.uom_packing,
-                        i.hsn_code,
-                        i.uom_production,
-                        i.packing_to_production_rate,
-                        i.buffer_percentage,
-                        i.max_qty,
-                        i.max_qty AS max_qty_condiments,
-                        i.picture_url,
-                        i.breakfast_price,
-                        i.lunch_price,
-                        i.dinner_price,
-                        i.condiments_price,
-                        i.festival_price,
-                        i.cgst,
-                        i.sgst,
-                        i.igst,
-                        i.net_price
-                    FROM items i
-                    LEFT JOIN categories cat ON i.category_id = cat.category_id
-                    LEFT JOIN component_types ct ON i.component_type_id = ct.component_type_id
-                    WHERE EXISTS (
-                        SELECT 1
-                          FROM item_bld_map map
-                         WHERE map.item_id = i.item_id
-                           AND map.bld_id = %s
-                    )
-                """
-                cursor.execute(legacy_query, (bld_id,))
-                items = cursor.fetchall()
-            else:
-                raise
-
-        if legacy_mode:
-            for item in items:
-                legacy_value = item.pop("max_qty", None)
-                item["max_qty_breakfast"] = legacy_value
-                item["max_qty_lunch"] = legacy_value
-                item["max_qty_dinner"] = legacy_value
-                item["max_qty_condiments"] = item.get("max_qty_condiments", legacy_value)
-
-        attach_bld_ids(cursor, items)
-        attach_plated_flags(cursor, items)
-        filtered_items = filter_items_by_bld(items, bld_id)
-
-        if not include_combos:
-            return filtered_items
-
-        cursor.execute(
-            """
-            SELECT
-                c.combo_id,
-                c.combo_name AS name,
-                NULL AS description,
-                NULL AS alias,
-                c.category_id,
-                cat.category_name,
-                NULL AS component_type_id,
-                NULL AS component_type_name,
-                'combo' AS uom_customer,
-                'combo' AS uom,
-                1 AS unit_packing,
-                'combo' AS uom_packing,
-                NULL AS hsn_code,
-                'combo' AS uom_production,
-                1 AS packing_to_production_rate,
-                NULL AS buffer_percentage,
-                NULL AS max_qty_breakfast,
-                NULL AS max_qty_lunch,
-                NULL AS max_qty_dinner,
-                NULL AS max_qty_condiments,
-                NULL AS picture_url,
-                c.price AS breakfast_price,
-                c.price AS lunch_price,
-                c.price AS dinner_price,
-                NULL AS condiments_price,
-                c.price AS festival_price,
-                NULL AS cgst,
-                NULL AS sgst,
-                NULL AS igst,
-                c.price AS net_price,
-                1 AS is_combo
-            FROM combos c
-            LEFT JOIN categories cat ON c.category_id = cat.category_id
-            WHERE EXISTS (
-                SELECT 1
-                  FROM combo_bld_map cbm
-                 WHERE cbm.combo_id = c.combo_id
-                   AND cbm.bld_id = %s
-            )
-            ORDER BY c.combo_name ASC
-            """,
-            (bld_id,),
-        )
-        combos = cursor.fetchall() or []
-        attach_combo_bld_ids(cursor, combos)
-        for combo in combos:
-            combo["item_id"] = None
-            combo["is_plated"] = False
-            combo["is_condiment"] = False
-
-        return [*filtered_items, *combos]
-
+        snapshot = get_catalog_snapshot(cursor)
     except mysql.connector.Error as err:
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
         db.close()
 
+    bld_id = snapshot.bld_id_for(bld_type)
+    if bld_id is None:
+        raise HTTPException(status_code=404, detail="BLD type not found")
+
+    def build() -> List[Dict[str, Any]]:
+        items = snapshot.list_items(bld_id=bld_id, include_plated=True)
+        if not include_combos:
+            return items
+        return [*items, *snapshot.list_combos(bld_id)]
+
+    etag, body = snapshot.rendered(("available", bld_id, include_combos), build)
+    return etag_response(request, etag, body)
+
 
 @router.get("/api/menu/low-stock-alerts")
 def get_low_stock_alerts(
@@ -541,6 +401,54 @@ def get_low_stock_alerts(
         db.close()
 
 
+@router.get("/api/menu/low-stock-alerts/stream")
+async def stream_low_stock_alerts(
+    request: Request,
+    city_code: Optional[str] = Query(None),
+    threshold: float = Query(
+        LOW_STOCK_RATIO, gt=0, le=1, description="Alert when available_qty <= max_qty * threshold"
+    ),
+    user: Optional[Dict[str, Any]] = Depends(get_optional_user),
+) -> StreamingResponse:
+    """Stream low-stock, sold-out and recovered events for today's menu over SSE.
+
+    New clients first receive the current low-stock set; clients reconnecting
+    with ``Last-Event-ID`` receive the alerts they missed from the watcher's
+    ring buffer instead. A comment line is sent every 15s as a keep-alive.
+
+    Args:
+        request: Incoming request (used for Last-Event-ID and disconnect checks).
+        city_code: City to watch; falls back to the authenticated user's city.
+        threshold: Alert threshold as a fraction of max_qty.
+        user: Optional authenticated user (injected).
+
+    Returns:
+        ``text/event-stream`` response of ``stock`` events.
+    """
+    resolved_city = _resolve_city_context(city_code, user)
+    raw_last_id = request.headers.get("last-event-id")
+    last_event_id = int(raw_last_id) if raw_last_id and raw_last_id.isdigit() else None
+    subscriber = await stock_watcher.subscribe(resolved_city, threshold, last_event_id)
+
+    async def event_source() -> AsyncGenerator[str, None]:
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['seq']}\nevent: stock\ndata: {json.dumps(event)}\n\n"
+        finally:
+            stock_watcher.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/api/menu")
 def get_daily_menu(
     date: Optional[str] = Query(None, description="Date in YYYY-MM-DD"),
@@ -893,6 +801,7 @@ def upsert_daily_menu(payload: DailyMenuPayload) -> Dict[str, Any]:
                 _validate_subscription_groups_for_daily_menu(validation_cursor, menu_id)
             finally:
                 validation_cursor.close()
+            invalidate_menu_snapshots(cursor, menu_id)
 
         db.commit()
         action = "ADD" if existing is None else "UPDATE"
@@ -1171,6 +1080,7 @@ def release_menu(menu_id: int) -> Dict[str, Any]:
         _validate_combo_generic_components(cursor, menu_id)
 
         cursor.execute("UPDATE menu SET is_released = 1 WHERE menu_id = %s", (menu_id,))
+        invalidate_menu_snapshots(cursor, menu_id)
         db.commit()
         log_admin_action(
             db,
@@ -1207,6 +1117,7 @@ def unrelease_menu(menu_id: int) -> Dict[str, Any]:
             raise HTTPException(status_code=404, detail="Menu not found")
 
         cursor.execute("UPDATE menu SET is_released = 0 WHERE menu_id = %s", (menu_id,))
+        invalidate_menu_snapshots(cursor, menu_id)
         db.commit()
         log_admin_action(
             db,
@@ -1260,8 +1171,6 @@ def resolve_subscriptions_for_menu(
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_subscription_pause_table(cursor)
-
         # 1. Fetch menu metadata
         cursor.execute(
             """
@@ -1311,10 +1220,11 @@ def resolve_subscriptions_for_menu(
             }
 
         # 3. If force: restore available_qty and delete existing subscription_daily orders
+        ordered_customer_ids: List[int] = []
         if existing_count > 0 and payload.force:
             cursor.execute(
                 """
-                SELECT DISTINCT o.order_id
+                SELECT DISTINCT o.order_id, o.customer_id
                   FROM orders o
                   JOIN addresses a ON a.address_id = o.address_id
                   JOIN order_items oi ON oi.order_id = o.order_id
@@ -1325,7 +1235,9 @@ def resolve_subscriptions_for_menu(
                 """,
                 (menu_date, bld_type, city_code),
             )
-            old_order_ids = [r["order_id"] for r in cursor.fetchall()]
+            old_orders = cursor.fetchall()
+            old_order_ids = [r["order_id"] for r in old_orders]
+            ordered_customer_ids.extend(r["customer_id"] for r in old_orders)
             if old_order_ids:
                 fmt = ",".join(["%s"] * len(old_order_ids))
                 # Restore available_qty
@@ -1339,12 +1251,7 @@ def resolve_subscriptions_for_menu(
                     """,
                     tuple(old_order_ids),
                 )
-                cursor.execute(
-                    f"DELETE FROM order_items WHERE order_id IN ({fmt})", tuple(old_order_ids)
-                )
-                cursor.execute(
-                    f"DELETE FROM orders WHERE order_id IN ({fmt})", tuple(old_order_ids)
-                )
+                delete_orders(cursor, old_order_ids)
 
         # 4. Build component_type_id → (menu_item_id, item_id, rate) map from today's menu
         cursor.execute(
@@ -1476,10 +1383,15 @@ def resolve_subscriptions_for_menu(
                     (line["quantity"], line["menu_item_id"]),
                 )
                 items_resolved += 1
+            touch_orders(cursor, [new_order_id])
 
             orders_created += 1
+            ordered_customer_ids.append(sub["customer_id"])
 
+        refresh_customer_city_summary(cursor, customer_ids=ordered_customer_ids)
+        rebuild_subscription_snapshots(cursor, menu_date, city_code)
         db.commit()
+        stock_watcher.notify_changed(db, menu_id=menu_id)
         return {
             "already_resolved": False,
             "existing_count": 0,
@@ -1495,50 +1407,6 @@ def resolve_subscriptions_for_menu(
         db.close()
 
 
-def _ensure_subscription_pause_table(cursor) -> None:
-    """Create the subscription pause table if the deployment has not run migrations yet.
-
-    Args:
-        cursor: Active MySQL cursor.
-    """
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS subscription_pause_windows (
-            pause_id INT NOT NULL AUTO_INCREMENT,
-            customer_id INT NOT NULL,
-            order_id INT NULL,
-            city_code VARCHAR(3) NOT NULL,
-            meal_type VARCHAR(20) NULL,
-            start_date DATE NOT NULL,
-            end_date DATE NOT NULL,
-            reason VARCHAR(255) NULL,
-            is_active TINYINT(1) NOT NULL DEFAULT 1,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            PRIMARY KEY (pause_id),
-            KEY idx_subscription_pause_city_dates (city_code, start_date, end_date),
-            KEY idx_subscription_pause_customer (customer_id),
-            KEY idx_subscription_pause_order (order_id),
-            CONSTRAINT fk_subscription_pause_customer
-                FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
-                ON DELETE CASCADE
-        )
-        """
-    )
-    cursor.execute("SHOW COLUMNS FROM subscription_pause_windows LIKE 'order_id'")
-    if cursor.fetchone() is None:
-        cursor.execute(
-            "ALTER TABLE subscription_pause_windows ADD COLUMN order_id INT NULL AFTER customer_id"
-        )
-    cursor.execute(
-        "SHOW INDEX FROM subscription_pause_windows WHERE Key_name = 'idx_subscription_pause_order'"
-    )
-    if cursor.fetchone() is None:
-        cursor.execute(
-            "CREATE INDEX idx_subscription_pause_order ON subscription_pause_windows (order_id)"
-        )
-
-
 @router.get("/api/subscription-pauses")
 def list_subscription_pauses(
     city_code: Optional[str] = Query(None, alias="city_code"),
@@ -1561,7 +1429,6 @@ def list_subscription_pauses(
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_subscription_pause_table(cursor)
         where = ["spw.city_code = %s"]
         params: List[Any] = [resolved_city]
         if customer_id is not None:
@@ -1624,7 +1491,6 @@ def create_subscription_pause(payload: SubscriptionPausePayload) -> Dict[str, An
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_subscription_pause_table(cursor)
         city_code = normalize_city_code(payload.city_code or DEFAULT_CITY)
         cursor.execute(
             """
@@ -1674,6 +1540,7 @@ def create_subscription_pause(payload: SubscriptionPausePayload) -> Dict[str, An
             ),
         )
         pause_id = int(cursor.lastrowid)
+        invalidate_customer_snapshots(cursor, [payload.customer_id])
         db.commit()
         log_admin_action(
             db,
@@ -1706,7 +1573,6 @@ def update_subscription_pause(pause_id: int, payload: SubscriptionPausePayload)
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        _ensure_subscription_pause_table(cursor)
         city_code = normalize_city_code(payload.city_code or DEFAULT_CITY)
         if payload.end_date < payload.start_date:
             raise HTTPException(status_code=400, detail="end_date must be on or after start_date")
@@ -1726,9 +1592,11 @@ def update_subscription_pause(pause_id: int, payload: SubscriptionPausePayload)
         if not cursor.fetchone():
             raise HTTPException(status_code=400, detail="Subscription order not found")
         cursor.execute(
-            "SELECT pause_id FROM subscription_pause_windows WHERE pause_id = %s", (pause_id,)
+            "SELECT pause_id, customer_id FROM subscription_pause_windows WHERE pause_id = %s",
+            (pause_id,),
         )
-        if not cursor.fetchone():
+        existing_pause = cursor.fetchone()
+        if not existing_pause:
             raise HTTPException(status_code=404, detail="Pause window not found")
         cursor.execute(
             """
@@ -1752,6 +1620,7 @@ def update_subscription_pause(pause_id: int, payload: SubscriptionPausePayload)
                 pause_id,
             ),
         )
+        invalidate_customer_snapshots(cursor, [existing_pause["customer_id"], payload.customer_id])
         db.commit()
         return {"status": "updated", "pause_id": pause_id}
     except mysql.connector.Error as err:
@@ -1775,13 +1644,18 @@ def resume_subscription_pause(pause_id: int) -> Dict[str, Any]:
     db = get_raw_db()
     cursor = db.cursor()
     try:
-        _ensure_subscription_pause_table(cursor)
         cursor.execute(
-            "UPDATE subscription_pause_windows SET is_active = 0 WHERE pause_id = %s",
+            "SELECT customer_id FROM subscription_pause_windows WHERE pause_id = %s",
             (pause_id,),
         )
-        if cursor.rowcount == 0:
+        pause_row = cursor.fetchone()
+        if pause_row is None:
             raise HTTPException(status_code=404, detail="Pause window not found")
+        cursor.execute(
+            "UPDATE subscription_pause_windows SET is_active = 0 WHERE pause_id = %s",
+            (pause_id,),
+        )
+        invalidate_customer_snapshots(cursor, [pause_row[0]])
         db.commit()
         return {"status": "resumed", "pause_id": pause_id}
     except mysql.connector.Error as err:
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import time
 from collections import defaultdict, deque
-from typing import Deque, Dict
+from typing import Any, Deque, Dict, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel, Field
@@ -10,7 +10,9 @@ from sqlalchemy.orm import Session
 
 from ..database import get_db
 from ..nl import get_service
+from ..nl.snapshot import reload_service
 from ..nl.sql_service import SQLGenerationService
+from ..utils.auth_deps import admin_required, get_optional_user
 
 router = APIRouter(prefix="/api/nl", tags=["Natural Language"])
 
@@ -40,16 +42,21 @@ def _enforce_rate_limit(identifier: str) -> None:
     bucket.append(now)
 
 
+def _city_code(user: Optional[Dict[str, Any]]) -> Optional[str]:
+    return user.get("city_code") if user else None
+
+
 @router.post("/route")
 def route_nl_query(
     payload: NLQuery,
     request: Request,
     db: Session = Depends(get_db),
+    user: Optional[Dict[str, Any]] = Depends(get_optional_user),
 ):
     identifier = request.client.host if request.client else "anonymous"
     _enforce_rate_limit(identifier)
     service = get_service()
-    return service.interpret(payload.q, db)
+    return service.interpret(payload.q, db, city_code=_city_code(user))
 
 
 @router.get("/route")
@@ -57,11 +64,49 @@ def route_nl_query_get(
     request: Request,
     q: str = Query(..., min_length=1, max_length=500),
     db: Session = Depends(get_db),
+    user: Optional[Dict[str, Any]] = Depends(get_optional_user),
 ):
     identifier = request.client.host if request.client else "anonymous"
     _enforce_rate_limit(identifier)
     service = get_service()
-    return service.interpret(q, db)
+    return service.interpret(q, db, city_code=_city_code(user))
+
+
+@router.get("/route/cache-stats")
+def route_cache_stats(_: Dict[str, Any] = Depends(admin_required)) -> Dict[str, Any]:
+    """Return this worker's NL result cache size, hit rate and invalidation counters."""
+    return get_service().cache_stats()
+
+
+@router.get("/sql/cache-stats")
+def sql_cache_stats(_: Dict[str, Any] = Depends(admin_required)) -> Dict[str, Any]:
+    """Return this worker's NL→SQL cache size and memory/disk hit counters."""
+    return _sql_service.cache_stats()
+
+
+@router.get("/registry")
+def registry_info(_: Dict[str, Any] = Depends(admin_required)) -> Dict[str, Any]:
+    """Return the version, origin and size of this worker's intent registry."""
+    return get_service().registry_info()
+
+
+@router.post("/registry/reload")
+def reload_registry(
+    force: bool = Query(False, description="Recompile even if the sources are unchanged"),
+    _: Dict[str, Any] = Depends(admin_required),
+) -> Dict[str, Any]:
+    """Recompile the intent registry and swap it in without a restart.
+
+    Only the worker serving the request reloads; with several workers set
+    ``NL_REGISTRY_WATCH_SEC`` so each picks up changes itself.  On a
+    compilation error the running registry is kept and a 422 is returned.
+    """
+    service = get_service()
+    try:
+        result = reload_service(service, force=force)
+    except Exception as exc:
+        raise HTTPException(status_code=422, detail=f"Registry not reloaded: {exc}") from exc
+    return {**result, **service.registry_info()}
 
 
 @router.post("/sql")
@@ -12,9 +12,12 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+from ..city_config import normalize_city_code
 from ..db import get_raw_db
+from ..customer.customer_search import customer_match_sql
 from ..utils.auth_deps import admin_required
 from ..utils.helpers import (
+    ORDER_STATUS_CANCELLED,
     ORDER_STATUS_CONFIRMED,
     _format_datetime,
     _parse_optional_date,
@@ -24,6 +27,17 @@ from ..utils.helpers import (
     normalize_order_status,
     payment_status_label,
 )
+from ..utils.customer_summary import refresh_customer_city_summary
+from ..utils.order_history import touch_orders
+from ..utils.discounts import (
+    AUTO_SELECT_DEFAULT,
+    CartLine,
+    claim_code_use,
+    evaluate_cart,
+    get_discount_index,
+)
+from ..utils.stock_watcher import stock_watcher
+from ..utils.subscription_snapshots import invalidate_customer_snapshots
 
 router = APIRouter()
 
@@ -55,6 +69,7 @@ class CreateOrderPayload(BaseModel):
     order_type: Optional[str] = None
     discount_code: Optional[str] = None
     coupon_codes: Optional[List[str]] = None
+    auto_discount: Optional[bool] = None
 
     def effective_discount_code(self) -> Optional[str]:
         """Return the submitted discount code, including legacy coupon payloads.
@@ -73,8 +88,12 @@ class OrderQuotePayload(BaseModel):
     """Payload for getting a price quote before placing an order."""
 
     items: List[OrderItemPayload]
+    customer_id: Optional[int] = None
+    address_id: Optional[int] = None
+    city_code: Optional[str] = None
     discount_code: Optional[str] = None
     coupon_codes: Optional[List[str]] = None
+    auto_discount: Optional[bool] = None
 
     def effective_discount_code(self) -> Optional[str]:
         """Return the submitted discount code, including legacy coupon payloads.
@@ -106,96 +125,6 @@ class OrderPaymentUpdate(BaseModel):
 # ---------------------------------------------------------------------------
 
 
-def _load_discount_code(cursor, code_str: Optional[str]) -> Optional[Dict[str, Any]]:
-    """Validate a discount code and return it with its conditions.
-
-    Args:
-        cursor: DB cursor.
-        code_str: The code string the customer entered.
-
-    Returns:
-        Dict with code row + 'conditions' list, or None if no code provided.
-
-    Raises:
-        HTTPException 400 if code is invalid, expired, inactive, or exhausted.
-    """
-    if not code_str:
-        return None
-    normalized = code_str.strip().upper()
-    if not normalized:
-        return None
-
-    cursor.execute(
-        "SELECT * FROM discount_codes "
-        "WHERE code = %s AND is_active = 1 "
-        "AND from_date <= CURDATE() AND (to_date IS NULL OR to_date >= CURDATE())",
-        (normalized,),
-    )
-    row = cursor.fetchone()
-    if not row:
-        raise HTTPException(
-            status_code=400, detail=f"Invalid or expired discount code: {normalized}"
-        )
-
-    if row["max_uses"] is not None and row["use_count"] >= row["max_uses"]:
-        raise HTTPException(
-            status_code=400, detail=f"Discount code {normalized} has reached its usage limit"
-        )
-
-    cursor.execute(
-        "SELECT * FROM discount_code_conditions WHERE code_id = %s",
-        (row["code_id"],),
-    )
-    row["conditions"] = cursor.fetchall() or []
-    return row
-
-
-def _item_matches_code(
-    cursor,
-    item: "OrderItemPayload",
-    code: Dict[str, Any],
-) -> bool:
-    """Check whether an order item qualifies for the discount code.
-
-    A code with no conditions applies to all items (global).
-    Otherwise any single matching condition fires the discount (OR logic).
-
-    Args:
-        cursor: DB cursor.
-        item: The order item being evaluated.
-        code: Discount code dict with nested conditions list.
-
-    Returns:
-        True if the discount should apply to this item.
-    """
-    conditions = code.get("conditions") or []
-    if not conditions:
-        return True  # no conditions = global
-
-    item_id = item.item_id
-    meal_type = (item.meal_type or "").lower()
-
-    # Lazy-fetch category_id only if a category condition exists
-    category_id: Optional[int] = None
-    needs_category = any(c["dimension"] == "category" for c in conditions)
-    if needs_category and item_id is not None:
-        cursor.execute("SELECT category_id FROM items WHERE item_id = %s LIMIT 1", (item_id,))
-        r = cursor.fetchone()
-        category_id = r["category_id"] if r else None
-
-    for cond in conditions:
-        dim = cond["dimension"]
-        if dim == "global":
-            return True
-        if dim == "item" and item_id is not None and cond["entity_id"] == item_id:
-            return True
-        if dim == "category" and category_id is not None and cond["entity_id"] == category_id:
-            return True
-        if dim == "meal_type" and meal_type and (cond["entity_label"] or "").lower() == meal_type:
-            return True
-    return False
-
-
 def _load_tax_amounts(cursor, discounted_subtotal: float) -> tuple[float, float]:
     """Load CGST and SGST tax percentages and compute tax amounts.
 
@@ -233,45 +162,60 @@ def _load_tax_amounts(cursor, discounted_subtotal: float) -> tuple[float, float]
     return cgst_amount, sgst_amount
 
 
-def _resolve_original_price(cursor, item: "OrderItemPayload") -> float:
-    """Resolve the full (undiscounted) unit price for an order item from menu_items.rate.
+def _resolve_original_prices(cursor, items: List["OrderItemPayload"]) -> List[float]:
+    """Resolve the full (undiscounted) unit price for every order line from menu_items.rate.
+
+    All referenced menu items are read in one query; lines without a
+    menu_item_id (or with an unknown one) keep the submitted price.
 
     Args:
         cursor: DB cursor.
-        item: Order item payload.
+        items: Order item payloads.
 
     Returns:
-        Full unit price (never discounted — menus always carry undiscounted rates).
+        Full unit prices in line order (never discounted — menus always carry undiscounted rates).
     """
-    if item.menu_item_id is not None:
+    menu_item_ids = sorted({item.menu_item_id for item in items if item.menu_item_id is not None})
+    rates: Dict[int, float] = {}
+    if menu_item_ids:
         cursor.execute(
-            "SELECT rate FROM menu_items WHERE menu_item_id = %s",
-            (item.menu_item_id,),
+            f"SELECT menu_item_id, rate FROM menu_items "
+            f"WHERE menu_item_id IN ({', '.join(['%s'] * len(menu_item_ids))})",
+            tuple(menu_item_ids),
         )
-        row = cursor.fetchone()
-        if row:
+        for row in cursor.fetchall() or []:
             if isinstance(row, dict):
-                return float(row["rate"])
-            return float(row[0])
-    return item.price
+                rates[int(row["menu_item_id"])] = float(row["rate"])
+            else:
+                rates[int(row[0])] = float(row[1])
+    return [rates.get(item.menu_item_id, item.price) for item in items]
 
 
 def _compute_order_totals(
-    cursor, items: List[OrderItemPayload], discount_code: Optional[str]
+    cursor,
+    items: List[OrderItemPayload],
+    discount_code: Optional[str],
+    city_code: Optional[str] = None,
+    auto_discount: Optional[bool] = None,
 ) -> Dict[str, Any]:
-    """Compute order totals with per-item discount code resolution.
+    """Compute order totals with per-item discount resolution.
 
-    Discounts are applied per item: only items matching the code's conditions
-    get the discount. Items that don't match pay full price.
+    Discounts are applied per item from the compiled discount index: an
+    entered code always applies (with auto selection and no entered code, the
+    best unlimited code of the city is picked), and each line gets the better
+    of that code's pct and its item discount.
 
     Args:
         cursor: DB cursor.
         items: List of order item payloads.
         discount_code: Optional discount code string entered by the customer.
+        city_code: City whose codes and item discounts are considered.
+        auto_discount: Override for automatic best-discount selection.
 
     Returns:
         Dict with subtotal, discount, cgst, sgst, total_price, discount_code,
-        resolved_prices, original_prices, and applied_discount_pcts per item.
+        resolved_prices, original_prices, applied_discount_pcts and
+        applied_discount_sources per item.
     """
     for index, item in enumerate(items):
         has_item = item.item_id is not None
@@ -284,19 +228,32 @@ def _compute_order_totals(
                 detail=f"items[{index}] must include exactly one of item_id or combo_id",
             )
 
-    code = _load_discount_code(cursor, discount_code)
-    original_prices = [_resolve_original_price(cursor, item) for item in items]
+    original_prices = _resolve_original_prices(cursor, items)
+    evaluation = evaluate_cart(
+        cursor,
+        get_discount_index(cursor),
+        [
+            CartLine(
+                item_id=item.item_id,
+                meal_type=(item.meal_type or "").lower(),
+                unit_price=original,
+                quantity=item.quantity,
+            )
+            for original, item in zip(original_prices, items)
+        ],
+        normalize_city_code(city_code),
+        entered_code=discount_code,
+        auto_select=AUTO_SELECT_DEFAULT if auto_discount is None else auto_discount,
+    )
+    code = evaluation.code
 
     resolved_prices: List[float] = []
-    applied_pcts: List[Optional[float]] = []
-    for original, item in zip(original_prices, items):
-        if code and _item_matches_code(cursor, item, code):
-            pct = float(code["discount_pct"])
+    applied_pcts = evaluation.line_pcts
+    for original, pct in zip(original_prices, applied_pcts):
+        if pct:
             resolved_prices.append(round(original * (1 - pct / 100), 2))
-            applied_pcts.append(pct)
         else:
             resolved_prices.append(original)
-            applied_pcts.append(None)
 
     subtotal = sum(p * item.quantity for p, item in zip(original_prices, items))
     discounted_subtotal = sum(p * item.quantity for p, item in zip(resolved_prices, items))
@@ -312,11 +269,13 @@ def _compute_order_totals(
         "sgst": round(sgst_amount, 2),
         "delivery_charge": round(delivery_charge, 2),
         "total_price": round(total_price, 2),
-        "discount_code": code["code"] if code else None,
-        "discount_code_id": code["code_id"] if code else None,
+        "discount_code": code.code if code else None,
+        "discount_code_id": code.code_id if code else None,
+        "discount_auto_selected": evaluation.auto_selected,
         "resolved_prices": resolved_prices,
         "original_prices": original_prices,
         "applied_discount_pcts": applied_pcts,
+        "applied_discount_sources": evaluation.line_sources,
     }
 
 
@@ -334,7 +293,7 @@ def _apply_order_filters(
         base_where: Mutable list of WHERE clause strings to append to.
         params: Mutable list of query params to append to.
         status: Status string to filter by (or None for all).
-        customer: Customer name/phone substring to filter by.
+        customer: Customer search text, matched by ``customer_match_sql``.
         product: Product name substring to filter by.
         meal_type: Meal type string to filter by.
     """
@@ -343,10 +302,12 @@ def _apply_order_filters(
         if normalized and normalized != "all":
             base_where.append("LOWER(REPLACE(COALESCE(o.status, ''), ' (Payment Due)', '')) = %s")
             params.append(normalized)
-    if customer:
-        term = f"%{customer.strip()}%"
-        base_where.append("(c.name LIKE %s OR c.primary_mobile LIKE %s)")
-        params.extend([term, term])
+    match = customer_match_sql(customer)
+    if match is not None:
+        # Orders are already scoped to the city; match customers anywhere.
+        match_sql, match_params = match
+        base_where.append(f"o.customer_id IN (SELECT m.customer_id FROM ({match_sql}) m)")
+        params.extend(match_params)
     if product:
         term = f"%{product.strip()}%"
         base_where.append("i.name LIKE %s")
@@ -362,6 +323,36 @@ def _apply_order_filters(
             params.append(canonical_meal.lower())
 
 
+def _resolve_order_address(
+    cursor, customer_id: int, address_id: Optional[int]
+) -> Optional[Dict[str, Any]]:
+    """Return the address an order for ``customer_id`` will be delivered to.
+
+    Uses ``address_id`` when it is an active address of the customer, otherwise
+    the customer's active default address.
+
+    Args:
+        cursor: Dictionary cursor.
+        customer_id: Customer placing the order.
+        address_id: Address chosen in the cart, if any.
+
+    Returns:
+        Row with address_id and city_code, or None when the customer has no usable address.
+    """
+    cursor.execute(
+        "SELECT address_id, city_code FROM addresses WHERE address_id=%s AND customer_id=%s AND is_active=1 LIMIT 1",
+        (address_id if address_id is not None else 0, customer_id),
+    )
+    address_row = cursor.fetchone()
+    if address_row is None:
+        cursor.execute(
+            "SELECT address_id, city_code FROM addresses WHERE customer_id=%s AND is_default=1 AND is_active=1 LIMIT 1",
+            (customer_id,),
+        )
+        address_row = cursor.fetchone()
+    return address_row
+
+
 # ---------------------------------------------------------------------------
 # Endpoints
 # ---------------------------------------------------------------------------
@@ -372,7 +363,7 @@ def quote_order(payload: OrderQuotePayload) -> Dict[str, Any]:
     """Return a price quote for a set of items without placing an order.
 
     Args:
-        payload: Items and optional discount code to quote.
+        payload: Items, optional discount code and the customer's delivery address to quote.
 
     Returns:
         Dict with subtotal, discount, cgst, sgst, total_price, discount_code, and per-item breakdown.
@@ -382,7 +373,19 @@ def quote_order(payload: OrderQuotePayload) -> Dict[str, Any]:
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        totals = _compute_order_totals(cursor, payload.items, payload.effective_discount_code())
+        # Price in the delivery address's city, exactly as create_order will.
+        city_code = payload.city_code
+        if payload.customer_id:
+            address_row = _resolve_order_address(cursor, payload.customer_id, payload.address_id)
+            if address_row is not None:
+                city_code = address_row.get("city_code")
+        totals = _compute_order_totals(
+            cursor,
+            payload.items,
+            payload.effective_discount_code(),
+            city_code=city_code,
+            auto_discount=payload.auto_discount,
+        )
         return totals
     except mysql.connector.Error as err:
         raise HTTPException(status_code=500, detail=str(err))
@@ -410,22 +413,18 @@ def create_order(payload: CreateOrderPayload) -> Dict[str, Any]:
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        address_id = payload.address_id if payload.address_id is not None else 0
-        cursor.execute(
-            "SELECT address_id FROM addresses WHERE address_id=%s AND customer_id=%s AND is_active=1 LIMIT 1",
-            (address_id, payload.customer_id),
+        address_row = _resolve_order_address(cursor, payload.customer_id, payload.address_id)
+        if address_row is None:
+            raise HTTPException(status_code=400, detail="No valid address found for customer")
+        address_id = address_row["address_id"]
+
+        totals = _compute_order_totals(
+            cursor,
+            payload.items,
+            payload.effective_discount_code(),
+            city_code=address_row.get("city_code"),
+            auto_discount=payload.auto_discount,
         )
-        if cursor.fetchone() is None:
-            cursor.execute(
-                "SELECT address_id FROM addresses WHERE customer_id=%s AND is_default=1 AND is_active=1 LIMIT 1",
-                (payload.customer_id,),
-            )
-            fallback = cursor.fetchone()
-            if fallback is None:
-                raise HTTPException(status_code=400, detail="No valid address found for customer")
-            address_id = fallback["address_id"]
-
-        totals = _compute_order_totals(cursor, payload.items, payload.effective_discount_code())
 
         normalized_method = (payload.payment_method or "").strip()
         paid_flag = 1 if normalized_method.lower() in {"upi", "card", "online"} else 0
@@ -481,13 +480,11 @@ def create_order(payload: CreateOrderPayload) -> Dict[str, Any]:
                 for i, item in enumerate(payload.items)
             ],
         )
+        touch_orders(cursor, [order_id])
 
         # Increment code use_count if a discount code was applied
         if totals["discount_code_id"]:
-            cursor.execute(
-                "UPDATE discount_codes SET use_count = use_count + 1 WHERE code_id = %s",
-                (totals["discount_code_id"],),
-            )
+            claim_code_use(cursor, totals["discount_code_id"], totals["discount_code"])
 
         for item in payload.items:
             if item.menu_item_id is not None:
@@ -496,7 +493,13 @@ def create_order(payload: CreateOrderPayload) -> Dict[str, Any]:
                     (item.quantity, item.menu_item_id),
                 )
 
+        refresh_customer_city_summary(cursor, customer_ids=[payload.customer_id])
+        if (payload.order_type or "").strip().lower() == "subscription":
+            invalidate_customer_snapshots(cursor, [payload.customer_id])
         db.commit()
+        stock_watcher.notify_changed(
+            db, menu_item_ids=[item.menu_item_id for item in payload.items]
+        )
 
         return {
             "message": "Order placed successfully",
@@ -505,6 +508,7 @@ def create_order(payload: CreateOrderPayload) -> Dict[str, Any]:
             "subtotal": float(totals["subtotal"]),
             "discount": float(totals["discount"]),
             "discount_code": totals["discount_code"],
+            "discount_auto_selected": totals["discount_auto_selected"],
             "cgst": float(totals["cgst"]),
             "sgst": float(totals["sgst"]),
             "delivery_charge": float(totals["delivery_charge"]),
@@ -856,7 +860,7 @@ def admin_update_order_status(
         target_city = _resolve_city_context(None, user)
         cursor.execute(
             """
-            SELECT o.paid
+            SELECT o.paid, o.customer_id
               FROM orders o
               JOIN addresses a ON o.address_id = a.address_id
              WHERE o.order_id = %s
@@ -875,7 +879,11 @@ def admin_update_order_status(
         if cursor.rowcount == 0:
             db.rollback()
             raise HTTPException(status_code=404, detail="Order not found")
+        refresh_customer_city_summary(cursor, order_ids=[order_id])
+        invalidate_customer_snapshots(cursor, [row[1]])
         db.commit()
+        if new_status == ORDER_STATUS_CANCELLED:
+            stock_watcher.notify_changed(db, order_id=order_id)
         return {"order_id": order_id, "status": new_status}
     except mysql.connector.Error as err:
         db.rollback()
@@ -2,16 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
+import time
 from datetime import date
 from typing import Any, Dict, Iterable, List, Optional, Set
 
 import mysql.connector
 from mysql.connector import errorcode
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 
 from ..db import get_raw_db
 from ..utils.auth_deps import admin_required
+from ..utils.catalog import (
+    CATALOG_STATE_DISCOUNTS,
+    bump_catalog_version,
+    etag_response,
+    get_catalog_snapshot,
+)
 from ..utils.helpers import (
     CONDIMENTS_BLD_TYPE,
     _is_condiment_from_blds,
@@ -23,7 +31,6 @@ from ..utils.helpers import (
     get_combo_blds,
     set_combo_blds,
     attach_combo_bld_ids,
-    attach_plated_flags,
     resolve_bld_id,
     _resolve_category_id_by_name,
     ensure_component_type_ids_exist,
@@ -40,6 +47,16 @@ from ..utils.combos import (
     fetch_combos_with_items,
     normalize_combo_items,
 )
+from ..utils.item_import import (
+    ACTION_ERROR,
+    RawImportRow,
+    apply_item_import,
+    detect_import_format,
+    load_import_references,
+    parse_import_rows,
+    plan_item_import,
+    summarize_plan,
+)
 from ..utils.plated_items import (
     fetch_plated_item_detail,
     fetch_plated_items_with_components,
@@ -275,6 +292,7 @@ class ComponentTypeUpdatePayload(BaseModel):
 
 @router.get("/api/products/items")
 def get_all_items(
+    request: Request,
     only_condiments: Optional[bool] = Query(
         None,
         description="When true, returns only condiment items",
@@ -289,149 +307,41 @@ def get_all_items(
         None,
         description="Filter condiment items by condiment_type_id",
     ),
-) -> List[Dict[str, Any]]:
+) -> Response:
     """Return all product items, with optional filters for condiments and plated items.
 
+    Served from the per-worker catalog snapshot; the response carries an ETag
+    and a matching If-None-Match yields 304.
+
     Args:
+        request: Incoming request (for If-None-Match).
         only_condiments: When true, returns only condiment items.
         include_plated: When true, includes plated items in the response.
         condiment_type_id: When set, returns only items of this condiment type.
 
     Returns:
-        List of item dicts with bld_ids, is_condiment, is_plated, and condiment_type fields.
+        JSON list of item dicts with bld_ids, is_condiment, is_plated, and condiment_type fields.
     """
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        available_columns = get_items_columns(cursor)
-        try:
-            condiments_bld_id = resolve_bld_id(cursor, CONDIMENTS_BLD_TYPE)
-        except HTTPException:
-            condiments_bld_id = None
-
-        has_meal_specific_max = {
-            "max_qty_breakfast",
-            "max_qty_lunch",
-            "max_qty_dinner",
-        }.issubset(available_columns)
-        has_legacy_max = "max_qty" in available_columns
-        has_condiment_max = "max_qty_condiments" in available_columns
-
-        max_columns_sql: List[str] = []
-        if has_meal_specific_max:
-            max_columns_sql.extend(
-                [
-                    "i.max_qty_breakfast",
-                    "i.max_qty_lunch",
-                    "i.max_qty_dinner",
-                ]
-            )
-        elif has_legacy_max:
-            max_columns_sql.extend(
-                [
-                    "i.max_qty AS max_qty_breakfast",
-                    "i.max_qty AS max_qty_lunch",
-                    "i.max_qty AS max_qty_dinner",
-                ]
-            )
-        else:
-            max_columns_sql.extend(
-                [
-                    "NULL AS max_qty_breakfast",
-                    "NULL AS max_qty_lunch",
-                    "NULL AS max_qty_dinner",
-                ]
-            )
-
-        if has_condiment_max:
-            max_columns_sql.append("i.max_qty_condiments")
-        elif has_meal_specific_max:
-            max_columns_sql.append("i.max_qty_dinner AS max_qty_condiments")
-        elif has_legacy_max:
-            max_columns_sql.append("i.max_qty AS max_qty_condiments")
-        else:
-            max_columns_sql.append("NULL AS max_qty_condiments")
-
-        has_condiment_type = "condiment_type_id" in available_columns
-
-        select_columns = [
-            "i.item_id",
-            "i.name",
-            "i.description",
-            "i.alias",
-            "i.category_id",
-            "c.category_name",
-            "i.component_type_id",
-            "ct.name AS component_type_name",
-            "i.uom_customer",
-            "i.uom_customer AS uom",
-            "i.unit_packing",
-            "i.uom_packing",
-            "i.hsn_code",
-            "i.uom_production",
-            "i.packing_to_production_rate",
-            "i.buffer_percentage",
-            *max_columns_sql,
-            "i.picture_url",
-            "i.breakfast_price",
-            "i.lunch_price",
-            "i.dinner_price",
-            "i.condiments_price",
-            "i.festival_price",
-            "i.cgst",
-            "i.sgst",
-            "i.igst",
-            "i.net_price",
-        ]
-
-        if has_condiment_type:
-            select_columns += [
-                "i.condiment_type_id",
-                "cdt.name AS condiment_type_name",
-            ]
-        else:
-            select_columns += [
-                "NULL AS condiment_type_id",
-                "NULL AS condiment_type_name",
-            ]
-
-        select_sql = ",\n                    ".join(select_columns)
-        join_condiment_type = (
-            "LEFT JOIN condiment_types cdt ON i.condiment_type_id = cdt.condiment_type_id"
-            if has_condiment_type
-            else ""
-        )
-        cursor.execute(
-            f"""
-                SELECT
-                    {select_sql}
-                FROM items i
-                LEFT JOIN categories c ON i.category_id = c.category_id
-                LEFT JOIN component_types ct ON i.component_type_id = ct.component_type_id
-                {join_condiment_type}
-            """
-        )
-        records = cursor.fetchall()
-
-        attach_bld_ids(cursor, records)
-        attach_plated_flags(cursor, records)
-        normalized_records = []
-        for row in records:
-            row["is_condiment"] = _is_condiment_from_blds(row.get("bld_ids"), condiments_bld_id)
-            if row.get("is_plated") and not include_plated:
-                continue
-            if only_condiments and not row["is_condiment"]:
-                continue
-            if condiment_type_id is not None and row.get("condiment_type_id") != condiment_type_id:
-                continue
-            normalized_records.append(row)
-        return normalized_records
+        snapshot = get_catalog_snapshot(cursor)
     except mysql.connector.Error as err:
         raise HTTPException(status_code=500, detail=str(err))
     finally:
         cursor.close()
         db.close()
 
+    filters = {
+        "only_condiments": bool(only_condiments),
+        "include_plated": bool(include_plated),
+        "condiment_type_id": condiment_type_id,
+    }
+    etag, body = snapshot.rendered(
+        ("items", *filters.values()), lambda: snapshot.list_items(**filters)
+    )
+    return etag_response(request, etag, body)
+
 
 @router.post("/api/products/items")
 def create_item(
@@ -516,6 +426,7 @@ def create_item(
                 created_item.get("bld_ids"), condiments_bld_id
             )
 
+        bump_catalog_version(cursor)
         db.commit()
         log_admin_action(
             db,
@@ -697,6 +608,7 @@ def update_item(
             )
         # ---------------------------------------------------------------------
 
+        bump_catalog_version(cursor)
         db.commit()
 
         updated_item = _fetch_item_detail(cursor, item_id, available_columns)
@@ -742,6 +654,109 @@ def update_item(
 # ---------------------------------------------------------------------------
 
 
+@router.post("/api/products/items:bulk")
+async def bulk_import_items(
+    request: Request,
+    dry_run: bool = Query(False, description="Validate and return the diff without writing"),
+    skip_invalid: bool = Query(
+        False, description="Apply valid rows even when other rows have errors"
+    ),
+    import_format: Optional[str] = Query(
+        None, alias="format", description="jsonl, csv or xlsx (default: from Content-Type)"
+    ),
+    user: Dict[str, Any] = Depends(admin_required),
+) -> Dict[str, Any]:
+    """Create and update many items from a JSON lines, CSV or XLSX upload.
+
+    Rows are validated against reference data loaded once per import and
+    applied with multi-row statements in a single transaction.  By default
+    nothing is written when any row has errors.
+
+    Args:
+        request: Incoming request; the body is the file content.
+        dry_run: When true, only validate and return the per-row diff.
+        skip_invalid: When true, apply the valid rows even if some rows fail.
+        import_format: Explicit file format, overriding the Content-Type header.
+        user: Current admin user (injected).
+
+    Returns:
+        Dict with success/applied flags, per-action summary, and per-row results.
+    """
+    resolved_format = detect_import_format(request.headers.get("content-type"), import_format)
+    body = await request.body()
+    raw_rows = parse_import_rows(body, resolved_format)
+    return await asyncio.to_thread(
+        _run_item_import, raw_rows, resolved_format, dry_run, skip_invalid, user
+    )
+
+
+def _run_item_import(
+    raw_rows: List[RawImportRow],
+    import_format: str,
+    dry_run: bool,
+    skip_invalid: bool,
+    user: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Plan and (unless dry-run) apply a bulk item import on a pooled connection."""
+    started = time.perf_counter()
+    db = get_raw_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        available_columns = get_items_columns(cursor)
+        refs = load_import_references(cursor, available_columns)
+        plan = plan_item_import(raw_rows, refs, available_columns)
+        summary = summarize_plan(plan)
+        has_errors = summary[ACTION_ERROR] > 0
+        result: Dict[str, Any] = {
+            "success": not has_errors,
+            "dry_run": dry_run,
+            "applied": False,
+            "format": import_format,
+            "summary": summary,
+            "rows": [row.as_dict() for row in plan],
+        }
+        if dry_run or (has_errors and not skip_invalid):
+            db.rollback()
+            result["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return result
+
+        created_ids, updated_ids = apply_item_import(cursor, plan, refs, available_columns)
+        if created_ids or updated_ids:
+            bump_catalog_version(cursor)
+        db.commit()
+        result["applied"] = True
+        for row_payload, row in zip(result["rows"], plan):
+            row_payload["item_id"] = row.item_id
+
+        admin_id = user.get("admin_id") if isinstance(user, dict) else None
+        if created_ids:
+            log_admin_action(
+                db,
+                admin_id=admin_id,
+                action_type="ADD",
+                entity_type="ITEM",
+                entity_id=created_ids[0],
+                description=f"Bulk import created {len(created_ids)} items: {created_ids[:50]}",
+            )
+        if updated_ids:
+            log_admin_action(
+                db,
+                admin_id=admin_id,
+                action_type="UPDATE",
+                entity_type="ITEM",
+                entity_id=updated_ids[0],
+                description=f"Bulk import updated {len(updated_ids)} items: {updated_ids[:50]}",
+            )
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(err))
+    finally:
+        cursor.close()
+        db.close()
+
+
 @router.get("/api/products/combos")
 def get_all_combos() -> List[Dict[str, Any]]:
     """Return all combo products with their items and BLD assignments.
@@ -823,6 +838,7 @@ def create_combo(
 
         set_combo_blds(cursor, combo_id, normalized_bld_ids)
 
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -933,6 +949,7 @@ def update_combo(
         if normalized_bld_ids is not None:
             set_combo_blds(cursor, combo_id, normalized_bld_ids)
 
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -978,6 +995,7 @@ def delete_combo(
             raise HTTPException(status_code=404, detail="Combo not found")
 
         cursor.execute("DELETE FROM combos WHERE combo_id = %s", (combo_id,))
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -1122,6 +1140,7 @@ def create_plated_item(
             ],
         )
 
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -1259,6 +1278,7 @@ def update_plated_item(
             )
             updated_fields.append("components")
 
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -1321,6 +1341,7 @@ def delete_plated_item(
         )
         cursor.execute("DELETE FROM items WHERE item_id = %s", (item_id,))
 
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -1390,6 +1411,7 @@ def create_category(
             (normalized_name,),
         )
         category_id = cursor.lastrowid
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -1443,6 +1465,7 @@ def update_category(
             "UPDATE categories SET category_name = %s WHERE category_id = %s",
             (normalized_name, category_id),
         )
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -1487,6 +1510,7 @@ def delete_category(
             raise HTTPException(status_code=404, detail="Category not found")
 
         cursor.execute("DELETE FROM categories WHERE category_id = %s", (category_id,))
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -1585,6 +1609,7 @@ def create_component_type(
             (name, description, category_id),
         )
         component_type_id = cursor.lastrowid
+        bump_catalog_version(cursor)
         db.commit()
         log_admin_action(
             db,
@@ -1668,6 +1693,7 @@ def update_component_type(
             f"UPDATE component_types SET {', '.join(updates)} WHERE component_type_id = %s",
             values,
         )
+        bump_catalog_version(cursor)
         db.commit()
         log_admin_action(
             db,
@@ -1761,6 +1787,7 @@ def delete_component_type(
             "DELETE FROM component_types WHERE component_type_id = %s",
             (component_type_id,),
         )
+        bump_catalog_version(cursor)
         db.commit()
         log_admin_action(
             db,
@@ -1874,6 +1901,7 @@ def create_item_discount(
             ),
         )
         discount_id = cursor.lastrowid
+        bump_catalog_version(cursor, CATALOG_STATE_DISCOUNTS)
         db.commit()
 
         cursor.execute(
@@ -1925,6 +1953,7 @@ def update_item_discount(
                 discount_id,
             ),
         )
+        bump_catalog_version(cursor, CATALOG_STATE_DISCOUNTS)
         db.commit()
 
         cursor.execute(
@@ -1963,6 +1992,7 @@ def delete_item_discount(
             raise HTTPException(status_code=404, detail="Discount rule not found")
 
         cursor.execute("DELETE FROM item_discounts WHERE discount_id = %s", (discount_id,))
+        bump_catalog_version(cursor, CATALOG_STATE_DISCOUNTS)
         db.commit()
         return {"status": "deleted", "discount_id": discount_id}
     except mysql.connector.Error as err:
@@ -2129,6 +2159,7 @@ def create_discount_code(
                 "VALUES (%s, %s, %s, %s)",
                 [(code_id, c.dimension, c.entity_id, c.entity_label) for c in payload.conditions],
             )
+        bump_catalog_version(cursor, CATALOG_STATE_DISCOUNTS)
         db.commit()
         return _fetch_code_with_conditions(cursor, code_id)
     except mysql.connector.Error as err:
@@ -2195,6 +2226,7 @@ def update_discount_code(
                 "VALUES (%s, %s, %s, %s)",
                 [(code_id, c.dimension, c.entity_id, c.entity_label) for c in payload.conditions],
             )
+        bump_catalog_version(cursor, CATALOG_STATE_DISCOUNTS)
         db.commit()
         return _fetch_code_with_conditions(cursor, code_id)
     except mysql.connector.Error as err:
@@ -2226,6 +2258,7 @@ def delete_discount_code(
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="Discount code not found")
         cursor.execute("DELETE FROM discount_codes WHERE code_id = %s", (code_id,))
+        bump_catalog_version(cursor, CATALOG_STATE_DISCOUNTS)
         db.commit()
         return {"status": "deleted", "code_id": code_id}
     except mysql.connector.Error as err:
@@ -2300,6 +2333,7 @@ def create_condiment_type(
             (normalized_name, payload.description, payload.sort_order),
         )
         condiment_type_id = cursor.lastrowid
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -2376,6 +2410,7 @@ def update_condiment_type(
             f"UPDATE condiment_types SET {set_clause} WHERE condiment_type_id = %s",
             (*updates.values(), condiment_type_id),
         )
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -2439,6 +2474,7 @@ def delete_condiment_type(
             "DELETE FROM condiment_types WHERE condiment_type_id = %s",
             (condiment_type_id,),
         )
+        bump_catalog_version(cursor)
         db.commit()
 
         log_admin_action(
@@ -10,13 +10,23 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 
 from ..db import get_raw_db
-from ..utils.auth_deps import ADMIN_ROLE_CODE, DEVELOPER_ROLE_CODE, admin_required, hash_password
+from ..utils.auth_deps import (
+    ADMIN_ROLE_CODE,
+    DEVELOPER_ROLE_CODE,
+    admin_required,
+    hash_password,
+    revoke_user_tokens,
+)
+from ..utils.logger import invalidate_audit_admins
+from ..utils.refresh_sessions import revoke_customer_sessions
 from ..utils.rbac import (
-    ensure_default_roles,
     fetch_role_map,
     make_role_summary,
     parse_role_ids,
+    role_assignment_counts,
+    role_registry,
     roles_to_json,
+    sync_customer_roles,
 )
 
 router = APIRouter()
@@ -86,14 +96,9 @@ def role_usage_counts(db) -> Dict[int, int]:
     Returns:
         Dict mapping role_id to count.
     """
-    cursor = db.cursor(dictionary=True)
+    cursor = db.cursor()
     try:
-        cursor.execute("SELECT roles FROM customers WHERE roles IS NOT NULL")
-        counts: Dict[int, int] = {}
-        for row in cursor.fetchall():
-            for rid in parse_role_ids(row.get("roles")):
-                counts[rid] = counts.get(rid, 0) + 1
-        return counts
+        return role_assignment_counts(cursor)
     finally:
         cursor.close()
 
@@ -113,7 +118,6 @@ def validate_role_ids(db, role_ids: List[int]) -> Dict[int, Dict[str, Any]]:
         return {}
     cursor = db.cursor()
     try:
-        ensure_default_roles(cursor)
         role_map = fetch_role_map(cursor, normalised)
     finally:
         cursor.close()
@@ -135,7 +139,6 @@ def build_role_context(db, role_ids: Optional[List[int]] = None):
     """
     cursor = db.cursor()
     try:
-        ensure_default_roles(cursor)
         role_map = fetch_role_map(cursor, role_ids)
     finally:
         cursor.close()
@@ -208,6 +211,10 @@ def apply_team_member_update(
 ):
     """Apply role/password/active-status updates to a team member.
 
+    Setting or clearing the admin password, or deactivating the account,
+    signs the member out everywhere: their refresh sessions are revoked and
+    their current access tokens rejected.
+
     Args:
         db: mysql.connector connection.
         customer_id: Customer to update.
@@ -279,7 +286,19 @@ def apply_team_member_update(
                 f"UPDATE customers SET {', '.join(updates)} WHERE customer_id=%s",
                 (*params, customer_id),
             )
+            if role_ids is not None:
+                sync_customer_roles(cursor, customer_id, normalised_roles)
+            sign_out_reason = None
+            if admin_password is not None:
+                sign_out_reason = "password_change"
+            elif admin_is_active is False:
+                sign_out_reason = "deactivated"
+            if sign_out_reason:
+                revoke_customer_sessions(cursor, [customer_id], sign_out_reason)
+                revoke_user_tokens(cursor, [customer_id])
             db.commit()
+            if role_ids is not None or admin_is_active is not None:
+                invalidate_audit_admins()
 
         cursor.execute(
             """
@@ -318,7 +337,6 @@ def list_roles(user: Dict[str, Any] = Depends(admin_required)):
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        ensure_default_roles(cursor)
         cursor.execute(
             """
             SELECT role_id, code, name, description, is_system, created_at
@@ -360,7 +378,6 @@ def create_role(payload: RoleCreateRequest, user: Dict[str, Any] = Depends(admin
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
-        ensure_default_roles(cursor)
         cursor.execute("SELECT role_id FROM roles WHERE code=%s LIMIT 1", (code,))
         if cursor.fetchone():
             raise HTTPException(status_code=409, detail="Role code already exists")
@@ -372,6 +389,7 @@ def create_role(payload: RoleCreateRequest, user: Dict[str, Any] = Depends(admin
             (code, name, payload.description),
         )
         db.commit()
+        role_registry.invalidate()
         role_id = cursor.lastrowid
         cursor.execute(
             """
@@ -437,6 +455,7 @@ def update_role(
                 (*params, role_id),
             )
             db.commit()
+            role_registry.invalidate()
 
         cursor.execute(
             """
@@ -483,6 +502,7 @@ def delete_role(role_id: int, user: Dict[str, Any] = Depends(admin_required)):
 
         cursor.execute("DELETE FROM roles WHERE role_id=%s", (role_id,))
         db.commit()
+        role_registry.invalidate()
         return {"deleted": True}
     finally:
         cursor.close()
@@ -502,12 +522,16 @@ def list_team_members(user: Dict[str, Any] = Depends(admin_required)):
     db = get_raw_db()
     cursor = db.cursor(dictionary=True)
     try:
+        # Filter on the JSON column, not customer_roles: members left with an
+        # empty role list or only deleted role ids must stay listed so they
+        # can be reassigned.
         cursor.execute(
             """
-            SELECT customer_id, name, primary_mobile, email, roles, admin_is_active, admin_password_hash, created_at
-            FROM customers
-            WHERE roles IS NOT NULL
-            ORDER BY name ASC
+            SELECT c.customer_id, c.name, c.primary_mobile, c.email, c.roles,
+                   c.admin_is_active, c.admin_password_hash, c.created_at
+            FROM customers c
+            WHERE c.roles IS NOT NULL
+            ORDER BY c.name ASC
             """
         )
         rows = cursor.fetchall()
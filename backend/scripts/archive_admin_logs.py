@@ -0,0 +1,50 @@
+"""
+Move admin logs older than the last N calendar months into admin_logs_archive.
+
+The archive is partitioned by month; partitions are added as needed.  Safe to
+run repeatedly (e.g. nightly from cron) and to interrupt: rows are moved in
+short batches.
+
+Usage:
+    python -m backend.scripts.archive_admin_logs [--months 6] [--batch-size 1000]
+
+Uses the same DATABASE_URL as the application (backend/.env).
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from ..db import get_raw_db
+from ..utils.admin_log_archive import (
+    ARCHIVE_BATCH,
+    DEFAULT_HOT_MONTHS,
+    _ensure_admin_logs_archive_table,
+    _ensure_admin_logs_indexes,
+    archive_admin_logs,
+)
+
+
+def run(months: int, batch_size: int) -> None:
+    db = get_raw_db()
+    try:
+        _ensure_admin_logs_indexes(db)
+        _ensure_admin_logs_archive_table(db)
+        started = time.perf_counter()
+        result = archive_admin_logs(db, hot_months=months, batch_size=batch_size)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+    print(
+        f"admin_logs archived: {result['moved']} rows older than {result['cutoff']}, "
+        f"{result['partitions_added']} partitions added, {elapsed_ms:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--months", type=int, default=DEFAULT_HOT_MONTHS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH)
+    args = parser.parse_args()
+    run(args.months, args.batch_size)
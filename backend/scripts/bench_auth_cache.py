@@ -0,0 +1,89 @@
+"""
+Benchmark the verified-token cache against the previous auth dependency chain.
+
+Mints ``tokens`` admin access tokens and replays ``requests`` lookups spread
+over them, timing per request:
+
+* legacy  — ``decode_token`` (HS256 verify + claims), the access-type check,
+            then ``_user_has_role`` re-deriving roles from the payload;
+* cached  — ``_verify_access_token`` + ``_user_has_role`` on the returned
+            AuthenticatedUser (the path ``get_current_user`` and
+            ``admin_required`` now take).
+
+No database is needed: the persisted-revocation lookup that runs on each
+cache miss is replaced with one that reports nothing revoked, so both paths
+time only token verification.
+
+Usage:
+    python -m backend.scripts.bench_auth_cache [requests] [tokens]
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+
+from ..utils import auth_deps
+from ..utils.auth_deps import (
+    ADMIN_ROLE_CODE,
+    _token_cache,
+    _user_has_role,
+    _verify_access_token,
+    create_access_token,
+    decode_token,
+    token_cache_stats,
+)
+
+
+def _legacy(token: str) -> bool:
+    payload = decode_token(token)
+    if payload.get("type") != "access":
+        raise ValueError("wrong token type")
+    return _user_has_role(payload["sub"], ADMIN_ROLE_CODE)
+
+
+def _cached(token: str) -> bool:
+    user = _verify_access_token(token)
+    if user is None:
+        raise ValueError("invalid token")
+    return _user_has_role(user, ADMIN_ROLE_CODE)
+
+
+def _time(label: str, check, tokens, requests: int) -> float:
+    started = time.perf_counter()
+    for index in range(requests):
+        assert check(tokens[index % len(tokens)])
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<8} {elapsed * 1000:9.1f} ms   {elapsed / requests * 1e6:7.2f} us/request   "
+        f"{requests / elapsed:>10,.0f} requests/s"
+    )
+    return elapsed
+
+
+def run(requests: int = 100000, tokens: int = 500) -> None:
+    minted = [
+        create_access_token(
+            {
+                "customer_id": index,
+                "phone": f"9{index:09d}",
+                "roles": [1, 2],
+                "role_codes": ["customer", ADMIN_ROLE_CODE],
+                "role": ADMIN_ROLE_CODE,
+                "city_code": "MYS",
+                "eligible_city_codes": ["MYS"],
+            }
+        )
+        for index in range(tokens)
+    ]
+    auth_deps._is_revoked_in_db = lambda key, user: False
+    print(f"requests={requests} tokens={tokens}")
+    legacy = _time("legacy", _legacy, minted, requests)
+    _token_cache.clear()
+    cached = _time("cached", _cached, minted, requests)
+    print(f"speed-up {legacy / cached:.1f}x   cache {token_cache_stats()}")
+
+
+if __name__ == "__main__":
+    args = [int(value) for value in sys.argv[1:3]]
+    run(*args)
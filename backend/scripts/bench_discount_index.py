@@ -0,0 +1,197 @@
+"""
+Benchmark best-discount selection: compiled index vs. a linear walk over every code.
+
+Generates a synthetic catalog (items, categories, meals), ``codes`` active
+discount codes with 1–4 random conditions each, a few hundred item discounts,
+and random carts of ``lines`` lines.  For each cart it compares:
+
+* naive  — the pre-index approach extended to every code: for each code, for
+           each line, walk the code's condition rows (``_item_matches_code``
+           style) and keep the code with the largest saving;
+* index  — ``evaluate_cart`` over a ``DiscountIndex`` compiled once.
+
+Both must pick a code with the same saving; the script asserts that.  No
+database is needed: the index is built from in-memory rows.
+
+Usage:
+    python -m backend.scripts.bench_discount_index [codes] [lines] [carts]
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.discounts import CartLine, build_discount_index, evaluate_cart
+
+CITY = "MYS"
+MEALS = ["breakfast", "lunch", "dinner", "condiments"]
+
+
+class _RowsCursor:
+    """Serves canned result sets for the index build queries, in order."""
+
+    def __init__(self, result_sets: List[List[Dict[str, Any]]]) -> None:
+        self._pending = list(result_sets)
+        self._rows: List[Dict[str, Any]] = []
+
+    def execute(self, sql: str, params: Any = None) -> None:
+        self._rows = self._pending.pop(0) if self._pending else []
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        return self._rows
+
+
+def _synthetic_data(codes: int, rng: random.Random):
+    items = [{"item_id": i, "category_id": rng.randint(1, 40)} for i in range(1, 2001)]
+    code_rows = []
+    conditions = []
+    for code_id in range(1, codes + 1):
+        code_rows.append(
+            {
+                "code_id": code_id,
+                "code": f"CODE{code_id}",
+                "name": f"Code {code_id}",
+                "discount_pct": rng.choice([5, 10, 12.5, 15, 20, 25, 30]),
+                "city_code": CITY,
+                "max_uses": None,
+                "use_count": 0,
+            }
+        )
+        if rng.random() < 0.02:
+            continue  # global code
+        for _ in range(rng.randint(1, 4)):
+            dimension = rng.choice(["item", "item", "category", "meal_type"])
+            if dimension == "item":
+                conditions.append(
+                    {
+                        "code_id": code_id,
+                        "dimension": "item",
+                        "entity_id": rng.randint(1, 2000),
+                        "entity_label": None,
+                    }
+                )
+            elif dimension == "category":
+                conditions.append(
+                    {
+                        "code_id": code_id,
+                        "dimension": "category",
+                        "entity_id": rng.randint(1, 40),
+                        "entity_label": None,
+                    }
+                )
+            else:
+                conditions.append(
+                    {
+                        "code_id": code_id,
+                        "dimension": "meal_type",
+                        "entity_id": None,
+                        "entity_label": rng.choice(MEALS).title(),
+                    }
+                )
+    item_discounts = [
+        {"item_id": item_id, "city_code": CITY, "discount_pct": rng.choice([5, 10, 20])}
+        for item_id in rng.sample(range(1, 2001), 300)
+    ]
+    return items, code_rows, conditions, item_discounts
+
+
+def _naive_best(
+    lines: List[CartLine],
+    code_rows: List[Dict[str, Any]],
+    conditions_by_code: Dict[int, List[Dict[str, Any]]],
+    categories: Dict[int, Optional[int]],
+    item_pcts: Dict[Tuple[str, int], float],
+) -> float:
+    best = 0.0
+    for code in code_rows:
+        conds = conditions_by_code.get(code["code_id"], [])
+        pct = float(code["discount_pct"])
+        saving = 0.0
+        for line in lines:
+            matched = not conds
+            for cond in conds:
+                dim = cond["dimension"]
+                if dim == "global":
+                    matched = True
+                elif dim == "item" and cond["entity_id"] == line.item_id:
+                    matched = True
+                elif dim == "category" and cond["entity_id"] == categories.get(line.item_id):
+                    matched = True
+                elif dim == "meal_type" and (cond["entity_label"] or "").lower() == line.meal_type:
+                    matched = True
+                if matched:
+                    break
+            if matched:
+                saving += max(pct - item_pcts.get((CITY, line.item_id), 0.0), 0.0) * line.amount
+        best = max(best, saving)
+    return best
+
+
+def run(codes: int = 500, lines: int = 50, carts: int = 200) -> None:
+    rng = random.Random(42)
+    items, code_rows, conditions, item_discounts = _synthetic_data(codes, rng)
+
+    started = time.perf_counter()
+    index = build_discount_index(
+        _RowsCursor([code_rows, conditions, item_discounts, items]), (date.today(), 0, 0)
+    )
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    conditions_by_code: Dict[int, List[Dict[str, Any]]] = {}
+    for cond in conditions:
+        conditions_by_code.setdefault(cond["code_id"], []).append(cond)
+    categories = {row["item_id"]: row["category_id"] for row in items}
+
+    cart_set = [
+        [
+            CartLine(
+                item_id=rng.randint(1, 2000),
+                meal_type=rng.choice(MEALS),
+                unit_price=float(rng.randint(20, 300)),
+                quantity=rng.randint(1, 4),
+            )
+            for _ in range(lines)
+        ]
+        for _ in range(carts)
+    ]
+
+    naive_savings = []
+    started = time.perf_counter()
+    for cart in cart_set:
+        naive_savings.append(
+            _naive_best(cart, code_rows, conditions_by_code, categories, index.item_discount_pcts)
+        )
+    naive_ms = (time.perf_counter() - started) * 1000
+
+    index_savings = []
+    no_db = _RowsCursor([])
+    started = time.perf_counter()
+    for cart in cart_set:
+        result = evaluate_cart(no_db, index, cart, CITY, auto_select=True)
+        chosen = result.code
+        saving = 0.0
+        if chosen is not None:
+            for line, pct, source in zip(cart, result.line_pcts, result.line_sources):
+                if source == "code":
+                    base = index.item_discount_pcts.get((CITY, line.item_id), 0.0)
+                    saving += (pct - base) * line.amount
+        index_savings.append(saving)
+    index_ms = (time.perf_counter() - started) * 1000
+
+    for naive, indexed in zip(naive_savings, index_savings):
+        assert abs(naive - indexed) < 1e-6, (naive, indexed)
+
+    print(f"codes={codes} conditions={len(conditions)} lines/cart={lines} carts={carts}")
+    print(f"index compile:       {compile_ms:9.2f} ms (once per catalog/discount version)")
+    print(f"naive linear walk:   {naive_ms / carts:9.3f} ms/cart")
+    print(f"compiled index:      {index_ms / carts:9.3f} ms/cart")
+    print(f"speed-up:            {naive_ms / max(index_ms, 1e-9):9.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(value) for value in sys.argv[1:4]]
+    run(*args)
@@ -0,0 +1,186 @@
+"""
+Benchmark the compiled NL intent matcher against the previous linear scan.
+
+Replays a corpus of utterances through:
+
+* linear   — every pattern of every intent in priority order
+             (``IntentPattern.matches``), slot extraction on the first hit;
+* compiled — ``IntentRegistry.match`` (inverted index + phrase alternation).
+
+once end to end (patterns, then slots) and once for pattern matching alone
+(every intent whose patterns match), and checks that both give the same
+intents and slots for every utterance.
+
+Without ``--corpus`` a reproducible 10k-utterance corpus is generated from
+the registry's examples, keywords and filler words; about 40% of it matches
+no intent.  A logged corpus is one utterance per line.
+
+No database is needed.
+
+Usage:
+    python -m backend.scripts.bench_nl_matcher [--corpus FILE] [--size 10000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from ..nl import get_service
+from ..nl.engine import (
+    IntentRegistry,
+    SlotExtractionError,
+    SlotValidationError,
+    normalize,
+    sanitize_slots,
+)
+
+_FILLER = [
+    "please",
+    "can",
+    "you",
+    "show",
+    "me",
+    "the",
+    "for",
+    "kitchen",
+    "delivery",
+    "route",
+    "driver",
+    "status",
+    "pending",
+    "paid",
+    "rasam",
+    "curd",
+    "rice",
+    "idli",
+    "shashank",
+    "mysore",
+    "tomorrow",
+    "report",
+    "stock",
+    "price",
+]
+_MEALS = ["breakfast", "lunch", "dinner", "condiments"]
+_RANGES = ["today", "yesterday", "this week", "this month"]
+
+Outcome = Optional[Tuple[str, Any]]
+
+
+def _linear(registry: IntentRegistry, query: str) -> Outcome:
+    utterance = normalize(query, registry.shared)
+    for intent in registry.intents:
+        if not intent.patterns:
+            continue
+        if not any(pattern.matches(utterance) for pattern in intent.patterns):
+            continue
+        try:
+            slots = intent.extract_slots(utterance, registry.shared)
+        except (SlotExtractionError, SlotValidationError):
+            continue
+        return intent.id, sanitize_slots(slots)
+    return None
+
+
+def _linear_candidates(registry: IntentRegistry, query: str) -> List[str]:
+    utterance = normalize(query, registry.shared)
+    return [
+        intent.id
+        for intent in registry.intents
+        if any(pattern.matches(utterance) for pattern in intent.patterns)
+    ]
+
+
+def _compiled_candidates(registry: IntentRegistry, query: str) -> List[str]:
+    utterance = normalize(query, registry.shared)
+    return [intent.id for intent in registry.matcher.candidates(utterance)]
+
+
+def _compiled(registry: IntentRegistry, query: str) -> Outcome:
+    match = registry.match(query)
+    if match is None:
+        return None
+    return match.intent.id, sanitize_slots(match.slots)
+
+
+def build_corpus(registry: IntentRegistry, size: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    examples = [example for intent in registry.intents for example in intent.examples]
+    examples += registry.examples
+    keywords = sorted(
+        {
+            term
+            for intent in registry.intents
+            for pattern in intent.patterns
+            for term in (*pattern.all_terms, *pattern.any_terms, *pattern.none_terms)
+        }
+    )
+    corpus: List[str] = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < 0.4 and examples:
+            words = rng.choice(examples).split()
+            words.insert(rng.randrange(len(words) + 1), rng.choice(_FILLER))
+        elif roll < 0.7:
+            words = rng.sample(keywords, k=min(len(keywords), rng.randint(1, 3)))
+            words += rng.sample(_FILLER, k=rng.randint(0, 3))
+            if rng.random() < 0.5:
+                words.append(rng.choice(_MEALS + _RANGES))
+            if rng.random() < 0.3:
+                words.append(str(rng.randint(1, 200)))
+            rng.shuffle(words)
+        else:
+            words = rng.sample(_FILLER, k=rng.randint(2, 6))
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def _time(
+    label: str, fn: Callable[[IntentRegistry, str], Any], registry, corpus
+) -> Tuple[float, List[Any]]:
+    started = time.perf_counter()
+    outcomes = [fn(registry, query) for query in corpus]
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<15} {elapsed * 1000:9.1f} ms   "
+        f"{elapsed / len(corpus) * 1e6:7.2f} us/utterance   "
+        f"{len(corpus) / elapsed:>10,.0f} utterances/s"
+    )
+    return elapsed, outcomes
+
+
+def run(corpus_path: Optional[str], size: int) -> None:
+    registry = get_service().registry
+    if corpus_path:
+        with open(corpus_path, encoding="utf-8") as handle:
+            corpus = [line.strip() for line in handle if line.strip()]
+    else:
+        corpus = build_corpus(registry, size)
+    hits = sum(1 for query in corpus if registry.match(query) is not None)
+    print(f"utterances={len(corpus)} intents={len(registry.intents)} matched={hits}")
+    mismatches = []
+    for suffix, linear_fn, compiled_fn in (
+        ("", _linear, _compiled),
+        ("/match", _linear_candidates, _compiled_candidates),
+    ):
+        linear, expected = _time("linear" + suffix, linear_fn, registry, corpus)
+        compiled, actual = _time("compiled" + suffix, compiled_fn, registry, corpus)
+        print(f"speed-up{suffix} {linear / compiled:.1f}x")
+        mismatches += [
+            (query, want, got) for query, want, got in zip(corpus, expected, actual) if want != got
+        ]
+    print(f"mismatches {len(mismatches)}")
+    for query, want, got in mismatches[:10]:
+        print(f"  {query!r}: linear={want} compiled={got}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--corpus", help="file with one logged utterance per line")
+    parser.add_argument("--size", type=int, default=10000, help="generated corpus size")
+    args = parser.parse_args()
+    run(args.corpus, args.size)
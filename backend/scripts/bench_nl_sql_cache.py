@@ -0,0 +1,134 @@
+"""
+Benchmark the NL→SQL cache offline with the stub model client.
+
+Replays ``--questions`` questions drawn from ``--distinct`` phrasings (with
+random case, spacing and trailing "?" so normalization is exercised)
+through ``SQLGenerationService.handle_query``:
+
+* uncached — cache disabled, every question goes to the client;
+* cached   — memory LRU plus a SQLite file in a temporary directory;
+* restart  — a fresh service on the same file, as after a deploy.
+
+The stub client sleeps ``--latency-ms`` per call to stand in for the API
+round trip.  Also times building the system prompt against the memoized copy.
+
+No database or API key is needed.
+
+Usage:
+    python -m backend.scripts.bench_nl_sql_cache [--questions 1000] [--distinct 50] [--latency-ms 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from ..nl.gemini_client import StubSQLClient, system_prompt, today_label
+from ..nl.sql_cache import SQLCache
+from ..nl.sql_prompt import build_system_prompt
+from ..nl.sql_sandbox import SelectSandbox
+from ..nl.sql_service import SQLGenerationService
+
+_SUBJECTS = ["menu", "lunch menu", "dinner menu", "orders", "top items", "buffer"]
+_WHEN = ["today", "tomorrow", "yesterday", "this week", "this month"]
+
+
+class _EmptyResult:
+    def mappings(self) -> list:
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class _NoDB:
+    """Session stand-in: every statement returns no rows."""
+
+    def execute(self, *args, **kwargs) -> _EmptyResult:
+        return _EmptyResult()
+
+    def close(self) -> None:
+        pass
+
+
+def _service(latency: float, cache: SQLCache) -> SQLGenerationService:
+    return SQLGenerationService(
+        StubSQLClient(latency_sec=latency), cache, SelectSandbox(session_factory=_NoDB)
+    )
+
+
+def build_questions(count: int, distinct: int, seed: int = 11) -> List[str]:
+    rng = random.Random(seed)
+    phrasings = [f"show {subject} {when}" for subject in _SUBJECTS for when in _WHEN]
+    phrasings += [f"show {s} for route {n}" for s in _SUBJECTS for n in range(1, 50)]
+    pool = rng.sample(phrasings, k=min(distinct, len(phrasings)))
+    questions = []
+    for _ in range(count):
+        words = rng.choice(pool).split()
+        if rng.random() < 0.3:
+            words = [word.upper() if rng.random() < 0.5 else word for word in words]
+        question = ("  " if rng.random() < 0.2 else " ").join(words)
+        questions.append(question + rng.choice(["", "", "?", " ?"]))
+    return questions
+
+
+def _replay(label: str, service: SQLGenerationService, questions: List[str]) -> float:
+    client = service._client_instance()
+    calls_before = client.calls
+    db = _NoDB()
+    started = time.perf_counter()
+    for question in questions:
+        result = service.handle_query(query=question, db=db, confirm=False)
+        if "error" in result:
+            raise SystemExit(f"{label}: {question!r} failed: {result['error']}")
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<9} {elapsed * 1000:9.1f} ms   "
+        f"{elapsed / len(questions) * 1000:7.3f} ms/question   "
+        f"model calls {client.calls - calls_before:>5}"
+    )
+    return elapsed
+
+
+def run(count: int, distinct: int, latency_ms: float) -> None:
+    questions = build_questions(count, distinct)
+    print(f"questions={len(questions)} distinct={distinct} stub latency={latency_ms} ms")
+
+    today = today_label()
+    started = time.perf_counter()
+    for _ in range(200):
+        build_system_prompt(today=today, allow_update=False)
+    built = (time.perf_counter() - started) / 200
+    system_prompt(today, False)
+    started = time.perf_counter()
+    for _ in range(200):
+        system_prompt(today, False)
+    memoized = (time.perf_counter() - started) / 200
+    print(f"prompt    build {built * 1e6:8.1f} us   memoized {memoized * 1e6:6.2f} us")
+
+    latency = latency_ms / 1000
+    uncached = _replay("uncached", _service(latency, SQLCache(maxsize=0)), questions)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "nl_sql_cache.sqlite3"
+        cache = SQLCache(path=path)
+        cached = _replay("cached", _service(latency, cache), questions)
+        print(f"          {cache.stats()}")
+        cache.close()
+        restart_cache = SQLCache(path=path)
+        _replay("restart", _service(latency, restart_cache), questions)
+        print(f"          {restart_cache.stats()}")
+        restart_cache.close()
+    print(f"speed-up  {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--questions", type=int, default=1000, help="questions replayed")
+    parser.add_argument("--distinct", type=int, default=50, help="distinct phrasings")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="stub model latency")
+    args = parser.parse_args()
+    run(args.questions, args.distinct, args.latency_ms)
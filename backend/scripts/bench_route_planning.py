@@ -0,0 +1,84 @@
+"""
+Benchmark automatic route planning on synthetic city addresses.
+
+Generates ``addresses`` points spread over ``hubs`` dense neighbourhoods
+around Mysuru plus uniform background noise, then times:
+
+* k-means   — ``cluster_coordinates`` without a capacity (plain k-means++);
+* balanced  — the same clustering followed by capacity-constrained
+              rebalancing so no route exceeds ``ceil(addresses / routes * 1.1)``
+              stops.
+
+For each it reports wall time, the largest and smallest route and the mean
+distance from an address to its route centre.  No database is needed.
+
+Usage:
+    python -m backend.scripts.bench_route_planning [addresses] [routes] [hubs]
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+import time
+
+import numpy as np
+
+from ..utils.route_planning import cluster_coordinates
+
+CENTRE_LAT = 12.2958
+CENTRE_LNG = 76.6394
+
+
+def _synthetic_coordinates(addresses: int, hubs: int, rng: np.random.Generator):
+    hub_lat = CENTRE_LAT + rng.normal(0, 0.04, hubs)
+    hub_lng = CENTRE_LNG + rng.normal(0, 0.04, hubs)
+    clustered = int(addresses * 0.85)
+    hub_of = rng.integers(hubs, size=clustered)
+    lat = np.concatenate(
+        (
+            hub_lat[hub_of] + rng.normal(0, 0.008, clustered),
+            CENTRE_LAT + rng.uniform(-0.1, 0.1, addresses - clustered),
+        )
+    )
+    lng = np.concatenate(
+        (
+            hub_lng[hub_of] + rng.normal(0, 0.008, clustered),
+            CENTRE_LNG + rng.uniform(-0.1, 0.1, addresses - clustered),
+        )
+    )
+    return lat, lng
+
+
+def _report(label: str, elapsed_ms: float, labels: np.ndarray, points: np.ndarray) -> None:
+    counts = np.bincount(labels)
+    k = len(counts)
+    centres = np.column_stack(
+        [np.bincount(labels, weights=points[:, dim], minlength=k) / counts for dim in range(2)]
+    )
+    spread = np.sqrt(((points - centres[labels]) ** 2).sum(axis=1)).mean()
+    print(
+        f"{label:<10} {elapsed_ms:9.1f} ms   routes={k:<4} "
+        f"stops min/max={counts.min()}/{counts.max():<6} mean distance to centre={spread:.2f} km"
+    )
+
+
+def run(addresses: int = 20000, routes: int = 40, hubs: int = 25) -> None:
+    rng = np.random.default_rng(42)
+    lat, lng = _synthetic_coordinates(addresses, hubs, rng)
+    capacity = math.ceil(addresses / routes * 1.1)
+    print(f"addresses={addresses} routes={routes} hubs={hubs} capacity={capacity}")
+
+    started = time.perf_counter()
+    labels, points = cluster_coordinates(lat, lng, routes, seed=0)
+    _report("k-means", (time.perf_counter() - started) * 1000, labels, points)
+
+    started = time.perf_counter()
+    labels, points = cluster_coordinates(lat, lng, routes, capacity=capacity, seed=0)
+    _report("balanced", (time.perf_counter() - started) * 1000, labels, points)
+    assert np.bincount(labels).max() <= capacity
+
+
+if __name__ == "__main__":
+    args = [int(value) for value in sys.argv[1:4]]
+    run(*args)
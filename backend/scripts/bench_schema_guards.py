@@ -0,0 +1,101 @@
+"""
+Benchmark the per-request overhead removed by the startup schema guard registry.
+
+Before the registry, the login, trip-sheet and subscription endpoints ran
+their ``_ensure_*`` / ``ensure_default_roles`` checks on every request.  This
+script replays exactly those guard calls per simulated request against the
+configured database, counting statements and commits, and compares them with
+the new request path (which issues none of them).
+
+Usage:
+    python -m backend.scripts.bench_schema_guards [iterations]
+
+Uses the same DATABASE_URL as the application (backend/.env).
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..db import get_raw_db
+from ..routers.logistics import _ensure_trip_sheets_table
+from ..utils.helpers import _ensure_delivery_routes_table, _ensure_subscription_pause_table
+from ..utils.rbac import ensure_default_roles
+
+
+class _CountingCursor:
+    def __init__(self, cursor, counter: Dict[str, int]) -> None:
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args: Any, **kwargs: Any) -> Any:
+        self._counter["statements"] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+class _CountingConnection:
+    def __init__(self, db) -> None:
+        self._db = db
+        self.counter = {"statements": 0, "commits": 0}
+
+    def cursor(self, *args: Any, **kwargs: Any) -> _CountingCursor:
+        return _CountingCursor(self._db.cursor(*args, **kwargs), self.counter)
+
+    def commit(self) -> None:
+        self.counter["commits"] += 1
+        self._db.commit()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+
+def _login_guards(db) -> None:
+    # /api/login called ensure_default_roles in the handler and again in
+    # _build_role_context_for_login.
+    for _ in range(2):
+        cursor = db.cursor()
+        try:
+            ensure_default_roles(cursor)
+        finally:
+            cursor.close()
+
+
+def _trip_sheet_guards(db) -> None:
+    _ensure_delivery_routes_table(db)
+    _ensure_trip_sheets_table(db)
+
+
+def _subscription_guards(db) -> None:
+    _ensure_subscription_pause_table(db)
+
+
+ENDPOINTS: List[Tuple[str, Callable[[Any], None]]] = [
+    ("POST /api/login", _login_guards),
+    ("POST /api/logistics/trip-sheet", _trip_sheet_guards),
+    ("GET /api/customers/{id}/subscription-today", _subscription_guards),
+]
+
+
+def run(iterations: int = 200) -> None:
+    raw = get_raw_db()
+    try:
+        print(f"{'endpoint':<44} {'before q/req':>12} {'after q/req':>12} {'saved ms/req':>13}")
+        for label, guards in ENDPOINTS:
+            db = _CountingConnection(raw)
+            started = time.perf_counter()
+            for _ in range(iterations):
+                guards(db)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            per_request = (db.counter["statements"] + db.counter["commits"]) / iterations
+            print(f"{label:<44} {per_request:>12.1f} {0:>12} {elapsed_ms / iterations:>13.3f}")
+    finally:
+        raw.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
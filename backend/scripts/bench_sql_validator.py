@@ -0,0 +1,278 @@
+"""
+Fuzz and benchmark ``nl.sql_validator.validate_sql`` against the original rules.
+
+The corpus starts from the SQL examples in the NL→SQL system prompt plus
+hand-written adversarial seeds (DDL/DML keywords, stacked statements,
+non-whitelisted tables and columns, disguised UPDATEs).  It then adds seeded
+mutations of those seeds: case flips, keyword and comment injection,
+semicolons, table/column swaps, truncation and whitespace noise.  Every
+statement is checked with ``allow_update`` both off and on.
+
+``_reference_validate`` is the validator as it was before the allowlists
+were precomputed, the unsafe patterns merged and results cached.  The fuzz
+pass requires the current validator to give exactly the same result (SQL and
+is_update, or the same error message) for every case; any difference exits
+non-zero.
+
+Timings:
+
+* reference — original validator;
+* uncached  — current rules without the result cache (precomputed
+              allowlists and the merged unsafe regex only);
+* cached    — ``validate_sql`` replaying statements already in its cache,
+              as when a cached NL→SQL answer is validated again.
+
+Each is run on the fuzz corpus and on the (long) prompt examples.
+
+No database is needed.
+
+Usage:
+    python -m backend.scripts.bench_sql_validator [--size 3000] [--seed 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import sqlparse
+
+from ..nl import sql_validator
+from ..nl.sql_prompt import ALLOWED_TABLE_COLUMNS, all_allowed_columns, build_system_prompt
+from ..nl.sql_validator import (
+    CODE_BLOCK_REGEX,
+    UNSAFE_PATTERNS,
+    SQLValidationError,
+    SQLValidationResult,
+    _extract_aliases,
+    _extract_aliases_from_group,
+    validate_sql,
+)
+
+_ADVERSARIAL_SEEDS = [
+    "SELECT * FROM customers",
+    "SELECT c.name, c.password FROM customers c",
+    "SELECT name FROM customers; DROP TABLE customers",
+    "SELECT name FROM customers;",
+    "DROP TABLE menu",
+    "DELETE FROM orders WHERE order_id = 1",
+    "INSERT INTO items (name) VALUES ('x')",
+    "TRUNCATE orders",
+    "REPLACE INTO items VALUES (1)",
+    "SELECT REPLACE(i.name, 'a', 'b') FROM items i",
+    "SELECT i.created_at FROM items i",
+    "SELECT o.order_id FROM orders o JOIN users u ON u.id = o.customer_id",
+    "SELECT x FROM information_schema.tables",
+    "SELECT name FROM mysql.user",
+    "UPDATE menu_items SET buffer_qty = 5 WHERE menu_item_id = 12",
+    "UPDATE menu_items SET buffer_qty = 5, final_qty = 9 WHERE menu_item_id = 12",
+    "UPDATE menu_items SET final_qty = 9 WHERE menu_item_id = 12",
+    "UPDATE customers SET name = 'x' WHERE customer_id = 1",
+    "update menu_items set buffer_qty = 2.5 where menu_item_id = (SELECT mi.menu_item_id "
+    "FROM menu_items mi JOIN items i ON i.item_id = mi.item_id WHERE i.name = 'Rasam')",
+    "SELECT 1",
+    "WITH t AS (SELECT 1) SELECT * FROM t",
+    "SHOW TABLES",
+    "SELECT mi.buffer_qty FROM menu_items mi WHERE mi.menu_id IN "
+    "(SELECT m.menu_id FROM menu m WHERE m.date = CURDATE())",
+    "SELECT /* DROP */ i.name FROM items i",
+    "SELECT i.name FROM items i -- ; DELETE",
+    "GRANT ALL ON *.* TO 'x'",
+    "SELECT i.name FROM items AS i WHERE i.name LIKE '%;%'",
+    "",
+    "   ",
+]
+
+_INJECTIONS = [
+    " DROP ",
+    " delete ",
+    " Create ",
+    " ALTER ",
+    " merge ",
+    " upsert ",
+    " revoke ",
+    " created ",
+    " dropped ",
+    " /* x */ ",
+    " -- c\n",
+    ";",
+    " ; SELECT 1",
+    " users.password ",
+    " JOIN secrets s ON s.id = 1 ",
+    " FROM admin_users ",
+    " i.item_id ",
+    " x.not_a_column ",
+    "(",
+    ")",
+    "'",
+    "\n",
+]
+
+Outcome = Tuple[Any, ...]
+
+
+def _reference_validate(sql: str, *, allow_update: bool) -> SQLValidationResult:
+    """The validator before precomputed allowlists, the merged regex and caching."""
+    sql = sql.strip()
+    if sql.endswith(";"):
+        sql = sql[:-1].strip()
+    if ";" in sql:
+        raise SQLValidationError("Multiple statements or semicolons are not allowed.")
+    upper_sql = sql.upper()
+    for pattern in UNSAFE_PATTERNS:
+        if re.search(pattern, upper_sql):
+            raise SQLValidationError("SQL contains a forbidden operation.")
+    is_update = upper_sql.startswith("UPDATE")
+    if is_update:
+        if not allow_update:
+            raise SQLValidationError("Updates are not permitted for this query.")
+        pattern = re.compile(
+            r"^\s*UPDATE\s+menu_items\s+SET\s+buffer_qty\s*=\s*([0-9]+(\.[0-9]+)?)",
+            re.IGNORECASE | re.DOTALL,
+        )
+        if not pattern.search(sql):
+            raise SQLValidationError("Only menu_items.buffer_qty updates are permitted.")
+        for clause in re.findall(r"SET\s+([^=]+)=", sql, flags=re.IGNORECASE):
+            for part in [segment.strip().lower() for segment in clause.split(",")]:
+                if part and not part.startswith("buffer_qty"):
+                    raise SQLValidationError(
+                        "UPDATE statement attempts to modify disallowed columns."
+                    )
+    else:
+        if not upper_sql.startswith("SELECT"):
+            raise SQLValidationError("Only SELECT queries are permitted.")
+
+    parsed = sqlparse.parse(sql)
+    if not parsed:
+        raise SQLValidationError("Unable to parse SQL for validation.")
+    table_aliases: Dict[str, str] = {}
+    for statement in parsed:
+        for token in statement.tokens:
+            if token.ttype is None and token.is_group:
+                _extract_aliases_from_group(token, table_aliases)
+            elif token.ttype is None:
+                _extract_aliases(token, table_aliases)
+    allowed_tables = set(ALLOWED_TABLE_COLUMNS.keys())
+    if table_aliases:
+        for table in table_aliases.values():
+            if table not in allowed_tables:
+                raise SQLValidationError(f"Table '{table}' is not allowed.")
+    else:
+        found_tables = set(re.findall(r"\bFROM\s+([a-zA-Z_][\w]*)", sql, flags=re.IGNORECASE))
+        found_tables.update(re.findall(r"\bJOIN\s+([a-zA-Z_][\w]*)", sql, flags=re.IGNORECASE))
+        if not found_tables.issubset(allowed_tables):
+            raise SQLValidationError("SQL references non-whitelisted tables.")
+    allowed_columns = all_allowed_columns()
+    for _alias, column in re.findall(r"\b([A-Za-z_][\w]*)\.([A-Za-z_][\w]*)\b", sql):
+        if column.lower() not in {col.lower() for col in allowed_columns}:
+            raise SQLValidationError(f"Column '{column}' is not allowed.")
+    return SQLValidationResult(sql=sql, is_update=is_update)
+
+
+def _outcome(fn: Callable[..., SQLValidationResult], sql: str, allow_update: bool) -> Outcome:
+    try:
+        result = fn(sql, allow_update=allow_update)
+    except SQLValidationError as exc:
+        return ("rejected", str(exc))
+    except Exception as exc:  # parser crashes must match too
+        return ("crashed", type(exc).__name__)
+    return ("accepted", result.sql, result.is_update)
+
+
+def _mutate(rng: random.Random, sql: str, tables: List[str], columns: List[str]) -> str:
+    roll = rng.random()
+    if roll < 0.2:
+        return "".join(ch.upper() if rng.random() < 0.5 else ch.lower() for ch in sql)
+    if roll < 0.5:
+        cut = rng.randrange(len(sql) + 1)
+        return sql[:cut] + rng.choice(_INJECTIONS) + sql[cut:]
+    if roll < 0.65:
+        words = sql.split(" ")
+        if words:
+            words[rng.randrange(len(words))] = rng.choice(tables + ["users", "secrets"])
+        return " ".join(words)
+    if roll < 0.8:
+        return re.sub(
+            r"\b([a-z])\.([a-z_]+)\b",
+            lambda m: f"{m.group(1)}.{rng.choice(columns + ['password', 'secret'])}",
+            sql,
+            count=rng.randint(1, 3),
+        )
+    if roll < 0.9:
+        return sql[: rng.randrange(len(sql) + 1)]
+    return re.sub(r" ", lambda _: rng.choice([" ", "  ", "\n", "\t"]), sql)
+
+
+def build_corpus(size: int, seed: int) -> List[str]:
+    prompt = build_system_prompt(today="2026-01-01", allow_update=True)
+    seeds = [m.group("sql").strip() for m in CODE_BLOCK_REGEX.finditer(prompt)]
+    seeds += _ADVERSARIAL_SEEDS
+    tables = sorted(ALLOWED_TABLE_COLUMNS)
+    columns = sorted(all_allowed_columns())
+    rng = random.Random(seed)
+    corpus = list(seeds)
+    while len(corpus) < size:
+        sql = rng.choice(seeds)
+        for _ in range(rng.randint(1, 3)):
+            sql = _mutate(rng, sql, tables, columns)
+        corpus.append(sql)
+    return corpus
+
+
+def _time(label: str, fn: Callable[..., SQLValidationResult], cases) -> float:
+    started = time.perf_counter()
+    for sql, allow_update in cases:
+        _outcome(fn, sql, allow_update)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<10} {elapsed * 1000:9.1f} ms   " f"{elapsed / len(cases) * 1e6:8.1f} us/statement"
+    )
+    return elapsed
+
+
+def run(size: int, seed: int) -> None:
+    corpus = build_corpus(size, seed)
+    cases = [(sql, allow_update) for sql in corpus for allow_update in (False, True)]
+    sql_validator._validate_cached.cache_clear()
+    mismatches = []
+    verdicts: Dict[str, int] = {}
+    for sql, allow_update in cases:
+        want = _outcome(_reference_validate, sql, allow_update)
+        got = _outcome(validate_sql, sql, allow_update)
+        verdicts[want[0]] = verdicts.get(want[0], 0) + 1
+        if got != want:
+            mismatches.append((sql, allow_update, want, got))
+    print(f"cases={len(cases)} " + " ".join(f"{k}={v}" for k, v in sorted(verdicts.items())))
+    print(f"mismatches {len(mismatches)}")
+    for sql, allow_update, want, got in mismatches[:10]:
+        print(f"  {sql!r} allow_update={allow_update}: reference={want} current={got}")
+    if mismatches:
+        raise SystemExit(1)
+
+    prompt = build_system_prompt(today="2026-01-01", allow_update=True)
+    examples = [
+        (m.group("sql").strip(), allow_update)
+        for m in CODE_BLOCK_REGEX.finditer(prompt)
+        for allow_update in (False, True)
+    ] * 50
+    for label, subset in (("fuzz corpus", cases), ("prompt examples", examples)):
+        print(f"-- {label}: {len(subset)} statements")
+        reference = _time("reference", _reference_validate, subset)
+        uncached = _time("uncached", sql_validator._validate, subset)
+        hot = subset[: sql_validator.VALIDATION_CACHE_SIZE]
+        sql_validator._validate_cached.cache_clear()
+        for sql, allow_update in hot:
+            _outcome(validate_sql, sql, allow_update)
+        cached = _time("cached", validate_sql, hot) * len(subset) / len(hot)
+        print(f"speed-up uncached {reference / uncached:.2f}x   cached {reference / cached:,.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--size", type=int, default=3000, help="statements in the corpus")
+    parser.add_argument("--seed", type=int, default=3, help="mutation seed")
+    args = parser.parse_args()
+    run(args.size, args.seed)
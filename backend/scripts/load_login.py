@@ -0,0 +1,137 @@
+"""
+Load-test admin logins against a running backend.
+
+Measures a cheap probe endpoint on its own first (baseline), then fires a
+storm of ``--logins`` admin logins from ``--concurrency`` threads while the
+probe keeps running, and prints latency percentiles for:
+
+* login         — POST /api/login with the admin password (bcrypt path);
+* probe/base    — the probe endpoint before the storm;
+* probe/storm   — the probe endpoint during the storm.
+
+With bcrypt on its own bounded pool, probe p99 during the storm should stay
+close to the baseline; logins beyond the pool's queue get 503 (counted
+separately).  Afterwards ``GET /api/dev/auth-metrics`` shows queue depth.
+
+Usage:
+    LOAD_ADMIN_PASSWORD=... python -m backend.scripts.load_login \\
+        http://127.0.0.1:8000 9876543210 [--logins 200] [--concurrency 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+def _request(url: str, body: Optional[Dict[str, str]] = None) -> Tuple[int, float]:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except OSError:
+        status = 0
+    return status, (time.perf_counter() - started) * 1000
+
+
+def _percentiles(label: str, samples: List[float], statuses: Counter) -> None:
+    if not samples:
+        print(f"{label:<12} no samples")
+        return
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    print(
+        f"{label:<12} n={len(ordered):<6} p50={pick(0.50):8.1f} ms  p95={pick(0.95):8.1f} ms  "
+        f"p99={pick(0.99):8.1f} ms  max={ordered[-1]:8.1f} ms  status={dict(statuses)}"
+    )
+
+
+def _probe(url: str, stop: threading.Event, samples: List[float], statuses: Counter) -> None:
+    while not stop.is_set():
+        status, elapsed = _request(url)
+        samples.append(elapsed)
+        statuses[status] += 1
+
+
+def _run_probes(url: str, threads: int, stop: threading.Event):
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    workers = [
+        threading.Thread(target=_probe, args=(url, stop, samples, statuses), daemon=True)
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers, samples, statuses
+
+
+def run(args: argparse.Namespace) -> None:
+    base = args.base_url.rstrip("/")
+    probe_url = base + args.probe_path
+    body = {"phone": args.phone, "admin_password": args.admin_password}
+
+    stop = threading.Event()
+    workers, base_samples, base_statuses = _run_probes(probe_url, args.probe_concurrency, stop)
+    time.sleep(args.baseline_seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    stop = threading.Event()
+    workers, storm_samples, storm_statuses = _run_probes(probe_url, args.probe_concurrency, stop)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: _request(base + "/api/login", body), range(args.logins)))
+    storm_seconds = time.perf_counter() - started
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    login_statuses = Counter(status for status, _ in results)
+    print(
+        f"logins={args.logins} concurrency={args.concurrency} "
+        f"storm={storm_seconds:.1f} s ({args.logins / storm_seconds:.1f} logins/s)"
+    )
+    _percentiles("login", [elapsed for status, elapsed in results if status == 200], login_statuses)
+    _percentiles("probe/base", base_samples, base_statuses)
+    _percentiles("probe/storm", storm_samples, storm_statuses)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("base_url")
+    parser.add_argument("phone", help="primary mobile of an admin account")
+    parser.add_argument(
+        "--admin-password",
+        default=os.getenv("LOAD_ADMIN_PASSWORD"),
+        help="defaults to $LOAD_ADMIN_PASSWORD",
+    )
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--probe-path", default="/api/get-cities")
+    parser.add_argument("--probe-concurrency", type=int, default=4)
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    if not args.admin_password:
+        parser.error("--admin-password or LOAD_ADMIN_PASSWORD is required")
+    return args
+
+
+if __name__ == "__main__":
+    run(_parse_args())
@@ -0,0 +1,38 @@
+"""
+Rebuild the customer_city_summary table from addresses and orders.
+
+The request handlers keep the summary current on every address and order
+write.  Run this after writes that bypass the API (manual SQL, bulk imports
+straight into MySQL, restores) or if the admin customer list looks stale.
+
+Usage:
+    python -m backend.scripts.rebuild_customer_city_summary
+
+Uses the same DATABASE_URL as the application (backend/.env).
+"""
+
+from __future__ import annotations
+
+import time
+
+from ..db import get_raw_db
+from ..utils.customer_summary import (
+    _ensure_customer_city_summary_table,
+    rebuild_customer_city_summary,
+)
+
+
+def run() -> None:
+    db = get_raw_db()
+    try:
+        _ensure_customer_city_summary_table(db)
+        started = time.perf_counter()
+        written = rebuild_customer_city_summary(db)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+    print(f"customer_city_summary rebuilt: {written} rows in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,235 @@
+"""Indexes for browsing ``admin_logs`` and its monthly-partitioned archive.
+
+The admin logs page pages newest first by ``(timestamp, log_id)`` and filters
+by entity type or admin, so ``admin_logs`` gets ``(entity_type, timestamp)``,
+``(admin_id, timestamp)`` and ``(timestamp)`` indexes (InnoDB appends the
+``log_id`` primary key to each, which completes the keyset order).
+
+To keep the hot table small, ``archive_admin_logs`` moves rows older than
+the last ``hot_months`` calendar months into ``admin_logs_archive``.  That
+table is partitioned by month (``RANGE COLUMNS(timestamp)``, one partition
+per month plus ``p_future``), so a month can later be dropped or exported
+with ``ALTER TABLE ... DROP/EXCHANGE PARTITION`` instead of a large DELETE.
+Partitions are added as months are archived.  Rows keep their ``log_id``,
+and the browsing API can read both tables.
+
+Run from cron with ``python -m backend.scripts.archive_admin_logs``.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from .schema import schema_guard
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = "admin_logs_archive"
+ARCHIVE_BATCH = 1000
+DEFAULT_HOT_MONTHS = 6
+
+_COLUMNS = "log_id, admin_id, action_type, entity_type, entity_id, description, `timestamp`"
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index,))
+    return bool(cursor.fetchall())
+
+
+@schema_guard("admin_logs_browse_indexes")
+def _ensure_admin_logs_indexes(db) -> None:
+    """Add the keyset indexes used by ``GET /api/logs``.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        indexes = {
+            "idx_admin_logs_entity_time": "(entity_type, `timestamp`)",
+            "idx_admin_logs_admin_time": "(admin_id, `timestamp`)",
+            "idx_admin_logs_time": "(`timestamp`)",
+        }
+        for name, columns in indexes.items():
+            if not _index_exists(cursor, "admin_logs", name):
+                cursor.execute(f"ALTER TABLE admin_logs ADD INDEX {name} {columns}")
+        db.commit()
+    finally:
+        cursor.close()
+
+
+@schema_guard("admin_logs_archive_table")
+def _ensure_admin_logs_archive_table(db) -> None:
+    """Create the monthly-partitioned admin_logs_archive table if it does not yet exist.
+
+    The partitioning column must be part of every unique key, hence the
+    ``(log_id, timestamp)`` primary key; partitioned tables cannot have
+    foreign keys, so admin_id is not constrained here.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (
+                log_id INT NOT NULL,
+                admin_id INT NOT NULL,
+                action_type VARCHAR(16) NOT NULL,
+                entity_type VARCHAR(32) NOT NULL,
+                entity_id INT NOT NULL,
+                description TEXT,
+                `timestamp` DATETIME NOT NULL,
+                archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (log_id, `timestamp`),
+                KEY idx_admin_logs_archive_entity_time (entity_type, `timestamp`),
+                KEY idx_admin_logs_archive_admin_time (admin_id, `timestamp`),
+                KEY idx_admin_logs_archive_time (`timestamp`)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            PARTITION BY RANGE COLUMNS(`timestamp`) (
+                PARTITION p_future VALUES LESS THAN (MAXVALUE)
+            )
+            """
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+# ---------------------------------------------------------------------------
+# Archiving
+# ---------------------------------------------------------------------------
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def archive_cutoff(today: date, hot_months: int) -> date:
+    """Return the first day of the oldest month kept in ``admin_logs``.
+
+    Args:
+        today: Reference date.
+        hot_months: Calendar months kept hot, including the current one.
+    """
+    months = today.year * 12 + today.month - 1 - (max(1, hot_months) - 1)
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _partition_bounds(cursor) -> List[date]:
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME
+          FROM information_schema.PARTITIONS
+         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME LIKE 'p______'
+        """,
+        (ARCHIVE_TABLE,),
+    )
+    bounds = []
+    for row in cursor.fetchall() or []:
+        name = row[0]
+        # pYYYYMM holds that month; its upper bound is the next month's first day.
+        bounds.append(_next_month(date(int(name[1:5]), int(name[5:7]), 1)))
+    return sorted(bounds)
+
+
+def _ensure_partitions(cursor, oldest: date, cutoff: date) -> int:
+    """Split ``p_future`` so every month from ``oldest`` up to ``cutoff`` has a partition."""
+    bounds = _partition_bounds(cursor)
+    month = _month_start(oldest)
+    if bounds and bounds[-1] > month:
+        month = bounds[-1]
+    new_parts = []
+    while month < cutoff:
+        upper = _next_month(month)
+        new_parts.append(
+            f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper.isoformat()} 00:00:00')"
+        )
+        month = upper
+    if not new_parts:
+        return 0
+    cursor.execute(
+        f"ALTER TABLE {ARCHIVE_TABLE} REORGANIZE PARTITION p_future INTO ("
+        + ", ".join(new_parts)
+        + ", PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+    )
+    return len(new_parts)
+
+
+def archive_admin_logs(
+    db,
+    hot_months: int = DEFAULT_HOT_MONTHS,
+    batch_size: int = ARCHIVE_BATCH,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Move admin logs older than ``hot_months`` months into the archive, in batches.
+
+    Each batch copies up to ``batch_size`` rows and deletes them from the hot
+    table in one short transaction, so a crash never loses or duplicates a
+    row (the copy is ``INSERT IGNORE`` on the archive's primary key).
+
+    Args:
+        db: mysql.connector connection.
+        hot_months: Calendar months kept in ``admin_logs``, including the current one.
+        batch_size: Rows moved per transaction.
+        today: Reference date (defaults to today).
+
+    Returns:
+        Dict with ``cutoff`` (ISO date), ``moved`` rows and ``partitions_added``.
+    """
+    cutoff = archive_cutoff(today or date.today(), hot_months)
+    cutoff_at = datetime.combine(cutoff, datetime.min.time())
+    cursor = db.cursor()
+    moved = 0
+    partitions_added = 0
+    try:
+        cursor.execute(
+            "SELECT MIN(`timestamp`) FROM admin_logs WHERE `timestamp` < %s", (cutoff_at,)
+        )
+        row = cursor.fetchone()
+        oldest = row[0] if row else None
+        if oldest is None:
+            return {"cutoff": cutoff.isoformat(), "moved": 0, "partitions_added": 0}
+        partitions_added = _ensure_partitions(cursor, oldest.date(), cutoff)
+        while True:
+            cursor.execute(
+                """
+                SELECT log_id
+                  FROM admin_logs
+                 WHERE `timestamp` < %s
+                 ORDER BY `timestamp`, log_id
+                 LIMIT %s
+                """,
+                (cutoff_at, batch_size),
+            )
+            ids = [int(r[0]) for r in cursor.fetchall() or []]
+            if not ids:
+                break
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"""
+                INSERT IGNORE INTO {ARCHIVE_TABLE} ({_COLUMNS})
+                SELECT {_COLUMNS} FROM admin_logs WHERE log_id IN ({placeholders})
+                """,
+                tuple(ids),
+            )
+            cursor.execute(f"DELETE FROM admin_logs WHERE log_id IN ({placeholders})", tuple(ids))
+            db.commit()
+            moved += len(ids)
+            if len(ids) < batch_size:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    if moved:
+        logger.info("Archived %d admin logs older than %s", moved, cutoff.isoformat())
+    return {"cutoff": cutoff.isoformat(), "moved": moved, "partitions_added": partitions_added}
@@ -1,13 +1,25 @@
 """JWT token helpers and FastAPI auth dependency functions.
 
 These are shared across all routers that need authentication.
+
+Verified access tokens are kept in a bounded per-worker LRU keyed by the
+SHA-256 of the token, so repeat requests skip signature verification and
+role parsing for up to ``AUTH_TOKEN_CACHE_TTL_SEC`` (never past the token's
+``exp``).  Revocations are persisted: logout stores the token hash in
+``revoked_access_tokens`` and signing a customer out everywhere sets
+``customers.tokens_valid_after``.  Both are read on every cache miss, so a
+revocation made on one worker reaches the others within the cache TTL; the
+worker that made it also remembers it in memory and rejects the token at once.
 """
 
 from __future__ import annotations
 
+import hashlib
+import logging
+import threading
 import time
-import uuid
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
 
 import bcrypt
 import jwt
@@ -17,16 +29,24 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from ..config import (
     ACCESS_TOKEN_TTL_SEC,
     ALGORITHM,
+    AUTH_TOKEN_CACHE_SIZE,
+    AUTH_TOKEN_CACHE_TTL_SEC,
+    BCRYPT_ROUNDS,
     COOKIE_DOMAIN,
     COOKIE_SAMESITE,
     COOKIE_SECURE,
     REFRESH_TOKEN_TTL_SEC,
     SECRET_KEY,
 )
+from .schema import schema_guard
+
+logger = logging.getLogger(__name__)
 
 ADMIN_ROLE_CODE = "admin"
 DEVELOPER_ROLE_CODE = "developer"
 
+REVOKED_PRUNE_BATCH = 100
+
 # ---------------------------------------------------------------------------
 # JWT helpers
 # ---------------------------------------------------------------------------
@@ -61,17 +81,21 @@ def create_access_token(sub: dict) -> str:
     return _create_jwt({"sub": sub, "type": "access"}, ACCESS_TOKEN_TTL_SEC)
 
 
-def create_refresh_token(sub: dict, jti: str) -> str:
+def create_refresh_token(sub: dict, jti: str, family_id: Optional[str] = None) -> str:
     """Create a refresh token for the given subject payload.
 
     Args:
         sub: Dict representing the authenticated user.
-        jti: Unique JWT ID (use str(uuid.uuid4())).
+        jti: Unique JWT ID (the refresh session's jti).
+        family_id: Refresh session family, embedded as the "fam" claim.
 
     Returns:
         Signed JWT refresh token string.
     """
-    return _create_jwt({"sub": sub, "type": "refresh", "jti": jti}, REFRESH_TOKEN_TTL_SEC)
+    payload = {"sub": sub, "type": "refresh", "jti": jti}
+    if family_id is not None:
+        payload["fam"] = family_id
+    return _create_jwt(payload, REFRESH_TOKEN_TTL_SEC)
 
 
 def decode_token(token: str) -> dict:
@@ -106,7 +130,7 @@ def hash_password(plain: str) -> str:
     Returns:
         Bcrypt-hashed password string.
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(plain.encode(), salt).decode()
 
 
@@ -164,6 +188,325 @@ def clear_cookie(resp: Response, name: str) -> None:
     resp.delete_cookie(key=name, domain=COOKIE_DOMAIN, path="/")
 
 
+# ---------------------------------------------------------------------------
+# Verified-token cache
+# ---------------------------------------------------------------------------
+
+
+def _parse_role_codes(sub: Dict[str, Any]) -> FrozenSet[str]:
+    role_codes = sub.get("role_codes")
+    if isinstance(role_codes, list):
+        codes = {code for code in role_codes if isinstance(code, str)}
+    elif isinstance(role_codes, str):
+        codes = {role_codes}
+    else:
+        codes = set()
+    legacy_role = sub.get("role")
+    if isinstance(legacy_role, str):
+        codes.add(legacy_role)
+    return frozenset(codes)
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("AuthenticatedUser is shared between requests; copy it with dict(user)")
+
+
+class AuthenticatedUser(dict):
+    """The JWT ``sub`` claim of a verified access token, parsed once.
+
+    Behaves like the plain payload dict routers already use, plus
+    ``role_code_set`` (role codes and the legacy ``role`` as a frozenset),
+    ``issued_at`` and ``expires_at``.  Instances are shared between requests
+    through the token cache, so they are read-only.
+    """
+
+    __slots__ = ("role_code_set", "issued_at", "expires_at")
+
+    def __init__(self, sub: Dict[str, Any], issued_at: int, expires_at: int) -> None:
+        super().__init__(sub)
+        self.role_code_set = _parse_role_codes(sub)
+        self.issued_at = issued_at
+        self.expires_at = expires_at
+
+    def has_role(self, role_code: str) -> bool:
+        """Return True if the user holds ``role_code``."""
+        return role_code in self.role_code_set
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    __ior__ = _read_only
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified access tokens with hit/miss counters and revocation.
+
+    Args:
+        maxsize: Maximum number of cached tokens; 0 disables caching (revocation
+            still applies).
+        ttl: Seconds an entry is served before the token is verified again.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = AUTH_TOKEN_CACHE_TTL_SEC) -> None:
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Token hash -> (user, monotonic deadline of the entry).
+        self._entries: "OrderedDict[bytes, Tuple[AuthenticatedUser, float]]" = OrderedDict()
+        # Token hash -> exp of revoked tokens; customer_id -> revocation time.
+        self._revoked: Dict[bytes, int] = {}
+        self._revoked_before: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        """Return the cache key for a raw token."""
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes, now: float) -> Optional[AuthenticatedUser]:
+        """Return the cached user for ``key`` if present and neither it nor the token expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user, deadline = entry
+                if user.expires_at > now and deadline > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return user
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, user: AuthenticatedUser) -> None:
+        """Cache a freshly verified user unless its token was revoked meanwhile."""
+        if not self.maxsize:
+            return
+        with self._lock:
+            if self._is_revoked(key, user):
+                return
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def is_revoked(self, key: bytes, user: AuthenticatedUser) -> bool:
+        """Return True if the token or all of its subject's tokens were revoked."""
+        with self._lock:
+            return self._is_revoked(key, user)
+
+    def _is_revoked(self, key: bytes, user: AuthenticatedUser) -> bool:
+        if key in self._revoked:
+            return True
+        cutoff = self._revoked_before.get(user.get("customer_id"))
+        return cutoff is not None and user.issued_at < cutoff
+
+    def revoke(self, key: bytes, expires_at: int) -> None:
+        """Reject the token with ``key`` until ``expires_at``."""
+        now = int(time.time())
+        with self._lock:
+            self._entries.pop(key, None)
+            self._revoked = {k: exp for k, exp in self._revoked.items() if exp > now}
+            self._revoked[key] = expires_at
+
+    def revoke_subject(self, customer_id: int) -> None:
+        """Reject every token issued to ``customer_id`` before now."""
+        now = int(time.time())
+        with self._lock:
+            self._revoked_before = {
+                cid: cutoff
+                for cid, cutoff in self._revoked_before.items()
+                if cutoff + ACCESS_TOKEN_TTL_SEC > now
+            }
+            self._revoked_before[customer_id] = now
+            stale = [k for k, (user, _) in self._entries.items() if self._is_revoked(k, user)]
+            for k in stale:
+                del self._entries[k]
+
+    def clear(self) -> None:
+        """Drop every cached token and reset the counters (revocations are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size, hit/miss counters and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_sec": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "revoked_tokens": len(self._revoked),
+            }
+
+
+_token_cache = VerifiedTokenCache(AUTH_TOKEN_CACHE_SIZE)
+
+
+@schema_guard("access_token_revocations")
+def _ensure_revocation_storage(db) -> None:
+    """Create revoked_access_tokens and add customers.tokens_valid_after if absent.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS revoked_access_tokens (
+                token_hash BINARY(32) NOT NULL,
+                expires_at DATETIME NOT NULL,
+                PRIMARY KEY (token_hash),
+                KEY idx_revoked_access_tokens_expires (expires_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        cursor.execute("SHOW COLUMNS FROM customers LIKE 'tokens_valid_after'")
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "ALTER TABLE customers ADD COLUMN tokens_valid_after TIMESTAMP NULL DEFAULT NULL"
+            )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def _is_revoked_in_db(key: bytes, user: AuthenticatedUser) -> bool:
+    """Return True if the token or all of its subject's tokens were revoked on any worker.
+
+    Args:
+        key: Cache key (SHA-256) of the token.
+        user: The token's verified user.
+
+    Returns:
+        True if ``revoked_access_tokens`` holds the token or it was issued
+        before its customer's ``tokens_valid_after``.
+    """
+    from ..db import get_raw_db
+
+    db = get_raw_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            """
+            SELECT EXISTS(
+                       SELECT 1 FROM revoked_access_tokens
+                        WHERE token_hash = %s AND expires_at > NOW()
+                   ) AS token_revoked,
+                   (SELECT UNIX_TIMESTAMP(tokens_valid_after)
+                      FROM customers WHERE customer_id = %s) AS valid_after
+            """,
+            (key, user.get("customer_id")),
+        )
+        row = cursor.fetchone() or {}
+    finally:
+        cursor.close()
+        db.close()
+    if row.get("token_revoked"):
+        return True
+    valid_after = row.get("valid_after")
+    return valid_after is not None and user.issued_at < int(valid_after)
+
+
+def _verify_access_token(token: str) -> Optional[AuthenticatedUser]:
+    """Return the verified user of an access token, or None if it is not valid.
+
+    Args:
+        token: Encoded JWT string.
+
+    Returns:
+        AuthenticatedUser, or None for a bad, expired, revoked or non-access token.
+    """
+    key = VerifiedTokenCache.key(token)
+    user = _token_cache.get(key, time.time())
+    if user is not None:
+        return user
+    try:
+        payload = decode_token(token)
+    except Exception:
+        return None
+    sub = payload.get("sub")
+    if payload.get("type") != "access" or not isinstance(sub, dict):
+        return None
+    user = AuthenticatedUser(sub, int(payload.get("iat") or 0), int(payload["exp"]))
+    if _token_cache.is_revoked(key, user):
+        return None
+    try:
+        revoked = _is_revoked_in_db(key, user)
+    except Exception:
+        logger.warning("Could not read access token revocations", exc_info=True)
+        raise HTTPException(status_code=503, detail="Authentication temporarily unavailable")
+    if revoked:
+        return None
+    _token_cache.put(key, user)
+    return user
+
+
+def revoke_access_token(cursor, token: str) -> None:
+    """Reject an access token from now on (logout).
+
+    The token hash is stored in ``revoked_access_tokens`` until the token's
+    ``exp``; other workers refuse it once their cached copy ages out.  A few
+    expired rows are pruned on the way.
+
+    Args:
+        cursor: Cursor on the caller's connection; the caller commits.
+        token: Encoded JWT string; invalid tokens are ignored.
+    """
+    try:
+        payload = decode_token(token)
+    except Exception:
+        return
+    key = VerifiedTokenCache.key(token)
+    expires_at = int(payload["exp"])
+    cursor.execute(
+        "DELETE FROM revoked_access_tokens WHERE expires_at < NOW() ORDER BY expires_at LIMIT %s",
+        (REVOKED_PRUNE_BATCH,),
+    )
+    cursor.execute(
+        """
+        INSERT INTO revoked_access_tokens (token_hash, expires_at)
+        VALUES (%s, NOW() + INTERVAL %s SECOND)
+        ON DUPLICATE KEY UPDATE expires_at = VALUES(expires_at)
+        """,
+        (key, max(0, expires_at - int(time.time()))),
+    )
+    _token_cache.revoke(key, expires_at)
+
+
+def revoke_user_tokens(cursor, customer_ids: Iterable[int]) -> None:
+    """Reject every access token issued to the given customers before now.
+
+    Sets ``customers.tokens_valid_after``; other workers refuse the older
+    tokens once their cached copies age out.
+
+    Args:
+        cursor: Cursor on the caller's connection; the caller commits.
+        customer_ids: Customers whose tokens must stop working.
+    """
+    ids = sorted({int(value) for value in customer_ids})
+    if not ids:
+        return
+    cursor.execute(
+        f"""
+        UPDATE customers SET tokens_valid_after = FROM_UNIXTIME(%s)
+         WHERE customer_id IN ({', '.join(['%s'] * len(ids))})
+        """,
+        (int(time.time()), *ids),
+    )
+    for customer_id in ids:
+        _token_cache.revoke_subject(customer_id)
+
+
+def token_cache_stats() -> Dict[str, Any]:
+    """Return the verified-token cache counters for this worker."""
+    return _token_cache.stats()
+
+
 # ---------------------------------------------------------------------------
 # Auth dependencies
 # ---------------------------------------------------------------------------
@@ -181,6 +524,8 @@ def _user_has_role(user: Dict[str, Any], role_code: str) -> bool:
     Returns:
         True if the user has the role.
     """
+    if isinstance(user, AuthenticatedUser):
+        return role_code in user.role_code_set
     role_codes = user.get("role_codes")
     if isinstance(role_codes, list):
         if role_code in role_codes:
@@ -220,18 +565,15 @@ def get_current_user(
         creds: Optional Bearer credentials from Authorization header.
 
     Returns:
-        Decoded user payload dict from JWT sub claim.
+        Read-only AuthenticatedUser built from the JWT sub claim.
     """
     token = _read_access_token(request, creds)
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        payload = decode_token(token)
-        if payload.get("type") != "access":
-            raise ValueError("wrong token type")
-        return payload["sub"]
-    except Exception:
+    user = _verify_access_token(token)
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return user
 
 
 def get_optional_user(
@@ -245,18 +587,12 @@ def get_optional_user(
         creds: Optional Bearer credentials from Authorization header.
 
     Returns:
-        Decoded user payload dict or None.
+        Read-only AuthenticatedUser or None.
     """
     token = _read_access_token(request, creds)
     if not token:
         return None
-    try:
-        payload = decode_token(token)
-        if payload.get("type") != "access":
-            return None
-        return payload["sub"]
-    except Exception:
-        return None
+    return _verify_access_token(token)
 
 
 def admin_required(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
@@ -0,0 +1,408 @@
+"""Per-worker catalog snapshot for the item listing endpoints.
+
+``/api/products/items`` and ``/api/menu/available-items`` used to rebuild the
+item catalog (items + categories + component types + bld maps + plated flags)
+on every request.  The catalog only changes a few times a day, so each worker
+now holds one immutable ``CatalogSnapshot`` built in a single pass and serves
+every filter variant from precomputed indexes, rendered once to JSON and
+tagged with an ETag.
+
+Freshness across workers is tracked by ``catalog_state.version``.  Every
+catalog write in ``routers/products.py`` calls ``bump_catalog_version`` inside
+its own transaction; readers compare the stored version with the snapshot's
+and rebuild (then swap the module-level reference) when it moved.  Discount
+writes bump a separate row (``CATALOG_STATE_DISCOUNTS``) so they do not
+invalidate the item snapshot, and menu stock changes bump
+``CATALOG_STATE_STOCK`` for the low-stock watcher (``stock_watcher.py``).
+
+Env overrides:
+    CATALOG_VERSION_CHECK_SEC — reuse the last version check for this many
+                                seconds (default 0: check on every request)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .helpers import (
+    CONDIMENTS_BLD_TYPE,
+    _build_item_detail_columns,
+    _row_value,
+    get_items_columns,
+    normalize_meal_type,
+)
+from .schema import schema_guard
+
+VERSION_CHECK_SEC = float(os.getenv("CATALOG_VERSION_CHECK_SEC", "0"))
+
+CATALOG_STATE_ITEMS = 1
+CATALOG_STATE_DISCOUNTS = 2
+CATALOG_STATE_STOCK = 3
+
+_COMBO_COLUMNS = """
+    c.combo_id,
+    c.combo_name AS name,
+    NULL AS description,
+    NULL AS alias,
+    c.category_id,
+    cat.category_name,
+    NULL AS component_type_id,
+    NULL AS component_type_name,
+    'combo' AS uom_customer,
+    'combo' AS uom,
+    1 AS unit_packing,
+    'combo' AS uom_packing,
+    NULL AS hsn_code,
+    'combo' AS uom_production,
+    1 AS packing_to_production_rate,
+    NULL AS buffer_percentage,
+    NULL AS max_qty_breakfast,
+    NULL AS max_qty_lunch,
+    NULL AS max_qty_dinner,
+    NULL AS max_qty_condiments,
+    NULL AS picture_url,
+    c.price AS breakfast_price,
+    c.price AS lunch_price,
+    c.price AS dinner_price,
+    NULL AS condiments_price,
+    c.price AS festival_price,
+    NULL AS cgst,
+    NULL AS sgst,
+    NULL AS igst,
+    c.price AS net_price,
+    1 AS is_combo
+"""
+
+
+@schema_guard("catalog_state_table", version=3)
+def _ensure_catalog_state_table(db) -> None:
+    """Create the catalog_state table holding one version counter per cached scope.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS catalog_state (
+                id TINYINT NOT NULL,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        cursor.execute(
+            "INSERT IGNORE INTO catalog_state (id, version) VALUES (%s, 0), (%s, 0), (%s, 0)",
+            (CATALOG_STATE_ITEMS, CATALOG_STATE_DISCOUNTS, CATALOG_STATE_STOCK),
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of the product catalog plus lookup indexes."""
+
+    version: int
+    items: Tuple[Dict[str, Any], ...]
+    combos: Tuple[Dict[str, Any], ...]
+    categories: Tuple[Dict[str, Any], ...]
+    component_types: Tuple[Dict[str, Any], ...]
+    bld_ids_by_type: Dict[str, int]
+    condiments_bld_id: Optional[int]
+    item_ids_by_bld: Dict[int, Tuple[int, ...]]
+    combo_ids_by_bld: Dict[int, Tuple[int, ...]]
+    plated_item_ids: FrozenSet[int]
+    condiment_item_ids: FrozenSet[int]
+    combo_ids_by_item: Dict[int, Tuple[int, ...]]
+    _rendered: Dict[Hashable, Tuple[str, bytes]] = field(default_factory=dict, compare=False)
+    _render_lock: threading.Lock = field(default_factory=threading.Lock, compare=False)
+
+    def bld_id_for(self, bld_type: str) -> Optional[int]:
+        """Return the bld_id for a meal type name, normalised like ``resolve_bld_id``."""
+        return self.bld_ids_by_type.get(normalize_meal_type(bld_type).lower())
+
+    def list_items(
+        self,
+        *,
+        only_condiments: bool = False,
+        include_plated: bool = False,
+        condiment_type_id: Optional[int] = None,
+        bld_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Filter the snapshot's items using the precomputed indexes.
+
+        Args:
+            only_condiments: Keep only condiment items.
+            include_plated: Keep plated items (excluded by default).
+            condiment_type_id: Keep only items of this condiment type.
+            bld_id: Keep only items mapped to this meal.
+
+        Returns:
+            Item dicts in item_id order (shared; do not mutate).
+        """
+        allowed: Optional[set] = None
+        if bld_id is not None:
+            allowed = set(self.item_ids_by_bld.get(int(bld_id), ()))
+        result: List[Dict[str, Any]] = []
+        for item in self.items:
+            item_id = item["item_id"]
+            if allowed is not None and item_id not in allowed:
+                continue
+            if not include_plated and item_id in self.plated_item_ids:
+                continue
+            if only_condiments and item_id not in self.condiment_item_ids:
+                continue
+            if condiment_type_id is not None and item.get("condiment_type_id") != condiment_type_id:
+                continue
+            result.append(item)
+        return result
+
+    def list_combos(self, bld_id: int) -> List[Dict[str, Any]]:
+        """Return combos mapped to a meal, ordered by name."""
+        allowed = set(self.combo_ids_by_bld.get(int(bld_id), ()))
+        return [combo for combo in self.combos if combo["combo_id"] in allowed]
+
+    def rendered(self, key: Hashable, build) -> Tuple[str, bytes]:
+        """Return (etag, JSON body) for a filter variant, rendering it once per snapshot.
+
+        Args:
+            key: Hashable description of the variant (endpoint + filters).
+            build: Zero-arg callable returning the response payload.
+
+        Returns:
+            Tuple of quoted ETag string and UTF-8 JSON bytes.
+        """
+        cached = self._rendered.get(key)
+        if cached is not None:
+            return cached
+        with self._render_lock:
+            cached = self._rendered.get(key)
+            if cached is None:
+                body = json.dumps(jsonable_encoder(build()), separators=(",", ":")).encode()
+                digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+                cached = (f'"cat{self.version}-{digest}"', body)
+                self._rendered[key] = cached
+        return cached
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_build_lock = threading.Lock()
+_last_checked_at = 0.0
+_last_seen_version: Optional[int] = None
+
+
+def _read_version(cursor) -> int:
+    cursor.execute("SELECT version FROM catalog_state WHERE id = %s", (CATALOG_STATE_ITEMS,))
+    return _row_value(cursor.fetchone(), "version", 0) or 0
+
+
+def read_catalog_versions(cursor) -> Dict[int, int]:
+    """Return every catalog_state version counter in one query.
+
+    Args:
+        cursor: Dictionary cursor.
+
+    Returns:
+        Dict mapping state id (``CATALOG_STATE_*``) to its version.
+    """
+    cursor.execute("SELECT id, version FROM catalog_state")
+    return {int(row["id"]): int(row["version"] or 0) for row in cursor.fetchall() or []}
+
+
+def bump_catalog_version(cursor, state_id: int = CATALOG_STATE_ITEMS) -> None:
+    """Mark the catalog as changed; call inside the writing transaction before commit.
+
+    Args:
+        cursor: Cursor on the connection performing the catalog write.
+        state_id: Which counter to bump (``CATALOG_STATE_ITEMS`` or ``CATALOG_STATE_DISCOUNTS``).
+    """
+    global _last_checked_at
+    cursor.execute("UPDATE catalog_state SET version = version + 1 WHERE id = %s", (state_id,))
+    # Force this worker to re-read the version on its next catalog request.
+    _last_checked_at = 0.0
+
+
+def _item_select_columns(available_columns) -> List[str]:
+    columns = _build_item_detail_columns(available_columns)
+    if "condiment_type_id" in available_columns:
+        columns += ["i.condiment_type_id", "cdt.name AS condiment_type_name"]
+    else:
+        columns += ["NULL AS condiment_type_id", "NULL AS condiment_type_name"]
+    return columns
+
+
+def build_catalog_snapshot(cursor, version: int) -> CatalogSnapshot:
+    """Load the full catalog in one pass and index it.
+
+    Args:
+        cursor: Dictionary cursor.
+        version: catalog_state version the snapshot corresponds to.
+
+    Returns:
+        A new CatalogSnapshot.
+    """
+    available_columns = get_items_columns(cursor)
+
+    cursor.execute("SELECT bld_id, bld_type FROM bld")
+    bld_ids_by_type = {
+        str(row["bld_type"]).strip().lower(): int(row["bld_id"])
+        for row in cursor.fetchall() or []
+        if row.get("bld_type") is not None
+    }
+    condiments_bld_id = bld_ids_by_type.get(CONDIMENTS_BLD_TYPE.lower())
+
+    select_sql = ",\n            ".join(_item_select_columns(available_columns))
+    join_condiment_type = (
+        "LEFT JOIN condiment_types cdt ON i.condiment_type_id = cdt.condiment_type_id"
+        if "condiment_type_id" in available_columns
+        else ""
+    )
+    cursor.execute(
+        f"""
+        SELECT
+            {select_sql}
+        FROM items i
+        LEFT JOIN categories c ON i.category_id = c.category_id
+        LEFT JOIN component_types ct ON i.component_type_id = ct.component_type_id
+        {join_condiment_type}
+        ORDER BY i.item_id
+        """
+    )
+    items = cursor.fetchall() or []
+
+    cursor.execute("SELECT item_id, bld_id FROM item_bld_map ORDER BY item_id, bld_id")
+    item_blds: Dict[int, List[int]] = {}
+    item_ids_by_bld: Dict[int, List[int]] = {}
+    for row in cursor.fetchall() or []:
+        item_blds.setdefault(int(row["item_id"]), []).append(int(row["bld_id"]))
+        item_ids_by_bld.setdefault(int(row["bld_id"]), []).append(int(row["item_id"]))
+
+    cursor.execute("SELECT item_id FROM plated_items")
+    plated_item_ids = frozenset(
+        int(row["item_id"]) for row in cursor.fetchall() or [] if row.get("item_id") is not None
+    )
+
+    condiment_item_ids = set()
+    for item in items:
+        item_id = int(item["item_id"])
+        item["bld_ids"] = item_blds.get(item_id, [])
+        item["is_plated"] = item_id in plated_item_ids
+        # The listing endpoints never exposed items.is_combo; keep their shape.
+        item.pop("is_combo", None)
+        item["is_condiment"] = (
+            condiments_bld_id is not None and condiments_bld_id in item["bld_ids"]
+        )
+        if item["is_condiment"]:
+            condiment_item_ids.add(item_id)
+
+    cursor.execute(
+        f"""
+        SELECT {_COMBO_COLUMNS}
+        FROM combos c
+        LEFT JOIN categories cat ON c.category_id = cat.category_id
+        ORDER BY c.combo_name ASC
+        """
+    )
+    combos = cursor.fetchall() or []
+    cursor.execute("SELECT combo_id, bld_id FROM combo_bld_map ORDER BY combo_id, bld_id")
+    combo_blds: Dict[int, List[int]] = {}
+    combo_ids_by_bld: Dict[int, List[int]] = {}
+    for row in cursor.fetchall() or []:
+        combo_blds.setdefault(int(row["combo_id"]), []).append(int(row["bld_id"]))
+        combo_ids_by_bld.setdefault(int(row["bld_id"]), []).append(int(row["combo_id"]))
+    for combo in combos:
+        combo["bld_ids"] = combo_blds.get(int(combo["combo_id"]), [])
+        combo["item_id"] = None
+        combo["is_plated"] = False
+        combo["is_condiment"] = False
+
+    cursor.execute("SELECT DISTINCT combo_id, item_id FROM combo_items WHERE item_id IS NOT NULL")
+    combo_ids_by_item: Dict[int, List[int]] = {}
+    for row in cursor.fetchall() or []:
+        combo_ids_by_item.setdefault(int(row["item_id"]), []).append(int(row["combo_id"]))
+
+    cursor.execute("SELECT category_id, category_name FROM categories ORDER BY category_name")
+    categories = cursor.fetchall() or []
+    cursor.execute("SELECT component_type_id, name FROM component_types ORDER BY name")
+    component_types = cursor.fetchall() or []
+
+    return CatalogSnapshot(
+        version=version,
+        items=tuple(items),
+        combos=tuple(combos),
+        categories=tuple(categories),
+        component_types=tuple(component_types),
+        bld_ids_by_type=bld_ids_by_type,
+        condiments_bld_id=condiments_bld_id,
+        item_ids_by_bld={k: tuple(v) for k, v in item_ids_by_bld.items()},
+        combo_ids_by_bld={k: tuple(v) for k, v in combo_ids_by_bld.items()},
+        plated_item_ids=plated_item_ids,
+        condiment_item_ids=frozenset(condiment_item_ids),
+        combo_ids_by_item={k: tuple(sorted(set(v))) for k, v in combo_ids_by_item.items()},
+    )
+
+
+def get_catalog_snapshot(cursor) -> CatalogSnapshot:
+    """Return the current snapshot, rebuilding it if the catalog version moved.
+
+    Args:
+        cursor: Dictionary cursor (used for the version check and any rebuild).
+
+    Returns:
+        The up-to-date CatalogSnapshot.
+    """
+    global _snapshot, _last_checked_at, _last_seen_version
+    current = _snapshot
+    now = time.monotonic()
+    if (
+        current is not None
+        and VERSION_CHECK_SEC > 0
+        and now - _last_checked_at < VERSION_CHECK_SEC
+        and _last_seen_version == current.version
+    ):
+        return current
+
+    version = _read_version(cursor)
+    _last_checked_at = now
+    _last_seen_version = version
+    if current is not None and current.version == version:
+        return current
+
+    with _build_lock:
+        current = _snapshot
+        if current is not None and current.version == version:
+            return current
+        fresh = build_catalog_snapshot(cursor, version)
+        _snapshot = fresh
+        return fresh
+
+
+def etag_response(request: Request, etag: str, body: bytes) -> Response:
+    """Build a JSON response with an ETag, or a 304 when the client already has it.
+
+    Args:
+        request: Incoming request (for If-None-Match).
+        etag: Quoted ETag value.
+        body: Pre-rendered JSON bytes.
+
+    Returns:
+        A Response.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match") or ""
+    if etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
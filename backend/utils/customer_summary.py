@@ -0,0 +1,230 @@
+"""Per (customer, city) summary rows for the admin customer list and counts.
+
+The admin customer list used to rank every address in a city with
+``ROW_NUMBER()`` and scan all orders twice for completed / pending counts on
+each page.  ``customer_city_summary`` keeps that work precomputed: one row per
+(customer, city) holding the primary active address, its route, the completed
+and pending order counts and the last order time.  The list and the dashboard
+count become range scans on ``(city_code, customer_created_at, customer_id)``.
+
+Rows are maintained by the write paths themselves: every handler that inserts
+or updates addresses or orders calls ``refresh_customer_city_summary`` with the
+touched customer ids (or order ids) before its commit, so the summary moves in
+the same transaction as the data.  A refresh recomputes the affected
+customers' rows from ``addresses`` and ``orders`` rather than applying deltas,
+so it is correct whatever the previous status of an order was.
+
+Writes that bypass the application (manual SQL, NL-generated updates) are
+reconciled by ``rebuild_customer_city_summary``, exposed as
+``python -m backend.scripts.rebuild_customer_city_summary``.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Iterable, List, Optional, Sequence
+
+from .schema import GUARD_KIND_SEED, schema_guard
+
+logger = logging.getLogger(__name__)
+
+REFRESH_BATCH_SIZE = 500
+
+COMPLETED_STATUSES = ("delivered",)
+PENDING_STATUSES = ("confirmed", "dispatched")
+
+# A (customer, city) key exists while the customer has an active address in
+# the city or has ordered to one of its addresses there.  address_id stays
+# NULL for keys that only carry order history; the list skips those.
+_SUMMARY_SELECT_SQL = """
+    SELECT
+        k.customer_id,
+        k.city_code,
+        pa.address_id,
+        pa.route_id,
+        COALESCE(oc.completed_orders, 0),
+        COALESCE(oc.pending_orders, 0),
+        oc.last_order_at,
+        c.created_at
+    FROM (
+        SELECT addr.customer_id, addr.city_code
+          FROM addresses addr
+         WHERE addr.is_active = 1 {addr_filter}
+        UNION
+        SELECT o.customer_id, ao.city_code
+          FROM orders o
+          JOIN addresses ao ON ao.address_id = o.address_id
+         WHERE 1=1 {order_filter}
+    ) k
+    JOIN customers c ON c.customer_id = k.customer_id
+    LEFT JOIN (
+        SELECT ranked.customer_id, ranked.city_code, ranked.address_id, ranked.route_id
+          FROM (
+            SELECT addr.customer_id, addr.city_code, addr.address_id, addr.route_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY addr.customer_id, addr.city_code
+                       ORDER BY addr.is_default DESC, addr.address_id DESC
+                   ) AS rn
+              FROM addresses addr
+             WHERE addr.is_active = 1 {addr_filter}
+          ) ranked
+         WHERE ranked.rn = 1
+    ) pa ON pa.customer_id = k.customer_id AND pa.city_code = k.city_code
+    LEFT JOIN (
+        SELECT o.customer_id,
+               ao.city_code,
+               SUM(LOWER(COALESCE(o.status, '')) IN ({completed})) AS completed_orders,
+               SUM(LOWER(COALESCE(o.status, '')) IN ({pending})) AS pending_orders,
+               MAX(o.created_at) AS last_order_at
+          FROM orders o
+          JOIN addresses ao ON ao.address_id = o.address_id
+         WHERE 1=1 {order_filter}
+         GROUP BY o.customer_id, ao.city_code
+    ) oc ON oc.customer_id = k.customer_id AND oc.city_code = k.city_code
+"""
+
+_SUMMARY_INSERT_SQL = """
+    INSERT INTO customer_city_summary (
+        customer_id, city_code, address_id, route_id,
+        completed_orders, pending_orders, last_order_at, customer_created_at
+    )
+"""
+
+
+@schema_guard("customer_city_summary_table")
+def _ensure_customer_city_summary_table(db) -> None:
+    """Create the customer_city_summary table if it does not yet exist.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS customer_city_summary (
+                customer_id INT NOT NULL,
+                city_code VARCHAR(3) NOT NULL,
+                address_id INT NULL,
+                route_id INT NULL,
+                completed_orders INT NOT NULL DEFAULT 0,
+                pending_orders INT NOT NULL DEFAULT 0,
+                last_order_at TIMESTAMP NULL,
+                customer_created_at DATETIME NULL,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (customer_id, city_code),
+                KEY idx_ccs_city_created (city_code, customer_created_at, customer_id),
+                KEY idx_ccs_address (address_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+@schema_guard("customer_city_summary_backfill", kind=GUARD_KIND_SEED)
+def _backfill_customer_city_summary(db) -> None:
+    """Populate customer_city_summary once after the table is created.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    rebuild_customer_city_summary(db)
+
+
+def _summary_sql(addr_filter: str = "", order_filter: str = "") -> str:
+    completed = ", ".join(f"'{status}'" for status in COMPLETED_STATUSES)
+    pending = ", ".join(f"'{status}'" for status in PENDING_STATUSES)
+    return _SUMMARY_INSERT_SQL + _SUMMARY_SELECT_SQL.format(
+        addr_filter=addr_filter,
+        order_filter=order_filter,
+        completed=completed,
+        pending=pending,
+    )
+
+
+def _normalize_ids(values: Optional[Iterable[Any]]) -> List[int]:
+    return sorted({int(value) for value in (values or []) if value is not None})
+
+
+def refresh_customer_city_summary(
+    cursor,
+    *,
+    customer_ids: Optional[Iterable[Any]] = None,
+    order_ids: Optional[Iterable[Any]] = None,
+) -> int:
+    """Recompute the summary rows of the customers touched by a write.
+
+    Call inside the writer's transaction, after its address/order statements
+    and before ``db.commit()``.  The customers behind ``order_ids`` are looked
+    up first, so bulk status updates can pass the ids they changed.
+
+    Args:
+        cursor: Open mysql.connector cursor on the writer's connection.
+        customer_ids: Customers whose addresses or orders changed.
+        order_ids: Orders whose status, address or existence changed.
+
+    Returns:
+        Number of customers refreshed.
+    """
+    customers = set(_normalize_ids(customer_ids))
+    orders = _normalize_ids(order_ids)
+    for start in range(0, len(orders), REFRESH_BATCH_SIZE):
+        chunk = orders[start : start + REFRESH_BATCH_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"SELECT DISTINCT customer_id FROM orders WHERE order_id IN ({placeholders})",
+            tuple(chunk),
+        )
+        for row in cursor.fetchall() or []:
+            value = row["customer_id"] if isinstance(row, dict) else row[0]
+            customers.add(int(value))
+
+    ordered = sorted(customers)
+    for start in range(0, len(ordered), REFRESH_BATCH_SIZE):
+        _refresh_batch(cursor, ordered[start : start + REFRESH_BATCH_SIZE])
+    return len(ordered)
+
+
+def _refresh_batch(cursor, customer_ids: Sequence[int]) -> None:
+    placeholders = ", ".join(["%s"] * len(customer_ids))
+    ids = tuple(customer_ids)
+    cursor.execute(
+        f"DELETE FROM customer_city_summary WHERE customer_id IN ({placeholders})",
+        ids,
+    )
+    cursor.execute(
+        _summary_sql(
+            addr_filter=f"AND addr.customer_id IN ({placeholders})",
+            order_filter=f"AND o.customer_id IN ({placeholders})",
+        ),
+        ids * 4,
+    )
+
+
+def rebuild_customer_city_summary(db) -> int:
+    """Rebuild the whole customer_city_summary table from addresses and orders.
+
+    Runs in one transaction so readers keep seeing the previous rows until the
+    commit.
+
+    Args:
+        db: mysql.connector connection.
+
+    Returns:
+        Number of summary rows written.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("DELETE FROM customer_city_summary")
+        cursor.execute(_summary_sql())
+        written = cursor.rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    logger.info("Rebuilt customer_city_summary: %s rows", written)
+    return written
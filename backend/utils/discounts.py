@@ -0,0 +1,395 @@
+"""Compiled discount index and best-discount selection for order pricing.
+
+All discount codes and item discounts active today are compiled into one
+per-worker ``DiscountIndex``: inverted indexes from item_id, category_id and
+meal type to the codes whose conditions target them, plus the global codes
+and the best item discount per (city, item).  ``evaluate_cart`` walks the
+cart once, collecting the candidate codes per line from those indexes, and
+picks the code that saves the most on top of the item discounts.
+
+An entered code is always honoured; auto selection only runs when no code
+was entered, and only among codes without a usage limit, so it never spends
+a limited code's uses on a customer who did not ask for it.
+
+Pricing rules (unchanged from the single-code engine):
+
+* A code with no conditions, or with a ``global`` condition, matches every
+  line; otherwise any matching condition (OR) qualifies the line.
+* One code per order; each line gets the better of the chosen code's pct (if
+  it matches) and the line's item discount pct — they never stack.
+* Item discounts apply whether or not auto selection is enabled.
+
+The index is rebuilt when the date rolls over or when either catalog_state
+counter moves (items for the item→category map, discounts for codes/rules).
+Code usage limits are checked live: ``refresh_code_usage`` re-reads
+``use_count`` for the entered code and ``claim_code_use`` increments it
+conditionally when the order is written.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException
+
+from .catalog import CATALOG_STATE_DISCOUNTS, CATALOG_STATE_ITEMS, read_catalog_versions
+
+AUTO_SELECT_DEFAULT = os.getenv("DISCOUNT_AUTO_SELECT", "1").strip().lower() in {"1", "true", "yes"}
+
+SOURCE_CODE = "code"
+SOURCE_ITEM = "item"
+
+
+@dataclass(frozen=True)
+class CompiledCode:
+    """An active discount code reduced to what evaluation needs."""
+
+    code_id: int
+    code: str
+    name: str
+    pct: float
+    city_code: str
+    max_uses: Optional[int]
+    use_count: int
+    is_global: bool
+
+
+@dataclass(frozen=True)
+class DiscountIndex:
+    """Immutable inverted indexes over today's active discounts."""
+
+    key: Tuple[Any, ...]
+    codes: Dict[int, CompiledCode]
+    code_pcts: Dict[int, float]
+    code_ids_by_text: Dict[str, Tuple[int, ...]]
+    global_code_ids: Dict[str, Tuple[int, ...]]
+    code_ids_by_item: Dict[Tuple[str, int], Tuple[int, ...]]
+    code_ids_by_category: Dict[Tuple[str, int], Tuple[int, ...]]
+    code_ids_by_meal: Dict[Tuple[str, str], Tuple[int, ...]]
+    item_discount_pcts: Dict[Tuple[str, int], float]
+    item_categories: Dict[int, Optional[int]]
+
+    def find_code(self, text: str, city_code: str) -> Optional[CompiledCode]:
+        """Look up an entered code in the order's city; None when it is not valid there."""
+        for code_id in self.code_ids_by_text.get(text.strip().upper(), ()):
+            if self.codes[code_id].city_code == city_code:
+                return self.codes[code_id]
+        return None
+
+    def candidate_code_ids(
+        self, city_code: str, item_id: Optional[int], meal_type: str
+    ) -> Set[int]:
+        """Return every code in ``city_code`` whose conditions match one cart line."""
+        found: Set[int] = set(self.global_code_ids.get(city_code, ()))
+        if item_id is not None:
+            found.update(self.code_ids_by_item.get((city_code, item_id), ()))
+            category_id = self.item_categories.get(item_id)
+            if category_id is not None:
+                found.update(self.code_ids_by_category.get((city_code, category_id), ()))
+        if meal_type:
+            found.update(self.code_ids_by_meal.get((city_code, meal_type), ()))
+        return found
+
+    def code_matches(self, code: CompiledCode, item_id: Optional[int], meal_type: str) -> bool:
+        """Check one code's conditions against one cart line."""
+        return code.code_id in self.candidate_code_ids(code.city_code, item_id, meal_type)
+
+
+@dataclass
+class CartLine:
+    """One priced cart line as seen by the evaluator."""
+
+    item_id: Optional[int]
+    meal_type: str
+    unit_price: float
+    quantity: int
+
+    @property
+    def amount(self) -> float:
+        return self.unit_price * self.quantity
+
+
+@dataclass
+class CartDiscount:
+    """Outcome of evaluating a cart: chosen code and per-line pct/source."""
+
+    code: Optional[CompiledCode]
+    auto_selected: bool
+    line_pcts: List[Optional[float]] = field(default_factory=list)
+    line_sources: List[Optional[str]] = field(default_factory=list)
+
+
+def _freeze(mapping: Dict[Any, Set[int]]) -> Dict[Any, Tuple[int, ...]]:
+    return {key: tuple(sorted(values)) for key, values in mapping.items()}
+
+
+def build_discount_index(cursor, key: Tuple[Any, ...]) -> DiscountIndex:
+    """Compile today's active codes, conditions and item discounts.
+
+    Args:
+        cursor: Dictionary cursor.
+        key: Cache key the index is valid for.
+
+    Returns:
+        A new DiscountIndex.
+    """
+    cursor.execute(
+        "SELECT code_id, code, name, discount_pct, city_code, max_uses, use_count "
+        "FROM discount_codes "
+        "WHERE is_active = 1 AND from_date <= CURDATE() "
+        "AND (to_date IS NULL OR to_date >= CURDATE())"
+    )
+    code_rows = cursor.fetchall() or []
+    cursor.execute(
+        "SELECT dcc.code_id, dcc.dimension, dcc.entity_id, dcc.entity_label "
+        "FROM discount_code_conditions dcc "
+        "JOIN discount_codes dc ON dc.code_id = dcc.code_id "
+        "WHERE dc.is_active = 1 AND dc.from_date <= CURDATE() "
+        "AND (dc.to_date IS NULL OR dc.to_date >= CURDATE())"
+    )
+    conditions_by_code: Dict[int, List[Dict[str, Any]]] = {}
+    for row in cursor.fetchall() or []:
+        conditions_by_code.setdefault(int(row["code_id"]), []).append(row)
+    cursor.execute(
+        "SELECT item_id, city_code, MAX(discount_pct) AS discount_pct "
+        "FROM item_discounts "
+        "WHERE from_date <= CURDATE() AND (to_date IS NULL OR to_date >= CURDATE()) "
+        "GROUP BY item_id, city_code"
+    )
+    item_discount_pcts = {
+        (str(row["city_code"]), int(row["item_id"])): float(row["discount_pct"])
+        for row in cursor.fetchall() or []
+    }
+    cursor.execute("SELECT item_id, category_id FROM items")
+    item_categories = {
+        int(row["item_id"]): (int(row["category_id"]) if row["category_id"] is not None else None)
+        for row in cursor.fetchall() or []
+    }
+
+    codes: Dict[int, CompiledCode] = {}
+    by_text: Dict[str, Set[int]] = {}
+    global_ids: Dict[str, Set[int]] = {}
+    by_item: Dict[Tuple[str, int], Set[int]] = {}
+    by_category: Dict[Tuple[str, int], Set[int]] = {}
+    by_meal: Dict[Tuple[str, str], Set[int]] = {}
+    for row in code_rows:
+        code_id = int(row["code_id"])
+        city = str(row["city_code"])
+        conditions = conditions_by_code.get(code_id, [])
+        is_global = not conditions or any(c["dimension"] == "global" for c in conditions)
+        codes[code_id] = CompiledCode(
+            code_id=code_id,
+            code=str(row["code"]),
+            name=str(row["name"]),
+            pct=float(row["discount_pct"]),
+            city_code=city,
+            max_uses=int(row["max_uses"]) if row["max_uses"] is not None else None,
+            use_count=int(row["use_count"] or 0),
+            is_global=is_global,
+        )
+        by_text.setdefault(str(row["code"]).strip().upper(), set()).add(code_id)
+        if is_global:
+            global_ids.setdefault(city, set()).add(code_id)
+            continue
+        for cond in conditions:
+            dimension = cond["dimension"]
+            if dimension == "item" and cond["entity_id"] is not None:
+                by_item.setdefault((city, int(cond["entity_id"])), set()).add(code_id)
+            elif dimension == "category" and cond["entity_id"] is not None:
+                by_category.setdefault((city, int(cond["entity_id"])), set()).add(code_id)
+            elif dimension == "meal_type" and cond["entity_label"]:
+                label = str(cond["entity_label"]).lower()
+                by_meal.setdefault((city, label), set()).add(code_id)
+
+    return DiscountIndex(
+        key=key,
+        codes=codes,
+        code_pcts={code_id: code.pct for code_id, code in codes.items()},
+        code_ids_by_text=_freeze(by_text),
+        global_code_ids=_freeze(global_ids),
+        code_ids_by_item=_freeze(by_item),
+        code_ids_by_category=_freeze(by_category),
+        code_ids_by_meal=_freeze(by_meal),
+        item_discount_pcts=item_discount_pcts,
+        item_categories=item_categories,
+    )
+
+
+_index: Optional[DiscountIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_discount_index(cursor) -> DiscountIndex:
+    """Return the current index, recompiling it when the date or a version moved.
+
+    Args:
+        cursor: Dictionary cursor.
+
+    Returns:
+        The up-to-date DiscountIndex.
+    """
+    global _index
+    versions = read_catalog_versions(cursor)
+    key = (
+        date.today(),
+        versions.get(CATALOG_STATE_ITEMS, 0),
+        versions.get(CATALOG_STATE_DISCOUNTS, 0),
+    )
+    current = _index
+    if current is not None and current.key == key:
+        return current
+    with _index_lock:
+        current = _index
+        if current is None or current.key != key:
+            current = build_discount_index(cursor, key)
+            _index = current
+        return current
+
+
+def refresh_code_usage(cursor, index: DiscountIndex, code_ids: Iterable[int]) -> Set[int]:
+    """Return the subset of codes that have reached ``max_uses``, read live.
+
+    Only codes with a usage limit are queried, in a single statement.
+
+    Args:
+        cursor: Dictionary cursor.
+        index: Current discount index.
+        code_ids: Candidate code ids.
+
+    Returns:
+        Set of exhausted code ids.
+    """
+    limited = sorted(
+        code_id for code_id in set(code_ids) if index.codes[code_id].max_uses is not None
+    )
+    if not limited:
+        return set()
+    cursor.execute(
+        f"SELECT code_id, use_count FROM discount_codes "
+        f"WHERE code_id IN ({', '.join(['%s'] * len(limited))})",
+        tuple(limited),
+    )
+    live = {int(row["code_id"]): int(row["use_count"] or 0) for row in cursor.fetchall() or []}
+    return {
+        code_id
+        for code_id in limited
+        if live.get(code_id, index.codes[code_id].use_count) >= index.codes[code_id].max_uses
+    }
+
+
+def claim_code_use(cursor, code_id: int, code: str) -> None:
+    """Increment a code's use_count, failing if a concurrent order used the last slot.
+
+    Args:
+        cursor: Cursor inside the order transaction.
+        code_id: Applied code's id.
+        code: Applied code text (for the error message).
+    """
+    cursor.execute(
+        "UPDATE discount_codes SET use_count = use_count + 1 "
+        "WHERE code_id = %s AND (max_uses IS NULL OR use_count < max_uses)",
+        (code_id,),
+    )
+    if cursor.rowcount == 0:
+        raise HTTPException(
+            status_code=400, detail=f"Discount code {code} has reached its usage limit"
+        )
+
+
+def evaluate_cart(
+    cursor,
+    index: DiscountIndex,
+    lines: Sequence[CartLine],
+    city_code: str,
+    entered_code: Optional[str] = None,
+    auto_select: bool = AUTO_SELECT_DEFAULT,
+) -> CartDiscount:
+    """Pick the code for a cart and the discount pct for every line.
+
+    An entered code is validated exactly like the single-code engine (400 on
+    unknown/expired/exhausted, or not active in ``city_code``) and always
+    applies.  Without one, and with ``auto_select``, the active codes of the
+    city that have no usage limit compete and the one with the largest saving
+    over the item discounts wins.  Item discounts apply in every case.
+
+    Args:
+        cursor: Dictionary cursor (used only for the live usage check).
+        index: Current discount index.
+        lines: Cart lines with resolved undiscounted unit prices.
+        city_code: City the order belongs to.
+        entered_code: Code typed by the customer, if any.
+        auto_select: Whether to pick a code when the customer entered none.
+
+    Returns:
+        CartDiscount with the chosen code and per-line pct/source.
+    """
+    entered: Optional[CompiledCode] = None
+    if entered_code and entered_code.strip():
+        normalized = entered_code.strip().upper()
+        entered = index.find_code(normalized, city_code)
+        if entered is None:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid or expired discount code: {normalized}"
+            )
+        if refresh_code_usage(cursor, index, [entered.code_id]):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Discount code {entered.code} has reached its usage limit",
+            )
+    searching = entered is None and auto_select
+
+    code_pcts = index.code_pcts
+    item_pcts: List[float] = []
+    line_candidates: List[Set[int]] = []
+    # code_id -> extra saving over the item discounts across the cart.
+    gains: Dict[int, float] = {}
+    for line in lines:
+        item_pct = (
+            index.item_discount_pcts.get((city_code, line.item_id), 0.0)
+            if line.item_id is not None
+            else 0.0
+        )
+        if searching:
+            candidates = {
+                code_id
+                for code_id in index.candidate_code_ids(city_code, line.item_id, line.meal_type)
+                if index.codes[code_id].max_uses is None
+            }
+        elif entered is not None and index.code_matches(entered, line.item_id, line.meal_type):
+            candidates = {entered.code_id}
+        else:
+            candidates = set()
+        item_pcts.append(item_pct)
+        line_candidates.append(candidates)
+        amount = line.amount
+        for code_id in candidates:
+            gain = code_pcts[code_id] - item_pct
+            if gain > 0:
+                gains[code_id] = gains.get(code_id, 0.0) + gain * amount
+
+    chosen: Optional[CompiledCode] = entered
+    if searching:
+        best_rank = None
+        for code_id, gain in gains.items():
+            code = index.codes[code_id]
+            rank = (gain, code.pct, -code.code_id)
+            if best_rank is None or rank > best_rank:
+                chosen, best_rank = code, rank
+
+    result = CartDiscount(code=chosen, auto_selected=chosen is not None and chosen is not entered)
+    for item_pct, candidates in zip(item_pcts, line_candidates):
+        code_pct = chosen.pct if chosen is not None and chosen.code_id in candidates else 0.0
+        if code_pct > 0 and code_pct >= item_pct:
+            result.line_pcts.append(code_pct)
+            result.line_sources.append(SOURCE_CODE)
+        elif item_pct > 0:
+            result.line_pcts.append(item_pct)
+            result.line_sources.append(SOURCE_ITEM)
+        else:
+            result.line_pcts.append(None)
+            result.line_sources.append(None)
+    return result
@@ -20,6 +20,8 @@ from ..city_config import (
     city_supports_food,
     city_supports_condiments,
 )
+from .customer_summary import refresh_customer_city_summary
+from .schema import schema_guard
 
 # ---------------------------------------------------------------------------
 # City / label helpers
@@ -445,7 +447,23 @@ def _bulk_update_order_status_for_date(
         """,
         tuple(params),
     )
-    return cursor.rowcount
+    updated = cursor.rowcount
+    if updated:
+        cursor.execute(
+            """
+            SELECT DISTINCT o.customer_id
+              FROM orders o
+              JOIN addresses a ON o.address_id = a.address_id
+             WHERE DATE(o.created_at) = %s
+               AND a.city_code = %s
+               AND o.status = %s
+            """,
+            (target_date, city_code, new_status),
+        )
+        refresh_customer_city_summary(
+            cursor, customer_ids=[_row_value(row, "customer_id") for row in cursor.fetchall()]
+        )
+    return updated
 
 
 # ---------------------------------------------------------------------------
@@ -1174,6 +1192,7 @@ def _item_column_field_map(available_columns: Set[str]) -> Dict[str, str]:
 _MENU_HAS_TYPE_COLUMN: Optional[bool] = None
 
 
+@schema_guard("menu_type_column")
 def _ensure_menu_type_column(db) -> None:
     """Ensure the menu.menu_type column exists, creating it via ALTER TABLE if absent.
 
@@ -1214,6 +1233,7 @@ def _ensure_menu_type_column(db) -> None:
 # ---------------------------------------------------------------------------
 
 
+@schema_guard("delivery_routes_table")
 def _ensure_delivery_routes_table(db) -> None:
     """Ensure the delivery_routes table exists, creating it if absent.
 
@@ -1244,6 +1264,63 @@ def _ensure_delivery_routes_table(db) -> None:
         cursor.close()
 
 
+# ---------------------------------------------------------------------------
+# Subscription pause table guard
+# ---------------------------------------------------------------------------
+
+
+@schema_guard("subscription_pause_windows_table")
+def _ensure_subscription_pause_table(db) -> None:
+    """Ensure the subscription_pause_windows table exists with its order_id column and index.
+
+    Args:
+        db: mysql.connector connection object.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subscription_pause_windows (
+                pause_id INT NOT NULL AUTO_INCREMENT,
+                customer_id INT NOT NULL,
+                order_id INT NULL,
+                city_code VARCHAR(3) NOT NULL,
+                meal_type VARCHAR(20) NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                reason VARCHAR(255) NULL,
+                is_active TINYINT(1) NOT NULL DEFAULT 1,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (pause_id),
+                KEY idx_subscription_pause_city_dates (city_code, start_date, end_date),
+                KEY idx_subscription_pause_customer (customer_id),
+                KEY idx_subscription_pause_order (order_id),
+                CONSTRAINT fk_subscription_pause_customer
+                    FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+                    ON DELETE CASCADE
+            )
+            """
+        )
+        cursor.execute("SHOW COLUMNS FROM subscription_pause_windows LIKE 'order_id'")
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "ALTER TABLE subscription_pause_windows "
+                "ADD COLUMN order_id INT NULL AFTER customer_id"
+            )
+        cursor.execute(
+            "SHOW INDEX FROM subscription_pause_windows "
+            "WHERE Key_name = 'idx_subscription_pause_order'"
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "CREATE INDEX idx_subscription_pause_order ON subscription_pause_windows (order_id)"
+            )
+        db.commit()
+    finally:
+        cursor.close()
+
+
 # ---------------------------------------------------------------------------
 # Production plan helpers
 # ---------------------------------------------------------------------------
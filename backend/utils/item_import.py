@@ -0,0 +1,742 @@
+"""Bulk item import: parse JSON lines / CSV / XLSX, validate against preloaded refs, apply in bulk.
+
+``POST /api/products/items:bulk`` feeds the uploaded rows through three steps:
+
+1. ``parse_import_rows`` turns the request body into raw dicts, one per row.
+2. ``plan_item_import`` validates every row against reference data loaded
+   once (categories, component/condiment types, bld ids, existing items and
+   their bld maps) using the same rules as the single-item endpoints, and
+   computes a per-row diff.  No writes happen here, so this is the dry run.
+3. ``apply_item_import`` executes the plan with multi-row statements inside
+   the caller's transaction.
+
+A row updates an existing item when it carries an ``item_id`` or when its
+``name`` matches an existing item (case-insensitive); otherwise it creates
+one.  CSV cells left blank leave the stored value unchanged; ``bld_ids`` and
+``bld_types`` accept ``|``-separated lists.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+from .helpers import (
+    CONDIMENTS_BLD_TYPE,
+    _ensure_component_type_required_for_item,
+    _ensure_valid_meal_combination,
+    _is_condiment_from_blds,
+    _item_column_field_map,
+    _normalize_item_payload_data,
+    normalize_meal_type,
+)
+
+IMPORT_FORMAT_JSONL = "jsonl"
+IMPORT_FORMAT_CSV = "csv"
+IMPORT_FORMAT_XLSX = "xlsx"
+
+MAX_IMPORT_ROWS = 5000
+_CHUNK_SIZE = 500
+_LIST_SEPARATOR = "|"
+
+ACTION_CREATE = "create"
+ACTION_UPDATE = "update"
+ACTION_UNCHANGED = "unchanged"
+ACTION_ERROR = "error"
+
+_PRICE_FIELDS = (
+    "breakfast_price",
+    "lunch_price",
+    "dinner_price",
+    "condiments_price",
+    "festival_price",
+    "cgst",
+    "sgst",
+    "igst",
+    "net_price",
+)
+
+_CONTENT_TYPE_FORMATS = {
+    "application/x-ndjson": IMPORT_FORMAT_JSONL,
+    "application/jsonl": IMPORT_FORMAT_JSONL,
+    "application/json": IMPORT_FORMAT_JSONL,
+    "text/csv": IMPORT_FORMAT_CSV,
+    "application/csv": IMPORT_FORMAT_CSV,
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": IMPORT_FORMAT_XLSX,
+}
+
+
+class BulkItemRow(BaseModel):
+    """One import row: the item update fields plus name-based references."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    item_id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    alias: Optional[str] = None
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    condiment_type_id: Optional[int] = None
+    condiment_type_name: Optional[str] = None
+    component_type_id: Optional[int] = None
+    component_type_name: Optional[str] = None
+    uom_customer: Optional[str] = None
+    unit_packing: Optional[float] = None
+    uom_packing: Optional[str] = None
+    hsn_code: Optional[str] = None
+    uom_production: Optional[str] = None
+    packing_to_production_rate: Optional[float] = None
+    buffer_percentage: Optional[float] = None
+    max_qty_breakfast: Optional[int] = None
+    max_qty_lunch: Optional[int] = None
+    max_qty_dinner: Optional[int] = None
+    max_qty_condiments: Optional[int] = None
+    picture_url: Optional[str] = None
+    breakfast_price: Optional[float] = None
+    lunch_price: Optional[float] = None
+    dinner_price: Optional[float] = None
+    condiments_price: Optional[float] = None
+    festival_price: Optional[float] = None
+    cgst: Optional[float] = None
+    sgst: Optional[float] = None
+    igst: Optional[float] = None
+    net_price: Optional[float] = None
+    is_combo: Optional[bool] = None
+    bld_ids: Optional[List[int]] = None
+    bld_types: Optional[List[str]] = None
+
+    @field_validator("bld_ids", "bld_types", mode="before")
+    @classmethod
+    def _split_list(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            return [part.strip() for part in value.split(_LIST_SEPARATOR) if part.strip()]
+        if isinstance(value, (int, float)):
+            return [value]
+        return value
+
+
+@dataclass
+class RawImportRow:
+    """A parsed but unvalidated row; ``error`` is set when the row could not be decoded."""
+
+    row_number: int
+    data: Dict[str, Any]
+    error: Optional[str] = None
+
+
+@dataclass
+class PlannedItemRow:
+    """Validation outcome and diff for one import row."""
+
+    row_number: int
+    action: str
+    item_id: Optional[int] = None
+    name: Optional[str] = None
+    values: Dict[str, Any] = field(default_factory=dict)
+    bld_ids: Optional[List[int]] = None
+    changes: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Serialize for the API response."""
+        return {
+            "row": self.row_number,
+            "action": self.action,
+            "item_id": self.item_id,
+            "name": self.name,
+            "changes": self.changes,
+            "errors": self.errors,
+        }
+
+
+@dataclass
+class ImportReferences:
+    """Reference data loaded once per import."""
+
+    category_ids: Set[int]
+    category_ids_by_name: Dict[str, int]
+    component_type_ids: Set[int]
+    component_type_ids_by_name: Dict[str, int]
+    condiment_type_ids: Set[int]
+    condiment_type_ids_by_name: Dict[str, int]
+    bld_ids: Set[int]
+    bld_ids_by_type: Dict[str, int]
+    condiments_bld_id: Optional[int]
+    items: Dict[int, Dict[str, Any]]
+    item_ids_by_name: Dict[str, int]
+    item_blds: Dict[int, List[int]]
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+
+def detect_import_format(content_type: Optional[str], requested: Optional[str]) -> str:
+    """Pick the import format from an explicit query value or the Content-Type header.
+
+    Args:
+        content_type: Request Content-Type header.
+        requested: Explicit ``format`` query value, if any.
+
+    Returns:
+        One of ``"jsonl"``, ``"csv"`` or ``"xlsx"``.
+    """
+    if requested:
+        normalized = requested.strip().lower()
+        if normalized in {"ndjson", "json"}:
+            normalized = IMPORT_FORMAT_JSONL
+        if normalized not in {IMPORT_FORMAT_JSONL, IMPORT_FORMAT_CSV, IMPORT_FORMAT_XLSX}:
+            raise HTTPException(status_code=400, detail=f"Unsupported import format: {requested}")
+        return normalized
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    detected = _CONTENT_TYPE_FORMATS.get(media_type)
+    if detected is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send JSON lines (application/x-ndjson), CSV (text/csv) or XLSX",
+        )
+    return detected
+
+
+def _csv_rows(text: str) -> List[RawImportRow]:
+    reader = csv.DictReader(io.StringIO(text))
+    rows: List[RawImportRow] = []
+    for index, record in enumerate(reader, start=2):
+        data = {
+            (key or "").strip(): value.strip()
+            for key, value in record.items()
+            if key and isinstance(value, str) and value.strip() != ""
+        }
+        if data:
+            rows.append(RawImportRow(row_number=index, data=data))
+    return rows
+
+
+def _jsonl_rows(text: str) -> List[RawImportRow]:
+    stripped = text.strip()
+    if stripped.startswith("["):
+        try:
+            records = json.loads(stripped)
+        except json.JSONDecodeError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON array: {exc}") from None
+        return [
+            (
+                RawImportRow(row_number=index, data=record)
+                if isinstance(record, dict)
+                else RawImportRow(row_number=index, data={}, error="Row must be a JSON object")
+            )
+            for index, record in enumerate(records, start=1)
+        ]
+
+    rows: List[RawImportRow] = []
+    for index, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            rows.append(RawImportRow(row_number=index, data={}, error=f"Invalid JSON: {exc.msg}"))
+            continue
+        if not isinstance(record, dict):
+            rows.append(RawImportRow(row_number=index, data={}, error="Row must be a JSON object"))
+            continue
+        rows.append(RawImportRow(row_number=index, data=record))
+    return rows
+
+
+def _xlsx_rows(body: bytes) -> List[RawImportRow]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise HTTPException(
+            status_code=415,
+            detail="XLSX import requires openpyxl on the server; upload CSV instead",
+        ) from None
+    try:
+        workbook = load_workbook(io.BytesIO(body), read_only=True, data_only=True)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid XLSX file: {exc}") from None
+    sheet = workbook.active
+    records = sheet.iter_rows(values_only=True)
+    header = [str(cell).strip() if cell is not None else "" for cell in next(records, ())]
+    rows: List[RawImportRow] = []
+    for index, values in enumerate(records, start=2):
+        data = {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in zip(header, values)
+            if key and value is not None and not (isinstance(value, str) and not value.strip())
+        }
+        if data:
+            rows.append(RawImportRow(row_number=index, data=data))
+    workbook.close()
+    return rows
+
+
+def parse_import_rows(body: bytes, import_format: str) -> List[RawImportRow]:
+    """Decode an uploaded file into raw rows.
+
+    Args:
+        body: Raw request body.
+        import_format: ``"jsonl"``, ``"csv"`` or ``"xlsx"``.
+
+    Returns:
+        Raw rows with their 1-based source row/line numbers.
+    """
+    if import_format == IMPORT_FORMAT_XLSX:
+        rows = _xlsx_rows(body)
+    else:
+        try:
+            text = body.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Import file must be UTF-8") from None
+        rows = _csv_rows(text) if import_format == IMPORT_FORMAT_CSV else _jsonl_rows(text)
+    if not rows:
+        raise HTTPException(status_code=400, detail="Import file contains no rows")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"Import is limited to {MAX_IMPORT_ROWS} rows per request"
+        )
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Validation / planning
+# ---------------------------------------------------------------------------
+
+
+def _name_key(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def load_import_references(cursor, available_columns: Set[str]) -> ImportReferences:
+    """Load every lookup the row validation needs in a fixed number of queries.
+
+    Args:
+        cursor: Dictionary cursor.
+        available_columns: Column names present in the items table.
+
+    Returns:
+        ImportReferences.
+    """
+    cursor.execute("SELECT category_id, category_name FROM categories")
+    categories = cursor.fetchall() or []
+    cursor.execute("SELECT component_type_id, name FROM component_types")
+    component_types = cursor.fetchall() or []
+    condiment_types: List[Dict[str, Any]] = []
+    if "condiment_type_id" in available_columns:
+        cursor.execute("SELECT condiment_type_id, name FROM condiment_types")
+        condiment_types = cursor.fetchall() or []
+    cursor.execute("SELECT bld_id, bld_type FROM bld")
+    blds = cursor.fetchall() or []
+
+    field_map = _item_column_field_map(available_columns)
+    item_columns = ", ".join(["item_id", *dict.fromkeys(field_map.values())])
+    cursor.execute(f"SELECT {item_columns} FROM items")
+    items = {int(row["item_id"]): row for row in cursor.fetchall() or []}
+    cursor.execute("SELECT item_id, bld_id FROM item_bld_map ORDER BY item_id, bld_id")
+    item_blds: Dict[int, List[int]] = {}
+    for row in cursor.fetchall() or []:
+        item_blds.setdefault(int(row["item_id"]), []).append(int(row["bld_id"]))
+
+    item_ids_by_name: Dict[str, int] = {}
+    for item_id, row in sorted(items.items()):
+        item_ids_by_name.setdefault(_name_key(row.get("name")), item_id)
+
+    bld_ids_by_type = {_name_key(row["bld_type"]): int(row["bld_id"]) for row in blds}
+    return ImportReferences(
+        category_ids={int(row["category_id"]) for row in categories},
+        category_ids_by_name={
+            _name_key(row["category_name"]): int(row["category_id"]) for row in categories
+        },
+        component_type_ids={int(row["component_type_id"]) for row in component_types},
+        component_type_ids_by_name={
+            _name_key(row["name"]): int(row["component_type_id"]) for row in component_types
+        },
+        condiment_type_ids={int(row["condiment_type_id"]) for row in condiment_types},
+        condiment_type_ids_by_name={
+            _name_key(row["name"]): int(row["condiment_type_id"]) for row in condiment_types
+        },
+        bld_ids=set(bld_ids_by_type.values()),
+        bld_ids_by_type=bld_ids_by_type,
+        condiments_bld_id=bld_ids_by_type.get(_name_key(CONDIMENTS_BLD_TYPE)),
+        items=items,
+        item_ids_by_name=item_ids_by_name,
+        item_blds=item_blds,
+    )
+
+
+def _same_value(current: Any, new: Any) -> bool:
+    if current is None or new is None:
+        return current is None and new is None
+    if isinstance(current, (int, float, Decimal)) and isinstance(new, (int, float, Decimal)):
+        return abs(float(current) - float(new)) < 1e-9
+    return current == new
+
+
+def _resolve_reference(
+    data: Dict[str, Any],
+    id_field: str,
+    name_field: str,
+    ids: Set[int],
+    ids_by_name: Dict[str, int],
+    errors: List[str],
+) -> None:
+    name = data.pop(name_field, None)
+    if name is not None and data.get(id_field) is None:
+        resolved = ids_by_name.get(_name_key(name))
+        if resolved is None:
+            errors.append(f"Unknown {name_field}: {name}")
+            return
+        data[id_field] = resolved
+    if data.get(id_field) is not None and int(data[id_field]) not in ids:
+        errors.append(f"Unknown {id_field}: {data[id_field]}")
+
+
+def _resolve_row_blds(data: Dict[str, Any], refs: ImportReferences, errors: List[str]):
+    bld_ids = data.pop("bld_ids", None)
+    bld_types = data.pop("bld_types", None)
+    if bld_ids is None and bld_types is None:
+        return None
+    resolved: Set[int] = set()
+    for bld_id in bld_ids or []:
+        if int(bld_id) not in refs.bld_ids:
+            errors.append(f"Invalid bld_ids: [{bld_id}]")
+        else:
+            resolved.add(int(bld_id))
+    for bld_type in bld_types or []:
+        try:
+            key = _name_key(normalize_meal_type(bld_type))
+        except HTTPException:
+            key = ""
+        if key not in refs.bld_ids_by_type:
+            errors.append(f"Unknown bld_type: {bld_type}")
+        else:
+            resolved.add(refs.bld_ids_by_type[key])
+    return sorted(resolved)
+
+
+def _plan_row(
+    raw: RawImportRow,
+    refs: ImportReferences,
+    field_map: Dict[str, str],
+    claimed: Dict[Any, int],
+) -> PlannedItemRow:
+    raw_name = raw.data.get("name")
+    planned = PlannedItemRow(
+        row_number=raw.row_number,
+        action=ACTION_ERROR,
+        name=str(raw_name).strip() if raw_name is not None else None,
+    )
+    if raw.error:
+        planned.errors.append(raw.error)
+        return planned
+    try:
+        model = BulkItemRow.model_validate(raw.data)
+    except ValidationError as exc:
+        for error in exc.errors():
+            location = ".".join(str(part) for part in error.get("loc", ()))
+            planned.errors.append(f"{location}: {error.get('msg')}")
+        return planned
+
+    data = model.model_dump(exclude_unset=True)
+    planned.name = (data.get("name") or "").strip() or None
+    errors = planned.errors
+
+    _resolve_reference(
+        data, "category_id", "category_name", refs.category_ids, refs.category_ids_by_name, errors
+    )
+    _resolve_reference(
+        data,
+        "component_type_id",
+        "component_type_name",
+        refs.component_type_ids,
+        refs.component_type_ids_by_name,
+        errors,
+    )
+    if "condiment_type_id" in field_map:
+        _resolve_reference(
+            data,
+            "condiment_type_id",
+            "condiment_type_name",
+            refs.condiment_type_ids,
+            refs.condiment_type_ids_by_name,
+            errors,
+        )
+    else:
+        data.pop("condiment_type_name", None)
+    bld_ids = _resolve_row_blds(data, refs, errors)
+
+    item_id = data.pop("item_id", None)
+    if item_id is not None:
+        if int(item_id) not in refs.items:
+            errors.append(f"Item {item_id} not found")
+            return planned
+        existing = refs.items[int(item_id)]
+    else:
+        matched_id = refs.item_ids_by_name.get(_name_key(planned.name))
+        existing = refs.items.get(matched_id) if matched_id is not None else None
+    planned.item_id = int(existing["item_id"]) if existing else None
+    planned.name = planned.name or (existing or {}).get("name")
+
+    claim_key = planned.item_id if existing else _name_key(planned.name)
+    if claim_key and claim_key in claimed:
+        errors.append(f"Duplicate of row {claimed[claim_key]}")
+    elif claim_key:
+        claimed[claim_key] = raw.row_number
+    if errors:
+        return planned
+
+    cleaned = _normalize_item_payload_data(
+        {key: value for key, value in data.items() if key in field_map}
+    )
+    current_blds = refs.item_blds.get(planned.item_id, []) if existing else []
+    effective_blds = bld_ids if bld_ids is not None else current_blds
+    is_condiment_item = _is_condiment_from_blds(effective_blds, refs.condiments_bld_id)
+    try:
+        _ensure_valid_meal_combination(effective_blds, refs.condiments_bld_id)
+        if not existing:
+            if not cleaned.get("name"):
+                raise HTTPException(status_code=400, detail="name is required")
+            if not cleaned.get("uom_customer"):
+                raise HTTPException(status_code=400, detail="uom_customer is required")
+            if not effective_blds:
+                raise HTTPException(
+                    status_code=400, detail="At least one meal assignment is required"
+                )
+        if is_condiment_item and not cleaned.get("category_id"):
+            snacks_category_id = refs.category_ids_by_name.get("snacks")
+            if snacks_category_id is not None:
+                cleaned["category_id"] = snacks_category_id
+        _ensure_component_type_required_for_item(
+            is_condiment_item=is_condiment_item,
+            component_type_id=(
+                cleaned.get("component_type_id")
+                if "component_type_id" in cleaned or not existing
+                else existing.get("component_type_id")
+            ),
+        )
+    except HTTPException as exc:
+        errors.append(str(exc.detail))
+        return planned
+
+    if not existing:
+        planned.action = ACTION_CREATE
+        planned.values = cleaned
+        planned.bld_ids = effective_blds
+        planned.changes = {key: {"current": None, "new": value} for key, value in cleaned.items()}
+        planned.changes["bld_ids"] = {"current": None, "new": effective_blds}
+        return planned
+
+    for key, value in cleaned.items():
+        current = existing.get(field_map[key])
+        if not _same_value(current, value):
+            planned.values[key] = value
+            planned.changes[key] = {"current": current, "new": value}
+    if bld_ids is not None and bld_ids != current_blds:
+        planned.bld_ids = bld_ids
+        planned.changes["bld_ids"] = {"current": current_blds, "new": bld_ids}
+    planned.action = ACTION_UPDATE if planned.changes else ACTION_UNCHANGED
+    return planned
+
+
+def plan_item_import(
+    raw_rows: List[RawImportRow], refs: ImportReferences, available_columns: Set[str]
+) -> List[PlannedItemRow]:
+    """Validate every row and compute its create/update diff without writing.
+
+    Args:
+        raw_rows: Rows from ``parse_import_rows``.
+        refs: Reference data from ``load_import_references``.
+        available_columns: Column names present in the items table.
+
+    Returns:
+        One PlannedItemRow per input row, in input order.
+    """
+    field_map = _item_column_field_map(available_columns)
+    claimed: Dict[Any, int] = {}
+    return [_plan_row(raw, refs, field_map, claimed) for raw in raw_rows]
+
+
+# ---------------------------------------------------------------------------
+# Apply
+# ---------------------------------------------------------------------------
+
+
+def _chunks(rows: List[Any]) -> List[List[Any]]:
+    return [rows[start : start + _CHUNK_SIZE] for start in range(0, len(rows), _CHUNK_SIZE)]
+
+
+def _insert_items(cursor, creates: List[PlannedItemRow], field_map: Dict[str, str]) -> None:
+    fields = [key for key in field_map if any(key in row.values for row in creates)]
+    columns = ", ".join(field_map[key] for key in fields)
+    for chunk in _chunks(creates):
+        row_sql: List[str] = []
+        params: List[Any] = []
+        for row in chunk:
+            placeholders = []
+            for key in fields:
+                if key in row.values:
+                    placeholders.append("%s")
+                    params.append(row.values[key])
+                else:
+                    placeholders.append("DEFAULT")
+            row_sql.append(f"({', '.join(placeholders)})")
+        cursor.execute(f"INSERT INTO items ({columns}) VALUES {', '.join(row_sql)}", params)
+        first_id = cursor.lastrowid
+
+        # Auto-increment ids of a multi-row INSERT are not guaranteed to be
+        # contiguous, so map them back by name (unique within the import and
+        # absent from items before it).
+        names = [_name_key(row.values["name"]) for row in chunk]
+        cursor.execute(
+            f"""
+            SELECT item_id, name
+              FROM items
+             WHERE item_id >= %s
+               AND LOWER(name) IN ({', '.join(['%s'] * len(names))})
+             ORDER BY item_id
+            """,
+            (first_id, *names),
+        )
+        ids_by_name: Dict[str, int] = {}
+        for found in cursor.fetchall() or []:
+            ids_by_name.setdefault(_name_key(found["name"]), int(found["item_id"]))
+        for row in chunk:
+            row.item_id = ids_by_name.get(_name_key(row.values["name"]))
+
+
+def _update_items(cursor, updates: List[PlannedItemRow], field_map: Dict[str, str]) -> None:
+    for chunk in _chunks([row for row in updates if row.values]):
+        set_clauses: List[str] = []
+        params: List[Any] = []
+        for key, column in field_map.items():
+            targets = [row for row in chunk if key in row.values]
+            if not targets:
+                continue
+            cases = " ".join("WHEN %s THEN %s" for _ in targets)
+            set_clauses.append(f"{column} = CASE item_id {cases} ELSE {column} END")
+            for row in targets:
+                params.extend((row.item_id, row.values[key]))
+        ids = [row.item_id for row in chunk]
+        params.extend(ids)
+        cursor.execute(
+            f"UPDATE items SET {', '.join(set_clauses)} "
+            f"WHERE item_id IN ({', '.join(['%s'] * len(ids))})",
+            params,
+        )
+
+
+def _replace_bld_maps(cursor, rows: List[PlannedItemRow]) -> None:
+    targets = [row for row in rows if row.bld_ids is not None and row.item_id is not None]
+    for chunk in _chunks([row for row in targets if row.action == ACTION_UPDATE]):
+        ids = [row.item_id for row in chunk]
+        cursor.execute(
+            f"DELETE FROM item_bld_map WHERE item_id IN ({', '.join(['%s'] * len(ids))})",
+            ids,
+        )
+    pairs = [(row.item_id, bld_id) for row in targets for bld_id in row.bld_ids]
+    if pairs:
+        cursor.executemany("INSERT INTO item_bld_map (item_id, bld_id) VALUES (%s, %s)", pairs)
+
+
+def _record_price_history(
+    cursor, updates: List[PlannedItemRow], refs: ImportReferences, field_map: Dict[str, str]
+) -> None:
+    repriced = [row for row in updates if any(key in row.values for key in _PRICE_FIELDS)]
+    if not repriced:
+        return
+    today = date.today()
+    yesterday = date.fromordinal(today.toordinal() - 1)
+    for chunk in _chunks(repriced):
+        ids = [row.item_id for row in chunk]
+        cursor.execute(
+            "UPDATE item_price_history SET to_date = %s "
+            f"WHERE to_date IS NULL AND item_id IN ({', '.join(['%s'] * len(ids))})",
+            (yesterday, *ids),
+        )
+        params: List[Any] = []
+        for row in chunk:
+            existing = refs.items[row.item_id]
+            params.extend((row.item_id, today))
+            for key in _PRICE_FIELDS:
+                if key in row.values:
+                    params.append(row.values[key])
+                else:
+                    params.append(existing.get(field_map.get(key, key)))
+        value_sql = ", ".join(["(%s, %s, NULL, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))
+        cursor.execute(
+            "INSERT INTO item_price_history "
+            "(item_id, from_date, to_date, breakfast_price, lunch_price, dinner_price, "
+            f"condiments_price, festival_price, cgst, sgst, igst, net_price) VALUES {value_sql}",
+            params,
+        )
+
+
+def apply_item_import(
+    cursor,
+    plan: List[PlannedItemRow],
+    refs: ImportReferences,
+    available_columns: Set[str],
+) -> Tuple[List[int], List[int]]:
+    """Write the create/update rows of a plan with multi-row statements.
+
+    Runs inside the caller's transaction; the caller commits or rolls back.
+    Rows in ``error``/``unchanged`` state are ignored.
+
+    Args:
+        cursor: Dictionary cursor on the importing connection.
+        plan: Output of ``plan_item_import``.
+        refs: Reference data the plan was built from.
+        available_columns: Column names present in the items table.
+
+    Returns:
+        Tuple of (created item ids, updated item ids).
+    """
+    field_map = _item_column_field_map(available_columns)
+    creates = [row for row in plan if row.action == ACTION_CREATE]
+    updates = [row for row in plan if row.action == ACTION_UPDATE]
+
+    if creates:
+        _insert_items(cursor, creates, field_map)
+        missing = [row.row_number for row in creates if row.item_id is None]
+        if missing:
+            raise HTTPException(
+                status_code=500, detail=f"Could not resolve created item ids for rows {missing}"
+            )
+    if updates:
+        _update_items(cursor, updates, field_map)
+        _record_price_history(cursor, updates, refs, field_map)
+    _replace_bld_maps(cursor, [*creates, *updates])
+
+    return [row.item_id for row in creates], [row.item_id for row in updates]
+
+
+def summarize_plan(plan: List[PlannedItemRow]) -> Dict[str, int]:
+    """Count rows per action.
+
+    Args:
+        plan: Output of ``plan_item_import``.
+
+    Returns:
+        Dict with rows/create/update/unchanged/error counts.
+    """
+    summary = {
+        "rows": len(plan),
+        ACTION_CREATE: 0,
+        ACTION_UPDATE: 0,
+        ACTION_UNCHANGED: 0,
+        ACTION_ERROR: 0,
+    }
+    for row in plan:
+        summary[row.action] += 1
+    return summary
@@ -1,12 +1,551 @@
+"""Admin audit log: buffered, batched writes to ``admin_logs``.
+
+``log_admin_action`` is called by production, menu and product endpoints
+after their own commit.  It used to validate the admin, look up a fallback
+admin and insert one row with its own commit on the request's connection;
+it now only timestamps the event and puts it on a bounded in-memory queue.
+
+A writer thread (one per worker process, started from the app's lifespan)
+takes events off the queue and writes them with one multi-row INSERT per
+batch: a batch is flushed once ``AUDIT_LOG_BATCH_SIZE`` events are waiting
+or ``AUDIT_LOG_FLUSH_MS`` after its first event, whichever comes first.
+Active admins are loaded once per ``AUDIT_LOG_ADMIN_TTL_SEC`` and kept in
+memory, so checking ``admin_id`` and choosing the fallback admin (the lowest
+active admin id, used when the given id is not an active admin) needs no
+query per event.
+
+If MySQL cannot be reached, or the queue is full, events are appended as JSON
+lines to a spool file under ``AUDIT_LOG_SPOOL_DIR`` instead of being lost.
+Spooled events are written to the table on the next successful flush, so
+delivery is at-least-once.  A spool file claimed for replay by a process that
+died before finishing is handed back to the spool by the next worker that
+replays (or on the next start).  ``shutdown_audit_log_writer`` drains the queue on
+shutdown.
+
+Env overrides:
+    AUDIT_LOG_QUEUE_SIZE     — events buffered in memory per worker (10000)
+    AUDIT_LOG_BATCH_SIZE     — events per INSERT (200)
+    AUDIT_LOG_FLUSH_MS       — max delay before a partial batch is written (500)
+    AUDIT_LOG_ADMIN_TTL_SEC  — how long the active-admin list is reused (60)
+    AUDIT_LOG_SPOOL_DIR      — directory for events that could not be written
+                               (backend/var/audit_spool)
+"""
+
 from __future__ import annotations
 
+import json
 import logging
-from typing import Optional
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import mysql.connector
 
-from .rbac import get_role_id, parse_role_ids
+from .rbac import get_role_id
 
 logger = logging.getLogger(__name__)
 
+QUEUE_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "200"))
+FLUSH_SEC = float(os.getenv("AUDIT_LOG_FLUSH_MS", "500")) / 1000
+ADMIN_TTL_SEC = float(os.getenv("AUDIT_LOG_ADMIN_TTL_SEC", "60"))
+ADMIN_RELOAD_MIN_SEC = 5.0
+SPOOL_DIR = Path(
+    os.getenv("AUDIT_LOG_SPOOL_DIR")
+    or Path(__file__).resolve().parent.parent / "var" / "audit_spool"
+)
+SPOOL_RETRY_SEC = 30.0
+# A claimed spool file is normally released within one flush; one held this
+# long belongs to a replay that will never finish (e.g. a reused pid).
+STALE_CLAIM_SEC = 300.0
+SHUTDOWN_TIMEOUT_SEC = 10.0
+
+_INSERT_SQL = """
+    INSERT INTO admin_logs
+        (admin_id, action_type, entity_type, entity_id, description, `timestamp`)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+_ACTIVE_ADMINS_SQL = """
+    SELECT c.customer_id
+    FROM customer_roles cr
+    JOIN customers c ON c.customer_id = cr.customer_id
+    WHERE cr.role_id=%s AND c.admin_is_active = 1
+    ORDER BY c.customer_id ASC
+"""
+
+
+@dataclass(frozen=True)
+class AuditEvent:
+    """One admin action waiting to be written."""
+
+    admin_id: Optional[int]
+    action_type: str
+    entity_type: str
+    entity_id: int
+    description: Optional[str]
+    created_at: str  # "%Y-%m-%d %H:%M:%S", local time like CURRENT_TIMESTAMP
+
+
+class _Stop:
+    """Queue marker asking the writer thread to drain and exit."""
+
+
+# ---------------------------------------------------------------------------
+# Disk spool
+# ---------------------------------------------------------------------------
+
+
+class _Spool:
+    """Append-only JSON-lines files for events that could not reach MySQL.
+
+    Each process appends to its own ``spool-<pid>.jsonl``.  Replay claims a
+    file by renaming it to ``<name>.claimed-<pid>``, so two workers never
+    write the same file twice.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @property
+    def _own_path(self) -> Path:
+        return self.directory / f"spool-{os.getpid()}.jsonl"
+
+    def append(self, events: List[AuditEvent]) -> bool:
+        if not events:
+            return True
+        lines = "".join(json.dumps(asdict(event)) + "\n" for event in events)
+        try:
+            with self._lock:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                with open(self._own_path, "a", encoding="utf-8") as fh:
+                    fh.write(lines)
+                    fh.flush()
+                    os.fsync(fh.fileno())
+            return True
+        except OSError as exc:
+            logger.error("Dropped %d admin log events; spool not writable: %s", len(events), exc)
+            return False
+
+    def pending(self) -> bool:
+        try:
+            return any(self.directory.glob("spool-*.jsonl"))
+        except OSError:
+            return False
+
+    def _claim_is_stale(self, path: Path, now: float) -> bool:
+        """True if the process that claimed ``path`` can no longer release it."""
+        try:
+            pid = int(path.name.rsplit("-", 1)[1])
+        except (IndexError, ValueError):
+            return True
+        if pid == os.getpid():
+            # Claims are released before claim() runs again, so this one was
+            # left by an earlier process that had the same pid.
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass  # alive, owned by another user
+        except OSError:
+            return True
+        try:
+            # rename() updates ctime, so this is the time since it was claimed.
+            return now - path.stat().st_ctime >= STALE_CLAIM_SEC
+        except OSError:
+            return False
+
+    def recover(self) -> int:
+        """Hand files claimed by dead (or stuck) replays back to the spool.
+
+        Returns:
+            Number of files recovered.
+        """
+        try:
+            candidates = sorted(self.directory.glob("spool-*.jsonl.claimed-*"))
+        except OSError:
+            return 0
+        now = time.time()
+        recovered = 0
+        for path in candidates:
+            if not self._claim_is_stale(path, now):
+                continue
+            target = self.directory / f"spool-recovered-{time.time_ns()}-{recovered}.jsonl"
+            try:
+                path.rename(target)
+            except OSError:
+                continue  # another worker recovered it first
+            recovered += 1
+            logger.warning("Recovered unfinished admin log spool file %s", path.name)
+        return recovered
+
+    def claim(self) -> List[Tuple[Path, List[AuditEvent]]]:
+        """Take ownership of every spool file, including stale claims, and parse its events."""
+        claimed: List[Tuple[Path, List[AuditEvent]]] = []
+        self.recover()
+        try:
+            candidates = sorted(self.directory.glob("spool-*.jsonl"))
+        except OSError:
+            return claimed
+        for path in candidates:
+            target = path.with_name(f"{path.name}.claimed-{os.getpid()}")
+            try:
+                with self._lock:
+                    path.rename(target)
+            except OSError:
+                continue  # another worker claimed it first
+            events: List[AuditEvent] = []
+            with open(target, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        events.append(AuditEvent(**json.loads(line)))
+                    except (TypeError, ValueError):
+                        logger.warning("Skipping malformed admin log spool line in %s", target)
+            claimed.append((target, events))
+        return claimed
+
+    def release(self, path: Path, events: List[AuditEvent], written: bool) -> None:
+        """Delete a claimed file once written, or hand its events back to the spool."""
+        if not written and not self.append(events):
+            return
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Active admins
+# ---------------------------------------------------------------------------
+
+
+class _AdminDirectory:
+    """Active admin ids, reloaded every ``ADMIN_TTL_SEC`` (writer thread only)."""
+
+    def __init__(self) -> None:
+        self._ids: frozenset = frozenset()
+        self._fallback: Optional[int] = None
+        self._loaded_at = float("-inf")
+
+    def _load(self, cursor) -> None:
+        admin_role_id = get_role_id(cursor, "admin")
+        ids: List[int] = []
+        if admin_role_id is not None:
+            cursor.execute(_ACTIVE_ADMINS_SQL, (admin_role_id,))
+            ids = [int(row["customer_id"]) for row in cursor.fetchall() or []]
+        self._ids = frozenset(ids)
+        self._fallback = ids[0] if ids else None
+        self._loaded_at = time.monotonic()
+
+    def resolve(self, cursor, admin_ids: List[Optional[int]]) -> Dict[Optional[int], int]:
+        """Map each requested admin id to the id to record (None if no admin exists)."""
+        age = time.monotonic() - self._loaded_at
+        unknown = any(admin_id not in self._ids for admin_id in admin_ids)
+        if age >= ADMIN_TTL_SEC or (unknown and age >= ADMIN_RELOAD_MIN_SEC):
+            self._load(cursor)
+        return {
+            admin_id: admin_id if admin_id in self._ids else self._fallback
+            for admin_id in set(admin_ids)
+        }
+
+    def invalidate(self) -> None:
+        self._loaded_at = float("-inf")
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+
+
+def _connection_lost(exc: Exception) -> bool:
+    return isinstance(exc, (mysql.connector.InterfaceError, mysql.connector.OperationalError))
+
+
+class AuditLogWriter:
+    """Bounded event queue plus the thread that batches it into ``admin_logs``."""
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, QUEUE_SIZE))
+        self._spool = _Spool(SPOOL_DIR)
+        self._admins = _AdminDirectory()
+        self._get_db: Optional[Callable[[], Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "spooled": 0,
+            "replayed": 0,
+            "dropped": 0,
+            "flush_ms_total": 0.0,
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    # -- producer side ------------------------------------------------------
+
+    def enqueue(self, event: AuditEvent) -> None:
+        """Queue an event; spool it to disk if the queue is full.  Never raises."""
+        try:
+            self._queue.put_nowait(event)
+            self._count("enqueued")
+        except queue.Full:
+            if self._spool.append([event]):
+                self._count("spooled")
+            else:
+                self._count("dropped")
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def start(self, get_db: Callable[[], Any]) -> None:
+        """Start the writer thread (idempotent).
+
+        Args:
+            get_db: Callable returning a pooled connection (``get_raw_db``).
+        """
+        with self._lock:
+            self._get_db = get_db
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT_SEC) -> None:
+        """Write everything still queued, then stop the thread.
+
+        Events that cannot be written before ``timeout`` are spooled to disk.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            try:
+                self._queue.put(_Stop(), timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.warning("Admin log writer did not finish within %.0fs", timeout)
+        leftovers: List[AuditEvent] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, AuditEvent):
+                leftovers.append(item)
+        if leftovers:
+            self._spill(leftovers)
+
+    def invalidate_admins(self) -> None:
+        """Reload the active-admin list before the next batch is written."""
+        self._admins.invalidate()
+
+    # -- writer thread ------------------------------------------------------
+
+    def _next_batch(self) -> Tuple[List[AuditEvent], bool]:
+        """Block for the first event, then gather more until the batch is full or due."""
+        try:
+            first = self._queue.get(timeout=FLUSH_SEC)
+        except queue.Empty:
+            return [], False
+        if isinstance(first, _Stop):
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + FLUSH_SEC
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if isinstance(item, _Stop):
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        last_spool_check = time.monotonic()
+        # Files left claimed by a worker that died mid-replay become pending again.
+        self._spool.recover()
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if stopping:
+                # Drain whatever was queued behind the stop marker.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, AuditEvent):
+                        batch.append(item)
+            if not batch and time.monotonic() - last_spool_check >= SPOOL_RETRY_SEC:
+                # Idle: retry spooled events now and then, without waiting for new ones.
+                last_spool_check = time.monotonic()
+                if self._spool.pending():
+                    self._flush([])
+            elif batch:
+                for start in range(0, len(batch), BATCH_SIZE):
+                    self._flush(batch[start : start + BATCH_SIZE])
+
+    def _spill(self, events: List[AuditEvent]) -> None:
+        if self._spool.append(events):
+            self._count("spooled", len(events))
+        else:
+            self._count("dropped", len(events))
+
+    def _flush(self, batch: List[AuditEvent]) -> None:
+        started = time.perf_counter()
+        get_db = self._get_db
+        try:
+            db = get_db()
+        except Exception as exc:
+            logger.warning("Admin log writer cannot reach MySQL, spooling: %s", exc)
+            self._spill(batch)
+            return
+        try:
+            cursor = db.cursor(dictionary=True)
+            try:
+                self._replay_spool(db, cursor)
+                written = self._write(db, cursor, batch)
+            finally:
+                cursor.close()
+        except Exception as exc:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            logger.warning("Failed to write %d admin log events, spooling: %s", len(batch), exc)
+            self._spill(batch)
+            return
+        finally:
+            db.close()
+        self._count("written", written)
+        if batch:
+            self._count("batches")
+            self._count("flush_ms_total", (time.perf_counter() - started) * 1000)
+
+    def _replay_spool(self, db, cursor) -> None:
+        claimed = self._spool.claim()
+        for position, (path, events) in enumerate(claimed):
+            try:
+                replayed = self._write(db, cursor, events)
+            except Exception:
+                for unwritten_path, unwritten in claimed[position:]:
+                    self._spool.release(unwritten_path, unwritten, written=False)
+                raise
+            self._spool.release(path, events, written=True)
+            self._count("replayed", replayed)
+            logger.info("Replayed %d spooled admin log events from %s", replayed, path.name)
+
+    def _write(self, db, cursor, events: List[AuditEvent]) -> int:
+        """Insert events and commit.
+
+        Connection errors propagate so the caller spools the events.  Any other
+        error (a row the table rejects) falls back to row-by-row inserts, so one
+        bad event cannot hold back its batch forever.
+
+        Returns:
+            Number of rows written.
+        """
+        if not events:
+            return 0
+        admins = self._admins.resolve(cursor, [event.admin_id for event in events])
+        rows = [
+            (
+                admins[event.admin_id],
+                event.action_type,
+                event.entity_type,
+                event.entity_id,
+                event.description,
+                event.created_at,
+            )
+            for event in events
+            if admins[event.admin_id] is not None
+        ]
+        skipped = len(events) - len(rows)
+        if skipped:
+            self._count("dropped", skipped)
+            logger.warning("Dropped %d admin log events: no active admin to record", skipped)
+        if not rows:
+            return 0
+        try:
+            # mysql.connector rewrites executemany INSERTs into one multi-row INSERT.
+            cursor.executemany(_INSERT_SQL, rows)
+            db.commit()
+            return len(rows)
+        except mysql.connector.Error as exc:
+            if _connection_lost(exc):
+                raise
+            db.rollback()
+        written = 0
+        for row in rows:
+            try:
+                cursor.execute(_INSERT_SQL, row)
+                written += 1
+            except mysql.connector.Error as exc:
+                if _connection_lost(exc):
+                    raise
+                self._count("dropped")
+                logger.warning("Dropped admin log event %s: %s", row[1:4], exc)
+        db.commit()
+        return written
+
+    # -- introspection ------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats.pop("batches")
+        flush_ms_total = stats.pop("flush_ms_total")
+        thread = self._thread
+        return {
+            **stats,
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "batches": batches,
+            "avg_batch_ms": round(flush_ms_total / batches, 2) if batches else 0.0,
+            "running": bool(thread and thread.is_alive()),
+            "spool_pending": self._spool.pending(),
+        }
+
+
+_writer = AuditLogWriter()
+
+
+def start_audit_log_writer(get_db: Callable[[], Any]) -> None:
+    """Start this worker's admin log writer thread (called from the app's lifespan)."""
+    _writer.start(get_db)
+
+
+def shutdown_audit_log_writer() -> None:
+    """Flush queued admin log events and stop the writer thread."""
+    _writer.shutdown()
+
+
+def audit_log_stats() -> Dict[str, Any]:
+    """Return queue depth, write, spool and drop counters for this worker's writer."""
+    return _writer.stats()
+
+
+def invalidate_audit_admins() -> None:
+    """Make the writer reload the active-admin list before its next batch."""
+    _writer.invalidate_admins()
+
 
 def log_admin_action(
     db,
@@ -17,65 +556,27 @@ def log_admin_action(
     entity_id: int,
     description: Optional[str] = None,
 ) -> None:
-    """Persist an admin action to the admin_logs table without impacting the main flow."""
-    try:
-        cursor = db.cursor(dictionary=True)
-        try:
-            effective_admin_id = admin_id
-            admin_role_id = get_role_id(cursor, "admin")
-
-            def is_valid_admin(candidate: Optional[int]) -> bool:
-                if candidate is None or admin_role_id is None:
-                    return False
-                cursor.execute(
-                    """
-                    SELECT roles, admin_is_active
-                    FROM customers
-                    WHERE customer_id=%s
-                    LIMIT 1
-                    """,
-                    (candidate,),
-                )
-                row = cursor.fetchone()
-                if not row:
-                    return False
-                if not bool(row.get("admin_is_active", True)):
-                    return False
-                roles = parse_role_ids(row.get("roles"))
-                return admin_role_id in roles
-
-            if not is_valid_admin(effective_admin_id):
-                cursor.execute(
-                    """
-                    SELECT customer_id, roles
-                    FROM customers
-                    WHERE admin_is_active = 1
-                    ORDER BY customer_id ASC
-                    """
-                )
-                for row in cursor.fetchall():
-                    roles = parse_role_ids(row.get("roles"))
-                    if admin_role_id and admin_role_id in roles:
-                        effective_admin_id = row["customer_id"]
-                        break
-                else:
-                    effective_admin_id = None
+    """Queue an admin action for the admin_logs table without impacting the main flow.
 
-            if effective_admin_id is None:
-                return
-            cursor.execute(
-                """
-                INSERT INTO admin_logs (admin_id, action_type, entity_type, entity_id, description)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (effective_admin_id, action_type, entity_type, entity_id, description),
+    Args:
+        db: Caller's connection.  Unused since writes are batched; kept so call
+            sites stay unchanged.
+        admin_id: Acting admin; replaced by the fallback admin if not active.
+        action_type: ``ADD``, ``UPDATE`` or ``DELETE``.
+        entity_type: ``ITEM``, ``COMBO``, ``ADDON`` or ``CATEGORY``.
+        entity_id: Primary key of the changed entity.
+        description: Free-text detail.
+    """
+    try:
+        _writer.enqueue(
+            AuditEvent(
+                admin_id=int(admin_id) if admin_id is not None else None,
+                action_type=action_type,
+                entity_type=entity_type,
+                entity_id=int(entity_id),
+                description=description,
+                created_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             )
-            db.commit()
-        finally:
-            cursor.close()
+        )
     except Exception as exc:  # pragma: no cover - logging failure should not break flow
-        try:
-            db.rollback()
-        except Exception:  # pragma: no cover
-            pass
-        logger.warning("Failed to write admin log: %s", exc)
+        logger.warning("Failed to queue admin log: %s", exc)
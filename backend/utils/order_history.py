@@ -0,0 +1,427 @@
+"""Shared order-history loader: keyset-paged orders plus their line items in two queries.
+
+``load_order_history`` pages ``orders`` by ``(created_at, order_id)`` (newest
+first) instead of OFFSET, fetches every ``order_items`` row for the page —
+with item, combo or component-type names — in one ``IN`` query, and attaches
+the items to their orders in a single pass.
+
+``orders.updated_at`` (``ON UPDATE CURRENT_TIMESTAMP``, added by the schema
+guard below) lets clients sync incrementally: pass the page's ``sync_token``
+as ``updated_since`` and only orders created or changed since then are
+returned, oldest change first and paged by ``(updated_at, order_id)`` so a
+token saved after any page never skips a row.  Writers that change an
+order's items call ``touch_orders``; writers that delete orders call
+``delete_orders``, which leaves a row in ``order_tombstones`` so a sync also
+reports ``deleted_order_ids``.
+"""
+
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .schema import schema_guard
+
+_ORDER_COLUMNS = """
+    o.order_id,
+    o.customer_id,
+    o.created_at,
+    o.updated_at,
+    o.delivery_date,
+    o.total_price,
+    o.status,
+    o.paid,
+    o.payment_method,
+    COALESCE(o.order_type, 'one_time') AS order_type,
+    a.address_type,
+    a.written_address,
+    a.city,
+    a.pin_code
+"""
+
+_ITEMS_SQL = """
+    SELECT oi.order_id,
+           oi.quantity,
+           oi.price,
+           oi.meal_type,
+           COALESCE(i.name, co.combo_name, ct_mi.name, ct_i.name) AS item_name
+      FROM order_items oi
+      LEFT JOIN items i ON oi.item_id = i.item_id
+      LEFT JOIN combos co ON oi.combo_id = co.combo_id
+      LEFT JOIN menu_items mi ON oi.menu_item_id = mi.menu_item_id
+      LEFT JOIN component_types ct_mi ON mi.component_type_id = ct_mi.component_type_id
+      LEFT JOIN component_types ct_i ON i.component_type_id = ct_i.component_type_id
+     WHERE oi.order_id IN ({placeholders})
+     ORDER BY oi.order_id ASC, oi.order_item_id ASC
+"""
+
+
+def _index_exists(cursor, table: str, index: str) -> bool:
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index,))
+    return bool(cursor.fetchall())
+
+
+@schema_guard("orders_updated_at_column")
+def _ensure_orders_updated_at(db) -> None:
+    """Add orders.updated_at plus the keyset and sync indexes used by the history loader.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("SHOW COLUMNS FROM orders LIKE 'updated_at'")
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "ALTER TABLE orders ADD COLUMN updated_at TIMESTAMP NOT NULL "
+                "DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+            )
+            # Existing orders last changed no later than they were created, as far as we know.
+            cursor.execute("UPDATE orders SET updated_at = created_at WHERE created_at IS NOT NULL")
+        if not _index_exists(cursor, "orders", "idx_orders_customer_created"):
+            cursor.execute(
+                "ALTER TABLE orders ADD INDEX idx_orders_customer_created "
+                "(customer_id, created_at, order_id)"
+            )
+        if not _index_exists(cursor, "orders", "idx_orders_customer_updated"):
+            cursor.execute(
+                "ALTER TABLE orders ADD INDEX idx_orders_customer_updated (customer_id, updated_at)"
+            )
+        if not _index_exists(cursor, "orders", "idx_orders_created"):
+            cursor.execute("ALTER TABLE orders ADD INDEX idx_orders_created (created_at, order_id)")
+        db.commit()
+    finally:
+        cursor.close()
+
+
+@schema_guard("order_tombstones_table")
+def _ensure_order_tombstones(db) -> None:
+    """Create order_tombstones, which records deleted orders for incremental sync.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS order_tombstones (
+                order_id INT NOT NULL,
+                customer_id INT NULL,
+                deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (order_id),
+                KEY idx_order_tombstones_customer_deleted (customer_id, deleted_at),
+                KEY idx_order_tombstones_deleted (deleted_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+@dataclass
+class OrderHistoryPage:
+    """One page of orders (items attached) and the keyset cursor for the next page."""
+
+    orders: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    sync_token: Optional[datetime]
+    deleted_order_ids: List[int] = field(default_factory=list)
+
+
+CURSOR_CREATED = "c"
+CURSOR_UPDATED = "u"
+
+
+def encode_order_cursor(position: datetime, order_id: int, key: str = CURSOR_CREATED) -> str:
+    """Encode a keyset position as an opaque URL-safe token.
+
+    Args:
+        position: created_at (or, in sync mode, updated_at) of the last order on the page.
+        order_id: order_id of the last order on the page.
+        key: ``CURSOR_CREATED`` or ``CURSOR_UPDATED``, the column the page is ordered by.
+
+    Returns:
+        Cursor string for the ``before`` parameter.
+    """
+    raw = f"{key}|{position.isoformat()}|{int(order_id)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_order_cursor(cursor_token: str, key: str = CURSOR_CREATED) -> Tuple[datetime, int]:
+    """Decode a cursor produced by ``encode_order_cursor``.
+
+    Args:
+        cursor_token: Opaque cursor string from a previous page.
+        key: Ordering the caller is paging by; a cursor from the other ordering is rejected.
+
+    Returns:
+        Tuple of (created_at or updated_at, order_id).
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or from the other ordering.
+    """
+    try:
+        padded = cursor_token + "=" * (-len(cursor_token) % 4)
+        cursor_key, position_raw, order_raw = (
+            base64.urlsafe_b64decode(padded).decode().split("|", 2)
+        )
+        if cursor_key != key:
+            raise ValueError(cursor_key)
+        return datetime.fromisoformat(position_raw), int(order_raw)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor") from exc
+
+
+def parse_updated_since(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO-8601 ``updated_since`` value (a trailing ``Z`` is accepted).
+
+    Args:
+        value: Timestamp string or None.
+
+    Returns:
+        Naive datetime, or None when no value was given.
+
+    Raises:
+        HTTPException: 400 if the value is not an ISO-8601 timestamp.
+    """
+    if not value:
+        return None
+    text = value.strip()
+    if text.endswith("Z"):
+        text = text[:-1]
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid updated_since timestamp") from exc
+    return parsed.replace(tzinfo=None)
+
+
+def touch_orders(cursor, order_ids: List[int]) -> None:
+    """Bump ``updated_at`` on orders whose items changed, so incremental sync sees them.
+
+    Call inside the writing transaction, after the ``order_items`` write.
+
+    Args:
+        cursor: Cursor on the writing connection.
+        order_ids: Orders whose items were inserted, changed or removed.
+    """
+    ids = sorted({int(order_id) for order_id in order_ids})
+    if not ids:
+        return
+    cursor.execute(
+        f"UPDATE orders SET updated_at = CURRENT_TIMESTAMP "
+        f"WHERE order_id IN ({', '.join(['%s'] * len(ids))})",
+        tuple(ids),
+    )
+
+
+def delete_orders(cursor, order_ids: Optional[List[int]]) -> None:
+    """Delete orders with their items, leaving tombstones for incremental sync.
+
+    Call inside the writing transaction.
+
+    Args:
+        cursor: Cursor on the writing connection.
+        order_ids: Orders to delete; None deletes every order.
+    """
+    if order_ids is None:
+        where_sql, params = "", ()
+    else:
+        ids = sorted({int(order_id) for order_id in order_ids})
+        if not ids:
+            return
+        where_sql = f" WHERE order_id IN ({', '.join(['%s'] * len(ids))})"
+        params = tuple(ids)
+    cursor.execute(
+        "INSERT INTO order_tombstones (order_id, customer_id) "
+        f"SELECT order_id, customer_id FROM orders{where_sql} "
+        "ON DUPLICATE KEY UPDATE customer_id = VALUES(customer_id), "
+        "deleted_at = CURRENT_TIMESTAMP",
+        params,
+    )
+    cursor.execute(f"DELETE FROM order_items{where_sql}", params)
+    cursor.execute(f"DELETE FROM orders{where_sql}", params)
+
+
+def load_order_items(cursor, order_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Fetch the line items of many orders in one query, grouped by order_id.
+
+    Args:
+        cursor: Dictionary cursor.
+        order_ids: Orders to load items for.
+
+    Returns:
+        Dict mapping order_id to its item dicts (item_name, quantity, price, meal_type).
+    """
+    items_by_order: Dict[int, List[Dict[str, Any]]] = {}
+    if not order_ids:
+        return items_by_order
+    cursor.execute(
+        _ITEMS_SQL.format(placeholders=", ".join(["%s"] * len(order_ids))),
+        tuple(order_ids),
+    )
+    for row in cursor.fetchall() or []:
+        items_by_order.setdefault(row["order_id"], []).append(
+            {
+                "item_name": row.get("item_name") or "Item",
+                "quantity": int(row.get("quantity") or 0),
+                "price": float(row.get("price") or 0),
+                "meal_type": row.get("meal_type"),
+            }
+        )
+    return items_by_order
+
+
+def load_order_history(
+    cursor,
+    *,
+    customer_id: Optional[int] = None,
+    city_code: Optional[str] = None,
+    created_on: Optional[date] = None,
+    status_like: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = 50,
+    include_customer: bool = False,
+) -> OrderHistoryPage:
+    """Load a page of orders with their line items attached.
+
+    Without ``updated_since`` orders come newest first, paged by
+    ``(created_at, order_id)``, and ``sync_token`` is the newest ``updated_at``
+    among all matching orders.  With it (sync mode) they come oldest change
+    first, paged by ``(updated_at, order_id)``; ``sync_token`` is the last
+    change on the page (or, on the last page, the newest change or deletion)
+    and ``deleted_order_ids`` lists orders deleted since ``updated_since``.
+
+    Args:
+        cursor: Dictionary cursor.
+        customer_id: Only this customer's orders.
+        city_code: Only orders delivered to an address in this city.
+        created_on: Only orders placed on this calendar day.
+        status_like: Case-insensitive substring filter on the status.
+        updated_since: Only orders created, changed or deleted at or after this time.
+        before: Keyset cursor from a previous page's ``next_cursor``.
+        limit: Page size; None loads every matching order.
+        include_customer: Also select customer_name and primary_mobile.
+
+    Returns:
+        OrderHistoryPage whose orders carry an ``items`` list.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    if customer_id is not None:
+        clauses.append("o.customer_id = %s")
+        params.append(int(customer_id))
+    if city_code:
+        clauses.append("a.city_code = %s")
+        params.append(city_code)
+    if created_on is not None:
+        day_start = datetime.combine(created_on, datetime.min.time())
+        clauses.append("o.created_at >= %s AND o.created_at < %s")
+        params.extend([day_start, day_start + timedelta(days=1)])
+    if status_like:
+        clauses.append("LOWER(o.status) LIKE LOWER(%s)")
+        params.append(f"%{status_like}%")
+    syncing = updated_since is not None
+    if syncing:
+        # >= so same-second changes are re-sent rather than missed.
+        clauses.append("o.updated_at >= %s")
+        params.append(updated_since)
+    filter_clauses, filter_params = list(clauses), list(params)
+    if before and syncing:
+        after_updated, after_id = decode_order_cursor(before, CURSOR_UPDATED)
+        clauses.append("(o.updated_at > %s OR (o.updated_at = %s AND o.order_id > %s))")
+        params.extend([after_updated, after_updated, after_id])
+    elif before:
+        before_created, before_id = decode_order_cursor(before)
+        clauses.append("(o.created_at < %s OR (o.created_at = %s AND o.order_id < %s))")
+        params.extend([before_created, before_created, before_id])
+
+    customer_columns = ""
+    customer_join = ""
+    if include_customer:
+        customer_columns = ", c.name AS customer_name, c.primary_mobile"
+        customer_join = "JOIN customers c ON o.customer_id = c.customer_id"
+    where_sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    order_sql = (
+        "o.updated_at ASC, o.order_id ASC" if syncing else "o.created_at DESC, o.order_id DESC"
+    )
+    limit_sql = ""
+    if limit is not None:
+        # One extra row tells us whether another page exists.
+        limit_sql = "LIMIT %s"
+        params.append(int(limit) + 1)
+
+    cursor.execute(
+        f"""
+        SELECT {_ORDER_COLUMNS}{customer_columns}
+          FROM orders o
+          JOIN addresses a ON o.address_id = a.address_id
+          {customer_join}
+          {where_sql}
+         ORDER BY {order_sql}
+         {limit_sql}
+        """,
+        tuple(params),
+    )
+    orders = list(cursor.fetchall() or [])
+
+    next_cursor = None
+    if limit is not None and len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        if syncing and last.get("updated_at") is not None:
+            next_cursor = encode_order_cursor(last["updated_at"], last["order_id"], CURSOR_UPDATED)
+        elif not syncing and last.get("created_at") is not None:
+            next_cursor = encode_order_cursor(last["created_at"], last["order_id"])
+
+    items_by_order = load_order_items(cursor, [order["order_id"] for order in orders])
+    for order in orders:
+        order["items"] = items_by_order.get(order["order_id"], [])
+
+    deleted_order_ids: List[int] = []
+    if syncing:
+        sync_token: Optional[datetime] = updated_since
+        if orders and orders[-1].get("updated_at") is not None:
+            sync_token = max(sync_token, orders[-1]["updated_at"])
+        tombstone_sql = "SELECT order_id, deleted_at FROM order_tombstones WHERE deleted_at >= %s"
+        tombstone_params: List[Any] = [updated_since]
+        if customer_id is not None:
+            tombstone_sql += " AND customer_id = %s"
+            tombstone_params.append(int(customer_id))
+        cursor.execute(f"{tombstone_sql} ORDER BY deleted_at, order_id", tuple(tombstone_params))
+        for row in cursor.fetchall() or []:
+            deleted_order_ids.append(int(row["order_id"]))
+            if next_cursor is None and row["deleted_at"] > sync_token:
+                sync_token = row["deleted_at"]
+    elif limit is None:
+        sync_token = max(
+            (order["updated_at"] for order in orders if order.get("updated_at") is not None),
+            default=None,
+        )
+    else:
+        # The newest change among every matching order, not just this page, so
+        # a client that loaded the full history can start syncing from it.
+        filter_sql = f"WHERE {' AND '.join(filter_clauses)}" if filter_clauses else ""
+        cursor.execute(
+            f"""
+            SELECT MAX(o.updated_at) AS sync_token
+              FROM orders o
+              JOIN addresses a ON o.address_id = a.address_id
+              {filter_sql}
+            """,
+            tuple(filter_params),
+        )
+        sync_token = (cursor.fetchone() or {}).get("sync_token")
+    return OrderHistoryPage(
+        orders=orders,
+        next_cursor=next_cursor,
+        sync_token=sync_token,
+        deleted_order_ids=deleted_order_ids,
+    )
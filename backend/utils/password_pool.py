@@ -0,0 +1,207 @@
+"""Bounded worker pool for bcrypt password checks.
+
+An admin login spends ~250 ms in bcrypt at cost 12.  Run inline in a sync
+endpoint, a burst of logins at shift start occupied the request threadpool
+(and, because the check ran before the connection was closed, pooled DB
+connections) for that long each.  Checks now run on a small dedicated thread
+pool — bcrypt releases the GIL, so threads hash in parallel — and wait for it
+without holding a request thread.
+
+At most ``BCRYPT_POOL_WORKERS`` checks run and ``BCRYPT_POOL_MAX_QUEUE`` wait
+per process; beyond that ``PasswordPoolBusy`` is raised so callers can answer
+503 instead of queueing without bound.  ``password_pool_stats`` reports queue
+depth, rejections and wait/hash times; ``shutdown_password_pool`` is called
+from the app's lifespan.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from ..config import (
+    BCRYPT_POOL_MAX_QUEUE,
+    BCRYPT_POOL_WORKERS,
+    BCRYPT_REHASH_ON_LOGIN,
+    BCRYPT_ROUNDS,
+)
+from .auth_deps import hash_password, verify_password
+
+_COST_RE = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the bcrypt pool's queue is full."""
+
+
+@dataclass(frozen=True)
+class PasswordCheck:
+    """Outcome of a pooled password check."""
+
+    ok: bool
+    needs_rehash: bool = False
+
+
+class _PoolMetrics:
+    def __init__(self) -> None:
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.peak_queued = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.hash_ms_total = 0.0
+
+
+_metrics = _PoolMetrics()
+_metrics_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, BCRYPT_POOL_WORKERS) + max(0, BCRYPT_POOL_MAX_QUEUE))
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, BCRYPT_POOL_WORKERS), thread_name_prefix="bcrypt"
+            )
+        return _executor
+
+
+def shutdown_password_pool() -> None:
+    """Stop the bcrypt threads, if they were started."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(fn: Callable[..., Any], *args: Any) -> Future:
+    if not _slots.acquire(blocking=False):
+        with _metrics_lock:
+            _metrics.rejected += 1
+        raise PasswordPoolBusy("password check queue is full")
+    enqueued = time.perf_counter()
+    with _metrics_lock:
+        _metrics.queued += 1
+        _metrics.peak_queued = max(_metrics.peak_queued, _metrics.queued)
+
+    ran = False
+
+    def run() -> Any:
+        nonlocal ran
+        started = time.perf_counter()
+        waited_ms = (started - enqueued) * 1000
+        with _metrics_lock:
+            ran = True
+            _metrics.queued -= 1
+            _metrics.running += 1
+            _metrics.wait_ms_total += waited_ms
+            _metrics.wait_ms_max = max(_metrics.wait_ms_max, waited_ms)
+        try:
+            return fn(*args)
+        finally:
+            with _metrics_lock:
+                _metrics.running -= 1
+                _metrics.completed += 1
+                _metrics.hash_ms_total += (time.perf_counter() - started) * 1000
+
+    def done(_future: Future) -> None:
+        # Also runs when the future is cancelled before run() starts (the
+        # awaiting request was cancelled, or the pool shut down), so the slot
+        # and the queued count are never leaked.
+        with _metrics_lock:
+            if not ran:
+                _metrics.queued -= 1
+                _metrics.cancelled += 1
+        _slots.release()
+
+    try:
+        future = _get_executor().submit(run)
+    except RuntimeError as exc:  # executor shut down
+        with _metrics_lock:
+            _metrics.queued -= 1
+            _metrics.rejected += 1
+        _slots.release()
+        raise PasswordPoolBusy("password pool is shut down") from exc
+    future.add_done_callback(done)
+    return future
+
+
+def password_cost(hashed: str) -> Optional[int]:
+    """Return the bcrypt cost factor of a stored hash, or None if unrecognised."""
+    match = _COST_RE.match(hashed or "")
+    return int(match.group(1)) if match else None
+
+
+async def check_password(plain: str, hashed: str) -> PasswordCheck:
+    """Verify a password on the bcrypt pool without blocking the caller's thread.
+
+    Args:
+        plain: Plain-text password supplied by the user.
+        hashed: Stored bcrypt hash.
+
+    Returns:
+        PasswordCheck; ``needs_rehash`` is set on a match when rehash-on-login
+        is enabled and the hash's cost differs from ``BCRYPT_ROUNDS``.
+
+    Raises:
+        PasswordPoolBusy: The pool's queue is full.
+    """
+    ok = await asyncio.wrap_future(_submit(verify_password, plain, hashed))
+    needs_rehash = bool(ok) and BCRYPT_REHASH_ON_LOGIN and password_cost(hashed) != BCRYPT_ROUNDS
+    return PasswordCheck(ok=bool(ok), needs_rehash=needs_rehash)
+
+
+def hash_password_pooled(plain: str, only_if_idle: bool = False) -> str:
+    """Hash a password on the bcrypt pool, blocking until it is done.
+
+    Args:
+        plain: Plain-text password.
+        only_if_idle: Refuse instead of queueing behind pending checks (for
+            work that can be retried later, like rehash-on-login).
+
+    Returns:
+        Bcrypt hash at ``BCRYPT_ROUNDS`` cost.
+
+    Raises:
+        PasswordPoolBusy: The pool's queue is full, or not empty with
+            ``only_if_idle``.
+    """
+    if only_if_idle:
+        with _metrics_lock:
+            busy = _metrics.queued > 0
+        if busy:
+            raise PasswordPoolBusy("password checks are queued")
+    return _submit(hash_password, plain).result()
+
+
+def password_pool_stats() -> Dict[str, Any]:
+    """Return queue depth, throughput and timing counters for this worker's pool."""
+    with _metrics_lock:
+        completed = _metrics.completed
+        return {
+            "workers": max(1, BCRYPT_POOL_WORKERS),
+            "max_queue": max(0, BCRYPT_POOL_MAX_QUEUE),
+            "queued": _metrics.queued,
+            "running": _metrics.running,
+            "peak_queued": _metrics.peak_queued,
+            "completed": completed,
+            "rejected": _metrics.rejected,
+            "cancelled": _metrics.cancelled,
+            "avg_wait_ms": round(_metrics.wait_ms_total / completed, 2) if completed else 0.0,
+            "max_wait_ms": round(_metrics.wait_ms_max, 2),
+            "avg_hash_ms": round(_metrics.hash_ms_total / completed, 2) if completed else 0.0,
+            "rounds": BCRYPT_ROUNDS,
+            "rehash_on_login": BCRYPT_REHASH_ON_LOGIN,
+        }
@@ -1,8 +1,30 @@
+"""Role helpers: the process-wide role registry and customer role assignments.
+
+The ``roles`` table is small and changes only through the RBAC endpoints, so
+``role_registry`` loads it once per process and answers role-map and
+code/id lookups from memory.  The RBAC write endpoints invalidate it; other
+workers pick changes up after ``ROLE_REGISTRY_TTL_SEC`` or immediately when a
+lookup asks for an id or code they have not seen.
+
+Role assignments are stored as a JSON array in ``customers.roles`` and
+mirrored into the ``customer_roles`` junction table, which is what usage
+counts and "who holds role X" lookups query.  Writers of ``customers.roles``
+call ``sync_customer_roles`` in the same transaction.
+"""
+
 from __future__ import annotations
 
 import json
+import threading
+import time
 from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
+from .schema import GUARD_KIND_SEED, schema_guard
+
+ROLE_REGISTRY_TTL_SEC = 60.0
+# A lookup for an unknown id/code reloads at most this often.
+ROLE_REGISTRY_MISS_RELOAD_SEC = 1.0
+
 DEFAULT_ROLES: Tuple[Dict[str, Any], ...] = (
     {
         "code": "admin",
@@ -22,6 +44,7 @@ DEFAULT_ROLES: Tuple[Dict[str, Any], ...] = (
 def ensure_default_roles(cursor) -> None:
     """
     Guarantee that core system roles exist. Safe to call repeatedly.
+    Runs once at startup via the ``default_roles`` schema guard.
     """
     inserted = False
     for role in DEFAULT_ROLES:
@@ -44,6 +67,7 @@ def ensure_default_roles(cursor) -> None:
         if getattr(cursor, "rowcount", 0):
             inserted = True
     if inserted:
+        role_registry.invalidate()
         connection = getattr(cursor, "connection", None)
         if connection is not None:
             try:
@@ -52,6 +76,18 @@ def ensure_default_roles(cursor) -> None:
                 pass
 
 
+@schema_guard("default_roles", kind=GUARD_KIND_SEED)
+def _seed_default_roles(db) -> None:
+    """
+    Startup seed guard wrapper around ensure_default_roles.
+    """
+    cursor = db.cursor()
+    try:
+        ensure_default_roles(cursor)
+    finally:
+        cursor.close()
+
+
 def parse_role_ids(raw: Any) -> List[int]:
     """
     Normalise roles JSON/iterable into a list[int].
@@ -88,46 +124,128 @@ def roles_to_json(role_ids: Sequence[int]) -> str:
     return json.dumps(unique_sorted)
 
 
+# ---------------------------------------------------------------------------
+# Role registry
+# ---------------------------------------------------------------------------
+
+
+def _role_row(row: Any) -> Dict[str, Any]:
+    if isinstance(row, Mapping):
+        role_id, code, name = row["role_id"], row["code"], row["name"]
+        description, is_system = row["description"], row["is_system"]
+    else:
+        role_id, code, name, description, is_system = row
+    return {
+        "role_id": int(role_id),
+        "code": code,
+        "name": name,
+        "description": description,
+        "is_system": bool(is_system),
+    }
+
+
+class RoleRegistry:
+    """In-memory copy of the roles table with code <-> id maps.
+
+    Args:
+        ttl_sec: Reload the table when the copy is older than this.
+    """
+
+    def __init__(self, ttl_sec: float = ROLE_REGISTRY_TTL_SEC) -> None:
+        self.ttl_sec = ttl_sec
+        self._roles: Dict[int, Dict[str, Any]] = {}
+        self._ids_by_code: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Drop the cached copy; the next lookup reloads it."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, cursor) -> None:
+        cursor.execute(
+            """
+            SELECT role_id, code, name, description, is_system
+            FROM roles
+            ORDER BY name ASC
+            """
+        )
+        roles = {}
+        for row in cursor.fetchall():
+            role = _role_row(row)
+            roles[role["role_id"]] = role
+        with self._lock:
+            self._roles = roles
+            self._ids_by_code = {role["code"]: rid for rid, role in roles.items()}
+            self._loaded_at = time.monotonic()
+
+    def _ensure(self, cursor, role_ids: Iterable[int] = (), codes: Iterable[str] = ()) -> None:
+        now = time.monotonic()
+        with self._lock:
+            loaded_at = self._loaded_at
+            missing = any(rid not in self._roles for rid in role_ids) or any(
+                code not in self._ids_by_code for code in codes
+            )
+        if (
+            loaded_at is None
+            or now - loaded_at > self.ttl_sec
+            or (missing and now - loaded_at > ROLE_REGISTRY_MISS_RELOAD_SEC)
+        ):
+            self._load(cursor)
+
+    def role_map(
+        self, cursor, role_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """Return role metadata keyed by id, in role-name order.
+
+        Args:
+            cursor: Cursor used if the table has to be (re)loaded.
+            role_ids: Restrict to these ids (unknown ids are left out); None
+                returns every role.
+
+        Returns:
+            Dict of role_id -> {role_id, code, name, description, is_system};
+            the dicts are copies.
+        """
+        wanted = None if role_ids is None else {int(r) for r in role_ids}
+        self._ensure(cursor, wanted or ())
+        with self._lock:
+            return {
+                rid: dict(role)
+                for rid, role in self._roles.items()
+                if wanted is None or rid in wanted
+            }
+
+    def ids_by_codes(self, cursor, codes: Iterable[str]) -> Dict[str, Optional[int]]:
+        """Resolve role codes to ids (None for unknown codes).
+
+        Args:
+            cursor: Cursor used if the table has to be (re)loaded.
+            codes: Role codes.
+
+        Returns:
+            Dict of code -> role_id or None.
+        """
+        wanted = {code for code in codes if code}
+        self._ensure(cursor, codes=wanted)
+        with self._lock:
+            return {code: self._ids_by_code.get(code) for code in wanted}
+
+
+role_registry = RoleRegistry()
+
+
 def fetch_role_map(cursor, role_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
     """
-    Return metadata for roles keyed by id. If role_ids is provided the query is scoped.
+    Return metadata for roles keyed by id. If role_ids is provided the result is scoped.
+    Served from the role registry.
     """
-    params: Tuple[Any, ...] = ()
-    where = ""
     if role_ids is not None:
         role_ids = tuple({int(r) for r in role_ids})
         if not role_ids:
             return {}
-        placeholders = ",".join(["%s"] * len(role_ids))
-        params = tuple(role_ids)
-        where = f"WHERE role_id IN ({placeholders})"
-
-    cursor.execute(
-        f"""
-        SELECT role_id, code, name, description, is_system
-        FROM roles
-        {where}
-        ORDER BY name ASC
-        """,
-        params,
-    )
-    result: Dict[int, Dict[str, Any]] = {}
-    for row in cursor.fetchall():
-        (
-            role_id,
-            code,
-            name,
-            description,
-            is_system,
-        ) = row
-        result[int(role_id)] = {
-            "role_id": int(role_id),
-            "code": code,
-            "name": name,
-            "description": description,
-            "is_system": bool(is_system),
-        }
-    return result
+    return role_registry.role_map(cursor, role_ids)
 
 
 def fetch_role_ids_by_codes(cursor, codes: Sequence[str]) -> Dict[str, Optional[int]]:
@@ -136,54 +254,121 @@ def fetch_role_ids_by_codes(cursor, codes: Sequence[str]) -> Dict[str, Optional[
     """
     if not codes:
         return {}
-    unique_codes = tuple({code for code in codes if code})
-    if not unique_codes:
-        return {}
-    placeholders = ",".join(["%s"] * len(unique_codes))
-
-    cursor.execute(
-        f"""
-        SELECT code, role_id
-        FROM roles
-        WHERE code IN ({placeholders})
-        """,
-        unique_codes,
-    )
-    mapping: Dict[str, Optional[int]] = {code: None for code in unique_codes}
-    for code, role_id in cursor.fetchall():
-        mapping[code] = int(role_id)
-    return mapping
+    return role_registry.ids_by_codes(cursor, codes)
 
 
 def get_role_id(cursor, code: str) -> Optional[int]:
     """
-    Convenience accessor for a single role id by code. Ensures defaults exist first.
+    Convenience accessor for a single role id by code.
     """
     if not code:
         return None
-    ensure_default_roles(cursor)
-    cursor.execute(
-        """
-        SELECT role_id
-        FROM roles
-        WHERE code = %s
-        LIMIT 1
-        """,
-        (code,),
-    )
-    row = cursor.fetchone()
-    if not row:
-        return None
-    if isinstance(row, Mapping):
-        value = row.get("role_id")
-    elif isinstance(row, (list, tuple)):
-        value = row[0]
-    else:
-        value = row
+    return role_registry.ids_by_codes(cursor, [code]).get(code)
+
+
+# ---------------------------------------------------------------------------
+# Customer role assignments
+# ---------------------------------------------------------------------------
+
+
+@schema_guard("customer_roles_table")
+def _ensure_customer_roles_table(db) -> None:
+    """Create the customer_roles junction table and fill it from customers.roles.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
     try:
-        return int(value)
-    except (TypeError, ValueError):
-        return None
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS customer_roles (
+                customer_id INT NOT NULL,
+                role_id INT NOT NULL,
+                PRIMARY KEY (customer_id, role_id),
+                KEY idx_customer_roles_role (role_id, customer_id),
+                CONSTRAINT fk_customer_roles_customer
+                    FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+                    ON DELETE CASCADE,
+                CONSTRAINT fk_customer_roles_role
+                    FOREIGN KEY (role_id) REFERENCES roles(role_id)
+                    ON DELETE CASCADE
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        db.commit()
+    finally:
+        cursor.close()
+    rebuild_customer_roles(db)
+
+
+def rebuild_customer_roles(db) -> int:
+    """Repopulate customer_roles from every customer's roles JSON.
+
+    Args:
+        db: mysql.connector connection.
+
+    Returns:
+        Number of assignment rows written.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute("DELETE FROM customer_roles")
+        cursor.execute(
+            """
+            INSERT IGNORE INTO customer_roles (customer_id, role_id)
+            SELECT c.customer_id, r.role_id
+              FROM customers c
+             CROSS JOIN JSON_TABLE(c.roles, '$[*]' COLUMNS (role_id INT PATH '$')) jt
+              JOIN roles r ON r.role_id = jt.role_id
+             WHERE c.roles IS NOT NULL
+            """
+        )
+        written = cursor.rowcount
+        db.commit()
+        return written
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def sync_customer_roles(cursor, customer_id: int, role_ids: Iterable[int]) -> None:
+    """Mirror one customer's role list into customer_roles.
+
+    Call in the same transaction as the ``customers.roles`` update.
+
+    Args:
+        cursor: Cursor on the writer's connection.
+        customer_id: Customer whose roles changed.
+        role_ids: The customer's full, validated role list.
+    """
+    ids = sorted({int(rid) for rid in role_ids})
+    cursor.execute("DELETE FROM customer_roles WHERE customer_id = %s", (customer_id,))
+    if ids:
+        cursor.execute(
+            "INSERT INTO customer_roles (customer_id, role_id) VALUES "
+            + ", ".join(["(%s, %s)"] * len(ids)),
+            tuple(value for rid in ids for value in (customer_id, rid)),
+        )
+
+
+def role_assignment_counts(cursor) -> Dict[int, int]:
+    """Return how many customers hold each role.
+
+    Args:
+        cursor: Any cursor.
+
+    Returns:
+        Dict of role_id -> customer count (roles nobody holds are absent).
+    """
+    cursor.execute("SELECT role_id, COUNT(*) AS assigned FROM customer_roles GROUP BY role_id")
+    counts: Dict[int, int] = {}
+    for row in cursor.fetchall():
+        role_id, assigned = (row["role_id"], row["assigned"]) if isinstance(row, Mapping) else row
+        counts[int(role_id)] = int(assigned)
+    return counts
 
 
 def make_role_summary(
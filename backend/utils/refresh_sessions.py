@@ -0,0 +1,373 @@
+"""Server-side refresh-token sessions: rotation, reuse detection and revocation.
+
+Every refresh token carries a ``jti`` and a ``fam`` (family) claim, and has a
+row in ``refresh_sessions``.  Login starts a family.  ``/auth/refresh``
+rotates atomically: a conditional UPDATE marks the presented session rotated
+and only the caller that wins it inserts the child session, so a refresh
+token can be exchanged once.
+
+Presenting an already-rotated token is treated as reuse (a stolen token being
+replayed) and revokes the whole family, except within
+``REFRESH_REUSE_GRACE_SEC`` of the rotation: the browser client refreshes from
+several requests at once with the same cookie, so those siblings get their
+own child session instead.  Logout revokes the token's family, and a password
+change or admin deactivation revokes every session of the customer.
+
+An in-process LRU in front of the table maps jti to the session's last known
+state, so revoked tokens are refused in O(1) without touching the database
+or signing new JWTs.  The table stays authoritative: only revoked states are
+trusted from the cache, and every rotation goes through the conditional
+UPDATE.  Sessions more than a day past expiry are pruned in batches by
+``run_session_pruner``, started from the app's lifespan.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, replace
+from typing import Iterable, Optional
+
+from cachetools import LRUCache
+
+from ..config import REFRESH_REUSE_GRACE_SEC, REFRESH_TOKEN_TTL_SEC
+from .schema import schema_guard
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_SIZE = 50000
+PRUNE_BATCH = 1000
+PRUNE_INTERVAL_SEC = 3600
+PRUNE_RETENTION_DAYS = 1
+
+STATE_ACTIVE = "active"
+STATE_ROTATED = "rotated"
+STATE_REVOKED = "revoked"
+
+
+@dataclass(frozen=True)
+class RefreshSession:
+    """Last known state of one refresh token."""
+
+    jti: str
+    family_id: str
+    customer_id: int
+    expires_at: int
+    state: str = STATE_ACTIVE
+
+
+class RefreshSessionError(Exception):
+    """A refresh token that must not be exchanged.
+
+    Attributes:
+        reason: ``"unknown"``, ``"expired"``, ``"revoked"`` or ``"reused"``.
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+_cache: "LRUCache[str, RefreshSession]" = LRUCache(maxsize=SESSION_CACHE_SIZE)
+_cache_lock = threading.Lock()
+
+
+@schema_guard("refresh_sessions_table")
+def _ensure_refresh_sessions_table(db) -> None:
+    """Create the refresh_sessions table if it does not yet exist.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_sessions (
+                jti CHAR(36) NOT NULL,
+                family_id CHAR(36) NOT NULL,
+                customer_id INT NOT NULL,
+                parent_jti CHAR(36) NULL,
+                issued_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                expires_at DATETIME NOT NULL,
+                rotated_at DATETIME NULL,
+                revoked_at DATETIME NULL,
+                revoke_reason VARCHAR(32) NULL,
+                PRIMARY KEY (jti),
+                KEY idx_refresh_sessions_family (family_id),
+                KEY idx_refresh_sessions_customer (customer_id, revoked_at),
+                KEY idx_refresh_sessions_expires (expires_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+
+def _remember(session: RefreshSession) -> None:
+    with _cache_lock:
+        _cache[session.jti] = session
+
+
+def cached_session(jti: str) -> Optional[RefreshSession]:
+    """Return this worker's last known state of a refresh token, if cached."""
+    with _cache_lock:
+        return _cache.get(jti)
+
+
+def _mark_revoked(family_id: Optional[str] = None, customer_ids: Iterable[int] = ()) -> None:
+    customers = set(customer_ids)
+    with _cache_lock:
+        for jti, session in list(_cache.items()):
+            if session.family_id == family_id or session.customer_id in customers:
+                _cache[jti] = replace(session, state=STATE_REVOKED)
+
+
+# ---------------------------------------------------------------------------
+# Session lifecycle
+# ---------------------------------------------------------------------------
+
+
+def _insert_session(
+    cursor, family_id: str, customer_id: int, parent_jti: Optional[str]
+) -> RefreshSession:
+    session = RefreshSession(
+        jti=str(uuid.uuid4()),
+        family_id=family_id,
+        customer_id=int(customer_id),
+        expires_at=int(time.time()) + REFRESH_TOKEN_TTL_SEC,
+    )
+    cursor.execute(
+        """
+        INSERT INTO refresh_sessions (jti, family_id, customer_id, parent_jti, expires_at)
+        VALUES (%s, %s, %s, %s, FROM_UNIXTIME(%s))
+        """,
+        (session.jti, family_id, session.customer_id, parent_jti, session.expires_at),
+    )
+    return session
+
+
+def start_session(cursor, customer_id: int) -> RefreshSession:
+    """Start a new session family (login).
+
+    Args:
+        cursor: Cursor on the caller's connection; the caller commits.
+        customer_id: Customer signing in.
+
+    Returns:
+        The new session; put its jti and family_id in the refresh token.
+    """
+    session = _insert_session(cursor, str(uuid.uuid4()), customer_id, None)
+    _remember(session)
+    return session
+
+
+def rotate_session(cursor, jti: str, family_id: Optional[str], customer_id: int) -> RefreshSession:
+    """Exchange a refresh token's session for a child session.
+
+    Refresh tokens issued before sessions were tracked (no ``fam`` claim and
+    no row) are adopted into a new family once; their row is recorded as
+    rotated so a replay is detected like any other.
+
+    Args:
+        cursor: Dictionary cursor on the caller's connection.  The caller
+            commits, including after ``RefreshSessionError`` (reuse revokes
+            the family).
+        jti: jti claim of the presented token.
+        family_id: fam claim of the presented token (None for legacy tokens).
+        customer_id: customer_id of the token's subject.
+
+    Returns:
+        The new child session.
+
+    Raises:
+        RefreshSessionError: The token is unknown, expired, revoked or reused.
+    """
+    cursor.execute(
+        """
+        UPDATE refresh_sessions
+           SET rotated_at = NOW()
+         WHERE jti = %s AND rotated_at IS NULL AND revoked_at IS NULL AND expires_at > NOW()
+        """,
+        (jti,),
+    )
+    if cursor.rowcount == 1:
+        child = _insert_session(cursor, family_id, customer_id, jti)
+        _remember(child)
+        return child
+
+    cursor.execute(
+        """
+        SELECT family_id,
+               customer_id,
+               UNIX_TIMESTAMP(expires_at) AS expires_at,
+               expires_at > NOW() AS live,
+               rotated_at IS NOT NULL AS rotated,
+               rotated_at >= NOW() - INTERVAL %s SECOND AS in_grace,
+               revoked_at IS NOT NULL AS revoked
+          FROM refresh_sessions
+         WHERE jti = %s
+        """,
+        (REFRESH_REUSE_GRACE_SEC, jti),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        if family_id is not None:
+            raise RefreshSessionError("unknown")
+        family_id = str(uuid.uuid4())
+        cursor.execute(
+            """
+            INSERT INTO refresh_sessions (jti, family_id, customer_id, expires_at, rotated_at)
+            VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND, NOW())
+            """,
+            (jti, family_id, customer_id, REFRESH_TOKEN_TTL_SEC),
+        )
+    else:
+        presented = RefreshSession(
+            jti=jti,
+            family_id=row["family_id"],
+            customer_id=int(row["customer_id"]),
+            expires_at=int(row["expires_at"]),
+            state=STATE_REVOKED if row["revoked"] else STATE_ROTATED,
+        )
+        if row["revoked"]:
+            _remember(presented)
+            raise RefreshSessionError("revoked")
+        if not row["live"]:
+            raise RefreshSessionError("expired")
+        if not row["in_grace"]:
+            revoke_family(cursor, presented.family_id, "reuse")
+            logger.warning(
+                "Refresh token reuse for customer %s; revoked family %s",
+                presented.customer_id,
+                presented.family_id,
+            )
+            raise RefreshSessionError("reused")
+        # A concurrent refresh with the same token: issue a sibling.
+        family_id, customer_id = presented.family_id, presented.customer_id
+
+    child = _insert_session(cursor, family_id, customer_id, jti)
+    _remember(child)
+    return child
+
+
+def revoke_family(cursor, family_id: str, reason: str) -> int:
+    """Revoke every live session of a family.
+
+    Args:
+        cursor: Cursor on the caller's connection; the caller commits.
+        family_id: Family to revoke.
+        reason: Short reason stored on the rows (``logout``, ``reuse``).
+
+    Returns:
+        Number of sessions revoked.
+    """
+    cursor.execute(
+        """
+        UPDATE refresh_sessions
+           SET revoked_at = NOW(), revoke_reason = %s
+         WHERE family_id = %s AND revoked_at IS NULL
+        """,
+        (reason, family_id),
+    )
+    _mark_revoked(family_id=family_id)
+    return cursor.rowcount
+
+
+def revoke_customer_sessions(cursor, customer_ids: Iterable[int], reason: str) -> int:
+    """Revoke every live session of the given customers.
+
+    Args:
+        cursor: Cursor on the caller's connection; the caller commits.
+        customer_ids: Customers to sign out everywhere.
+        reason: Short reason stored on the rows (``password_change``, ...).
+
+    Returns:
+        Number of sessions revoked.
+    """
+    ids = sorted({int(value) for value in customer_ids})
+    if not ids:
+        return 0
+    cursor.execute(
+        f"""
+        UPDATE refresh_sessions
+           SET revoked_at = NOW(), revoke_reason = %s
+         WHERE customer_id IN ({', '.join(['%s'] * len(ids))}) AND revoked_at IS NULL
+        """,
+        (reason, *ids),
+    )
+    _mark_revoked(customer_ids=ids)
+    return cursor.rowcount
+
+
+# ---------------------------------------------------------------------------
+# Pruning
+# ---------------------------------------------------------------------------
+
+
+def prune_expired_sessions(db, batch_size: int = PRUNE_BATCH) -> int:
+    """Delete sessions more than ``PRUNE_RETENTION_DAYS`` past expiry, in batches.
+
+    Each batch is its own short transaction so pruning never holds many locks.
+
+    Args:
+        db: mysql.connector connection.
+        batch_size: Rows deleted per statement.
+
+    Returns:
+        Number of rows deleted.
+    """
+    cursor = db.cursor()
+    deleted = 0
+    try:
+        while True:
+            cursor.execute(
+                """
+                DELETE FROM refresh_sessions
+                 WHERE expires_at < NOW() - INTERVAL %s DAY
+                 ORDER BY expires_at
+                 LIMIT %s
+                """,
+                (PRUNE_RETENTION_DAYS, batch_size),
+            )
+            removed = cursor.rowcount
+            db.commit()
+            deleted += removed
+            if removed < batch_size:
+                return deleted
+    finally:
+        cursor.close()
+
+
+async def run_session_pruner(get_db, interval_sec: float = PRUNE_INTERVAL_SEC) -> None:
+    """Prune expired sessions every ``interval_sec`` until cancelled.
+
+    Args:
+        get_db: Callable returning a pooled connection (``get_raw_db``).
+        interval_sec: Seconds between runs.
+    """
+
+    def prune_once() -> int:
+        db = get_db()
+        try:
+            return prune_expired_sessions(db)
+        finally:
+            db.close()
+
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            deleted = await asyncio.to_thread(prune_once)
+            if deleted:
+                logger.info("Pruned %d expired refresh sessions", deleted)
+        except Exception:
+            logger.warning("Refresh session pruning failed", exc_info=True)
@@ -0,0 +1,553 @@
+"""Automatic delivery-route planning from address coordinates.
+
+Routes used to be built by hand, one ``PATCH .../addresses/{id}/route`` call
+per address.  ``plan_routes`` clusters a city's active addresses into N
+routes with a vectorised k-means over their latitude/longitude and,
+optionally, a capacity-constrained rebalancing pass so that no route gets
+more than ``max_stops_per_route`` addresses.  ``apply_route_plan`` writes a
+plan in the caller's transaction: new ``delivery_routes`` rows where needed
+and one joined ``UPDATE`` of ``addresses.route_id`` from a temporary table.
+
+Clusters are matched to the city's existing routes by how many of their
+addresses those routes already serve, so re-planning keeps route codes
+stable and only moves the addresses that actually change.
+
+Plans are deterministic for a given address set and (route_count,
+max_stops_per_route, seed); ``plan_token`` fingerprints those inputs so the
+apply endpoint can refuse a plan whose addresses changed after the preview.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .customer_summary import refresh_customer_city_summary
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_ROUTE_COUNT = 200
+KMEANS_MAX_ITER = 100
+KMEANS_TOLERANCE_KM = 1e-4
+BALANCE_ROUNDS = 3
+APPLY_BATCH_SIZE = 1000
+AUTO_ROUTE_PREFIX = "AUTO"
+
+
+# ---------------------------------------------------------------------------
+# Clustering
+# ---------------------------------------------------------------------------
+
+
+def project_coordinates(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Project lat/lng degrees onto a local plane in kilometres.
+
+    An equirectangular projection around the mean latitude is accurate to a
+    fraction of a percent across a city, which is all the clustering needs.
+
+    Args:
+        lat: Latitudes in degrees, shape (n,).
+        lng: Longitudes in degrees, shape (n,).
+
+    Returns:
+        Array of shape (n, 2) with x (east) and y (north) in kilometres.
+    """
+    lat_rad = np.radians(lat)
+    lng_rad = np.radians(lng)
+    origin_lat = float(lat_rad.mean()) if lat_rad.size else 0.0
+    origin_lng = float(lng_rad.mean()) if lng_rad.size else 0.0
+    x = (lng_rad - origin_lng) * math.cos(origin_lat) * EARTH_RADIUS_KM
+    y = (lat_rad - origin_lat) * EARTH_RADIUS_KM
+    return np.column_stack((x, y))
+
+
+def _squared_distances(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    cross = points @ centroids.T
+    d2 = (points * points).sum(axis=1)[:, None] - 2.0 * cross + (centroids * centroids).sum(axis=1)
+    return np.maximum(d2, 0.0)
+
+
+def _kmeans_plus_plus(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = np.empty((k, points.shape[1]))
+    centroids[0] = points[rng.integers(len(points))]
+    closest = _squared_distances(points, centroids[:1])[:, 0]
+    for index in range(1, k):
+        total = closest.sum()
+        if total <= 0:
+            # Fewer distinct locations than clusters: reuse random points.
+            centroids[index] = points[rng.integers(len(points))]
+            continue
+        choice = rng.choice(len(points), p=closest / total)
+        centroids[index] = points[choice]
+        closest = np.minimum(
+            closest, _squared_distances(points, centroids[index : index + 1])[:, 0]
+        )
+    return centroids
+
+
+def _centroids_for(points: np.ndarray, labels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    counts = np.bincount(labels, minlength=k).astype(float)
+    sums = np.column_stack(
+        [np.bincount(labels, weights=points[:, dim], minlength=k) for dim in range(points.shape[1])]
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroids = sums / counts[:, None]
+    return centroids, counts
+
+
+def kmeans(
+    points: np.ndarray,
+    k: int,
+    *,
+    seed: int = 0,
+    max_iter: int = KMEANS_MAX_ITER,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster points with k-means++ seeding and vectorised Lloyd iterations.
+
+    Args:
+        points: Array of shape (n, 2), in kilometres.
+        k: Number of clusters (1 <= k <= n).
+        seed: Random seed; equal inputs and seed give equal clusters.
+        max_iter: Iteration cap.
+
+    Returns:
+        Tuple of (labels of shape (n,), centroids of shape (k, 2)).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = _kmeans_plus_plus(points, k, rng)
+    labels = np.zeros(len(points), dtype=np.int64)
+    for _ in range(max_iter):
+        d2 = _squared_distances(points, centroids)
+        labels = d2.argmin(axis=1)
+        new_centroids, counts = _centroids_for(points, labels, k)
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            # Re-seed empty clusters with the points furthest from their centroid.
+            worst = np.argsort(d2[np.arange(len(points)), labels])[::-1][: empty.size]
+            new_centroids[empty] = points[worst]
+        shift = np.sqrt(((new_centroids - centroids) ** 2).sum(axis=1)).max()
+        centroids = new_centroids
+        if shift < KMEANS_TOLERANCE_KM:
+            break
+    labels = _squared_distances(points, centroids).argmin(axis=1)
+    return labels, centroids
+
+
+def balance_clusters(points: np.ndarray, centroids: np.ndarray, capacity: int) -> np.ndarray:
+    """Assign points to their nearest centroid that still has capacity.
+
+    Points with the most to lose from not getting their first choice (the
+    largest gap to their second-nearest centroid) are placed first.
+
+    Args:
+        points: Array of shape (n, 2).
+        centroids: Array of shape (k, 2).
+        capacity: Maximum points per cluster; ``k * capacity`` must be >= n.
+
+    Returns:
+        Labels of shape (n,).
+    """
+    k = len(centroids)
+    distances = np.sqrt(_squared_distances(points, centroids))
+    preferences = np.argsort(distances, axis=1)
+    if k > 1:
+        ranked = np.take_along_axis(distances, preferences[:, :2], axis=1)
+        order = np.argsort(ranked[:, 0] - ranked[:, 1], kind="stable")
+    else:
+        order = np.arange(len(points))
+    loads = np.zeros(k, dtype=np.int64)
+    labels = np.empty(len(points), dtype=np.int64)
+    for point in order.tolist():
+        for cluster in preferences[point].tolist():
+            if loads[cluster] < capacity:
+                labels[point] = cluster
+                loads[cluster] += 1
+                break
+    return labels
+
+
+def cluster_coordinates(
+    lat: Sequence[float],
+    lng: Sequence[float],
+    route_count: int,
+    *,
+    capacity: Optional[int] = None,
+    seed: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster coordinates into ``route_count`` routes.
+
+    Args:
+        lat: Latitudes in degrees.
+        lng: Longitudes in degrees.
+        route_count: Number of routes (clamped to the number of points).
+        capacity: Optional maximum stops per route.
+        seed: Random seed for k-means++ seeding.
+
+    Returns:
+        Tuple of (labels of shape (n,), projected points of shape (n, 2)).
+    """
+    points = project_coordinates(np.asarray(lat, dtype=float), np.asarray(lng, dtype=float))
+    if not len(points):
+        return np.zeros(0, dtype=np.int64), points
+    k = max(1, min(int(route_count), len(points)))
+    labels, centroids = kmeans(points, k, seed=seed)
+    if capacity is not None:
+        for _ in range(BALANCE_ROUNDS):
+            labels = balance_clusters(points, centroids, capacity)
+            balanced, counts = _centroids_for(points, labels, k)
+            centroids = np.where(counts[:, None] > 0, balanced, centroids)
+    # Renumber so cluster labels are 0..k'-1 with no empty clusters.
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels.astype(np.int64), points
+
+
+# ---------------------------------------------------------------------------
+# Plans
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class PlannedRoute:
+    """One cluster of a plan and the delivery route it maps to."""
+
+    route_key: int
+    route_id: Optional[int]
+    route_code: str
+    route_name: str
+    stops: int
+    centroid_lat: float
+    centroid_lng: float
+    radius_km: float
+
+
+@dataclass
+class AddressAssignment:
+    """Planned route for one address."""
+
+    address_id: int
+    customer_id: int
+    from_route_id: Optional[int]
+    route_key: int
+
+
+@dataclass
+class RoutePlan:
+    """Result of ``plan_routes``: the routes and every address's assignment."""
+
+    city_code: str
+    plan_token: str
+    routes: List[PlannedRoute]
+    assignments: List[AddressAssignment]
+    skipped_address_ids: List[int] = field(default_factory=list)
+
+    def changed_assignments(self) -> List[AddressAssignment]:
+        """Return the assignments that move an address to a different route."""
+        route_ids = {route.route_key: route.route_id for route in self.routes}
+        return [
+            assignment
+            for assignment in self.assignments
+            if route_ids[assignment.route_key] is None
+            or route_ids[assignment.route_key] != assignment.from_route_id
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialise the plan for the preview endpoint (changed addresses only)."""
+        routes_by_key = {route.route_key: route for route in self.routes}
+        changed = self.changed_assignments()
+        return {
+            "city_code": self.city_code,
+            "plan_token": self.plan_token,
+            "total_addresses": len(self.assignments),
+            "changed_addresses": len(changed),
+            "skipped_address_ids": self.skipped_address_ids,
+            "routes": [
+                {
+                    "route_key": route.route_key,
+                    "route_id": route.route_id,
+                    "route_code": route.route_code,
+                    "route_name": route.route_name,
+                    "is_new": route.route_id is None,
+                    "stops": route.stops,
+                    "centroid": {"lat": route.centroid_lat, "lng": route.centroid_lng},
+                    "radius_km": route.radius_km,
+                }
+                for route in self.routes
+            ],
+            "assignments": [
+                {
+                    "address_id": assignment.address_id,
+                    "customer_id": assignment.customer_id,
+                    "from_route_id": assignment.from_route_id,
+                    "route_key": assignment.route_key,
+                    "route_code": routes_by_key[assignment.route_key].route_code,
+                }
+                for assignment in changed
+            ],
+        }
+
+
+def _plan_token(
+    address_rows: Sequence[Tuple[int, int, float, float, Optional[int]]],
+    route_rows: Sequence[Dict[str, Any]],
+    route_count: int,
+    capacity: Optional[int],
+    seed: int,
+) -> str:
+    digest = hashlib.sha1(f"{route_count}|{capacity}|{seed}".encode())
+    for address_id, _, lat, lng, route_id in address_rows:
+        digest.update(f"{address_id}:{lat:.7f}:{lng:.7f}:{route_id};".encode())
+    for route in route_rows:
+        digest.update(f"r{route['route_id']}:{route['route_code']};".encode())
+    return digest.hexdigest()
+
+
+def _load_addresses(cursor, city_code: str):
+    cursor.execute(
+        """
+        SELECT address_id, customer_id, latitude, longitude, route_id
+          FROM addresses
+         WHERE city_code = %s
+           AND is_active = 1
+         ORDER BY address_id
+        """,
+        (city_code,),
+    )
+    placeable: List[Tuple[int, int, float, float, Optional[int]]] = []
+    skipped: List[int] = []
+    for row in cursor.fetchall() or []:
+        lat = float(row["latitude"]) if row.get("latitude") is not None else 0.0
+        lng = float(row["longitude"]) if row.get("longitude") is not None else 0.0
+        if (lat == 0.0 and lng == 0.0) or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            skipped.append(int(row["address_id"]))
+            continue
+        route_id = int(row["route_id"]) if row.get("route_id") is not None else None
+        placeable.append((int(row["address_id"]), int(row["customer_id"]), lat, lng, route_id))
+    return placeable, skipped
+
+
+def _match_existing_routes(
+    labels: np.ndarray,
+    current_route_ids: Sequence[Optional[int]],
+    k: int,
+    existing_routes: Sequence[Dict[str, Any]],
+) -> Dict[int, Dict[str, Any]]:
+    """Map cluster index -> existing route row, maximising kept assignments."""
+    route_index = {int(route["route_id"]): index for index, route in enumerate(existing_routes)}
+    overlap = np.zeros((k, len(existing_routes)), dtype=np.int64)
+    current = np.array(
+        [
+            route_index.get(route_id, -1) if route_id is not None else -1
+            for route_id in current_route_ids
+        ],
+        dtype=np.int64,
+    )
+    known = current >= 0
+    np.add.at(overlap, (labels[known], current[known]), 1)
+
+    matched: Dict[int, Dict[str, Any]] = {}
+    used_routes: set = set()
+    if overlap.size:
+        for flat in np.argsort(overlap, axis=None, kind="stable")[::-1].tolist():
+            cluster, route = divmod(flat, len(existing_routes))
+            if overlap[cluster, route] == 0:
+                break
+            if cluster in matched or route in used_routes:
+                continue
+            matched[cluster] = existing_routes[route]
+            used_routes.add(route)
+    # Routes that serve nobody yet (e.g. created by hand for this plan) are
+    # handed to the remaining clusters in sort order before inventing new ones.
+    spare = [route for index, route in enumerate(existing_routes) if index not in used_routes]
+    for cluster in range(k):
+        if cluster not in matched and spare:
+            matched[cluster] = spare.pop(0)
+    return matched
+
+
+def plan_routes(
+    cursor,
+    city_code: str,
+    route_count: int,
+    *,
+    max_stops_per_route: Optional[int] = None,
+    seed: int = 0,
+) -> RoutePlan:
+    """Cluster a city's active addresses into delivery routes.
+
+    Addresses without usable coordinates (0, 0 or out of range) are left
+    alone and reported in ``skipped_address_ids``.
+
+    Args:
+        cursor: Dictionary cursor.
+        city_code: City to plan.
+        route_count: Number of routes to produce.
+        max_stops_per_route: Optional capacity per route.
+        seed: Random seed for the clustering.
+
+    Returns:
+        RoutePlan mapping every placeable address to a route.
+
+    Raises:
+        ValueError: If the capacity cannot hold every address.
+    """
+    addresses, skipped = _load_addresses(cursor, city_code)
+    cursor.execute(
+        """
+        SELECT route_id, route_code, route_name, sort_order
+          FROM delivery_routes
+         WHERE city_code = %s
+           AND is_active = 1
+         ORDER BY sort_order ASC, route_code ASC
+        """,
+        (city_code,),
+    )
+    existing_routes = list(cursor.fetchall() or [])
+    if max_stops_per_route is not None and route_count * max_stops_per_route < len(addresses):
+        raise ValueError(
+            f"{route_count} routes of at most {max_stops_per_route} stops cannot hold "
+            f"{len(addresses)} addresses"
+        )
+    token = _plan_token(addresses, existing_routes, route_count, max_stops_per_route, seed)
+    if not addresses:
+        return RoutePlan(city_code, token, [], [], skipped)
+
+    lat = np.array([row[2] for row in addresses])
+    lng = np.array([row[3] for row in addresses])
+    labels, points = cluster_coordinates(
+        lat, lng, route_count, capacity=max_stops_per_route, seed=seed
+    )
+    k = int(labels.max()) + 1
+    matched = _match_existing_routes(labels, [row[4] for row in addresses], k, existing_routes)
+
+    taken_codes = {str(route["route_code"]).lower() for route in existing_routes}
+    next_number = 1
+    routes: List[PlannedRoute] = []
+    for cluster in range(k):
+        members = labels == cluster
+        centre = points[members].mean(axis=0)
+        radius = float(np.sqrt(((points[members] - centre) ** 2).sum(axis=1)).max())
+        existing = matched.get(cluster)
+        if existing is not None:
+            route_id = int(existing["route_id"])
+            route_code = existing["route_code"]
+            route_name = existing["route_name"]
+        else:
+            while f"{AUTO_ROUTE_PREFIX}-{next_number:02d}".lower() in taken_codes:
+                next_number += 1
+            route_id = None
+            route_code = f"{AUTO_ROUTE_PREFIX}-{next_number:02d}"
+            route_name = f"Auto route {next_number}"
+            taken_codes.add(route_code.lower())
+        routes.append(
+            PlannedRoute(
+                route_key=cluster,
+                route_id=route_id,
+                route_code=route_code,
+                route_name=route_name,
+                stops=int(members.sum()),
+                centroid_lat=round(float(lat[members].mean()), 7),
+                centroid_lng=round(float(lng[members].mean()), 7),
+                radius_km=round(radius, 3),
+            )
+        )
+
+    assignments = [
+        AddressAssignment(address_id, customer_id, route_id, int(label))
+        for (address_id, customer_id, _, _, route_id), label in zip(addresses, labels.tolist())
+    ]
+    return RoutePlan(city_code, token, routes, assignments, skipped)
+
+
+def apply_route_plan(cursor, plan: RoutePlan) -> Dict[str, int]:
+    """Write a plan: create missing routes, then move changed addresses in bulk.
+
+    Call inside the caller's transaction and commit afterwards.
+
+    Args:
+        cursor: Cursor on the writer's connection.
+        plan: Plan returned by ``plan_routes``.
+
+    Returns:
+        Dict with created_routes and updated_addresses counts.
+    """
+    changed = plan.changed_assignments()
+    created = 0
+    next_sort_order = 0
+    if any(route.route_id is None for route in plan.routes):
+        cursor.execute(
+            "SELECT COALESCE(MAX(sort_order), 0) AS max_sort FROM delivery_routes WHERE city_code = %s",
+            (plan.city_code,),
+        )
+        row = cursor.fetchone()
+        next_sort_order = int((row["max_sort"] if isinstance(row, dict) else row[0]) or 0) + 1
+    for route in plan.routes:
+        if route.route_id is not None:
+            continue
+        cursor.execute(
+            """
+            INSERT INTO delivery_routes (city_code, route_code, route_name, notes, is_active, sort_order)
+            VALUES (%s, %s, %s, %s, 1, %s)
+            """,
+            (
+                plan.city_code,
+                route.route_code,
+                route.route_name,
+                "Created by route planner",
+                next_sort_order,
+            ),
+        )
+        route.route_id = int(cursor.lastrowid)
+        next_sort_order += 1
+        created += 1
+
+    if not changed:
+        return {"created_routes": created, "updated_addresses": 0}
+
+    route_ids = {route.route_key: route.route_id for route in plan.routes}
+    cursor.execute(
+        """
+        CREATE TEMPORARY TABLE IF NOT EXISTS tmp_route_plan (
+            address_id INT NOT NULL PRIMARY KEY,
+            route_id INT NOT NULL
+        ) ENGINE=MEMORY
+        """
+    )
+    cursor.execute("DELETE FROM tmp_route_plan")
+    for start in range(0, len(changed), APPLY_BATCH_SIZE):
+        batch = changed[start : start + APPLY_BATCH_SIZE]
+        cursor.execute(
+            f"INSERT INTO tmp_route_plan (address_id, route_id) VALUES "
+            f"{', '.join(['(%s, %s)'] * len(batch))}",
+            tuple(
+                value
+                for assignment in batch
+                for value in (assignment.address_id, route_ids[assignment.route_key])
+            ),
+        )
+    cursor.execute(
+        """
+        UPDATE addresses a
+          JOIN tmp_route_plan t ON t.address_id = a.address_id
+           SET a.route_id = t.route_id
+         WHERE a.city_code = %s
+        """,
+        (plan.city_code,),
+    )
+    updated = cursor.rowcount
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_route_plan")
+    refresh_customer_city_summary(
+        cursor, customer_ids=[assignment.customer_id for assignment in changed]
+    )
+    logger.info(
+        "Applied route plan for %s: %s new routes, %s addresses moved",
+        plan.city_code,
+        created,
+        updated,
+    )
+    return {"created_routes": created, "updated_addresses": updated}
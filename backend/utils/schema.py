@@ -0,0 +1,218 @@
+"""Startup schema guard registry.
+
+Modules that own a table register their ``CREATE TABLE IF NOT EXISTS`` /
+``ALTER TABLE`` checks and seed routines here at import time via
+``@schema_guard(...)``.  ``main._lifespan`` calls ``run_schema_guards`` once
+before serving requests, so request handlers never run DDL or seed checks.
+
+Each guard carries a version number.  Applied versions are recorded in the
+``schema_guard_versions`` table; a guard only runs again when its registered
+version is bumped (or when a previous attempt failed).
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSIONS_TABLE = "schema_guard_versions"
+
+GUARD_KIND_DDL = "ddl"
+GUARD_KIND_SEED = "seed"
+
+
+@dataclass(frozen=True)
+class SchemaGuard:
+    """A registered schema or seed check."""
+
+    name: str
+    version: int
+    kind: str
+    apply: Callable[[Any], None]
+
+
+_REGISTRY: Dict[str, SchemaGuard] = {}
+_LAST_REPORT: List[Dict[str, Any]] = []
+
+
+def schema_guard(
+    name: str, *, version: int = 1, kind: str = GUARD_KIND_DDL
+) -> Callable[[Callable[[Any], None]], Callable[[Any], None]]:
+    """Register a function as a startup schema guard.
+
+    The decorated function receives a mysql.connector connection and must be
+    idempotent.  It is returned unchanged so it can still be called directly
+    (e.g. from scripts).
+
+    Args:
+        name: Unique guard name, used as the key in ``schema_guard_versions``.
+        version: Bump this when the guard's DDL changes so it re-runs once.
+        kind: ``"ddl"`` for schema changes, ``"seed"`` for reference data.
+
+    Returns:
+        Decorator that registers the function.
+    """
+
+    def decorator(func: Callable[[Any], None]) -> Callable[[Any], None]:
+        existing = _REGISTRY.get(name)
+        if existing is not None and existing.apply is not func:
+            raise RuntimeError(f"Schema guard '{name}' is already registered")
+        _REGISTRY[name] = SchemaGuard(name=name, version=int(version), kind=kind, apply=func)
+        return func
+
+    return decorator
+
+
+def registered_guards() -> List[SchemaGuard]:
+    """Return the registered guards in registration order.
+
+    Returns:
+        List of SchemaGuard entries.
+    """
+    return list(_REGISTRY.values())
+
+
+def last_schema_report() -> List[Dict[str, Any]]:
+    """Return the timing report produced by the most recent ``run_schema_guards`` call.
+
+    Returns:
+        List of per-guard report dicts (copy).
+    """
+    return [dict(entry) for entry in _LAST_REPORT]
+
+
+def _ensure_versions_table(db) -> None:
+    """Create the schema_guard_versions bookkeeping table if it does not yet exist.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {SCHEMA_VERSIONS_TABLE} (
+                guard_name VARCHAR(100) NOT NULL,
+                version INT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (guard_name)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def _fetch_applied_versions(db) -> Dict[str, int]:
+    """Read the applied version for every guard recorded so far.
+
+    Args:
+        db: mysql.connector connection.
+
+    Returns:
+        Dict mapping guard name to applied version.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(f"SELECT guard_name, version FROM {SCHEMA_VERSIONS_TABLE}")
+        return {str(name): int(version) for name, version in cursor.fetchall() or []}
+    finally:
+        cursor.close()
+
+
+def _record_version(db, guard: SchemaGuard) -> None:
+    """Upsert the applied version for a guard and commit.
+
+    Args:
+        db: mysql.connector connection.
+        guard: Guard that has just been applied.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            f"""
+            INSERT INTO {SCHEMA_VERSIONS_TABLE} (guard_name, version)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE version = VALUES(version), applied_at = CURRENT_TIMESTAMP
+            """,
+            (guard.name, guard.version),
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def run_schema_guards(db, *, force: bool = False) -> List[Dict[str, Any]]:
+    """Apply every registered guard whose version has not been recorded yet.
+
+    A failing guard is logged and left unrecorded so it is retried on the
+    next startup; it does not stop the remaining guards from running.
+
+    Args:
+        db: mysql.connector connection.
+        force: Re-run every guard regardless of the recorded version.
+
+    Returns:
+        Timing report: one dict per guard with name, kind, version, status
+        (``applied``/``skipped``/``failed``) and duration_ms.
+    """
+    global _LAST_REPORT
+    started = time.perf_counter()
+    _ensure_versions_table(db)
+    applied_versions = _fetch_applied_versions(db)
+
+    report: List[Dict[str, Any]] = []
+    for guard in registered_guards():
+        entry: Dict[str, Any] = {
+            "name": guard.name,
+            "kind": guard.kind,
+            "version": guard.version,
+            "status": "skipped",
+            "duration_ms": 0.0,
+        }
+        if not force and applied_versions.get(guard.name, 0) >= guard.version:
+            report.append(entry)
+            continue
+
+        guard_started = time.perf_counter()
+        try:
+            guard.apply(db)
+            db.commit()
+            _record_version(db, guard)
+            entry["status"] = "applied"
+        except Exception as exc:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            entry["status"] = "failed"
+            entry["error"] = str(exc)
+            logger.exception("Schema guard '%s' failed", guard.name)
+        entry["duration_ms"] = round((time.perf_counter() - guard_started) * 1000, 2)
+        report.append(entry)
+
+    total_ms = round((time.perf_counter() - started) * 1000, 2)
+    applied = sum(1 for entry in report if entry["status"] == "applied")
+    failed = sum(1 for entry in report if entry["status"] == "failed")
+    logger.info(
+        "Schema guards finished in %.2f ms (%d applied, %d skipped, %d failed)",
+        total_ms,
+        applied,
+        len(report) - applied - failed,
+        failed,
+    )
+    for entry in report:
+        logger.info(
+            "  %-32s v%-3d %-7s %8.2f ms",
+            entry["name"],
+            entry["version"],
+            entry["status"],
+            entry["duration_ms"],
+        )
+    _LAST_REPORT = report
+    return report
@@ -0,0 +1,484 @@
+"""Low-stock watcher that pushes menu stock alerts to connected ops clients.
+
+Request handlers that change ``menu_items.available_qty`` (order create,
+subscription resolution, cancellations) call ``stock_watcher.notify_changed``
+after their commit.  The watcher re-reads only the touched menu items,
+compares them with each subscriber's threshold and pushes level transitions
+(``low_stock`` / ``sold_out`` / ``recovered``) to the subscriber's queue after
+a short debounce window, so a burst of orders on one item yields one event.
+
+Alerts at the default threshold are kept in a ring buffer so a client that
+reconnects with ``Last-Event-ID`` can replay what it missed.
+
+Each uvicorn worker runs its own watcher.  ``notify_changed`` also bumps
+the ``CATALOG_STATE_STOCK`` counter, so writes handled by another worker are
+picked up by a reconcile pass: while this worker has at least one subscriber
+it reads that counter every ``STOCK_WATCHER_POLL_SEC`` and re-reads today's
+released menu items only when it moved, when the date changed, or at the
+latest every ``STOCK_WATCHER_RECONCILE_SEC`` (for stock edits that do not go
+through ``notify_changed``).
+
+State is per day: when CURDATE changes the snapshot, levels and ring buffer
+are reset, and a full re-read drops menu items no longer on today's menu.
+
+Env overrides:
+    LOW_STOCK_RATIO              — default alert threshold as a fraction of max_qty (0.20)
+    STOCK_WATCHER_DEBOUNCE_MS    — coalescing window before pushing events (250)
+    STOCK_WATCHER_POLL_SEC       — stock version check interval (1.0)
+    STOCK_WATCHER_RECONCILE_SEC  — fallback full re-read interval (60)
+    STOCK_WATCHER_RING_SIZE      — recent alerts kept for late joiners (200)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .catalog import CATALOG_STATE_STOCK
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_RATIO = float(os.getenv("LOW_STOCK_RATIO", "0.20"))
+DEBOUNCE_SEC = float(os.getenv("STOCK_WATCHER_DEBOUNCE_MS", "250")) / 1000
+POLL_SEC = float(os.getenv("STOCK_WATCHER_POLL_SEC", "1.0"))
+RECONCILE_SEC = float(os.getenv("STOCK_WATCHER_RECONCILE_SEC", "60"))
+RING_SIZE = int(os.getenv("STOCK_WATCHER_RING_SIZE", "200"))
+SUBSCRIBER_QUEUE_SIZE = 500
+
+LEVEL_OK = "ok"
+LEVEL_LOW = "low_stock"
+LEVEL_SOLD_OUT = "sold_out"
+EVENT_RECOVERED = "recovered"
+
+_TODAY_STOCK_SQL = """
+    SELECT
+        mi.menu_item_id,
+        mi.menu_id,
+        m.city_code,
+        COALESCE(i.name, c.combo_name) AS item_name,
+        mi.available_qty,
+        mi.max_qty,
+        CURDATE() AS stock_date
+    FROM menu_items mi
+    JOIN menu m ON m.menu_id = mi.menu_id
+    LEFT JOIN items i ON i.item_id = mi.item_id
+    LEFT JOIN combos c ON c.combo_id = mi.combo_id
+    WHERE m.date = CURDATE()
+      AND m.is_released = 1
+      AND m.menu_type = 'ONE_DAY'
+      AND mi.max_qty > 0
+"""
+
+_STOCK_STATE_SQL = "SELECT version, CURDATE() AS today FROM catalog_state WHERE id = %s"
+
+
+def stock_level(available_qty: Any, max_qty: Any, ratio: float = LOW_STOCK_RATIO) -> str:
+    """Classify a menu item's stock against a threshold ratio.
+
+    Args:
+        available_qty: Remaining quantity.
+        max_qty: Planned quantity for the day.
+        ratio: Alert threshold as a fraction of max_qty.
+
+    Returns:
+        ``"sold_out"``, ``"low_stock"`` or ``"ok"``.
+    """
+    available = float(available_qty or 0)
+    planned = float(max_qty or 0)
+    if planned <= 0:
+        return LEVEL_OK
+    if available <= 0:
+        return LEVEL_SOLD_OUT
+    if available <= planned * ratio:
+        return LEVEL_LOW
+    return LEVEL_OK
+
+
+def _normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "menu_item_id": int(row["menu_item_id"]),
+        "menu_id": int(row["menu_id"]),
+        "city_code": row.get("city_code"),
+        "item_name": row.get("item_name"),
+        "available_qty": float(row.get("available_qty") or 0),
+        "max_qty": float(row.get("max_qty") or 0),
+    }
+
+
+class StockSubscriber:
+    """One connected client: its city, threshold, and pending event queue."""
+
+    def __init__(self, city_code: str, ratio: float, loop: asyncio.AbstractEventLoop) -> None:
+        self.city_code = city_code
+        self.ratio = ratio
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.levels: Dict[int, str] = {}
+
+    def _push(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping low-stock event for slow subscriber (%s)", self.city_code)
+
+    def forget(self, menu_item_ids: Iterable[int]) -> None:
+        """Drop levels for menu items that left today's menu."""
+        for item_id in menu_item_ids:
+            self.levels.pop(item_id, None)
+
+    def replay(self, events: Iterable[Dict[str, Any]]) -> Set[int]:
+        """Push missed ring-buffer alerts re-classified at this subscriber's threshold.
+
+        Returns:
+            Menu item ids that had at least one replayed event.
+        """
+        seen: Set[int] = set()
+        for event in events:
+            if event["city_code"] != self.city_code:
+                continue
+            item_id = event["menu_item_id"]
+            seen.add(item_id)
+            level = stock_level(event["available_qty"], event["max_qty"], self.ratio)
+            if level == self.levels.get(item_id, LEVEL_OK):
+                continue
+            self.levels[item_id] = level
+            event_type = level if level != LEVEL_OK else EVENT_RECOVERED
+            self._push({**event, "type": event_type})
+        return seen
+
+    def evaluate(self, rows: Iterable[Dict[str, Any]], seq: "itertools.count[int]") -> None:
+        """Push an event for every row whose level changed for this subscriber.
+
+        Must be called on the subscriber's event loop.
+        """
+        for row in rows:
+            if row["city_code"] != self.city_code:
+                continue
+            level = stock_level(row["available_qty"], row["max_qty"], self.ratio)
+            previous = self.levels.get(row["menu_item_id"], LEVEL_OK)
+            if level == previous:
+                continue
+            self.levels[row["menu_item_id"]] = level
+            event_type = level if level != LEVEL_OK else EVENT_RECOVERED
+            self._push({**row, "seq": next(seq), "type": event_type, "at": _now_iso()})
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class StockWatcher:
+    """Per-process low-stock state, subscriber registry, and alert ring buffer."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._levels: Dict[int, str] = {}
+        self._snapshot: Dict[int, Dict[str, Any]] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=RING_SIZE)
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._subscribers: Set[StockSubscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_armed = False
+        self._reconcile_task: Optional[asyncio.Task] = None
+        self._day: Optional[date] = None
+        self._stock_version: Optional[int] = None
+        self._dropped: Set[int] = set()
+
+    # -- write side ---------------------------------------------------------
+
+    def notify_changed(
+        self,
+        db,
+        *,
+        menu_item_ids: Optional[Iterable[Any]] = None,
+        menu_id: Optional[int] = None,
+        order_id: Optional[int] = None,
+    ) -> None:
+        """Re-evaluate the given menu items after their available_qty changed.
+
+        Call after the caller's commit.  Never raises: a watcher failure must
+        not turn a successful write into an error response.
+
+        Args:
+            db: mysql.connector connection (a new dictionary cursor is opened).
+            menu_item_ids: Explicit menu items that changed.
+            menu_id: Re-evaluate every item on this menu.
+            order_id: Re-evaluate every menu item referenced by this order.
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        ids = sorted({int(v) for v in (menu_item_ids or []) if v is not None})
+        if ids:
+            clauses.append(f"mi.menu_item_id IN ({', '.join(['%s'] * len(ids))})")
+            params.extend(ids)
+        if menu_id is not None:
+            clauses.append("mi.menu_id = %s")
+            params.append(int(menu_id))
+        if order_id is not None:
+            clauses.append(
+                "mi.menu_item_id IN (SELECT oi.menu_item_id FROM order_items oi "
+                "WHERE oi.order_id = %s AND oi.menu_item_id IS NOT NULL)"
+            )
+            params.append(int(order_id))
+        if not clauses:
+            return
+        try:
+            cursor = db.cursor(dictionary=True)
+            try:
+                cursor.execute(f"{_TODAY_STOCK_SQL} AND ({' OR '.join(clauses)})", tuple(params))
+                rows = cursor.fetchall() or []
+            finally:
+                cursor.close()
+        except Exception as exc:  # pragma: no cover - alerts must never break writes
+            logger.warning("Low-stock watcher refresh failed: %s", exc)
+            return
+        self._bump_stock_version(db)
+        self._ingest(rows)
+
+    def _bump_stock_version(self, db) -> None:
+        """Tell the other workers' reconcile passes that stock moved."""
+        try:
+            cursor = db.cursor(dictionary=True)
+            try:
+                cursor.execute(
+                    "UPDATE catalog_state SET version = LAST_INSERT_ID(version + 1) WHERE id = %s",
+                    (CATALOG_STATE_STOCK,),
+                )
+                bumped = cursor.rowcount == 1
+                cursor.execute("SELECT LAST_INSERT_ID() AS version")
+                version = int((cursor.fetchone() or {}).get("version") or 0)
+                db.commit()
+            finally:
+                cursor.close()
+        except Exception as exc:  # pragma: no cover - alerts must never break writes
+            logger.warning("Low-stock version bump failed: %s", exc)
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            return
+        with self._lock:
+            if bumped and self._stock_version is not None and version == self._stock_version + 1:
+                # Only our own bump since the last read: this worker already has the rows.
+                self._stock_version = version
+
+    def _ingest(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        day: Optional[date] = None,
+        complete: bool = False,
+    ) -> None:
+        """Fold re-read rows into the snapshot and queue level transitions.
+
+        Args:
+            rows: Rows from ``_TODAY_STOCK_SQL``.
+            day: CURDATE the rows were read on (taken from the rows if omitted).
+            complete: The rows are all of today's items; drop any others.
+        """
+        rows = list(rows)
+        if day is None and rows:
+            day = rows[0].get("stock_date")
+        normalized = [_normalize_row(row) for row in rows]
+        with self._lock:
+            if day is not None and day != self._day:
+                if self._day is not None and day < self._day:
+                    return  # read before midnight, arrived after the reset
+                # New day: yesterday's items and alerts no longer apply.
+                self._dropped.update(self._snapshot)
+                self._snapshot.clear()
+                self._levels.clear()
+                self._pending.clear()
+                self._recent.clear()
+                self._day = day
+            if complete:
+                missing = set(self._snapshot) - {row["menu_item_id"] for row in normalized}
+                for item_id in missing:
+                    self._snapshot.pop(item_id, None)
+                    self._levels.pop(item_id, None)
+                    self._pending.pop(item_id, None)
+                self._dropped.update(missing)
+            for row in normalized:
+                item_id = row["menu_item_id"]
+                self._snapshot[item_id] = row
+                self._pending[item_id] = row
+                level = stock_level(row["available_qty"], row["max_qty"])
+                previous = self._levels.get(item_id, LEVEL_OK)
+                if level != previous:
+                    self._levels[item_id] = level
+                    event_type = level if level != LEVEL_OK else EVENT_RECOVERED
+                    self._recent.append(
+                        {**row, "seq": next(self._seq), "type": event_type, "at": _now_iso()}
+                    )
+            loop = self._loop
+            should_arm = (
+                loop is not None
+                and not self._flush_armed
+                and bool(self._subscribers)
+                and bool(self._pending or self._dropped)
+            )
+            if should_arm:
+                self._flush_armed = True
+        if should_arm:
+            loop.call_soon_threadsafe(loop.call_later, DEBOUNCE_SEC, self._flush)
+
+    def _flush(self) -> None:
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+            dropped, self._dropped = self._dropped, set()
+            self._flush_armed = False
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.forget(dropped)
+            subscriber.evaluate(pending, self._seq)
+
+    # -- read side ----------------------------------------------------------
+
+    def _load_today(self) -> Tuple[List[Dict[str, Any]], date, int]:
+        """Read today's stock, the database's CURDATE and the stock version."""
+        from ..db import get_raw_db
+
+        db = get_raw_db()
+        try:
+            cursor = db.cursor(dictionary=True)
+            try:
+                cursor.execute(_STOCK_STATE_SQL, (CATALOG_STATE_STOCK,))
+                state = cursor.fetchone() or {}
+                cursor.execute(_TODAY_STOCK_SQL)
+                rows = cursor.fetchall() or []
+                return rows, state.get("today"), int(state.get("version") or 0)
+            finally:
+                cursor.close()
+        finally:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            db.close()
+
+    def _read_stock_state(self) -> Tuple[Optional[date], int]:
+        from ..db import get_raw_db
+
+        db = get_raw_db()
+        try:
+            cursor = db.cursor(dictionary=True)
+            try:
+                cursor.execute(_STOCK_STATE_SQL, (CATALOG_STATE_STOCK,))
+                state = cursor.fetchone() or {}
+                return state.get("today"), int(state.get("version") or 0)
+            finally:
+                cursor.close()
+        finally:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            db.close()
+
+    async def _reload(self) -> None:
+        rows, day, version = await asyncio.to_thread(self._load_today)
+        with self._lock:
+            self._stock_version = version
+        self._ingest(rows, day=day, complete=True)
+
+    async def _reconcile_loop(self) -> None:
+        last_reload = time.monotonic()
+        while True:
+            await asyncio.sleep(POLL_SEC)
+            with self._lock:
+                if not self._subscribers:
+                    self._reconcile_task = None
+                    return
+            try:
+                if time.monotonic() - last_reload < RECONCILE_SEC:
+                    day, version = await asyncio.to_thread(self._read_stock_state)
+                    with self._lock:
+                        unchanged = day == self._day and version == self._stock_version
+                    if unchanged:
+                        continue
+                await self._reload()
+                last_reload = time.monotonic()
+            except Exception as exc:
+                logger.warning("Low-stock reconcile failed: %s", exc)
+
+    async def subscribe(
+        self,
+        city_code: str,
+        ratio: float = LOW_STOCK_RATIO,
+        last_event_id: Optional[int] = None,
+    ) -> StockSubscriber:
+        """Register a subscriber and queue its initial events.
+
+        A reconnecting client (``last_event_id`` set) receives the ring-buffer
+        alerts it missed, re-classified at its own threshold; a new client
+        receives the current low-stock set.  When no reconcile pass is running
+        (no other subscriber), today's stock is re-read first.
+
+        Args:
+            city_code: City whose menu items the client watches.
+            ratio: Alert threshold for this client as a fraction of max_qty.
+            last_event_id: Last event seq seen by the client, if reconnecting.
+
+        Returns:
+            The registered StockSubscriber.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            idle = self._reconcile_task is None
+        if idle:
+            await self._reload()
+
+        subscriber = StockSubscriber(city_code, ratio, loop)
+        with self._lock:
+            self._loop = loop
+            snapshot = [row for row in self._snapshot.values() if row["city_code"] == city_code]
+            replay = [
+                dict(event)
+                for event in self._recent
+                if last_event_id is not None
+                and event["seq"] > last_event_id
+                and event["city_code"] == city_code
+            ]
+            self._subscribers.add(subscriber)
+            if self._reconcile_task is None:
+                self._reconcile_task = loop.create_task(self._reconcile_loop())
+
+        if last_event_id is not None:
+            replayed = subscriber.replay(replay)
+            for row in snapshot:
+                if row["menu_item_id"] not in replayed:
+                    subscriber.levels[row["menu_item_id"]] = stock_level(
+                        row["available_qty"], row["max_qty"], ratio
+                    )
+            # Bring replayed items up to their current level.
+            subscriber.evaluate(
+                [row for row in snapshot if row["menu_item_id"] in replayed], self._seq
+            )
+        else:
+            subscriber.evaluate(snapshot, self._seq)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StockSubscriber) -> None:
+        """Remove a subscriber; the reconcile loop stops once none remain."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def recent_alerts(self, city_code: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return the ring-buffer alerts, optionally limited to one city."""
+        with self._lock:
+            return [
+                dict(event)
+                for event in self._recent
+                if city_code is None or event["city_code"] == city_code
+            ]
+
+
+stock_watcher = StockWatcher()
@@ -0,0 +1,241 @@
+"""Visiting order for the stops of a delivery route.
+
+Trip sheets listed stops in route ``sort_order`` and query order, so drivers
+criss-crossed town.  ``sequence_routes`` orders each route's addresses with a
+nearest-neighbour tour improved by 2-opt, both driven by a haversine distance
+matrix computed once per route with NumPy, and reports the resulting path
+length.  Routes are open paths: the driver starts at the first stop (the one
+furthest from the route's centre) and ends at the last.
+
+Results are cached per worker, keyed by the route and the exact set of
+(address, coordinates) it contains, so regenerating a sheet whose routes did
+not change costs nothing.  When several uncached routes together are large
+enough to be worth it, they are sequenced in parallel on a small process
+pool; ``shutdown_sequencing_pool`` is called from the app's lifespan.  The
+pool starts its workers through a forkserver (spawn where that is not
+available) rather than forking the server, whose threads may hold locks
+such as the DB pool's or logging's at fork time.  Workers import only this
+module, so ``_sequence_worker`` must stay at its top level.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+TWO_OPT_MAX_PASSES = 50
+TWO_OPT_EPSILON_KM = 1e-9
+SEQUENCE_CACHE_SIZE = 2048
+# Below this many uncached stops in total, process start-up costs more than it saves.
+PARALLEL_MIN_STOPS = 400
+MAX_POOL_WORKERS = 4
+
+Stop = Tuple[int, float, float]
+
+
+@dataclass(frozen=True)
+class RouteSequence:
+    """Optimised visiting order for one route."""
+
+    address_ids: Tuple[int, ...]
+    distance_km: float
+
+
+_cache: "LRUCache[str, RouteSequence]" = LRUCache(maxsize=SEQUENCE_CACHE_SIZE)
+_cache_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Tour construction
+# ---------------------------------------------------------------------------
+
+
+def haversine_matrix(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    """Return the great-circle distance in km between every pair of points.
+
+    Args:
+        lat: Latitudes in degrees, shape (n,).
+        lng: Longitudes in degrees, shape (n,).
+
+    Returns:
+        Symmetric array of shape (n, n).
+    """
+    lat_rad = np.radians(lat)
+    lng_rad = np.radians(lng)
+    dlat = lat_rad[:, None] - lat_rad[None, :]
+    dlng = lng_rad[:, None] - lng_rad[None, :]
+    a = (
+        np.sin(dlat / 2.0) ** 2
+        + np.cos(lat_rad)[:, None] * np.cos(lat_rad)[None, :] * np.sin(dlng / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _nearest_neighbour(dist: np.ndarray, start: int) -> List[int]:
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    tour = [start]
+    visited[start] = True
+    current = start
+    for _ in range(n - 1):
+        candidates = np.where(visited, np.inf, dist[current])
+        current = int(candidates.argmin())
+        visited[current] = True
+        tour.append(current)
+    return tour
+
+
+def _two_opt(tour: List[int], dist: np.ndarray) -> List[int]:
+    """Improve a closed tour with 2-opt, evaluating all moves for each i at once."""
+    route = np.array(tour, dtype=np.int64)
+    m = len(route)
+    for _ in range(TWO_OPT_MAX_PASSES):
+        improved = False
+        for i in range(1, m - 1):
+            j = np.arange(i + 1, m)
+            a, b = route[i - 1], route[i]
+            c, d = route[j], route[(j + 1) % m]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            best = int(delta.argmin())
+            if delta[best] < -TWO_OPT_EPSILON_KM:
+                end = int(j[best])
+                route[i : end + 1] = route[i : end + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route.tolist()
+
+
+def sequence_stops(lat: Sequence[float], lng: Sequence[float]) -> Tuple[List[int], float]:
+    """Order stops for an open delivery path.
+
+    A zero-cost dummy node turns the open path into a closed tour so the
+    standard 2-opt move set applies to both ends of the route.
+
+    Args:
+        lat: Stop latitudes in degrees.
+        lng: Stop longitudes in degrees.
+
+    Returns:
+        Tuple of (indexes into the inputs in visiting order, path length in km).
+    """
+    n = len(lat)
+    if n == 0:
+        return [], 0.0
+    lat_arr = np.asarray(lat, dtype=float)
+    lng_arr = np.asarray(lng, dtype=float)
+    dist = haversine_matrix(lat_arr, lng_arr)
+    if n <= 2:
+        return list(range(n)), float(dist[0, n - 1])
+
+    # Start from the stop furthest from the route's centre (a local projection suffices).
+    offset_x = (lng_arr - lng_arr.mean()) * np.cos(np.radians(lat_arr.mean()))
+    offset_y = lat_arr - lat_arr.mean()
+    tour = _nearest_neighbour(dist, int((offset_x**2 + offset_y**2).argmax()))
+
+    padded = np.zeros((n + 1, n + 1))
+    padded[1:, 1:] = dist
+    closed = _two_opt([0] + [index + 1 for index in tour], padded)
+    start = closed.index(0)
+    order = [index - 1 for index in closed[start + 1 :] + closed[:start]]
+    length = float(dist[order[:-1], order[1:]].sum())
+    return order, length
+
+
+def _sequence_worker(stops: Sequence[Stop]) -> RouteSequence:
+    order, length = sequence_stops([stop[1] for stop in stops], [stop[2] for stop in stops])
+    return RouteSequence(
+        address_ids=tuple(stops[index][0] for index in order), distance_km=round(length, 3)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Cached, parallel sequencing
+# ---------------------------------------------------------------------------
+
+
+def _cache_key(route_key: Hashable, stops: Sequence[Stop]) -> str:
+    digest = hashlib.sha1(repr(route_key).encode())
+    for address_id, lat, lng in stops:
+        digest.update(f"{address_id}:{lat:.7f}:{lng:.7f};".encode())
+    return digest.hexdigest()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = (
+                "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            )
+            _pool = ProcessPoolExecutor(
+                max_workers=min(MAX_POOL_WORKERS, os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context(method),
+            )
+        return _pool
+
+
+def shutdown_sequencing_pool() -> None:
+    """Stop the worker processes, if any were started."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def sequence_routes(
+    stops_by_route: Dict[Hashable, Sequence[Stop]],
+) -> Dict[Hashable, RouteSequence]:
+    """Return the optimised visiting order of every route.
+
+    Args:
+        stops_by_route: Route key -> unique (address_id, lat, lng) stops, in
+            any order.
+
+    Returns:
+        Route key -> RouteSequence.
+    """
+    results: Dict[Hashable, RouteSequence] = {}
+    pending: List[Tuple[Hashable, str, List[Stop]]] = []
+    with _cache_lock:
+        for route_key, stops in stops_by_route.items():
+            stops = sorted(stops)
+            key = _cache_key(route_key, stops)
+            cached = _cache.get(key)
+            if cached is not None:
+                results[route_key] = cached
+            else:
+                pending.append((route_key, key, stops))
+
+    computed: List[RouteSequence] = []
+    if len(pending) > 1 and sum(len(stops) for _, _, stops in pending) >= PARALLEL_MIN_STOPS:
+        try:
+            computed = list(_get_pool().map(_sequence_worker, [stops for _, _, stops in pending]))
+        except (BrokenProcessPool, OSError):
+            logger.warning("Stop sequencing pool unavailable; sequencing in-process", exc_info=True)
+            shutdown_sequencing_pool()
+            computed = []
+    if not computed:
+        computed = [_sequence_worker(stops) for _, _, stops in pending]
+
+    with _cache_lock:
+        for (route_key, key, _), sequence in zip(pending, computed):
+            _cache[key] = sequence
+            results[route_key] = sequence
+    return results
@@ -0,0 +1,279 @@
+"""Precomputed "subscription today" answers, one row per (date, city, customer).
+
+``GET /api/customers/{id}/subscription-today`` used to rebuild each
+subscriber's day from orders, pause windows and the day's menus on every app
+open, and every subscriber opens the app around meal time.  Now
+``resolve_subscriptions_for_menu`` rebuilds ``subscription_today_snapshots``
+for the menu's (date, city) inside its own transaction, and the endpoint
+reads one customer's row by primary key.
+
+Rows are dropped — and the endpoint falls back to the live computation,
+which is the same ``compute_subscription_today`` function — when:
+
+* the customer's subscription or pause windows change
+  (``invalidate_customer_snapshots``);
+* a menu for that date and city is edited, released or unreleased
+  (``invalidate_menu_snapshots``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from .schema import schema_guard
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INSERT_BATCH = 500
+
+_SUBSCRIPTION_ROWS_SQL = """
+    SELECT
+        o.customer_id,
+        oi.meal_type,
+        oi.quantity,
+        COALESCE(sub_mi.component_type_id, i_sub.component_type_id) AS component_type_id,
+        COALESCE(ct.name, ct2.name)                                 AS group_name
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.order_id
+    LEFT JOIN menu_items sub_mi ON oi.menu_item_id = sub_mi.menu_item_id
+    LEFT JOIN items i_sub     ON oi.item_id = i_sub.item_id
+    LEFT JOIN component_types ct  ON sub_mi.component_type_id = ct.component_type_id
+    LEFT JOIN component_types ct2 ON i_sub.component_type_id  = ct2.component_type_id
+    LEFT JOIN subscription_pause_windows spw
+           ON spw.customer_id = o.customer_id
+          AND spw.city_code = %s
+          AND spw.is_active = 1
+          AND %s BETWEEN spw.start_date AND spw.end_date
+          AND spw.order_id = o.order_id
+    WHERE o.order_type  = 'subscription'
+      AND o.status NOT IN ('cancelled', 'rejected')
+      AND COALESCE(sub_mi.component_type_id, i_sub.component_type_id) IS NOT NULL
+      AND spw.pause_id IS NULL
+      AND {customer_filter}
+    ORDER BY o.customer_id, o.order_id, oi.order_item_id
+"""
+
+
+@schema_guard("subscription_today_snapshots_table")
+def _ensure_subscription_snapshot_table(db) -> None:
+    """Create the subscription_today_snapshots table if it does not yet exist.
+
+    Args:
+        db: mysql.connector connection.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS subscription_today_snapshots (
+                service_date DATE NOT NULL,
+                city_code VARCHAR(3) NOT NULL,
+                customer_id INT NOT NULL,
+                payload JSON NOT NULL,
+                built_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (service_date, city_code, customer_id),
+                KEY idx_sub_snapshots_customer (customer_id, service_date)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+            """
+        )
+        db.commit()
+    finally:
+        cursor.close()
+
+
+def compute_subscription_today(
+    cursor,
+    service_date: str,
+    city_code: str,
+    customer_ids: Optional[Iterable[int]] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Resolve active, non-paused subscriptions against the day's menus.
+
+    Args:
+        cursor: Dictionary cursor.
+        service_date: ISO date to resolve for.
+        city_code: City whose pause windows and menus apply.
+        customer_ids: Customers to compute; None computes every customer with a
+            subscription delivered to an address in ``city_code``.
+
+    Returns:
+        Dict mapping customer_id to the endpoint's list of entries (meal_type,
+        group_name, quantity, resolved_item_name, resolved_picture_url,
+        resolved_price, menu_released).  Subscribers whose subscriptions are
+        all paused map to an empty list.
+    """
+    params: List[Any] = [city_code, service_date]
+    if customer_ids is None:
+        customer_filter = """o.customer_id IN (
+            SELECT so.customer_id
+              FROM orders so
+              JOIN addresses sa ON sa.address_id = so.address_id
+             WHERE so.order_type = 'subscription'
+               AND so.status NOT IN ('cancelled', 'rejected')
+               AND sa.city_code = %s
+        )"""
+        params.append(city_code)
+        subscriber_ids: List[int] = []
+    else:
+        subscriber_ids = sorted({int(value) for value in customer_ids})
+        if not subscriber_ids:
+            return {}
+        customer_filter = f"o.customer_id IN ({', '.join(['%s'] * len(subscriber_ids))})"
+        params.extend(subscriber_ids)
+
+    cursor.execute(_SUBSCRIPTION_ROWS_SQL.format(customer_filter=customer_filter), tuple(params))
+    sub_rows = cursor.fetchall() or []
+
+    result: Dict[int, List[Dict[str, Any]]] = {cid: [] for cid in subscriber_ids}
+    ct_ids = sorted({r["component_type_id"] for r in sub_rows if r["component_type_id"]})
+    resolved: Dict[int, Dict[str, Any]] = {}
+    if ct_ids:
+        placeholders = ",".join(["%s"] * len(ct_ids))
+        cursor.execute(
+            f"""
+            SELECT
+                COALESCE(i.component_type_id, today_mi.component_type_id) AS component_type_id,
+                i.name          AS resolved_item_name,
+                i.picture_url   AS resolved_picture_url,
+                today_mi.rate   AS resolved_price,
+                m.is_released
+            FROM menu m
+            JOIN menu_items today_mi ON today_mi.menu_id = m.menu_id
+            JOIN items i             ON today_mi.item_id = i.item_id
+            WHERE m.date       = %s
+              AND m.menu_type  = 'ONE_DAY'
+              AND m.city_code  = %s
+              AND COALESCE(i.component_type_id, today_mi.component_type_id) IN ({placeholders})
+            """,
+            [service_date, city_code] + ct_ids,
+        )
+        resolved = {r["component_type_id"]: r for r in cursor.fetchall()}
+
+    seen: set = set()
+    for row in sub_rows:
+        customer_id = int(row["customer_id"])
+        ct_id = row["component_type_id"]
+        key = (customer_id, row["meal_type"], ct_id)
+        if key in seen:
+            continue
+        seen.add(key)
+        res = resolved.get(ct_id, {})
+        result.setdefault(customer_id, []).append(
+            {
+                "meal_type": row["meal_type"],
+                "group_name": row["group_name"],
+                "quantity": row["quantity"],
+                "resolved_item_name": res.get("resolved_item_name"),
+                "resolved_picture_url": res.get("resolved_picture_url"),
+                "resolved_price": (
+                    float(res["resolved_price"]) if res.get("resolved_price") is not None else None
+                ),
+                "menu_released": bool(res.get("is_released", False)),
+            }
+        )
+    return result
+
+
+def rebuild_subscription_snapshots(cursor, service_date: str, city_code: str) -> int:
+    """Replace the (date, city) snapshot rows with freshly computed ones.
+
+    Call inside the subscription-resolution transaction, before its commit.
+
+    Args:
+        cursor: Dictionary cursor.
+        service_date: ISO date of the resolved menu.
+        city_code: City of the resolved menu.
+
+    Returns:
+        Number of customer rows written.
+    """
+    by_customer = compute_subscription_today(cursor, service_date, city_code)
+    cursor.execute(
+        "DELETE FROM subscription_today_snapshots WHERE service_date = %s AND city_code = %s",
+        (service_date, city_code),
+    )
+    rows = [
+        (service_date, city_code, customer_id, json.dumps(entries))
+        for customer_id, entries in sorted(by_customer.items())
+    ]
+    for start in range(0, len(rows), SNAPSHOT_INSERT_BATCH):
+        batch = rows[start : start + SNAPSHOT_INSERT_BATCH]
+        values_sql = ", ".join(["(%s, %s, %s, CAST(%s AS JSON))"] * len(batch))
+        cursor.execute(
+            "INSERT INTO subscription_today_snapshots "
+            f"(service_date, city_code, customer_id, payload) VALUES {values_sql}",
+            tuple(value for row in batch for value in row),
+        )
+    return len(rows)
+
+
+def read_subscription_snapshot(
+    cursor, service_date: str, city_code: str, customer_id: int
+) -> Optional[List[Dict[str, Any]]]:
+    """Return one customer's snapshot entries, or None when there is no row.
+
+    Args:
+        cursor: Dictionary cursor.
+        service_date: ISO date.
+        city_code: City code.
+        customer_id: Customer to read.
+
+    Returns:
+        List of entries, or None on a miss.
+    """
+    cursor.execute(
+        """
+        SELECT payload
+          FROM subscription_today_snapshots
+         WHERE service_date = %s AND city_code = %s AND customer_id = %s
+        """,
+        (service_date, city_code, customer_id),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    payload = row["payload"] if isinstance(row, dict) else row[0]
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode()
+    return json.loads(payload) if isinstance(payload, str) else payload
+
+
+def invalidate_customer_snapshots(cursor, customer_ids: Iterable[Any]) -> None:
+    """Drop today's and future snapshot rows of customers whose subscriptions changed.
+
+    Args:
+        cursor: Cursor on the writer's connection (call before its commit).
+        customer_ids: Affected customers.
+    """
+    ids = sorted({int(value) for value in customer_ids if value is not None})
+    if not ids:
+        return
+    cursor.execute(
+        f"""
+        DELETE FROM subscription_today_snapshots
+         WHERE customer_id IN ({', '.join(['%s'] * len(ids))})
+           AND service_date >= %s
+        """,
+        (*ids, date.today()),
+    )
+
+
+def invalidate_menu_snapshots(cursor, menu_id: int) -> None:
+    """Drop the snapshot rows for the date and city of a changed menu.
+
+    Args:
+        cursor: Cursor on the writer's connection (call before its commit).
+        menu_id: Menu that was edited, released or unreleased.
+    """
+    cursor.execute(
+        """
+        DELETE s
+          FROM subscription_today_snapshots s
+          JOIN menu m ON m.date = s.service_date AND m.city_code = s.city_code
+         WHERE m.menu_id = %s
+        """,
+        (menu_id,),
+    )
@@ -0,0 +1,344 @@
+"""Printable trip-sheet exports (CSV and PDF), streamed one stop at a time.
+
+Drivers used to print the trip sheet from the JSON payload rendered in the
+browser, which for a large city is several megabytes.  The export endpoint
+instead explodes the saved ``trip_sheets`` payload into one row per stop
+with ``JSON_TABLE`` and reads those rows from an unbuffered cursor in small
+batches, so neither the payload nor the rendered document is ever held in
+memory and the first page reaches the client right away.
+
+The PDF writer is a minimal PDF 1.4 generator: each page (Courier text) is
+written as soon as it is full and the page tree, cross-reference table and
+trailer are written at the end, which the format allows.  Each route starts
+on a new page so sheets can be handed to drivers route by route.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import textwrap
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+EXPORT_FETCH_SIZE = 200
+
+_STOPS_SQL = """
+    SELECT jt.route_index,
+           jt.route,
+           jt.route_id,
+           jt.stop_index,
+           jt.stop_sequence,
+           jt.order_id,
+           jt.customer_name,
+           jt.phone,
+           jt.house_apartment_no,
+           jt.written_address,
+           jt.pin_code,
+           jt.total_price,
+           jt.payment_status,
+           jt.status,
+           jt.items
+      FROM trip_sheets ts,
+           JSON_TABLE(
+               ts.payload, '$.routes[*]' COLUMNS (
+                   route_index FOR ORDINALITY,
+                   route VARCHAR(150) PATH '$.route',
+                   route_id INT PATH '$.route_id',
+                   NESTED PATH '$.orders[*]' COLUMNS (
+                       stop_index FOR ORDINALITY,
+                       stop_sequence INT PATH '$.stop_sequence',
+                       order_id INT PATH '$.order_id',
+                       customer_name VARCHAR(255) PATH '$.customer_name',
+                       phone VARCHAR(32) PATH '$.phone',
+                       house_apartment_no VARCHAR(255) PATH '$.address.house_apartment_no',
+                       written_address VARCHAR(2000) PATH '$.address.written_address',
+                       pin_code VARCHAR(16) PATH '$.address.pin_code',
+                       total_price DECIMAL(12, 2) PATH '$.total_price',
+                       payment_status VARCHAR(32) PATH '$.payment_status',
+                       status VARCHAR(64) PATH '$.status',
+                       items JSON PATH '$.items'
+                   )
+               )
+           ) jt
+     WHERE ts.service_date = %s
+       AND ts.city_code = %s
+       AND ts.meal_type = %s
+       AND jt.order_id IS NOT NULL
+       {route_filter}
+     ORDER BY jt.route_index, jt.stop_index
+"""
+
+CSV_HEADER = [
+    "Route",
+    "Stop",
+    "Order ID",
+    "Customer",
+    "Phone",
+    "House/Apartment",
+    "Address",
+    "Pin Code",
+    "Items",
+    "Order Total",
+    "Payment Status",
+    "Status",
+]
+
+
+# ---------------------------------------------------------------------------
+# Row source
+# ---------------------------------------------------------------------------
+
+
+def iter_trip_sheet_stops(
+    cursor,
+    service_date: date,
+    city_code: str,
+    meal_type: str,
+    route_id: Optional[int] = None,
+    route_name: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the stops of a saved trip sheet in sheet order.
+
+    Args:
+        cursor: Unbuffered dictionary cursor; rows are fetched in batches.
+        service_date: Service date of the sheet.
+        city_code: City of the sheet.
+        meal_type: Normalised meal type of the sheet ("" for all meals).
+        route_id: Only this route.  Sheets saved before routes carried a
+            route_id are matched on ``route_name`` instead.
+        route_name: Name of ``route_id``, for the fallback match.
+
+    Yields:
+        One dict per stop with route, stop number, order, customer, address,
+        items (list) and payment/status fields.
+    """
+    route_filter = ""
+    params: List[Any] = [service_date, city_code, meal_type]
+    if route_id is not None:
+        route_filter = "AND (jt.route_id = %s OR (jt.route_id IS NULL AND jt.route = %s))"
+        params.extend([route_id, route_name])
+    cursor.execute(_STOPS_SQL.format(route_filter=route_filter), tuple(params))
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            items = row.get("items")
+            if isinstance(items, (bytes, bytearray)):
+                items = items.decode()
+            row["items"] = json.loads(items) if isinstance(items, str) else (items or [])
+            yield row
+
+
+def _items_label(items: Iterable[Dict[str, Any]]) -> str:
+    return ", ".join(
+        f"{int(item.get('quantity') or 0)} x {item.get('item_name') or 'Item'}" for item in items
+    )
+
+
+def _stop_number(row: Dict[str, Any]) -> int:
+    return int(row.get("stop_sequence") or row.get("stop_index") or 0)
+
+
+# ---------------------------------------------------------------------------
+# CSV
+# ---------------------------------------------------------------------------
+
+
+def stream_trip_sheet_csv(stops: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Render stops as CSV, yielding one chunk per batch of rows.
+
+    Args:
+        stops: Rows from ``iter_trip_sheet_stops``.
+
+    Yields:
+        CSV text chunks, header first.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADER)
+    pending = 0
+    for row in stops:
+        writer.writerow(
+            [
+                row.get("route") or "Unassigned",
+                _stop_number(row),
+                row.get("order_id"),
+                row.get("customer_name") or "",
+                row.get("phone") or "",
+                row.get("house_apartment_no") or "",
+                row.get("written_address") or "",
+                row.get("pin_code") or "",
+                _items_label(row["items"]),
+                f"{float(row.get('total_price') or 0):.2f}",
+                row.get("payment_status") or "",
+                row.get("status") or "",
+            ]
+        )
+        pending += 1
+        if pending >= EXPORT_FETCH_SIZE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    yield buf.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# PDF
+# ---------------------------------------------------------------------------
+
+PAGE_WIDTH = 595  # A4, points
+PAGE_HEIGHT = 842
+PDF_MARGIN = 40
+PDF_FONT_SIZE = 9
+PDF_LEADING = 11
+PDF_LINE_CHARS = 94  # Courier 9pt across the printable width
+PDF_LINES_PER_PAGE = (PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+
+# Object 1 is the catalog, 2 the page tree (written last), 3 the font.
+_CATALOG_ID = 1
+_PAGES_ID = 2
+_FONT_ID = 3
+
+
+def _pdf_text(value: str) -> str:
+    encoded = value.encode("latin-1", errors="replace").decode("latin-1")
+    return encoded.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class _PdfWriter:
+    """Emits PDF objects as bytes while tracking their offsets for the xref table."""
+
+    def __init__(self) -> None:
+        self.offset = 0
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = _FONT_ID + 1
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def header(self) -> bytes:
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def obj(self, obj_id: int, body: bytes) -> bytes:
+        self.offsets[obj_id] = self.offset
+        return self._emit(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def page(self, lines: List[str]) -> bytes:
+        page_id, content_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.page_ids.append(page_id)
+        text = [
+            "BT",
+            f"/F1 {PDF_FONT_SIZE} Tf",
+            f"{PDF_LEADING} TL",
+            f"{PDF_MARGIN} {PAGE_HEIGHT - PDF_MARGIN} Td",
+        ]
+        text.extend(f"({_pdf_text(line)}) '" for line in lines)
+        text.append("ET")
+        stream = "\n".join(text).encode("latin-1")
+        content = self.obj(
+            content_id,
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        )
+        page = self.obj(
+            page_id,
+            (
+                f"<< /Type /Page /Parent {_PAGES_ID} 0 R "
+                f"/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 {_FONT_ID} 0 R >> >> "
+                f"/Contents {content_id} 0 R >>"
+            ).encode(),
+        )
+        return content + page
+
+    def trailer(self) -> bytes:
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        chunks = [
+            self.obj(
+                _PAGES_ID,
+                f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode(),
+            )
+        ]
+        xref_offset = self.offset
+        size = self.next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            xref.append(b"%010d 00000 n \n" % self.offsets[obj_id])
+        xref.append(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, _CATALOG_ID, xref_offset)
+        )
+        chunks.append(self._emit(b"".join(xref)))
+        return b"".join(chunks)
+
+
+def _stop_lines(row: Dict[str, Any]) -> List[str]:
+    head = (
+        f"{_stop_number(row):>3}. #{row.get('order_id')}  {row.get('customer_name') or ''}  "
+        f"{row.get('phone') or ''}  Rs {float(row.get('total_price') or 0):.2f}  "
+        f"{row.get('payment_status') or ''}  {row.get('status') or ''}"
+    )
+    address = ", ".join(
+        part
+        for part in (
+            row.get("house_apartment_no"),
+            row.get("written_address"),
+            row.get("pin_code"),
+        )
+        if part
+    )
+    lines = textwrap.wrap(head, PDF_LINE_CHARS) or [""]
+    lines += textwrap.wrap(
+        address, PDF_LINE_CHARS, initial_indent="     ", subsequent_indent="     "
+    )
+    lines += textwrap.wrap(
+        _items_label(row["items"]),
+        PDF_LINE_CHARS,
+        initial_indent="     Items: ",
+        subsequent_indent="            ",
+    )
+    lines.append("")
+    return lines
+
+
+def stream_trip_sheet_pdf(stops: Iterable[Dict[str, Any]], title: str) -> Iterator[bytes]:
+    """Render stops as a PDF, yielding each page as soon as it is laid out.
+
+    Args:
+        stops: Rows from ``iter_trip_sheet_stops``.
+        title: Heading printed at the top of every route's first page.
+
+    Yields:
+        PDF byte chunks.
+    """
+    writer = _PdfWriter()
+    yield writer.header()
+    yield writer.obj(_CATALOG_ID, f"<< /Type /Catalog /Pages {_PAGES_ID} 0 R >>".encode())
+    yield writer.obj(
+        _FONT_ID,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    )
+
+    lines: List[str] = []
+    current_route: Optional[Any] = None
+    for row in stops:
+        route_key = row.get("route_index")
+        if route_key != current_route:
+            if lines:
+                yield writer.page(lines)
+            current_route = route_key
+            lines = [title, f"Route: {row.get('route') or 'Unassigned'}", ""]
+        for line in _stop_lines(row):
+            if len(lines) >= PDF_LINES_PER_PAGE:
+                yield writer.page(lines)
+                lines = [f"Route: {row.get('route') or 'Unassigned'} (continued)", ""]
+            lines.append(line)
+    if lines or not writer.page_ids:
+        yield writer.page(lines or [title, "No stops."])
+    yield writer.trailer()
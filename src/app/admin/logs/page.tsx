@@ -55,9 +55,17 @@ export default function LogsPage() {
   const [entityFilter, setEntityFilter] =
     useState<(typeof entityOptions)[number]>("All");
   const [search, setSearch] = useState("");
+  const [startDate, setStartDate] = useState("");
+  const [endDate, setEndDate] = useState("");
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  const fetchLogs = async () => {
-    setLoading(true);
+  const fetchLogs = async (before?: string) => {
+    if (before) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+    }
     const params = new URLSearchParams();
     if (adminIdFilter !== "All") {
       params.set("admin_id", adminIdFilter);
@@ -68,21 +76,33 @@ export default function LogsPage() {
     if (entityFilter !== "All") {
       params.set("entity_type", entityFilter);
     }
+    if (startDate) {
+      params.set("start_date", startDate);
+    }
+    if (endDate) {
+      params.set("end_date", endDate);
+    }
+    if (before) {
+      params.set("before", before);
+    }
     const query = params.toString();
     const res = await http.get(`/api/logs${query ? `?${query}` : ""}`);
     if (res.ok) {
       const data = (await res.json()) as LogEntry[];
-      setLogs(data);
-    } else {
+      setLogs((current) => (before ? [...current, ...data] : data));
+      setNextCursor(res.headers.get("X-Next-Cursor"));
+    } else if (!before) {
       setLogs([]);
+      setNextCursor(null);
     }
     setLoading(false);
+    setLoadingMore(false);
   };
 
   useEffect(() => {
     fetchLogs();
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [adminIdFilter, actionFilter, entityFilter]);
+  }, [adminIdFilter, actionFilter, entityFilter, startDate, endDate]);
 
   const filteredLogs = useMemo(() => {
     if (!search.trim()) return logs;
@@ -151,6 +171,8 @@ export default function LogsPage() {
                   setAdminIdFilter("All");
                   setActionFilter("All");
                   setEntityFilter("All");
+                  setStartDate("");
+                  setEndDate("");
                   setSearch("");
                   fetchLogs();
                 }}
@@ -165,7 +187,7 @@ export default function LogsPage() {
             </div>
           </CardHeader>
           <CardContent className="space-y-4">
-            <div className="grid gap-3 md:grid-cols-4">
+            <div className="grid gap-3 md:grid-cols-6">
               <div className="space-y-2">
                 <span className="block text-sm font-medium text-muted-foreground">
                   Admin ID
@@ -218,6 +240,26 @@ export default function LogsPage() {
                   </SelectContent>
                 </Select>
               </div>
+              <div className="space-y-2">
+                <span className="block text-sm font-medium text-muted-foreground">
+                  From
+                </span>
+                <Input
+                  type="date"
+                  value={startDate}
+                  onChange={(event) => setStartDate(event.target.value)}
+                />
+              </div>
+              <div className="space-y-2">
+                <span className="block text-sm font-medium text-muted-foreground">
+                  To
+                </span>
+                <Input
+                  type="date"
+                  value={endDate}
+                  onChange={(event) => setEndDate(event.target.value)}
+                />
+              </div>
               <div className="space-y-2">
                 <span className="block text-sm font-medium text-muted-foreground">
                   Search Description
@@ -283,6 +325,18 @@ export default function LogsPage() {
                     ))}
                   </TableBody>
                 </Table>
+                {nextCursor && (
+                  <div className="flex justify-center pt-4">
+                    <Button
+                      variant="outline"
+                      size="sm"
+                      onClick={() => fetchLogs(nextCursor)}
+                      disabled={loadingMore}
+                    >
+                      {loadingMore ? "Loading…" : "Load more"}
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
           </CardContent>
@@ -266,6 +266,8 @@ export default function CustomerV2CartPage() {
             meal_type: item.meal,
           })),
           discount_code: (couponOverride ?? appliedCoupons)[0],
+          customer_id: user?.customer_id,
+          address_id: selectedAddress?.address_id,
         });
         const data = await readJsonResponse<OrderQuoteResponse & ApiErrorResponse>(response);
         if (!response.ok) {
@@ -288,7 +290,7 @@ export default function CustomerV2CartPage() {
         setQuoteLoading(false);
       }
     },
-    [appliedCoupons, cartItems],
+    [appliedCoupons, cartItems, user?.customer_id, selectedAddress?.address_id],
   );
 
   useEffect(() => {
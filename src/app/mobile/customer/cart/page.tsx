@@ -226,6 +226,8 @@ export default function MobileCartPage() {
           meal_type: item.meal,
         })),
         discount_code: (couponOverride ?? appliedCoupons)[0],
+        customer_id: user?.customer_id,
+        address_id: selectedAddress?.address_id,
       });
       const data = await readJsonResponse<OrderQuoteResponse & ApiErrorResponse>(response);
       if (!response.ok) {
@@ -252,7 +254,7 @@ export default function MobileCartPage() {
   useEffect(() => {
     fetchQuote();
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [cartItems, appliedCoupons]);
+  }, [cartItems, appliedCoupons, user?.customer_id, selectedAddress?.address_id]);
 
   const handleApplyCoupon = async () => {
     const next = couponCode.trim();
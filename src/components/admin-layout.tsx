@@ -112,36 +112,37 @@ export function AdminLayout({ children, activePage, onNavigateAttempt }: AdminLa
   useEffect(() => {
     if (!isHydrated) return;
 
-    const checkLowStock = async () => {
+    type StockEvent = {
+      type: "low_stock" | "sold_out" | "recovered";
+      menu_item_id: number;
+      item_name: string;
+      available_qty: number;
+      max_qty: number;
+    };
+
+    const params = new URLSearchParams({ city_code: normalizedAdminCity });
+    const source = new EventSource(`/api/backend/api/menu/low-stock-alerts/stream?${params}`);
+    source.addEventListener("stock", (message) => {
       try {
-        const params = new URLSearchParams({ city_code: normalizedAdminCity });
-        const res = await fetch(`/api/backend/api/menu/low-stock-alerts?${params}`);
-        if (!res.ok) return;
-        const items = (await res.json()) as {
-          menu_item_id: number;
-          item_name: string;
-          available_qty: number;
-          max_qty: number;
-        }[];
-        items.forEach((item) => {
-          const id = `low-stock-${item.menu_item_id}`;
-          const isSoldOut = item.available_qty === 0;
-          addNotification({
-            id,
-            title: isSoldOut ? `${item.item_name} — Sold Out` : `${item.item_name} — Low Stock`,
-            message: isSoldOut
-              ? "No units remaining on today's menu."
-              : `Only ${item.available_qty} of ${item.max_qty} units left.`,
-            severity: isSoldOut ? "error" : "warning",
-            href: "/admin/dailymenusetup",
-          });
+        const item = JSON.parse((message as MessageEvent<string>).data) as StockEvent;
+        if (item.type === "recovered") return;
+        const id = `low-stock-${item.menu_item_id}`;
+        const isSoldOut = item.type === "sold_out";
+        addNotification({
+          id,
+          title: isSoldOut ? `${item.item_name} — Sold Out` : `${item.item_name} — Low Stock`,
+          message: isSoldOut
+            ? "No units remaining on today's menu."
+            : `Only ${item.available_qty} of ${item.max_qty} units left.`,
+          severity: isSoldOut ? "error" : "warning",
+          href: "/admin/dailymenusetup",
         });
       } catch {
-        // ignore network errors silently
+        // ignore malformed events
       }
-    };
+    });
 
-    checkLowStock();
+    return () => source.close();
   }, [isHydrated, normalizedAdminCity, addNotification]);
 
   const handleLogout = useCallback(async () => {
@@ -40,6 +40,8 @@ type NLSelectSuccess = {
   intent: string;
   sql: string;
   rows: Array<Record<string, unknown>>;
+  truncated?: boolean;
+  max_rows?: number;
 };
 
 type NLUpdateSuccess = {
@@ -391,6 +393,11 @@ function renderIntentBadge(result: NLResult, meta: IntentMeta | null) {
       {isSelect(result) && result.rows.length === 0 ? (
         <Badge className="bg-amber-100 text-amber-800">{effectiveMeta.emptyMessage}</Badge>
       ) : null}
+      {isSelect(result) && result.truncated ? (
+        <Badge className="bg-amber-100 text-amber-800">
+          Showing first {result.rows.length} rows · narrow the question for the rest
+        </Badge>
+      ) : null}
     </div>
   );
 }